@@ -12,13 +12,15 @@ from datetime import timedelta
 
 import numpy as np
 import pandas as pd
-from django.db.models import Avg, Count, Sum
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
 from django.utils import timezone
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 
-from apps.bookingapp.models import Booking
+from apps.bookingapp.models import Appointment
 from apps.customersapp.models import Customer, CustomerTag
 from apps.payment.models import Transaction
 
@@ -29,6 +31,30 @@ class CustomerSegmenter:
     Creates behavioral clusters to group similar customers.
     """
 
+    # Rows pulled from the database per chunk during feature extraction
+    CHUNK_SIZE = 20000
+    # Populations above this size are clustered with MiniBatchKMeans
+    MINIBATCH_THRESHOLD = 50000
+    MINIBATCH_SIZE = 4096
+
+    # Per-customer aggregates are cached between incremental runs
+    FEATURE_STATE_KEY = "customer_segmenter:feature_state:"
+    FEATURE_STATE_TTL = 60 * 60 * 24 * 7
+    STATE_COLUMNS = [
+        "last_booking_at",
+        "booking_frequency",
+        "hour_sum",
+        "hour_count",
+        "day_sum",
+        "day_count",
+        "interval_sum",
+        "interval_count",
+        "last_transaction_at",
+        "transaction_frequency",
+        "total_spend",
+        "preferred_category",
+    ]
+
     def __init__(self, n_clusters=5, random_state=42):
         """
         Initialize the customer segmentation model.
@@ -45,13 +71,21 @@ class CustomerSegmenter:
         self.feature_names = None
         self.cluster_profiles = None
 
-    def get_customer_features(self, lookback_days=365, min_transactions=1):
+    def get_customer_features(self, lookback_days=365, min_transactions=1, incremental=False):
         """
-        Extract customer features from booking and transaction data.
+        Extract customer features from appointment and transaction data.
+
+        Appointments and transactions are streamed with values() in chunks and
+        reduced to per-customer aggregates with pandas groupby, so memory is
+        bounded by the number of customers rather than the number of rows.
 
         Args:
             lookback_days: Number of days to look back for data collection
             min_transactions: Minimum number of transactions required for inclusion
+            incremental: Only recompute customers with activity since the
+                previous run, or with activity that has since left the
+                lookback window; other customers keep their cached aggregates
+                and only have their recency refreshed
 
         Returns:
             DataFrame with customer features
@@ -60,124 +94,32 @@ class CustomerSegmenter:
         end_date = timezone.now()
         start_date = end_date - timedelta(days=lookback_days)
 
-        # Get all customers with bookings in the period
-        bookings = Booking.objects.filter(
-            created_at__gte=start_date, created_at__lte=end_date
-        ).select_related("user")
-
-        # Get all transactions in the period
-        transactions = Transaction.objects.filter(
-            created_at__gte=start_date, created_at__lte=end_date, status="completed"
-        ).select_related("user")
-
-        # Extract customer IDs
-        customer_ids = set(
-            [b.user_id for b in bookings] + [t.user_id for t in transactions]
-        )
-
-        # Build customer feature matrix
-        customer_features = []
-
-        for customer_id in customer_ids:
-            customer_bookings = [b for b in bookings if b.user_id == customer_id]
-            customer_transactions = [
-                t for t in transactions if t.user_id == customer_id
-            ]
-
-            # Skip if not enough transactions
-            if len(customer_transactions) < min_transactions:
-                continue
-
-            # Calculate recency (days since last booking/transaction)
-            if customer_bookings:
-                last_booking_date = max([b.created_at for b in customer_bookings])
-                recency_booking = (end_date - last_booking_date).days
-            else:
-                recency_booking = lookback_days
-
-            if customer_transactions:
-                last_transaction_date = max(
-                    [t.created_at for t in customer_transactions]
-                )
-                recency_transaction = (end_date - last_transaction_date).days
-            else:
-                recency_transaction = lookback_days
-
-            # Calculate frequency
-            booking_frequency = len(customer_bookings)
-            transaction_frequency = len(customer_transactions)
-
-            # Calculate monetary value
-            total_spend = sum([t.amount for t in customer_transactions])
-            avg_transaction_value = (
-                total_spend / transaction_frequency if transaction_frequency > 0 else 0
-            )
-
-            # Time of day preference (0-23 scale)
-            booking_hours = [
-                b.booking_time.hour for b in customer_bookings if b.booking_time
-            ]
-            preferred_hour = int(np.mean(booking_hours)) if booking_hours else -1
+        state_key = f"{self.FEATURE_STATE_KEY}{lookback_days}"
+        previous = cache.get(state_key) if incremental else None
 
-            # Day of week preference (0-6 scale, 0=Monday)
-            booking_days = [
-                b.booking_date.weekday() for b in customer_bookings if b.booking_date
-            ]
-            preferred_day = int(np.mean(booking_days)) if booking_days else -1
-
-            # Service category preference
-            category_counts = {}
-            for booking in customer_bookings:
-                if booking.service and booking.service.category:
-                    category = booking.service.category.name
-                    category_counts[category] = category_counts.get(category, 0) + 1
-
-            preferred_category = (
-                max(category_counts.items(), key=lambda x: x[1])[0]
-                if category_counts
-                else None
+        if previous is not None:
+            # Customers with new activity, and customers whose oldest
+            # activity aged out of the window, are recomputed from scratch
+            changed_ids = list(
+                set(self._get_active_customer_ids(previous["run_at"], end_date))
+                | set(self._get_active_customer_ids(previous["start_date"], start_date))
             )
-
-            # Calculate interval between bookings
-            if len(customer_bookings) > 1:
-                booking_dates = sorted([b.created_at for b in customer_bookings])
-                intervals = [
-                    (booking_dates[i + 1] - booking_dates[i]).days
-                    for i in range(len(booking_dates) - 1)
-                ]
-                avg_interval = sum(intervals) / len(intervals)
-            else:
-                avg_interval = lookback_days
-
-            # Engagement score (simple weighted sum)
-            engagement_score = (
-                (lookback_days - recency_booking) * 0.3
-                + booking_frequency * 3  # More recent = better
-                + transaction_frequency * 2  # More bookings = better
-                + (total_spend / 100)
-                * 0.5  # More transactions = better  # More spending = better
+            changed = self._aggregate_customer_activity(
+                start_date, end_date, customer_ids=changed_ids
             )
+            state = pd.concat(
+                [previous["state"].drop(index=changed_ids, errors="ignore"), changed]
+            ).sort_index()
+        else:
+            state = self._aggregate_customer_activity(start_date, end_date)
 
-            # Assemble feature vector
-            features = {
-                "customer_id": customer_id,
-                "recency_booking": recency_booking,
-                "recency_transaction": recency_transaction,
-                "booking_frequency": booking_frequency,
-                "transaction_frequency": transaction_frequency,
-                "total_spend": total_spend,
-                "avg_transaction_value": avg_transaction_value,
-                "preferred_hour": preferred_hour,
-                "preferred_day": preferred_day,
-                "avg_interval": avg_interval,
-                "engagement_score": engagement_score,
-                "preferred_category": preferred_category,
-            }
-
-            customer_features.append(features)
+        cache.set(
+            state_key,
+            {"state": state, "start_date": start_date, "run_at": end_date},
+            self.FEATURE_STATE_TTL,
+        )
 
-        # Convert to DataFrame
-        df = pd.DataFrame(customer_features)
+        df = self._features_from_state(state, end_date, lookback_days, min_transactions)
 
         # Remove non-numerical columns for clustering
         self.feature_names = [
@@ -200,12 +142,277 @@ class CustomerSegmenter:
 
         return df
 
-    def train_model(self, customer_features=None):
+    def _get_active_customer_ids(self, since, end_date):
+        """
+        Get customers with appointments or transactions in a time window.
+
+        Args:
+            since: Start of the activity window
+            end_date: End of the activity window
+
+        Returns:
+            List of customer IDs
+        """
+        booking_ids = Appointment.objects.filter(
+            created_at__gte=since, created_at__lte=end_date
+        ).values_list("customer_id", flat=True)
+        transaction_ids = Transaction.objects.filter(
+            created_at__gte=since, created_at__lte=end_date, status="completed"
+        ).values_list("user_id", flat=True)
+
+        customer_ids = set(booking_ids.distinct()) | set(transaction_ids.distinct())
+        customer_ids.discard(None)
+        return list(customer_ids)
+
+    def _iter_chunks(self, queryset, columns):
+        """Stream a values_list queryset as DataFrame chunks."""
+        rows = []
+        for row in queryset.values_list(*columns).iterator(chunk_size=self.CHUNK_SIZE):
+            rows.append(row)
+            if len(rows) >= self.CHUNK_SIZE:
+                yield pd.DataFrame.from_records(rows, columns=columns)
+                rows = []
+        if rows:
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def _filter_customers(self, queryset, customer_ids, field):
+        """Restrict a queryset to a list of customers, if one is given."""
+        if customer_ids is None:
+            return [queryset]
+        return [
+            queryset.filter(**{f"{field}__in": customer_ids[i : i + self.CHUNK_SIZE]})
+            for i in range(0, len(customer_ids), self.CHUNK_SIZE)
+        ]
+
+    def _aggregate_customer_activity(self, start_date, end_date, customer_ids=None):
+        """
+        Reduce appointments and transactions to per-customer aggregates.
+
+        Args:
+            start_date: Start of the lookback window
+            end_date: End of the lookback window
+            customer_ids: Optional customers to restrict the aggregation to
+
+        Returns:
+            DataFrame indexed by customer ID with one row per customer
+        """
+        booking_columns = [
+            "customer_id",
+            "created_at",
+            "hour",
+            "iso_weekday",
+            "category",
+        ]
+        bookings = (
+            Appointment.objects.filter(created_at__gte=start_date, created_at__lte=end_date)
+            .annotate(
+                hour=ExtractHour("start_time"),
+                iso_weekday=ExtractIsoWeekDay("start_time"),
+                category=F("service__category__name"),
+            )
+            .order_by("customer_id", "created_at", "id")
+        )
+
+        booking_parts = []
+        category_parts = []
+        # Last booking of the previous chunk, to bridge intervals across chunks
+        carry = None
+
+        for queryset in self._filter_customers(bookings, customer_ids, "customer_id"):
+            for chunk in self._iter_chunks(queryset, booking_columns):
+                chunk["created_at"] = pd.to_datetime(chunk["created_at"], utc=True)
+
+                # Whole days between consecutive bookings of the same customer
+                previous_customer = chunk["customer_id"].shift()
+                previous_time = chunk["created_at"].shift()
+                if carry is not None:
+                    previous_customer.iloc[0] = carry[0]
+                    previous_time.iloc[0] = carry[1]
+                same_customer = chunk["customer_id"] == previous_customer
+                chunk["interval"] = (
+                    (chunk["created_at"] - previous_time) // pd.Timedelta(days=1)
+                ).where(same_customer)
+                carry = (chunk["customer_id"].iloc[-1], chunk["created_at"].iloc[-1])
+
+                chunk["day"] = chunk["iso_weekday"] - 1
+                booking_parts.append(
+                    chunk.groupby("customer_id").agg(
+                        last_booking_at=("created_at", "max"),
+                        booking_frequency=("created_at", "size"),
+                        hour_sum=("hour", "sum"),
+                        hour_count=("hour", "count"),
+                        day_sum=("day", "sum"),
+                        day_count=("day", "count"),
+                        interval_sum=("interval", "sum"),
+                        interval_count=("interval", "count"),
+                    )
+                )
+                category_parts.append(
+                    chunk.dropna(subset=["category"]).groupby(["customer_id", "category"]).size()
+                )
+
+        transactions = Transaction.objects.filter(
+            created_at__gte=start_date, created_at__lte=end_date, status="completed"
+        )
+
+        transaction_parts = []
+        for queryset in self._filter_customers(transactions, customer_ids, "user_id"):
+            for chunk in self._iter_chunks(queryset, ["user_id", "created_at", "amount"]):
+                chunk = chunk.rename(columns={"user_id": "customer_id"})
+                chunk["created_at"] = pd.to_datetime(chunk["created_at"], utc=True)
+                chunk["amount"] = chunk["amount"].astype(float)
+                transaction_parts.append(
+                    chunk.groupby("customer_id").agg(
+                        last_transaction_at=("created_at", "max"),
+                        transaction_frequency=("created_at", "size"),
+                        total_spend=("amount", "sum"),
+                    )
+                )
+
+        # Combine chunk partials; a customer can span several chunks
+        state = pd.DataFrame(index=pd.Index([], name="customer_id"))
+        if booking_parts:
+            state = state.join(
+                pd.concat(booking_parts)
+                .groupby(level=0)
+                .agg(
+                    {
+                        "last_booking_at": "max",
+                        "booking_frequency": "sum",
+                        "hour_sum": "sum",
+                        "hour_count": "sum",
+                        "day_sum": "sum",
+                        "day_count": "sum",
+                        "interval_sum": "sum",
+                        "interval_count": "sum",
+                    }
+                ),
+                how="outer",
+            )
+        if transaction_parts:
+            state = state.join(
+                pd.concat(transaction_parts)
+                .groupby(level=0)
+                .agg(
+                    {
+                        "last_transaction_at": "max",
+                        "transaction_frequency": "sum",
+                        "total_spend": "sum",
+                    }
+                ),
+                how="outer",
+            )
+
+        categories = (
+            pd.concat(category_parts).groupby(level=[0, 1]).sum()
+            if category_parts
+            else pd.Series(dtype="int64")
+        )
+        if not categories.empty:
+            # Most booked category per customer, ties broken by name
+            top = (
+                categories.rename("count")
+                .reset_index()
+                .sort_values(["customer_id", "count", "category"], ascending=[True, False, True])
+                .drop_duplicates("customer_id")
+                .set_index("customer_id")["category"]
+            )
+            state = state.join(top.rename("preferred_category"), how="outer")
+
+        for column in self.STATE_COLUMNS:
+            if column not in state.columns:
+                state[column] = pd.NaT if column.startswith("last_") else np.nan
+        return state[self.STATE_COLUMNS]
+
+    def _features_from_state(self, state, end_date, lookback_days, min_transactions):
+        """
+        Derive the feature frame from per-customer aggregates.
+
+        Args:
+            state: Per-customer aggregates from _aggregate_customer_activity
+            end_date: Reference time for recency
+            lookback_days: Number of days in the lookback window
+            min_transactions: Minimum number of transactions required for inclusion
+
+        Returns:
+            DataFrame with one row of features per customer
+        """
+        state = state.copy()
+        counts = ["booking_frequency", "transaction_frequency"]
+        sums = [
+            "total_spend",
+            "hour_sum",
+            "hour_count",
+            "day_sum",
+            "day_count",
+            "interval_sum",
+            "interval_count",
+        ]
+        state[counts] = state[counts].fillna(0).astype(int)
+        state[sums] = state[sums].fillna(0)
+
+        # Skip if not enough transactions
+        state = state[state["transaction_frequency"] >= min_transactions]
+
+        now = pd.Timestamp(end_date)
+        one_day = pd.Timedelta(days=1)
+
+        def recency(last_at):
+            return (
+                ((now - pd.to_datetime(last_at, utc=True)) // one_day)
+                .fillna(lookback_days)
+                .astype(int)
+            )
+
+        def truncated_mean(total, count):
+            return np.trunc(total / count.where(count > 0)).fillna(-1).astype(int)
+
+        df = pd.DataFrame(
+            {
+                "customer_id": state.index,
+                "recency_booking": recency(state["last_booking_at"]).values,
+                "recency_transaction": recency(state["last_transaction_at"]).values,
+                "booking_frequency": state["booking_frequency"].values,
+                "transaction_frequency": state["transaction_frequency"].values,
+                "total_spend": state["total_spend"].values,
+                "avg_transaction_value": (
+                    state["total_spend"]
+                    / state["transaction_frequency"].where(state["transaction_frequency"] > 0)
+                )
+                .fillna(0)
+                .values,
+                "preferred_hour": truncated_mean(state["hour_sum"], state["hour_count"]).values,
+                "preferred_day": truncated_mean(state["day_sum"], state["day_count"]).values,
+                "avg_interval": (
+                    state["interval_sum"]
+                    / state["interval_count"].where(state["interval_count"] > 0)
+                )
+                .fillna(lookback_days)
+                .values,
+            }
+        )
+
+        # Engagement score (simple weighted sum)
+        df["engagement_score"] = (
+            (lookback_days - df["recency_booking"]) * 0.3  # More recent = better
+            + df["booking_frequency"] * 3  # More bookings = better
+            + df["transaction_frequency"] * 2  # More transactions = better
+            + (df["total_spend"] / 100) * 0.5  # More spending = better
+        )
+        df["preferred_category"] = (
+            state["preferred_category"].where(state["preferred_category"].notna(), None)
+        ).values
+
+        return df.reset_index(drop=True)
+
+    def train_model(self, customer_features=None, use_minibatch=None):
         """
         Train the clustering model on customer features.
 
         Args:
             customer_features: Optional DataFrame with pre-computed features
+            use_minibatch: Whether to cluster with MiniBatchKMeans; defaults
+                to doing so for populations above MINIBATCH_THRESHOLD
 
         Returns:
             Trained model and cluster assignments
@@ -218,6 +425,9 @@ class CustomerSegmenter:
                 f"Not enough customers for {self.n_clusters} clusters. Have {len(customer_features)}."
             )
 
+        if use_minibatch is None:
+            use_minibatch = len(customer_features) > self.MINIBATCH_THRESHOLD
+
         # Extract numerical features for clustering
         X = customer_features[self.feature_names].copy()
 
@@ -226,9 +436,17 @@ class CustomerSegmenter:
         self.pca = PCA(
             n_components=min(5, len(self.feature_names)), random_state=self.random_state
         )
-        self.model = KMeans(
-            n_clusters=self.n_clusters, random_state=self.random_state, n_init=10
-        )
+        if use_minibatch:
+            self.model = MiniBatchKMeans(
+                n_clusters=self.n_clusters,
+                random_state=self.random_state,
+                batch_size=self.MINIBATCH_SIZE,
+                n_init=3,
+            )
+        else:
+            self.model = KMeans(
+                n_clusters=self.n_clusters, random_state=self.random_state, n_init=10
+            )
 
         # Fit the pipeline
         X_scaled = self.scaler.fit_transform(X)
@@ -6,12 +6,19 @@ time slots, resolving scheduling conflicts, and optimizing resource allocation.
 
 Key components:
 - SlotGenerator: Generates available time slots based on multiple constraints
+- AvailabilityEngine: Minute-resolution interval/bitmap engine behind SlotGenerator
 - ConstraintSolver: Solves complex scheduling problems with multiple constraints
 - ConflictDetector: Detects scheduling conflicts across multiple dimensions
 """
 
 from .conflict_detector import ConflictDetector
 from .constraint_solver import ConstraintSolver
+from .interval_engine import AvailabilityEngine
 from .slot_generator import SlotGenerator
 
-__all__ = ["SlotGenerator", "ConstraintSolver", "ConflictDetector"]
+__all__ = [
+    "SlotGenerator",
+    "AvailabilityEngine",
+    "ConstraintSolver",
+    "ConflictDetector",
+]
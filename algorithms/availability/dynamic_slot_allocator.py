@@ -20,6 +20,7 @@ from django.core.cache import cache
 from django.db.models import Avg, Count
 from django.utils import timezone
 
+from algorithms.availability.slot_cache import invalidate_slot_cache, slot_cache_token
 from apps.bookingapp.models import Appointment
 from apps.serviceapp.models import Service
 from apps.shopapp.models import Shop
@@ -88,10 +89,14 @@ class DynamicSlotAllocator:
         Returns:
             List of optimized time slots with metadata
         """
-        # Generate cache key
-        cache_key = (
-            f"{self.CACHE_PREFIX}{shop_id}:{service_id}:{target_date.isoformat()}"
+        # Generate cache key, registered under the shop/service/date tags
+        token = slot_cache_token(
+            target_date,
+            shop_id,
+            service_id,
+            [specialist_id] if specialist_id else None,
         )
+        cache_key = f"{self.CACHE_PREFIX}{shop_id}:{service_id}:{target_date.isoformat()}:{token}"
         if specialist_id:
             cache_key += f":{specialist_id}"
 
@@ -646,30 +651,13 @@ class DynamicSlotAllocator:
         """
         Invalidate cache for dynamic slot allocation
 
+        Cached allocations embed the generation token of their shop/service/date
+        tags, so invalidation bumps the matching counters instead of scanning
+        the keyspace.
+
         Args:
             shop_id: Optional shop ID to invalidate
             service_id: Optional service ID to invalidate
             date_str: Optional date string to invalidate
         """
-        patterns = []
-
-        if shop_id and service_id and date_str:
-            patterns.append(f"{self.CACHE_PREFIX}{shop_id}:{service_id}:{date_str}*")
-        elif shop_id and service_id:
-            patterns.append(f"{self.CACHE_PREFIX}{shop_id}:{service_id}:*")
-        elif shop_id and date_str:
-            patterns.append(f"{self.CACHE_PREFIX}{shop_id}:*:{date_str}*")
-        elif service_id and date_str:
-            patterns.append(f"{self.CACHE_PREFIX}*:{service_id}:{date_str}*")
-        elif shop_id:
-            patterns.append(f"{self.CACHE_PREFIX}{shop_id}:*")
-        elif service_id:
-            patterns.append(f"{self.CACHE_PREFIX}*:{service_id}:*")
-        elif date_str:
-            patterns.append(f"{self.CACHE_PREFIX}*:*:{date_str}*")
-        else:
-            patterns.append(f"{self.CACHE_PREFIX}*")
-
-        # Delete matching cache entries
-        for pattern in patterns:
-            cache.delete_pattern(pattern)
+        invalidate_slot_cache(date_str, shop_id=shop_id, service_id=service_id)
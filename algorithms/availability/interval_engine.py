@@ -0,0 +1,485 @@
+"""
+Minute-resolution availability engine.
+
+This module provides the compact availability engine used by SlotGenerator.
+Working hours, specialist hours and bookings are compiled into integer
+minute-of-day intervals and evaluated by a pluggable backend:
+
+- IntervalBackend: sorted ``[start, end)`` int-minute interval lists combined
+  with linear two-pointer merges (pure Python, no extra dependencies)
+- BitmapBackend: NumPy per-day bitmaps with 1440 cells per row (one row per
+  availability window or specialist), combined with vectorized mask operations
+
+Both backends reproduce the legacy TimeSlot pipeline exactly. Inputs that the
+minute model cannot represent (seconds, timezone-aware times, windows that wrap
+past midnight, degenerate durations) are reported by returning ``None`` so the
+caller can fall back to the legacy implementation.
+"""
+
+import logging
+from datetime import datetime, time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+Interval = Tuple[int, int]
+
+
+def time_to_minute(value: Any) -> Optional[int]:
+    """
+    Convert a naive, minute-aligned time to its minute of the day.
+
+    Args:
+        value: A time object
+
+    Returns:
+        Minute of the day (0-1439), or None if the value cannot be represented
+    """
+    if not isinstance(value, time):
+        return None
+    if value.tzinfo is not None or value.second or value.microsecond:
+        return None
+    return value.hour * 60 + value.minute
+
+
+@lru_cache(maxsize=MINUTES_PER_DAY)
+def minute_labels(minute: int) -> Tuple[str, str]:
+    """
+    Return the 24-hour and 12-hour labels for a minute of the day.
+
+    Args:
+        minute: Minute of the day (0-1439)
+
+    Returns:
+        Tuple of ("HH:MM", "HH:MM AM/PM") labels
+    """
+    value = time(minute // 60, minute % 60)
+    return value.strftime("%H:%M"), value.strftime("%I:%M %p")
+
+
+def normalize_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Sort intervals and merge the ones that overlap or touch.
+
+    Args:
+        intervals: Iterable of (start, end) minute intervals
+
+    Returns:
+        Sorted list of disjoint intervals
+    """
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class IntervalBackend:
+    """Sorted int-minute interval arrays combined with two-pointer merges."""
+
+    name = "interval"
+
+    def intersect(self, first: List[Interval], second: List[Interval]) -> List[Interval]:
+        """
+        Intersect two sorted, disjoint interval lists.
+
+        Args:
+            first: Sorted disjoint intervals
+            second: Sorted disjoint intervals
+
+        Returns:
+            Sorted disjoint intervals present in both lists
+        """
+        result = []
+        i = j = 0
+        while i < len(first) and j < len(second):
+            start = max(first[i][0], second[j][0])
+            end = min(first[i][1], second[j][1])
+            if start < end:
+                result.append((start, end))
+            if first[i][1] < second[j][1]:
+                i += 1
+            else:
+                j += 1
+        return result
+
+    def subtract(self, intervals: List[Interval], removed: List[Interval]) -> List[Interval]:
+        """
+        Remove a sorted, disjoint interval list from another one.
+
+        Args:
+            intervals: Sorted disjoint intervals
+            removed: Sorted disjoint intervals to remove
+
+        Returns:
+            Sorted disjoint intervals left after the subtraction
+        """
+        result = []
+        j = 0
+        for start, end in intervals:
+            while j < len(removed) and removed[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(removed) and removed[k][0] < end:
+                if removed[k][0] > start:
+                    result.append((start, removed[k][0]))
+                start = max(start, removed[k][1])
+                k += 1
+            if start < end:
+                result.append((start, end))
+        return result
+
+    def free_runs(
+        self,
+        rows: List[Interval],
+        specialist: Optional[List[Interval]],
+        booked: List[Interval],
+    ) -> List[Interval]:
+        """
+        Compute free runs for each availability row, in row order.
+
+        Args:
+            rows: Availability windows, processed independently and in order
+            specialist: Merged specialist availability, or None to skip
+            booked: Merged booked intervals (buffers included)
+
+        Returns:
+            Maximal free runs, grouped by row and sorted within each row
+        """
+        runs: List[Interval] = []
+        for row in rows:
+            free = [row]
+            if specialist is not None:
+                free = self.intersect(free, specialist)
+            if booked:
+                free = self.subtract(free, booked)
+            runs.extend(free)
+        return runs
+
+    def slot_starts(
+        self,
+        runs: List[Interval],
+        service_duration: int,
+        buffer_before: int,
+        buffer_after: int,
+        slot_granularity: int,
+    ) -> List[int]:
+        """
+        Extract discrete slot start minutes from free runs.
+
+        Args:
+            runs: Free runs in output order
+            service_duration: Service duration in minutes
+            buffer_before: Buffer time before service in minutes
+            buffer_after: Buffer time after service in minutes
+            slot_granularity: Time between slot start times in minutes
+
+        Returns:
+            Slot start minutes in output order
+        """
+        starts: List[int] = []
+        tail = service_duration + buffer_after
+        for start, end in runs:
+            starts.extend(range(start + buffer_before, end - tail + 1, slot_granularity))
+        return starts
+
+
+class BitmapBackend:
+    """NumPy per-day bitmaps with one 1440-cell row per window or specialist."""
+
+    name = "bitmap"
+
+    @staticmethod
+    def build_masks(intervals: Sequence[Interval]) -> np.ndarray:
+        """
+        Build one boolean minute mask per interval.
+
+        Args:
+            intervals: Sequence of (start, end) minute intervals
+
+        Returns:
+            Boolean array of shape (len(intervals), 1440)
+        """
+        if not intervals:
+            return np.zeros((0, MINUTES_PER_DAY), dtype=bool)
+        bounds = np.asarray(intervals, dtype=np.int32)
+        minutes = np.arange(MINUTES_PER_DAY, dtype=np.int32)
+        return (minutes >= bounds[:, :1]) & (minutes < bounds[:, 1:])
+
+    @classmethod
+    def build_union(cls, intervals: Sequence[Interval]) -> np.ndarray:
+        """
+        Build a single mask covering the union of intervals.
+
+        Args:
+            intervals: Sequence of (start, end) minute intervals
+
+        Returns:
+            Boolean array of shape (1440,)
+        """
+        return cls.build_masks(intervals).any(axis=0)
+
+    @staticmethod
+    def mask_runs(masks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extract maximal runs of set minutes from a stack of masks.
+
+        Args:
+            masks: Boolean array of shape (rows, 1440)
+
+        Returns:
+            Tuple of (starts, ends) arrays ordered by row, then by minute
+        """
+        padded = np.zeros((masks.shape[0], MINUTES_PER_DAY + 2), dtype=np.int8)
+        padded[:, 1:-1] = masks
+        edges = np.diff(padded, axis=1)
+        starts = np.nonzero(edges == 1)[1]
+        ends = np.nonzero(edges == -1)[1]
+        return starts, ends
+
+    def free_runs(
+        self,
+        rows: List[Interval],
+        specialist: Optional[List[Interval]],
+        booked: List[Interval],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute free runs for each availability row, in row order.
+
+        Args:
+            rows: Availability windows, processed independently and in order
+            specialist: Specialist availability intervals, or None to skip
+            booked: Booked intervals (buffers included)
+
+        Returns:
+            Tuple of (starts, ends) arrays grouped by row
+        """
+        masks = self.build_masks(rows)
+        if specialist is not None:
+            masks &= self.build_union(specialist)
+        if booked:
+            masks &= ~self.build_union(booked)
+        return self.mask_runs(masks)
+
+    def slot_starts(
+        self,
+        runs: Tuple[np.ndarray, np.ndarray],
+        service_duration: int,
+        buffer_before: int,
+        buffer_after: int,
+        slot_granularity: int,
+    ) -> List[int]:
+        """
+        Extract discrete slot start minutes from free runs.
+
+        Args:
+            runs: Tuple of (starts, ends) arrays in output order
+            service_duration: Service duration in minutes
+            buffer_before: Buffer time before service in minutes
+            buffer_after: Buffer time after service in minutes
+            slot_granularity: Time between slot start times in minutes
+
+        Returns:
+            Slot start minutes in output order
+        """
+        run_starts, run_ends = runs
+        first = run_starts + buffer_before
+        last = run_ends - service_duration - buffer_after
+        counts = np.where(last >= first, (last - first) // slot_granularity + 1, 0)
+        total = int(counts.sum())
+        if not total:
+            return []
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return (np.repeat(first, counts) + offsets * slot_granularity).tolist()
+
+
+BACKENDS = {
+    IntervalBackend.name: IntervalBackend,
+    BitmapBackend.name: BitmapBackend,
+}
+
+
+class AvailabilityEngine:
+    """
+    Compiles slot generation inputs to minute intervals and evaluates them
+    with the configured backend.
+    """
+
+    def __init__(self, backend: str = IntervalBackend.name):
+        """
+        Initialize the engine.
+
+        Args:
+            backend: Backend name ("interval" or "bitmap")
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown availability backend: {backend}")
+        self.backend = BACKENDS[backend]()
+
+    def discrete_slots(
+        self,
+        base_slots: List[Any],
+        service_availability: Optional[List[Dict[str, Any]]],
+        specialist_hours: Optional[List[Dict[str, Any]]],
+        existing_bookings: Optional[List[Dict[str, Any]]],
+        service_duration: int,
+        buffer_before: int,
+        buffer_after: int,
+        slot_granularity: int,
+        specialist_ids: Optional[List[str]] = None,
+    ) -> Optional[List[Interval]]:
+        """
+        Generate discrete slots as (start, end) minute pairs.
+
+        Args:
+            base_slots: Shop base TimeSlots for the day
+            service_availability: Optional list of service availability windows
+            specialist_hours: Optional list of specialist working hours
+            existing_bookings: Optional list of existing bookings
+            service_duration: Service duration in minutes
+            buffer_before: Buffer time before service in minutes
+            buffer_after: Buffer time after service in minutes
+            slot_granularity: Time between slot start times in minutes
+            specialist_ids: Optional list of specialist IDs to filter by
+
+        Returns:
+            List of (start, end) minute pairs, or None if the inputs need the
+            legacy TimeSlot pipeline
+        """
+        if service_duration <= 0 or slot_granularity <= 0:
+            return None
+        if buffer_before < 0 or buffer_after < 0:
+            return None
+
+        rows = self._compile_rows(base_slots, service_availability)
+        if rows is None:
+            return None
+
+        specialist = None
+        if specialist_hours and specialist_ids:
+            specialist = self._compile_specialists(specialist_hours, specialist_ids)
+            if specialist is None:
+                return None
+
+        booked: List[Interval] = []
+        if existing_bookings:
+            booked = self._compile_bookings(
+                existing_bookings, buffer_before, buffer_after, specialist_ids
+            )
+            if booked is None:
+                return None
+
+        runs = self.backend.free_runs(rows, specialist, booked)
+        starts = self.backend.slot_starts(
+            runs, service_duration, buffer_before, buffer_after, slot_granularity
+        )
+        return [(start, start + service_duration) for start in starts]
+
+    def format_slots(self, slots: List[Interval], duration: int) -> List[Dict[str, Any]]:
+        """
+        Format minute slots exactly like SlotGenerator._format_slots.
+
+        Args:
+            slots: List of (start, end) minute pairs
+            duration: Service duration in minutes
+
+        Returns:
+            List of dictionaries with formatted time slot information
+        """
+        formatted_slots = []
+        for start, end in slots:
+            start_label, start_formatted = minute_labels(start)
+            end_label, end_formatted = minute_labels(end)
+            formatted_slots.append(
+                {
+                    "start": start_label,
+                    "end": end_label,
+                    "duration": duration,
+                    "start_formatted": start_formatted,
+                    "end_formatted": end_formatted,
+                }
+            )
+        return formatted_slots
+
+    def _compile_rows(
+        self,
+        base_slots: List[Any],
+        service_availability: Optional[List[Dict[str, Any]]],
+    ) -> Optional[List[Interval]]:
+        """Compile shop hours clipped by service windows into ordered rows."""
+        if len(base_slots) != 1:
+            return None
+        base_start = time_to_minute(base_slots[0].start)
+        base_end = time_to_minute(base_slots[0].end)
+        if base_start is None or base_end is None or base_start >= base_end:
+            return None
+
+        if not service_availability:
+            return [(base_start, base_end)]
+
+        # Service windows are not merged: overlapping windows produce
+        # overlapping rows, exactly like the legacy nested intersection.
+        rows = []
+        for avail in service_availability:
+            if avail.get("is_closed", False):
+                continue
+            start = time_to_minute(avail["from_hour"])
+            end = time_to_minute(avail["to_hour"])
+            if start is None or end is None:
+                return None
+            start = max(base_start, start)
+            end = min(base_end, end)
+            if start < end:
+                rows.append((start, end))
+        return rows
+
+    def _compile_specialists(
+        self, specialist_hours: List[Dict[str, Any]], specialist_ids: List[str]
+    ) -> Optional[List[Interval]]:
+        """Compile the union of specialist working hours."""
+        intervals = []
+        for hours in specialist_hours:
+            if hours.get("specialist_id") not in specialist_ids or hours.get("is_off", False):
+                continue
+            start = time_to_minute(hours["from_hour"])
+            end = time_to_minute(hours["to_hour"])
+            if start is None or end is None or start >= end:
+                return None
+            intervals.append((start, end))
+        return normalize_intervals(intervals)
+
+    def _compile_bookings(
+        self,
+        existing_bookings: List[Dict[str, Any]],
+        buffer_before: int,
+        buffer_after: int,
+        specialist_ids: Optional[List[str]],
+    ) -> Optional[List[Interval]]:
+        """Compile bookings widened by their buffers into merged intervals."""
+        intervals = []
+        for booking in existing_bookings:
+            if specialist_ids and booking.get("specialist_id") not in specialist_ids:
+                continue
+            start_time = booking["start_time"]
+            end_time = booking["end_time"]
+            if not isinstance(start_time, datetime) or not isinstance(end_time, datetime):
+                return None
+            start = time_to_minute(start_time.time())
+            end = time_to_minute(end_time.time())
+            if start is None or end is None:
+                return None
+            start -= buffer_before
+            end += buffer_after
+            # Buffers that wrap past midnight are left to the legacy pipeline
+            if start < 0 or end >= MINUTES_PER_DAY or start >= end:
+                return None
+            intervals.append((start, end))
+        return normalize_intervals(intervals)
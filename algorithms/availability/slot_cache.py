@@ -0,0 +1,118 @@
+"""
+Tag-based invalidation for availability caches.
+
+Slot results cached by SlotGenerator, the booking AvailabilityService and the
+DynamicSlotAllocator are registered under shop/date/service/specialist tags by
+embedding the tags' generation counters in their cache keys. A booking write
+bumps a handful of counters instead of scanning the keyspace for patterns.
+"""
+
+from datetime import date
+from typing import Iterable, List, Optional, Union
+
+from utils.cache_utils import bump_generations, generation_token
+
+TAG_PREFIX = "slots"
+
+DateLike = Union[date, str]
+
+
+def _date_str(value: DateLike) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def slot_cache_tags(
+    target_date: DateLike,
+    shop_id: Optional[str] = None,
+    service_id: Optional[str] = None,
+    specialist_ids: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    Get the tags a cached slot result depends on.
+
+    Args:
+        target_date: Date the slots were generated for
+        shop_id: Optional shop ID
+        service_id: Optional service ID
+        specialist_ids: Optional specialist IDs the result covers
+
+    Returns:
+        List of tag names
+    """
+    date_str = _date_str(target_date)
+    tags = [f"{TAG_PREFIX}:all", f"{TAG_PREFIX}:date:{date_str}"]
+
+    if shop_id:
+        tags.append(f"{TAG_PREFIX}:shop:{shop_id}")
+        tags.append(f"{TAG_PREFIX}:shop:{shop_id}:{date_str}")
+    if service_id:
+        tags.append(f"{TAG_PREFIX}:service:{service_id}")
+    for specialist_id in specialist_ids or []:
+        tags.append(f"{TAG_PREFIX}:specialist:{specialist_id}:{date_str}")
+
+    return tags
+
+
+def slot_cache_token(
+    target_date: DateLike,
+    shop_id: Optional[str] = None,
+    service_id: Optional[str] = None,
+    specialist_ids: Optional[Iterable[str]] = None,
+) -> str:
+    """
+    Get the generation token to embed in a slot cache key.
+
+    Args:
+        target_date: Date the slots were generated for
+        shop_id: Optional shop ID
+        service_id: Optional service ID
+        specialist_ids: Optional specialist IDs the result covers
+
+    Returns:
+        Token that changes whenever one of the entry's tags is invalidated
+    """
+    return generation_token(slot_cache_tags(target_date, shop_id, service_id, specialist_ids))
+
+
+def invalidate_slot_cache(
+    target_date: Optional[DateLike] = None,
+    shop_id: Optional[str] = None,
+    service_id: Optional[str] = None,
+    specialist_id: Optional[str] = None,
+) -> None:
+    """
+    Invalidate cached slot results by bumping the matching tag generations.
+
+    Invalidation is conservative: when a shop and a date are given, every slot
+    result for that shop on that date is dropped, whichever service or
+    specialist it was computed for.
+
+    Args:
+        target_date: Optional date to invalidate
+        shop_id: Optional shop ID to invalidate
+        service_id: Optional service ID to invalidate
+        specialist_id: Optional specialist ID to invalidate
+    """
+    date_str = _date_str(target_date) if target_date else None
+    tags = []
+
+    if date_str:
+        if shop_id:
+            tags.append(f"{TAG_PREFIX}:shop:{shop_id}:{date_str}")
+        if specialist_id:
+            tags.append(f"{TAG_PREFIX}:specialist:{specialist_id}:{date_str}")
+        if not shop_id and not specialist_id:
+            tags.append(
+                f"{TAG_PREFIX}:service:{service_id}"
+                if service_id
+                else f"{TAG_PREFIX}:date:{date_str}"
+            )
+    elif shop_id:
+        tags.append(f"{TAG_PREFIX}:shop:{shop_id}")
+    elif service_id:
+        tags.append(f"{TAG_PREFIX}:service:{service_id}")
+    else:
+        # Specialist-wide or global changes (e.g. working hours) affect every date
+        tags.append(f"{TAG_PREFIX}:all")
+
+    bump_generations(*tags)
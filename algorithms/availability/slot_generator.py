@@ -12,9 +12,11 @@ import logging
 from datetime import datetime, time, timedelta
 from typing import Any, Dict, List, Optional
 
+from django.conf import settings
 from django.core.cache import cache
 
-from utils.cache_utils import delete_pattern
+from .interval_engine import AvailabilityEngine
+from .slot_cache import invalidate_slot_cache, slot_cache_token
 
 logger = logging.getLogger(__name__)
 
@@ -94,14 +96,28 @@ class SlotGenerator:
     Advanced time slot generator that creates available time slots based on
     multiple constraints such as business hours, specialist availability,
     service duration, and existing bookings.
+
+    Slots are computed by the minute-resolution AvailabilityEngine; inputs it
+    cannot represent fall back to the TimeSlot pipeline below.
     """
 
-    def __init__(self):
-        """Initialize the slot generator."""
+    LEGACY_BACKEND = "legacy"
+
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Initialize the slot generator.
+
+        Args:
+            backend: Availability engine backend ("interval", "bitmap" or
+                "legacy"). Defaults to the SLOT_ENGINE_BACKEND setting.
+        """
         self.constraints = []
         self.cache_enabled = True
         self.cache_ttl = 300  # 5 minutes cache for availability data
 
+        backend = backend or getattr(settings, "SLOT_ENGINE_BACKEND", "interval")
+        self.engine = None if backend == self.LEGACY_BACKEND else AvailabilityEngine(backend)
+
     def generate_slots(
         self,
         date: datetime.date,
@@ -115,6 +131,7 @@ class SlotGenerator:
         slot_granularity: int = 15,
         specialist_ids: Optional[List[str]] = None,
         use_cache: bool = True,
+        shop_id: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         """
         Generate available time slots based on all constraints.
@@ -131,6 +148,8 @@ class SlotGenerator:
             slot_granularity: Time between slot start times in minutes
             specialist_ids: Optional list of specialist IDs to filter by
             use_cache: Whether to use cache for results (default: True)
+            shop_id: Optional shop ID, registers the cached result under the
+                shop's invalidation tag
 
         Returns:
             List of available time slots with details
@@ -152,6 +171,7 @@ class SlotGenerator:
                 buffer_after,
                 slot_granularity,
                 specialist_ids,
+                shop_id,
             )
             cached_result = cache.get(cache_key)
             if cached_result is not None:
@@ -164,6 +184,60 @@ class SlotGenerator:
             logger.info(f"No shop hours available for date {date}")
             return []
 
+        # 2-5. Fast path: evaluate all constraints on minute intervals
+        discrete_minutes = None
+        if self.engine is not None:
+            discrete_minutes = self.engine.discrete_slots(
+                base_slots,
+                service_availability,
+                specialist_hours,
+                existing_bookings,
+                service_duration,
+                buffer_before,
+                buffer_after,
+                slot_granularity,
+                specialist_ids,
+            )
+
+        if discrete_minutes is not None:
+            result = self.engine.format_slots(discrete_minutes, service_duration)
+        else:
+            result = self._generate_slots_legacy(
+                base_slots,
+                service_availability,
+                specialist_hours,
+                existing_bookings,
+                service_duration,
+                buffer_before,
+                buffer_after,
+                slot_granularity,
+                specialist_ids,
+            )
+
+        # Cache the result if caching is enabled
+        if self.cache_enabled and use_cache:
+            cache.set(cache_key, result, self.cache_ttl)
+
+        return result
+
+    def _generate_slots_legacy(
+        self,
+        base_slots: List[TimeSlot],
+        service_availability: Optional[List[Dict[str, time]]],
+        specialist_hours: Optional[List[Dict[str, Any]]],
+        existing_bookings: Optional[List[Dict[str, Any]]],
+        service_duration: int,
+        buffer_before: int,
+        buffer_after: int,
+        slot_granularity: int,
+        specialist_ids: Optional[List[str]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate formatted slots with the TimeSlot pipeline.
+
+        Used for inputs the minute engine cannot represent (e.g. times with
+        seconds or windows wrapping past midnight) and as the benchmark baseline.
+        """
         # 2. Apply service availability constraints if provided
         available_slots = base_slots
         if service_availability:
@@ -201,13 +275,7 @@ class SlotGenerator:
         )
 
         # 6. Format and return the slots
-        result = self._format_slots(discrete_slots, service_duration)
-
-        # Cache the result if caching is enabled
-        if self.cache_enabled and use_cache:
-            cache.set(cache_key, result, self.cache_ttl)
-
-        return result
+        return self._format_slots(discrete_slots, service_duration)
 
     def _generate_cache_key(
         self,
@@ -221,11 +289,19 @@ class SlotGenerator:
         buffer_after,
         slot_granularity,
         specialist_ids,
+        shop_id=None,
     ):
-        """Generate a unique cache key for the slot generation parameters"""
+        """
+        Generate a unique cache key for the slot generation parameters.
+
+        The key embeds the generation token of the entry's shop/date/specialist
+        tags, so invalidate_cache_for_date makes it unreachable in O(1).
+        """
         # Create a dictionary of all parameters
         params = {
             "date": date.isoformat(),
+            "shop_id": str(shop_id) if shop_id else None,
+            "generation": slot_cache_token(date, shop_id, specialist_ids=specialist_ids),
             "service_duration": service_duration,
             "buffer_before": buffer_before,
             "buffer_after": buffer_after,
@@ -310,33 +386,22 @@ class SlotGenerator:
 
         # Create the final key
         key_str = json.dumps(params, sort_keys=True)
-        return f"slots:{hashlib.sha256(key_str.encode(), usedforsecurity=False).hexdigest()}"
+        digest = hashlib.sha256(key_str.encode(), usedforsecurity=False).hexdigest()
+        return f"slots:{date.isoformat()}:{digest}"
 
     def invalidate_cache_for_date(self, date, shop_id=None, specialist_id=None):
         """
         Invalidate cache for a specific date.
         This should be called when a booking is created, updated, or cancelled
         """
-        # Build pattern for cache deletion
-        date_str = date.isoformat()
-
-        if shop_id and specialist_id:
-            # Specific shop and specialist
-            pattern = f"slots:*{date_str}*{shop_id}*{specialist_id}*"
-        elif shop_id:
-            # All slots for this shop on this date
-            pattern = f"slots:*{date_str}*{shop_id}*"
-        elif specialist_id:
-            # All slots for this specialist on this date
-            pattern = f"slots:*{date_str}*{specialist_id}*"
-        else:
-            # All slots for this date
-            pattern = f"slots:*{date_str}*"
+        # Bump the shop/specialist generation counters for this date; cached
+        # entries registered under them become unreachable immediately
+        invalidate_slot_cache(date, shop_id=shop_id, specialist_id=specialist_id)
 
-        # Use the custom delete_pattern utility
-        deleted_count = delete_pattern(pattern)
-
-        logger.debug(f"Invalidated {deleted_count} slot cache entries for date {date}")
+        logger.debug(
+            f"Invalidated slot cache for date {date} "
+            f"(shop={shop_id}, specialist={specialist_id})"
+        )
 
     def _get_shop_base_slots(
         self, date: datetime.date, shop_hours: List[Dict[str, time]]
@@ -227,6 +227,26 @@ class WaitTimePredictor:
         try:
             # Import here to avoid circular imports
             from apps.queueapp.models import QueueTicket
+            from apps.queueapp.services.service_time_stats import ServiceTimeStats
+
+            # Single-dimension lookups are served by the streaming statistics
+            if len([f for f in (queue_id, service_id, specialist_id) if f]) == 1:
+                stats = ServiceTimeStats.get(
+                    queue_id=queue_id,
+                    service_id=service_id,
+                    specialist_id=specialist_id,
+                )
+                if stats and stats["count"] >= self.MIN_SAMPLES:
+                    return {
+                        "avg": stats["mean"],
+                        "median": stats["median"],
+                        "std_dev": stats["std_dev"] or self.DEFAULT_VARIANCE,
+                        "min": stats["min"],
+                        "max": stats["max"],
+                        "p90": stats["p90"],
+                        "confidence_interval": stats["confidence_interval"],
+                        "count": stats["count"],
+                    }
 
             # Build query filters
             filters = {
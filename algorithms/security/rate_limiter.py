@@ -11,6 +11,7 @@ This module provides sophisticated rate limiting capabilities with:
 
 import hashlib
 import json
+import math
 from functools import wraps
 from typing import Optional, Tuple
 
@@ -21,6 +22,8 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework import status
 from rest_framework.exceptions import Throttled
 
+from utils.rate_limits import GCRALimiter
+
 # Default rate limits by user role (requests per minute)
 DEFAULT_RATE_LIMITS = {
     "anonymous": 30,  # Unauthenticated users
@@ -73,32 +76,41 @@ class RateLimiter:
     """
     Sophisticated rate limiting implementation with tiered rates,
     multiple tracking strategies, and exponential backoff.
+
+    Counting is done by GCRA limiters from utils.rate_limits, one atomic
+    Redis script call per check. Requests refused again after a full extra
+    window of overage are violations, and back off exponentially.
     """
 
-    def __init__(self, redis_client=None):
-        """
-        Initialize the rate limiter.
+    WINDOW = 60  # Rates are per minute
 
-        Args:
-            redis_client: Optional Redis client for distributed rate limiting.
-                          If None, falls back to Django's cache.
-        """
-        self.redis = redis_client
-        self.use_redis = redis_client is not None
-        self.cache = cache
+    def __init__(self):
+        """Initialize the rate limiter."""
+        # (category, limit) -> (limiter, overage limiter)
+        self._limiters = {}
 
-    def _get_cache_key(self, identifier: str, category: str) -> str:
+    def _get_limiters(self, category: str, limit: int) -> Tuple[GCRALimiter, GCRALimiter]:
         """
-        Generate a cache key for rate limiting.
+        Get the limiter of a category and limit, and its overage limiter.
 
         Args:
-            identifier: User ID, IP address, or combined key
             category: Endpoint category (auth, booking, etc.)
+            limit: Rate limit (requests per minute)
 
         Returns:
-            A unique cache key string
+            Tuple of (limiter, overage_limiter)
         """
-        return f"ratelimit:{category}:{identifier}"
+        limiters = self._limiters.get((category, limit))
+        if limiters is None:
+            limiters = self._new_limiters(category, limit)
+            self._limiters[(category, limit)] = limiters
+        return limiters
+
+    def _new_limiters(self, category: str, limit: int) -> Tuple[GCRALimiter, GCRALimiter]:
+        return (
+            GCRALimiter(limit, self.WINDOW, f"ratelimit:{category}:"),
+            GCRALimiter(limit, self.WINDOW, f"ratelimit_overage:{category}:"),
+        )
 
     def _get_violation_key(self, identifier: str) -> str:
         """
@@ -116,8 +128,7 @@ class RateLimiter:
         """
         Extract identifier from request for rate limiting.
 
-        Uses user ID for authenticated users, IP for anonymous users,
-        or a combination for suspicious patterns.
+        Uses user ID for authenticated users and IP for anonymous users.
 
         Args:
             request: Django HTTP request
@@ -125,9 +136,6 @@ class RateLimiter:
         Returns:
             Tuple of (identifier, user_role)
         """
-        # Get IP address with forwarded proxy support
-        ip = self._get_client_ip(request)
-
         # Get user if authenticated
         user = getattr(request, "user", None)
         user_id = (
@@ -145,15 +153,10 @@ class RateLimiter:
 
         # Use appropriate identifier based on authentication
         if user_id:
-            # For authenticated users, primary identifier is user ID
             identifier = f"user:{user_id}"
-            # But also check IP to detect suspicious behavior where
-            # many user accounts may be used from same IP
-            ip_key = f"ip:{ip}"
-            self._increment_count(ip_key, "auth", 1, 86400)  # Track IP for 24 hours
         else:
             # For anonymous users, use IP address
-            identifier = f"ip:{ip}"
+            identifier = f"ip:{self._get_client_ip(request)}"
 
         return identifier, role
 
@@ -175,55 +178,6 @@ class RateLimiter:
 
         return ip
 
-    def _increment_count(
-        self, identifier: str, category: str, increment: int = 1, expiry: int = 60
-    ) -> int:
-        """
-        Increment the counter for rate limiting.
-
-        Args:
-            identifier: User ID or IP string
-            category: Endpoint category (auth, booking, etc.)
-            increment: Amount to increment (default 1)
-            expiry: Time in seconds before key expires (default 60s)
-
-        Returns:
-            The new count after incrementing
-        """
-        cache_key = self._get_cache_key(identifier, category)
-
-        if self.use_redis:
-            # Use Redis pipeline for atomicity
-            pipe = self.redis.pipeline()
-            pipe.incr(cache_key, increment)
-            pipe.expire(cache_key, expiry)
-            result = pipe.execute()
-            return result[0]  # Return the result of the INCR
-        else:
-            # Use Django's cache
-            count = cache.get(cache_key, 0) + increment
-            cache.set(cache_key, count, expiry)
-            return count
-
-    def _get_count(self, identifier: str, category: str) -> int:
-        """
-        Get the current count for an identifier and category.
-
-        Args:
-            identifier: User ID or IP string
-            category: Endpoint category
-
-        Returns:
-            Current count (integer)
-        """
-        cache_key = self._get_cache_key(identifier, category)
-
-        if self.use_redis:
-            count = self.redis.get(cache_key)
-            return int(count) if count else 0
-        else:
-            return cache.get(cache_key, 0)
-
     def _record_violation(self, identifier: str) -> int:
         """
         Record a rate limit violation and implement exponential backoff.
@@ -251,28 +205,6 @@ class RateLimiter:
 
         return backoff_seconds
 
-    def _get_backoff_time(self, identifier: str) -> int:
-        """
-        Get current backoff time for an identifier if in a violation state.
-
-        Args:
-            identifier: User ID or IP string
-
-        Returns:
-            Backoff time in seconds or 0 if no active backoff
-        """
-        violation_key = self._get_violation_key(identifier)
-        violations = cache.get(violation_key, 0)
-
-        if violations > 0:
-            # Calculate current backoff time
-            backoff_minutes = min(
-                BACKOFF_MULTIPLIER ** (violations - 1), MAX_BACKOFF_MINUTES
-            )
-            return int(backoff_minutes * 60)
-
-        return 0
-
     def _get_rate_limit(self, role: str, category: str) -> int:
         """
         Get the rate limit for a role and category.
@@ -295,6 +227,40 @@ class RateLimiter:
         # Fall back to default limits
         return DEFAULT_RATE_LIMITS.get(role, 30)
 
+    def check_identifier(
+        self, identifier: str, category: str, limit: int
+    ) -> Tuple[bool, Optional[int]]:
+        """
+        Count a request of an identifier against a limit.
+
+        Args:
+            identifier: User ID, IP or other identifier string
+            category: Endpoint category (auth, booking, etc.)
+            limit: Rate limit (requests per minute)
+
+        Returns:
+            Tuple of (is_allowed, retry_after)
+        """
+        limiter, overage_limiter = self._get_limiters(category, limit)
+
+        result = limiter.hit(identifier)
+        if result.allowed:
+            return True, None
+
+        # Requests refused during a backoff wait longer than one request
+        # interval, and do not count towards the next violation
+        if result.retry_after > self.WINDOW / limit:
+            return False, max(1, math.ceil(result.retry_after))
+
+        # Another full window of refused requests is a violation
+        if not overage_limiter.hit(identifier).allowed:
+            backoff_time = self._record_violation(identifier)
+            limiter.block(identifier, backoff_time)
+            overage_limiter.reset(identifier)
+            return False, backoff_time
+
+        return False, max(1, math.ceil(result.retry_after))
+
     def check_rate_limit(
         self, request: HttpRequest, category: str = "default"
     ) -> Tuple[bool, Optional[int]]:
@@ -313,33 +279,7 @@ class RateLimiter:
         # Get identifier and user role
         identifier, role = self._get_identifier(request)
 
-        # Check if in backoff period from previous violations
-        backoff_time = self._get_backoff_time(identifier)
-        if backoff_time > 0:
-            return False, backoff_time
-
-        # Get applicable rate limit
-        rate_limit = self._get_rate_limit(role, category)
-
-        # Get current count
-        current_count = self._get_count(identifier, category)
-
-        # Check if limit exceeded
-        if current_count >= rate_limit:
-            # Record violation for repeated offenders
-            if current_count >= rate_limit * 2:  # Significant overage
-                backoff_time = self._record_violation(identifier)
-                return False, backoff_time
-
-            # Calculate retry after (time remaining in the minute window)
-            retry_after = 60
-            return False, retry_after
-
-        # Increment counter
-        self._increment_count(identifier, category)
-
-        # Request is allowed
-        return True, None
+        return self.check_identifier(identifier, category, self._get_rate_limit(role, category))
 
     def reset_counts(self, identifier: str, category: str = None) -> None:
         """
@@ -349,16 +289,20 @@ class RateLimiter:
             identifier: User ID or IP string
             category: Optional category to reset (None for all)
         """
-        if category:
-            cache_key = self._get_cache_key(identifier, category)
-            cache.delete(cache_key)
-        else:
-            # For Redis, we would use pattern matching to delete all keys
-            # For Django cache, we need to know all categories used
-            categories = list(ENDPOINT_RATE_LIMITS.keys()) + ["default"]
-            for cat in categories:
-                cache_key = self._get_cache_key(identifier, cat)
-                cache.delete(cache_key)
+        categories = [category] if category else list(ENDPOINT_RATE_LIMITS.keys()) + ["default"]
+        for cat in categories:
+            limiters = next(
+                (
+                    cat_limiters
+                    for (cat_name, _), cat_limiters in self._limiters.items()
+                    if cat_name == cat
+                ),
+                None,
+            )
+            # Keys only depend on the category, so categories this process
+            # has not checked yet are reset through limiters that are not kept
+            for cat_limiter in limiters or self._new_limiters(cat, 1):
+                cat_limiter.reset(identifier)
 
 
 # Create a global instance
@@ -420,33 +364,7 @@ def otp_rate_limit(phone_number: str) -> Tuple[bool, Optional[int]]:
     # Enforce a strict rate limit for OTP requests
     otp_limit = ENDPOINT_RATE_LIMITS.get("otp", {}).get("default", 3)
 
-    # Get current count (separate from general rate limiting)
-    count_key = f"ratelimit:otp:{identifier}"
-    current_count = cache.get(count_key, 0)
-
-    if current_count >= otp_limit:
-        # Calculate time remaining in the minute window (simplified)
-        retry_after = 60
-
-        # Record violation for repeated offenders
-        if current_count >= otp_limit * 2:
-            violation_key = f"ratelimit_violations:{identifier}"
-            violations = cache.get(violation_key, 0) + 1
-            backoff_minutes = min(
-                BACKOFF_MULTIPLIER ** (violations - 1), MAX_BACKOFF_MINUTES
-            )
-            retry_after = int(backoff_minutes * 60)
-
-            # Update violation count
-            cache.set(violation_key, violations, retry_after * 2)
-
-        return False, retry_after
-
-    # Increment counter
-    cache.set(count_key, current_count + 1, 60)
-
-    # Request is allowed
-    return True, None
+    return limiter.check_identifier(identifier, "otp", otp_limit)
 
 
 class RateLimitMiddleware:
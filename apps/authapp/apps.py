@@ -8,4 +8,4 @@ class AuthAppConfig(AppConfig):
 
     def ready(self):
         # Import signals to ensure they are registered
-        pass
+        import apps.authapp.principal_signals  # noqa
@@ -0,0 +1,23 @@
+# apps/authapp/principal_signals.py
+"""
+Drop cached token principals when their user changes.
+
+Saving a user (deactivation, role or profile changes) or deleting it bumps
+the user's generation, so requests reload the user on their next token check.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .services.principal_cache import PrincipalCache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_principal_on_user_change(sender, instance, **kwargs):
+    """Invalidate cached principals of a saved or deleted user"""
+    # Invalidate now and again after commit, so no request caches the old row
+    PrincipalCache.invalidate_user(instance.id)
+    transaction.on_commit(lambda: PrincipalCache.invalidate_user(instance.id))
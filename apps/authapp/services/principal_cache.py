@@ -0,0 +1,125 @@
+"""
+Verified-principal cache for token authentication.
+
+Once a token has been fully validated and its user loaded, a slim snapshot of
+the user is cached under the token's jti: for a few seconds in a per-process
+LRU, and for up to a minute (never past the token's expiry) in the shared
+cache. Later requests with the same token rebuild the user from the snapshot
+without touching the database; the remaining fields are loaded lazily if a
+view needs them.
+
+Shared entries are versioned by a per-user generation counter, bumped when the
+user is saved or deleted and when one of their tokens is revoked, so
+deactivation and logout take effect within LOCAL_TTL seconds.
+"""
+
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.authapp.models import User
+from utils.cache_utils import LocalLRU, bump_generations, generation_token
+
+
+def user_tag(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+class PrincipalCache:
+    """Cache of authenticated users keyed by token jti"""
+
+    KEY_PREFIX = "auth_principal:"
+    TTL = getattr(settings, "AUTH_PRINCIPAL_TTL", 60)
+    # Seconds a process trusts its local entry without checking the shared cache
+    LOCAL_TTL = getattr(settings, "AUTH_PRINCIPAL_LOCAL_TTL", 5)
+
+    # Fields kept in the snapshot, everything else is deferred
+    FIELDS = (
+        "id",
+        "phone_number",
+        "email",
+        "first_name",
+        "last_name",
+        "is_staff",
+        "is_superuser",
+        "is_active",
+        "is_verified",
+        "user_type",
+        "language_preference",
+    )
+
+    _local = LocalLRU(getattr(settings, "AUTH_PRINCIPAL_LRU_SIZE", 10000))
+
+    @staticmethod
+    def _user_from_values(values: Dict) -> User:
+        # A fresh instance per request, built as if loaded from the database.
+        # from_db expects the loaded fields in model field order.
+        names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return User.from_db("default", names, [values[name] for name in names])
+
+    @classmethod
+    def get(cls, payload: Dict) -> Optional[User]:
+        """
+        Get the cached user of a validated token payload.
+
+        Args:
+            payload: Verified token payload with jti, sub and exp claims
+
+        Returns:
+            User instance, or None when not cached
+        """
+        jti, user_id = payload.get("jti"), payload.get("sub")
+        if not jti or not user_id:
+            return None
+
+        now = time.monotonic()
+        entry = cls._local.get(jti)
+        if entry is not None and now - entry[0] < cls.LOCAL_TTL:
+            return cls._user_from_values(entry[1])
+
+        token = generation_token([user_tag(user_id)])
+        values = cache.get(f"{cls.KEY_PREFIX}{jti}:{token}")
+        if values is None:
+            cls._local.discard(jti)
+            return None
+
+        cls._local.set(jti, (now, values))
+        return cls._user_from_values(values)
+
+    @classmethod
+    def set(cls, payload: Dict, user: User) -> None:
+        """
+        Cache the user of a validated token payload.
+
+        Args:
+            payload: Verified token payload with jti, sub and exp claims
+            user: Active user the token belongs to
+        """
+        jti = payload.get("jti")
+        if not jti:
+            return
+
+        ttl = cls.TTL
+        if payload.get("exp"):
+            ttl = min(ttl, int(payload["exp"] - time.time()))
+        if ttl <= 0:
+            return
+
+        values = {field: getattr(user, field) for field in cls.FIELDS}
+        token = generation_token([user_tag(user.id)])
+        cache.set(f"{cls.KEY_PREFIX}{jti}:{token}", values, ttl)
+        cls._local.set(jti, (time.monotonic(), values))
+
+    @classmethod
+    def invalidate_token(cls, jti: str, user_id=None) -> None:
+        """Drop the cached user of a revoked token."""
+        cls._local.discard(jti)
+        if user_id:
+            cls.invalidate_user(user_id)
+
+    @staticmethod
+    def invalidate_user(user_id) -> None:
+        """Drop the cached snapshots of every token of a user."""
+        bump_generations(user_tag(user_id))
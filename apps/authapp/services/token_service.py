@@ -10,6 +10,7 @@ from typing import Dict, Optional, Tuple
 
 import jwt
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.token_blacklist.models import (
@@ -23,6 +24,7 @@ from apps.authapp.constants import (
     JWT_REFRESH_TOKEN_LIFETIME_DAYS,
 )
 from apps.authapp.models import User
+from apps.authapp.services.principal_cache import PrincipalCache
 from core.exceptions.auth_exceptions import (
     TokenBlacklistedError,
     TokenExpiredError,
@@ -35,8 +37,9 @@ logger = logging.getLogger(__name__)
 class TokenService:
     """Service for managing authentication tokens with enhanced security."""
 
-    # Token blacklist cache (in-memory for simplicity, could be Redis in production)
+    # Token blacklist cache (in-memory, mirrored to the shared cache by jti)
     _blacklist = set()
+    BLACKLIST_KEY_PREFIX = "token_blacklist:"
 
     @classmethod
     def create_token(cls, user: User, token_type: str = "access") -> str:
@@ -159,15 +162,29 @@ class TokenService:
         """
         Get user associated with a token.
 
+        Users of recently validated tokens are served from PrincipalCache.
+
         Args:
             token: JWT token string
 
         Returns:
             User instance or None if token is invalid
         """
-        is_valid, payload, _ = cls.validate_token(token)
+        # Signature, expiry, type and local blacklist checks need no I/O
+        payload = cls._decode_access_token(token)
+        if not payload:
+            return None
+        jti = payload.get("jti")
+        if (jti and jti in cls._blacklist) or token in cls._blacklist:
+            return None
 
-        if not is_valid or not payload:
+        user = PrincipalCache.get(payload)
+        if user is not None:
+            return user
+
+        # The token is already verified, only revocations by other processes
+        # remain to be checked
+        if cls._is_payload_blacklisted(token, payload):
             return None
 
         try:
@@ -183,6 +200,7 @@ class TokenService:
                 logger.warning(f"Attempt to use token for inactive user: {user_id}")
                 return None
 
+            PrincipalCache.set(payload, user)
             return user
 
         except User.DoesNotExist:
@@ -192,6 +210,36 @@ class TokenService:
             logger.error(f"Error retrieving user from token: {str(e)}")
             return None
 
+    @staticmethod
+    def _decode_access_token(token: str) -> Optional[Dict]:
+        """
+        Verify the signature, expiry and type of an access token.
+
+        Args:
+            token: JWT token string
+
+        Returns:
+            Token payload, or None if the token is invalid
+        """
+        if not token:
+            return None
+
+        try:
+            payload = jwt.decode(
+                token,
+                settings.SECRET_KEY,
+                algorithms=[settings.TOKEN_ALGORITHM],
+            )
+        except jwt.InvalidTokenError:
+            return None
+        except Exception as e:
+            logger.error(f"Token validation error: {str(e)}")
+            return None
+
+        if payload.get("type") != "access":
+            return None
+        return payload
+
     @classmethod
     def blacklist_token(cls, token: str) -> bool:
         """
@@ -217,6 +265,8 @@ class TokenService:
                 jti = payload.get("jti")
                 if jti:
                     cls._blacklist.add(jti)
+                    cls._share_blacklisted(payload)
+                    PrincipalCache.invalidate_token(jti, payload.get("sub"))
                     logger.info(f"Token blacklisted: {jti}")
                     return True
             except BaseException:
@@ -231,6 +281,16 @@ class TokenService:
             logger.error(f"Error blacklisting token: {str(e)}")
             return False
 
+    @classmethod
+    def _share_blacklisted(cls, payload: Dict) -> None:
+        """Record a blacklisted jti in the shared cache until the token expires."""
+        timeout = None
+        if payload.get("exp"):
+            timeout = int(payload["exp"] - timezone.now().timestamp())
+            if timeout <= 0:
+                return
+        cache.set(f"{cls.BLACKLIST_KEY_PREFIX}{payload['jti']}", True, timeout)
+
     @classmethod
     def _is_token_blacklisted(cls, token: str) -> bool:
         """
@@ -251,19 +311,38 @@ class TokenService:
                 token,
                 options={"verify_signature": False},
             )
-            jti = payload.get("jti")
-
-            # Check if jti is in blacklist
-            if jti and jti in cls._blacklist:
-                return True
-
-            # Also check if full token is blacklisted
-            return token in cls._blacklist
-
         except Exception:
             # If we can't decode the token, check the full token
             return token in cls._blacklist
 
+        return cls._is_payload_blacklisted(token, payload)
+
+    @classmethod
+    def _is_payload_blacklisted(cls, token: str, payload: Dict) -> bool:
+        """
+        Check if a decoded token is blacklisted.
+
+        Args:
+            token: JWT token string
+            payload: Decoded token payload
+
+        Returns:
+            True if blacklisted, False otherwise
+        """
+        jti = payload.get("jti")
+
+        # Check if jti is in blacklist
+        if jti and jti in cls._blacklist:
+            return True
+
+        # Tokens revoked by other processes
+        if jti and cache.get(f"{cls.BLACKLIST_KEY_PREFIX}{jti}"):
+            cls._blacklist.add(jti)
+            return True
+
+        # Also check if full token is blacklisted
+        return token in cls._blacklist
+
     @classmethod
     def refresh_token(cls, refresh_token: str) -> Optional[Dict[str, str]]:
         """
@@ -407,6 +486,7 @@ class TokenService:
 
             # Add to blacklist
             BlacklistedToken.objects.get_or_create(token=outstanding_token)
+            PrincipalCache.invalidate_user(outstanding_token.user_id)
 
             logger.info(f"Token {token[:10]}... blacklisted successfully")
             return True
@@ -435,6 +515,7 @@ class TokenService:
             # Add all to blacklist
             for token in tokens:
                 BlacklistedToken.objects.get_or_create(token=token)
+            PrincipalCache.invalidate_user(user_id)
 
             logger.info(f"All tokens for user {user_id} blacklisted successfully")
             return True
@@ -1,6 +1,10 @@
 import datetime
+import time
+import uuid
 from unittest.mock import MagicMock, patch
 
+import jwt
+from django.conf import settings
 from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
@@ -8,6 +12,7 @@ from django.utils import timezone
 from apps.authapp.models import OTP, User
 from apps.authapp.services.otp_service import OTPService
 from apps.authapp.services.phone_verification import PhoneVerificationService
+from apps.authapp.services.principal_cache import PrincipalCache
 from apps.authapp.services.security_service import SecurityService
 from apps.authapp.services.token_service import TokenService
 
@@ -163,6 +168,113 @@ class TokenServiceTest(TestCase):
         self.assertIsNone(result_user)
 
 
+class PrincipalCacheTest(TestCase):
+    """
+    Test case for the cached principals of validated tokens.
+    """
+
+    def setUp(self):
+        self.override = self.settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            TOKEN_ALGORITHM="HS256",
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        cache.clear()
+        PrincipalCache._local.clear()
+        TokenService._blacklist.clear()
+
+        self.user = User.objects.create(
+            phone_number="966501234567", email="test@example.com", user_type="customer"
+        )
+        self.token, self.payload = self.access_token(self.user)
+
+    def access_token(self, user):
+        now = int(time.time())
+        payload = {
+            "sub": str(user.id),
+            "type": "access",
+            "iat": now,
+            "exp": now + 3600,
+            "jti": str(uuid.uuid4()),
+        }
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256"), payload
+
+    def test_cached_user_served_without_database(self):
+        """Test that a validated token is served from the cache afterwards."""
+        self.assertEqual(TokenService.get_user_from_token(self.token), self.user)
+
+        with self.assertNumQueries(0):
+            user = TokenService.get_user_from_token(self.token)
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.phone_number, self.user.phone_number)
+
+    def test_shared_entry_used_after_local_miss(self):
+        """Test that another process finds the user in the shared cache."""
+        PrincipalCache.set(self.payload, self.user)
+        PrincipalCache._local.clear()
+
+        self.assertEqual(PrincipalCache.get(self.payload), self.user)
+
+        # Refilled locally, the next lookup skips the shared cache
+        cache.clear()
+        self.assertEqual(PrincipalCache.get(self.payload), self.user)
+
+    def test_local_entry_trusted_for_local_ttl(self):
+        """Test that local entries outlive invalidation by at most LOCAL_TTL."""
+        PrincipalCache.set(self.payload, self.user)
+        PrincipalCache.invalidate_user(self.user.id)
+
+        # Still trusted within the window
+        self.assertEqual(PrincipalCache.get(self.payload), self.user)
+
+        later = time.monotonic() + PrincipalCache.LOCAL_TTL + 1
+        with patch("apps.authapp.services.principal_cache.time.monotonic", return_value=later):
+            self.assertIsNone(PrincipalCache.get(self.payload))
+
+    def test_blacklisted_token_invalidated(self):
+        """Test that blacklisting drops the cached user at once."""
+        self.assertIsNotNone(TokenService.get_user_from_token(self.token))
+
+        self.assertTrue(TokenService.blacklist_token(self.token))
+
+        self.assertIsNone(PrincipalCache.get(self.payload))
+        self.assertIsNone(TokenService.get_user_from_token(self.token))
+
+    def test_token_blacklisted_by_other_process_rejected(self):
+        """Test that jtis blacklisted in the shared cache are rejected."""
+        cache.set(f"{TokenService.BLACKLIST_KEY_PREFIX}{self.payload['jti']}", True)
+
+        self.assertIsNone(TokenService.get_user_from_token(self.token))
+
+    def test_user_change_invalidates_principal(self):
+        """Test that saving or deleting a user drops its cached principals."""
+        PrincipalCache.set(self.payload, self.user)
+        PrincipalCache._local.clear()
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(PrincipalCache.get(self.payload))
+        self.assertIsNone(TokenService.get_user_from_token(self.token))
+
+        # Deleting invalidates as well
+        other = User.objects.create(phone_number="966501234568", user_type="customer")
+        _, payload = self.access_token(other)
+        PrincipalCache.set(payload, other)
+        PrincipalCache._local.clear()
+        other.delete()
+
+        self.assertIsNone(PrincipalCache.get(payload))
+
+    def test_token_decoded_once_on_cache_miss(self):
+        """Test that a cache miss decodes the token only once."""
+        with patch("apps.authapp.services.token_service.jwt.decode", wraps=jwt.decode) as decode:
+            self.assertEqual(TokenService.get_user_from_token(self.token), self.user)
+
+        decode.assert_called_once()
+
+
 class SecurityServiceTest(TestCase):
     """
     Test case for the Security service.
@@ -1,10 +1,12 @@
 # apps/bookingapp/services/availability_service.py
 import logging
+from collections import defaultdict
 from datetime import date, datetime, time, timedelta
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from django.core.cache import cache
 
+from algorithms.availability.slot_cache import slot_cache_token
 from apps.bookingapp.models import Appointment
 from apps.serviceapp.models import Service, ServiceAvailability
 from apps.shopapp.models import Shop, ShopHours
@@ -18,6 +20,7 @@ logger = logging.getLogger(__name__)
 # Type definitions for time slots
 TimeSlot = Tuple[datetime, datetime]  # (start_time, end_time)
 TimeRange = Tuple[time, time]  # (start_time, end_time)
+SlotSpecialists = Tuple[datetime, datetime, Set[str]]  # (start, end, specialist_ids)
 DayOfWeek = int  # 0-6: Monday-Sunday
 
 
@@ -56,12 +59,32 @@ class AvailabilityService:
         Returns:
             List of available time slots as (start_time, end_time) tuples
         """
-        # Check cache first
-        cache_key = f"availability:{shop_id}:{service_id}:{target_date}:{specialist_id}:{duration_override}:{slot_interval}"
+        # Check cache first; the token ties the entry to the shop/date tags
+        # bumped by booking writes
+        token = slot_cache_token(
+            target_date,
+            shop_id,
+            service_id,
+            [specialist_id] if specialist_id else None,
+        )
+        cache_key = (
+            f"availability:{shop_id}:{service_id}:{target_date}:{specialist_id}:"
+            f"{duration_override}:{slot_interval}:{token}"
+        )
         cached_result = cache.get(cache_key)
         if cached_result:
             return cached_result
 
+        if not specialist_id:
+            # Any specialist: derive from the batched per-slot specialist sets
+            slot_specialists = cls.get_slot_specialists(
+                shop_id, service_id, target_date, duration_override, slot_interval
+            )
+            available_slots = [(start, end) for start, end, _ in slot_specialists]
+            if available_slots:
+                cache.set(cache_key, available_slots, cls.AVAILABILITY_CACHE_TTL)
+            return available_slots
+
         try:
             # Get required data
             service = Service.objects.select_related("shop").get(id=service_id)
@@ -75,114 +98,168 @@ class AvailabilityService:
                 slot_interval or service.slot_granularity or 15
             )  # Default 15-min slots
 
-            # 1. Get shop operating hours for the day
+            # 1-3. Intersect shop operating hours and service availability
             day_of_week = target_date.weekday()
-            shop_hours = cls._get_shop_hours(shop, day_of_week)
-            if not shop_hours:
-                logger.info(f"Shop {shop.name} is closed on {target_date}")
+            base_availability = cls._get_base_availability(shop, service, target_date)
+            if not base_availability:
                 return []
 
-            # 2. Get service availability time ranges
-            service_ranges = cls._get_service_availability(service, day_of_week)
-            if not service_ranges:
-                logger.info(f"Service {service.name} is not available on {target_date}")
+            # 4. Consider the specialist's availability
+            specialist = Specialist.objects.get(id=specialist_id)
+            specialist_ranges = cls._get_specialist_hours(specialist, day_of_week)
+            if not specialist_ranges:
+                logger.info(
+                    f"Specialist {specialist.employee.name} is not working on {target_date}"
+                )
                 return []
 
-            # 3. Intersect shop hours and service availability
-            base_availability = cls._intersect_time_ranges(shop_hours, service_ranges)
+            # Intersect with specialist availability
+            base_availability = cls._intersect_time_ranges(base_availability, specialist_ranges)
             if not base_availability:
                 logger.info(
-                    f"No overlap between shop hours and service availability on {target_date}"
+                    f"No overlap between service availability and specialist hours on {target_date}"
                 )
                 return []
 
-            # 4. If specialist is specified, consider their availability
-            if specialist_id:
-                specialist = Specialist.objects.get(id=specialist_id)
-                specialist_ranges = cls._get_specialist_hours(specialist, day_of_week)
+            # Get specialist's existing appointments
+            existing_bookings = cls._get_specialist_bookings(specialist_id, target_date)
+
+            # Generate discrete time slots, avoiding existing bookings
+            available_slots = cls._generate_available_slots(
+                base_availability,
+                target_date,
+                duration,
+                buffer_before,
+                buffer_after,
+                granularity,
+                existing_bookings,
+            )
+
+            # Sort slots by start time
+            available_slots.sort(key=lambda x: x[0])
+
+            # Cache the result
+            cache.set(cache_key, available_slots, cls.AVAILABILITY_CACHE_TTL)
+
+            return available_slots
+
+        except Exception as e:
+            logger.error(f"Error calculating availability: {str(e)}")
+            return []
+
+    @classmethod
+    def get_slot_specialists(
+        cls,
+        shop_id: str,
+        service_id: str,
+        target_date: date,
+        duration_override: Optional[int] = None,
+        slot_interval: Optional[int] = None,
+    ) -> List[SlotSpecialists]:
+        """
+        Calculate available slots together with the specialists free for each.
+
+        Working hours and active appointments for every eligible specialist are
+        loaded in one query each and grouped in memory, so the query count does
+        not grow with the number of specialists.
+
+        Args:
+            shop_id: ID of the shop
+            service_id: ID of the service
+            target_date: Date to check availability for
+            duration_override: Optional custom duration (overrides service duration)
+            slot_interval: Optional custom slot granularity (overrides service slot_granularity)
+
+        Returns:
+            List of (start_time, end_time, specialist_ids) tuples sorted by time
+        """
+        slot_specialists, _ = cls._get_slot_specialists(
+            shop_id, service_id, target_date, duration_override, slot_interval
+        )
+        return slot_specialists
+
+    @classmethod
+    def _get_slot_specialists(
+        cls,
+        shop_id: str,
+        service_id: str,
+        target_date: date,
+        duration_override: Optional[int] = None,
+        slot_interval: Optional[int] = None,
+    ) -> Tuple[List[SlotSpecialists], Optional[Tuple[List, Dict, Dict]]]:
+        """
+        Calculate the slot specialists along with the batch they were built from.
+
+        Returns:
+            Tuple of (slot_specialists, batch). batch is the (specialist_ids,
+            hours_by_specialist, bookings_by_specialist) loaded for the date, or
+            None when the result came from the cache or needed no batch.
+        """
+        token = slot_cache_token(target_date, shop_id, service_id)
+        cache_key = (
+            f"availability_specialists:{shop_id}:{service_id}:{target_date}:"
+            f"{duration_override}:{slot_interval}:{token}"
+        )
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            return cached_result, None
+
+        try:
+            service = Service.objects.select_related("shop").get(id=service_id)
+            shop = Shop.objects.get(id=shop_id)
+
+            duration = duration_override or service.duration
+            buffer_before = service.buffer_before or 0
+            buffer_after = service.buffer_after or 0
+            granularity = slot_interval or service.slot_granularity or 15
+
+            base_availability = cls._get_base_availability(shop, service, target_date)
+            if not base_availability:
+                return [], None
+
+            specialists = list(cls._get_specialists_for_service(service_id))
+            if not specialists:
+                logger.warning(f"No specialists assigned to service {service.name}")
+                return [], None
+
+            specialist_ids = [sp.id for sp in specialists]
+            hours_by_specialist = cls._get_specialists_hours(specialist_ids, target_date.weekday())
+            bookings_by_specialist = cls._get_specialists_bookings(specialist_ids, target_date)
+            batch = (specialist_ids, hours_by_specialist, bookings_by_specialist)
+
+            # Collect (start, end, specialist) candidates for every specialist
+            candidates = []
+            for sp_id in specialist_ids:
+                specialist_ranges = hours_by_specialist.get(sp_id)
                 if not specialist_ranges:
-                    logger.info(
-                        f"Specialist {specialist.employee.name} is not working on {target_date}"
-                    )
-                    return []
+                    continue
 
-                # Intersect with specialist availability
-                base_availability = cls._intersect_time_ranges(
+                specialist_availability = cls._intersect_time_ranges(
                     base_availability, specialist_ranges
                 )
-                if not base_availability:
-                    logger.info(
-                        f"No overlap between service availability and specialist hours on {target_date}"
-                    )
-                    return []
-
-                # Get specialist's existing appointments
-                existing_bookings = cls._get_specialist_bookings(
-                    specialist_id, target_date
-                )
+                if not specialist_availability:
+                    continue
 
-                # Generate discrete time slots, avoiding existing bookings
-                available_slots = cls._generate_available_slots(
-                    base_availability,
+                specialist_slots = cls._generate_available_slots(
+                    specialist_availability,
                     target_date,
                     duration,
                     buffer_before,
                     buffer_after,
                     granularity,
-                    existing_bookings,
+                    bookings_by_specialist.get(sp_id, []),
                 )
-            else:
-                # Find any available specialist
-                specialists = cls._get_specialists_for_service(service_id)
-                if not specialists:
-                    logger.warning(f"No specialists assigned to service {service.name}")
-                    return []
-
-                # Combine availability across all specialists
-                available_slots = []
-                for sp in specialists:
-                    # Get this specialist's working hours
-                    specialist_ranges = cls._get_specialist_hours(sp, day_of_week)
-                    if not specialist_ranges:
-                        continue
-
-                    # Intersect base availability with this specialist's hours
-                    specialist_availability = cls._intersect_time_ranges(
-                        base_availability, specialist_ranges
-                    )
-                    if not specialist_availability:
-                        continue
-
-                    # Get this specialist's existing appointments
-                    existing_bookings = cls._get_specialist_bookings(sp.id, target_date)
-
-                    # Generate slots for this specialist
-                    specialist_slots = cls._generate_available_slots(
-                        specialist_availability,
-                        target_date,
-                        duration,
-                        buffer_before,
-                        buffer_after,
-                        granularity,
-                        existing_bookings,
-                    )
-
-                    # Merge into overall availability
-                    available_slots = cls._merge_time_slots(
-                        available_slots, specialist_slots
-                    )
+                candidates.extend((start, end, sp_id) for start, end in specialist_slots)
 
-            # Sort slots by start time
-            available_slots.sort(key=lambda x: x[0])
+            slot_specialists = cls._sweep_slot_specialists(candidates)
 
-            # Cache the result
-            cache.set(cache_key, available_slots, cls.AVAILABILITY_CACHE_TTL)
+            cache.set(cache_key, slot_specialists, cls.AVAILABILITY_CACHE_TTL)
 
-            return available_slots
+            return slot_specialists, batch
 
         except Exception as e:
-            logger.error(f"Error calculating availability: {str(e)}")
-            return []
+            logger.error(f"Error calculating specialist availability: {str(e)}")
+            return [], None
 
     @classmethod
     def get_earliest_available_slot(
@@ -242,9 +319,24 @@ class AvailabilityService:
         """
         try:
             service = Service.objects.get(id=service_id)
-            specialists = cls._get_specialists_for_service(service_id)
-
             target_datetime = datetime.combine(target_date, target_time)
+
+            slot_specialists, batch = cls._get_slot_specialists(shop_id, service_id, target_date)
+            if batch:
+                specialist_ids, hours_by_specialist, bookings_by_specialist = batch
+            else:
+                specialist_ids = [
+                    specialist.id for specialist in cls._get_specialists_for_service(service_id)
+                ]
+
+            # Reuse the batched slot result when the time falls on a slot boundary
+            for slot_start, _, slot_specialist_ids in slot_specialists:
+                if slot_start == target_datetime:
+                    for sp_id in specialist_ids:
+                        if sp_id in slot_specialist_ids:
+                            return sp_id
+                    break
+
             duration = service.duration
             buffer_before = service.buffer_before or 0
             buffer_after = service.buffer_after or 0
@@ -255,33 +347,29 @@ class AvailabilityService:
                 minutes=duration + buffer_after
             )
 
-            for specialist in specialists:
+            # Load the batch only if the slot result didn't bring one
+            if not batch:
+                hours_by_specialist = cls._get_specialists_hours(
+                    specialist_ids, target_date.weekday()
+                )
+                bookings_by_specialist = cls._get_specialists_bookings(specialist_ids, target_date)
+
+            for sp_id in specialist_ids:
                 # Check if specialist is working during this time
-                if not cls._is_specialist_available(
-                    specialist,
-                    target_date,
-                    start_with_buffer.time(),
-                    end_with_buffer.time(),
+                if not any(
+                    start_with_buffer.time() >= work_start and end_with_buffer.time() <= work_end
+                    for work_start, work_end in hours_by_specialist.get(sp_id, [])
                 ):
                     continue
 
                 # Check for conflicts with existing bookings
-                existing_bookings = cls._get_specialist_bookings(
-                    specialist.id, target_date
+                has_conflict = any(
+                    start_with_buffer < booking_end and end_with_buffer > booking_start
+                    for booking_start, booking_end in bookings_by_specialist.get(sp_id, [])
                 )
-                has_conflict = False
-
-                for booking_start, booking_end in existing_bookings:
-                    # Check for overlap
-                    if (
-                        start_with_buffer < booking_end
-                        and end_with_buffer > booking_start
-                    ):
-                        has_conflict = True
-                        break
 
                 if not has_conflict:
-                    return specialist.id
+                    return sp_id
 
             # No available specialist found
             return None
@@ -341,6 +429,28 @@ class AvailabilityService:
     # Private helper methods
     # ------------------------------------------------------------------------
 
+    @classmethod
+    def _get_base_availability(
+        cls, shop: Shop, service: Service, target_date: date
+    ) -> List[TimeRange]:
+        """Intersect shop operating hours with service availability for a date."""
+        day_of_week = target_date.weekday()
+
+        shop_hours = cls._get_shop_hours(shop, day_of_week)
+        if not shop_hours:
+            logger.info(f"Shop {shop.name} is closed on {target_date}")
+            return []
+
+        service_ranges = cls._get_service_availability(service, day_of_week)
+        if not service_ranges:
+            logger.info(f"Service {service.name} is not available on {target_date}")
+            return []
+
+        base_availability = cls._intersect_time_ranges(shop_hours, service_ranges)
+        if not base_availability:
+            logger.info(f"No overlap between shop hours and service availability on {target_date}")
+        return base_availability
+
     @staticmethod
     def _get_shop_hours(shop: Shop, day_of_week: int) -> List[TimeRange]:
         """Get operating hours for a shop on a specific day of the week."""
@@ -438,30 +548,48 @@ class AvailabilityService:
             return []
 
     @staticmethod
-    def _is_specialist_available(
-        specialist: Specialist, target_date: date, start_time: time, end_time: time
-    ) -> bool:
-        """Check if a specialist is available during a specific time range."""
+    def _get_specialists_hours(
+        specialist_ids: List[str], day_of_week: int
+    ) -> Dict[str, List[TimeRange]]:
+        """Get working hours for many specialists in one query, grouped by specialist."""
+        hours_by_specialist = defaultdict(list)
         try:
-            day_of_week = target_date.weekday()
-            working_hours = AvailabilityService._get_specialist_hours(
-                specialist, day_of_week
-            )
+            working_hours = SpecialistWorkingHours.objects.filter(
+                specialist_id__in=specialist_ids, weekday=day_of_week, is_off=False
+            ).values_list("specialist_id", "from_hour", "to_hour")
 
-            # If no working hours defined, specialist is not working
-            if not working_hours:
-                return False
+            for sp_id, from_hour, to_hour in working_hours:
+                hours_by_specialist[sp_id].append((from_hour, to_hour))
 
-            # Check if the requested time falls within any working period
-            for work_start, work_end in working_hours:
-                if start_time >= work_start and end_time <= work_end:
-                    return True
+        except Exception as e:
+            logger.error(f"Error getting specialists hours: {str(e)}")
 
-            return False
+        return hours_by_specialist
+
+    @staticmethod
+    def _get_specialists_bookings(
+        specialist_ids: List[str], target_date: date
+    ) -> Dict[str, List[TimeSlot]]:
+        """Get active bookings for many specialists in one query, grouped by specialist."""
+        bookings_by_specialist = defaultdict(list)
+        try:
+            day_start = datetime.combine(target_date, time.min)
+            day_end = datetime.combine(target_date, time.max)
+
+            appointments = Appointment.objects.filter(
+                specialist_id__in=specialist_ids,
+                start_time__gte=day_start,
+                start_time__lte=day_end,
+                status__in=["scheduled", "confirmed", "in_progress"],
+            ).values_list("specialist_id", "start_time", "end_time")
+
+            for sp_id, start_time, end_time in appointments:
+                bookings_by_specialist[sp_id].append((start_time, end_time))
 
         except Exception as e:
-            logger.error(f"Error checking specialist availability: {str(e)}")
-            return False
+            logger.error(f"Error getting specialists bookings: {str(e)}")
+
+        return bookings_by_specialist
 
     @staticmethod
     def _intersect_time_ranges(
@@ -562,25 +690,22 @@ class AvailabilityService:
         return available_slots
 
     @staticmethod
-    def _merge_time_slots(
-        slots1: List[TimeSlot], slots2: List[TimeSlot]
-    ) -> List[TimeSlot]:
+    def _sweep_slot_specialists(
+        candidates: List[Tuple[datetime, datetime, str]],
+    ) -> List[SlotSpecialists]:
         """
-        Merge two lists of time slots, removing any duplicates.
+        Union per-specialist slots into per-slot specialist sets.
 
-        This is used when combining availability across multiple specialists.
+        Candidates are swept once in (start, end) order; consecutive identical
+        slots are folded into a single entry carrying every free specialist.
         """
-        # Create a set to eliminate duplicates (convert to string for hashability)
-        merged_set = set(
-            f"{slot[0].isoformat()}|{slot[1].isoformat()}" for slot in slots1 + slots2
-        )
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
 
-        # Convert back to datetime tuples
-        merged_slots = []
-        for slot_str in merged_set:
-            start_str, end_str = slot_str.split("|")
-            merged_slots.append(
-                (datetime.fromisoformat(start_str), datetime.fromisoformat(end_str))
-            )
+        slot_specialists = []
+        for start, end, sp_id in candidates:
+            if slot_specialists and slot_specialists[-1][:2] == (start, end):
+                slot_specialists[-1][2].add(sp_id)
+            else:
+                slot_specialists.append((start, end, {sp_id}))
 
-        return merged_slots
+        return slot_specialists
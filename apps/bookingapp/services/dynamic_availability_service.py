@@ -111,6 +111,9 @@ class DynamicAvailabilityService:
         """
         Invalidate the dynamic slot cache when bookings change
 
+        Bumps the shop/date slot cache generation, which also drops the
+        SlotGenerator and AvailabilityService entries for that day.
+
         Args:
             appointment_id: ID of the modified appointment
             service_id: Service ID
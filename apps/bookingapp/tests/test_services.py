@@ -3,9 +3,10 @@ import uuid
 from datetime import datetime, time, timedelta
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.utils import timezone
 
+from algorithms.availability.slot_generator import SlotGenerator
 from apps.authapp.models import User
 from apps.bookingapp.models import Appointment, AppointmentReminder
 from apps.bookingapp.services.availability_service import AvailabilityService
@@ -190,6 +191,106 @@ class AvailabilityServiceTest(TestCase):
 
         self.assertTrue(is_available)
 
+    def test_sweep_slot_specialists(self):
+        """Test folding per-specialist slots into per-slot specialist sets"""
+        nine = datetime.combine(self.test_date, time(9, 0))
+        ten = datetime.combine(self.test_date, time(10, 0))
+        eleven = datetime.combine(self.test_date, time(11, 0))
+
+        slot_specialists = AvailabilityService._sweep_slot_specialists(
+            [(ten, eleven, "b"), (nine, ten, "a"), (ten, eleven, "a")]
+        )
+
+        self.assertEqual(slot_specialists, [(nine, ten, {"a"}), (ten, eleven, {"a", "b"})])
+
+    def test_get_slot_specialists_batches_queries(self):
+        """Test that multi-specialist availability does not query per specialist"""
+        from apps.specialistsapp.models import SpecialistWorkingHours
+
+        for _ in range(5):
+            specialist = Specialist.objects.create(id=uuid.uuid4())
+            SpecialistService.objects.create(specialist=specialist, service=self.service)
+            SpecialistWorkingHours.objects.create(
+                specialist=specialist,
+                weekday=self.test_date.weekday(),
+                from_hour=time(9, 0),
+                to_hour=time(17, 0),
+                is_off=False,
+            )
+
+        with self.assertNumQueries(8):
+            slot_specialists = AvailabilityService.get_slot_specialists(
+                self.shop.id, self.service.id, self.test_date
+            )
+
+        self.assertEqual(
+            AvailabilityService.get_available_slots(self.shop.id, self.service.id, self.test_date),
+            [(start, end) for start, end, _ in slot_specialists],
+        )
+        self.assertTrue(all(len(ids) == 6 for _, _, ids in slot_specialists))
+
+    def test_next_available_specialist_reuses_slot_batch(self):
+        """Test that a time off the slot grid does not reload the specialist batch"""
+        with self.assertNumQueries(9):
+            specialist_id = AvailabilityService.get_next_available_specialist(
+                self.shop.id, self.service.id, self.test_date, time(10, 10)
+            )
+
+        self.assertEqual(specialist_id, self.specialist.id)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SlotCacheInvalidationTest(SimpleTestCase):
+    """Test cases for tag-based slot cache invalidation"""
+
+    def setUp(self):
+        self.test_date = timezone.now().date() + timedelta(days=1)
+        self.shop_hours = [
+            {
+                "weekday": (self.test_date.weekday() + 1) % 7,
+                "from_hour": time(9, 0),
+                "to_hour": time(17, 0),
+            }
+        ]
+        self.generator = SlotGenerator()
+
+    def _cache_key(self, shop_id, specialist_ids=None):
+        return self.generator._generate_cache_key(
+            self.test_date,
+            self.shop_hours,
+            None,
+            None,
+            None,
+            30,
+            0,
+            0,
+            15,
+            specialist_ids,
+            shop_id,
+        )
+
+    def test_invalidate_cache_for_date_changes_keys(self):
+        """Test that booking invalidation makes cached slot keys unreachable"""
+        shop_key = self._cache_key("shop-1")
+        other_shop_key = self._cache_key("shop-2")
+        specialist_key = self._cache_key(None, ["specialist-1"])
+
+        self.generator.invalidate_cache_for_date(
+            self.test_date, shop_id="shop-1", specialist_id="specialist-1"
+        )
+
+        self.assertNotEqual(self._cache_key("shop-1"), shop_key)
+        self.assertNotEqual(self._cache_key(None, ["specialist-1"]), specialist_key)
+        self.assertEqual(self._cache_key("shop-2"), other_shop_key)
+
+    def test_invalidate_cache_for_date_without_shop(self):
+        """Test that date-wide invalidation reaches every shop"""
+        shop_key = self._cache_key("shop-1")
+
+        self.generator.invalidate_cache_for_date(self.test_date)
+
+        self.assertNotEqual(self._cache_key("shop-1"), shop_key)
+
 
 class BookingServiceTest(TestCase):
     """Test cases for the BookingService"""
@@ -4,7 +4,7 @@ from django.db import models, transaction
 
 from apps.geoapp.models import Location
 from apps.shopapp.models import Shop
-from apps.subscriptionapp.services.subscription_service import SubscriptionService
+from apps.subscriptionapp.services.usage_monitor import UsageMonitor
 
 
 class BranchService:
@@ -15,25 +15,25 @@ class BranchService:
         Create a new branch (shop) for a company
         This delegates to shopapp but handles subscription validation
         """
-        # Check subscription limits
-        subscription_info = SubscriptionService.validate_shop_creation(company)
-        if not subscription_info["can_create_shop"]:
-            raise ValueError(subscription_info["message"])
-
-        # Create shop using ShopService
-        from apps.shopapp.services.shop_service import ShopService
-
-        shop = ShopService.create_shop(
-            company=company,
-            shop_data=branch_data,
-            location_data=location_data,
-            manager_data=manager_data,
-        )
+        # Reserve a shop slot within the subscription limits
+        with UsageMonitor.reserve_shop(company.id) as (reserved, current, limit):
+            if not reserved:
+                raise ValueError(f"Shop limit reached ({current}/{limit})")
+
+            # Create shop using ShopService
+            from apps.shopapp.services.shop_service import ShopService
+
+            shop = ShopService.create_shop(
+                company=company,
+                shop_data=branch_data,
+                location_data=location_data,
+                manager_data=manager_data,
+            )
 
-        # Update company shop count
-        company.update_counts()
+            # Update company shop count
+            company.update_counts()
 
-        return shop
+            return shop
 
     @staticmethod
     def get_company_branches(company, with_metrics=False):
@@ -53,7 +53,6 @@ class BranchService:
 
         shops = shops.annotate(
             employee_count=Count("employees", distinct=True),
-            specialist_count=Count("employees__specialist", distinct=True),
             total_bookings=Count("appointments", distinct=True),
             today_bookings=Count(
                 "appointments",
@@ -7,7 +7,7 @@ configuration, staff reassignment, resource sharing, and cross-branch analytics.
 """
 
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 from django.db import transaction
@@ -472,6 +472,60 @@ class MultiBranchService:
                 "message": f"Error calculating analytics: {str(e)}",
             }
 
+    @staticmethod
+    def get_branch_kpis(
+        company_id: str,
+        date_from: date,
+        date_to: date,
+        kpi_keys: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Get the dashboard KPIs of every branch of a company
+
+        All branches are evaluated together by KPIService, with one query per
+        source table rather than per branch.
+
+        Args:
+            company_id: Company ID
+            date_from: First day of the period
+            date_to: Last day of the period
+            kpi_keys: KPI keys to include, or None for all default KPIs
+
+        Returns:
+            Dictionary with the KPIs of each branch
+        """
+        from apps.shopDashboardApp.services.kpi_service import KPIService
+
+        try:
+            branches = dict(Shop.objects.filter(company_id=company_id).values_list("id", "name"))
+
+            if not branches:
+                return {"success": False, "message": "No branches found for company"}
+
+            kpis = KPIService().get_kpis_for_shops(list(branches), date_from, date_to, kpi_keys)
+
+            return {
+                "success": True,
+                "data": {
+                    "company_id": company_id,
+                    "date_range": {
+                        "from": date_from.isoformat(),
+                        "to": date_to.isoformat(),
+                    },
+                    "branches": {
+                        str(branch_id): {"name": name, "kpis": kpis[str(branch_id)]}
+                        for branch_id, name in branches.items()
+                    },
+                },
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting branch KPIs: {e}")
+            return {
+                "success": False,
+                "message": f"Error calculating KPIs: {str(e)}",
+            }
+
     @staticmethod
     def get_staff_allocation_suggestions(company_id: str) -> Dict[str, Any]:
         """
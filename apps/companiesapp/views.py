@@ -23,6 +23,7 @@ from .serializers import (
     VerifyCompanyDocumentSerializer,
 )
 from .services.company_service import CompanyService
+from .services.multi_branch_service import MultiBranchService
 
 
 class CompanyViewSet(viewsets.ModelViewSet):
@@ -228,6 +229,58 @@ class CompanyViewSet(viewsets.ModelViewSet):
         stats = CompanyService.generate_company_statistics(company)
         return Response(stats)
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="branch-kpis",
+        permission_classes=[IsAdminOrCompanyOwner],
+    )
+    def branch_kpis(self, request, pk=None):
+        """
+        Get the dashboard KPIs of every branch of the company.
+
+        Query parameters:
+        - time_period: Dashboard time period (default: month)
+        - start_date, end_date: Date range for the custom time period
+        - kpis: Optional comma-separated KPI keys
+
+        Returns:
+            Response: JSON object with the KPIs of each branch
+        """
+        from apps.shopDashboardApp.constants import (
+            TIME_PERIOD_CHOICES,
+            TIME_PERIOD_MONTH,
+        )
+        from apps.shopDashboardApp.exceptions import InvalidDateRangeException
+        from apps.shopDashboardApp.services.dashboard_service import DashboardService
+
+        company = self.get_object()
+
+        time_period = request.query_params.get("time_period", TIME_PERIOD_MONTH)
+        if time_period not in dict(TIME_PERIOD_CHOICES):
+            return Response({"detail": "Invalid time period."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            date_range = DashboardService().calculate_date_range(
+                time_period,
+                request.query_params.get("start_date"),
+                request.query_params.get("end_date"),
+            )
+        except InvalidDateRangeException as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        kpi_keys = request.query_params.get("kpis")
+        result = MultiBranchService.get_branch_kpis(
+            str(company.id),
+            date_range["start_date"],
+            date_range["end_date"],
+            kpi_keys.split(",") if kpi_keys else None,
+        )
+
+        if not result["success"]:
+            return Response({"detail": result["message"]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result["data"])
+
 
 class CompanyDocumentViewSet(viewsets.ModelViewSet):
     """
@@ -0,0 +1,127 @@
+# apps/customersapp/tests/test_segmentation.py
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+
+import pandas as pd
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from algorithms.analytics.segmentation.customer_clustering import CustomerSegmenter
+from apps.authapp.models import User
+from apps.bookingapp.models import Appointment
+from apps.categoriesapp.models import Category
+from apps.payment.models import Transaction
+from apps.serviceapp.models import Service
+from apps.shopapp.models import Shop
+from apps.specialistsapp.models import Specialist
+
+
+class CustomerSegmenterFeaturesTest(TestCase):
+    """Test cases for CustomerSegmenter feature extraction"""
+
+    LOOKBACK_DAYS = 30
+
+    def setUp(self):
+        """Set up test data"""
+        self.override = self.settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        cache.clear()
+
+        self.now = timezone.now()
+        self.shop = Shop.objects.create(id=uuid.uuid4(), name="Test Shop", username="testshop")
+        self.specialist = Specialist.objects.create(id=uuid.uuid4())
+        self.services = [
+            Service.objects.create(
+                id=uuid.uuid4(),
+                name=f"{name} Service",
+                shop=self.shop,
+                category=Category.objects.create(name=name),
+                price=100.00,
+                duration=60,
+            )
+            for name in ("Hair", "Nails")
+        ]
+
+        # Active only before the second run's window: dropped
+        self.aged_out = self.customer("1000000001", [38], [38])
+        # Partly aged out: aggregates shrink
+        self.partly_aged_out = self.customer("1000000002", [35, 20], [35, 20])
+        # No activity between the runs: kept as is
+        self.unchanged = self.customer("1000000003", [15, 12], [15])
+        # New activity after the first run
+        self.returning = self.customer("1000000004", [25, 5], [25, 5], service=1)
+
+    def customer(self, phone_number, appointment_days, transaction_days, service=0):
+        user = User.objects.create(phone_number=phone_number, user_type="customer")
+        for days in appointment_days:
+            moment = self.now - timedelta(days=days)
+            appointment = Appointment.objects.create(
+                customer=user,
+                service=self.services[service],
+                specialist=self.specialist,
+                shop=self.shop,
+                start_time=moment,
+                end_time=moment + timedelta(hours=1),
+                status="completed",
+            )
+            Appointment.objects.filter(id=appointment.id).update(created_at=moment)
+        for days in transaction_days:
+            transaction = Transaction.objects.create(user=user, amount=50, status="completed")
+            Transaction.objects.filter(id=transaction.id).update(
+                created_at=self.now - timedelta(days=days)
+            )
+        return user
+
+    def features(self, incremental, days_ago=0):
+        with patch(
+            "algorithms.analytics.segmentation.customer_clustering.timezone.now",
+            return_value=self.now - timedelta(days=days_ago),
+        ):
+            return (
+                CustomerSegmenter()
+                .get_customer_features(lookback_days=self.LOOKBACK_DAYS, incremental=incremental)
+                .sort_values("customer_id")
+                .reset_index(drop=True)
+            )
+
+    def test_incremental_matches_full_extraction(self):
+        """Test that an incremental run matches a full run on the same data"""
+        first = self.features(incremental=True, days_ago=10)
+        self.assertIn(self.aged_out.id, set(first["customer_id"]))
+
+        incremental = self.features(incremental=True)
+        cache.clear()
+        full = self.features(incremental=False)
+
+        pd.testing.assert_frame_equal(incremental, full)
+        self.assertEqual(
+            set(full["customer_id"]),
+            {self.partly_aged_out.id, self.unchanged.id, self.returning.id},
+        )
+
+        returning = full.set_index("customer_id").loc[self.returning.id]
+        self.assertEqual(returning["booking_frequency"], 2)
+        self.assertEqual(returning["avg_interval"], 20)
+        self.assertEqual(returning["preferred_category"], "Nails")
+
+    def test_feature_state_is_cached_between_runs(self):
+        """Test that a later incremental run only reaggregates changed customers"""
+        self.features(incremental=True, days_ago=10)
+
+        with patch.object(
+            CustomerSegmenter,
+            "_aggregate_customer_activity",
+            wraps=CustomerSegmenter()._aggregate_customer_activity,
+        ) as mock_aggregate:
+            self.features(incremental=True)
+
+        changed_ids = mock_aggregate.call_args.kwargs["customer_ids"]
+        self.assertEqual(
+            set(changed_ids),
+            {self.aged_out.id, self.partly_aged_out.id, self.returning.id},
+        )
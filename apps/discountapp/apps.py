@@ -9,4 +9,4 @@ class DiscountappConfig(AppConfig):
     verbose_name = _("Discounts & Coupons")
 
     def ready(self):
-        pass
+        import apps.discountapp.eligibility_signals  # noqa
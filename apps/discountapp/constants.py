@@ -43,7 +43,7 @@ MAX_DISCOUNT_PERCENT = 100
 MIN_DISCOUNT_PERCENT = 0
 
 # System Constants
-COUPON_BATCH_SIZE = 100
+COUPON_BATCH_SIZE = 1000  # Coupons written per bulk generation chunk
 DEFAULT_COUPON_PREFIX = "QM"
 DEFAULT_COUPON_LENGTH = 8
 DEFAULT_REFERRAL_DISCOUNT = 10  # Percentage
@@ -0,0 +1,64 @@
+# apps/discountapp/eligibility_signals.py
+"""
+Invalidate cached discount eligibility when discounts or their targets change.
+"""
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.discountapp.models import Coupon, CouponUsage, ServiceDiscount
+from apps.discountapp.services.eligibility_index import DiscountEligibilityIndex, UsedCouponSet
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+@receiver(post_save, sender=ServiceDiscount)
+@receiver(post_delete, sender=ServiceDiscount)
+def invalidate_discount_index(sender, instance, **kwargs):
+    """Invalidate the index of the shop a coupon or discount belongs to"""
+
+    def invalidate():
+        DiscountEligibilityIndex.invalidate_shops(instance.shop_id)
+        if sender is Coupon:
+            DiscountEligibilityIndex.forget_code(instance.code)
+
+    # Invalidate now and again after commit, so no request caches the old rows
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(m2m_changed, sender=Coupon.services.through)
+@receiver(m2m_changed, sender=Coupon.categories.through)
+@receiver(m2m_changed, sender=ServiceDiscount.services.through)
+@receiver(m2m_changed, sender=ServiceDiscount.categories.through)
+def invalidate_discount_index_targets(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Invalidate indexes when the services or categories of discounts change"""
+    if not action.startswith("post_"):
+        return
+
+    if not reverse:
+        shop_ids = {instance.shop_id}
+    elif pk_set:
+        # Changed from the service or category side, pk_set holds discounts
+        shop_ids = set(model.objects.filter(pk__in=pk_set).values_list("shop_id", flat=True))
+    else:
+        # Cleared from the service or category side
+        shop_ids = None
+
+    def invalidate():
+        if shop_ids is None:
+            DiscountEligibilityIndex.invalidate_all()
+        else:
+            DiscountEligibilityIndex.invalidate_shops(*shop_ids)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=CouponUsage)
+def record_used_coupon(sender, instance, created, **kwargs):
+    """Add a used coupon to the customer's used coupon set"""
+    if created:
+        # A rolled back usage must not mark the coupon as used
+        transaction.on_commit(lambda: UsedCouponSet.add(instance.customer_id, instance.coupon_id))
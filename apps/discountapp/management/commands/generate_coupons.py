@@ -115,6 +115,9 @@ class Command(BaseCommand):
                     apply_to_all_services=apply_to_all_services,
                     services=services,
                     categories=categories,
+                    progress_callback=lambda created, total: self.stdout.write(
+                        f"  {created}/{total} coupons created"
+                    ),
                 )
 
                 self.stdout.write(self.style.SUCCESS(f"Created {len(coupons)} coupons"))
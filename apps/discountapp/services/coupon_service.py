@@ -1,12 +1,16 @@
 # apps/discountapp/services/coupon_service.py
-import random
+import logging
+import secrets
 import string
 
-from django.db import transaction
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.utils import timezone
 
 from apps.discountapp.constants import (
+    COUPON_BATCH_SIZE,
     DEFAULT_COUPON_LENGTH,
     DEFAULT_COUPON_PREFIX,
     ERROR_CODE_ALREADY_USED,
@@ -19,14 +23,76 @@ from apps.discountapp.constants import (
     ERROR_CODE_USAGE_LIMIT,
 )
 from apps.discountapp.models import Coupon, CouponUsage
+from apps.discountapp.services.eligibility_index import (
+    DiscountEligibilityIndex,
+    IndexedDiscount,
+    UsedCouponSet,
+)
 from apps.discountapp.validators import validate_coupon_code
 
+logger = logging.getLogger(__name__)
+
+
+# Characters drawn for the random part of generated codes
+CODE_CHARACTERS = string.ascii_uppercase + string.digits
+
 
 class CouponService:
     @staticmethod
-    def generate_code(prefix=DEFAULT_COUPON_PREFIX, length=DEFAULT_COUPON_LENGTH):
+    def _random_parts(count, length):
         """
-        Generate a unique coupon code with prefix and random characters
+        Draw random code parts in one vectorized batch
+
+        Bytes at or above the largest multiple of the alphabet size are
+        rejected, so every character is equally likely.
+        """
+        alphabet = np.frombuffer(CODE_CHARACTERS.encode(), dtype=np.uint8)
+        limit = 256 - 256 % len(alphabet)
+        needed = count * length
+
+        values = np.empty(0, dtype=np.uint8)
+        while len(values) < needed:
+            missing = needed - len(values)
+            draw = np.frombuffer(secrets.token_bytes(missing + missing // 8 + 16), dtype=np.uint8)
+            values = np.concatenate([values, draw[draw < limit]])
+
+        characters = alphabet[values[:needed] % len(alphabet)].reshape(count, length)
+        return characters.view(f"S{length}").ravel().astype(f"U{length}").tolist()
+
+    @staticmethod
+    def _draw_unique_codes(prefix, random_length, count):
+        """
+        Draw codes that are unique among themselves and unused in the database
+
+        Each round checks all of its candidates with a single code__in query.
+        """
+        codes = {}
+        while len(codes) < count:
+            missing = count - len(codes)
+            # A few spare candidates make a second round unlikely
+            candidates = {
+                f"{prefix}-{part}": None
+                for part in CouponService._random_parts(missing + missing // 20 + 1, random_length)
+            }
+            for code in codes:
+                candidates.pop(code, None)
+
+            taken = set(
+                Coupon.objects.filter(code__in=list(candidates)).values_list("code", flat=True)
+            )
+            for code in candidates:
+                if code not in taken and len(codes) < count:
+                    codes[code] = None
+
+        return list(codes)
+
+    @staticmethod
+    def _code_format(prefix, length, quantity=1):
+        """
+        Get the normalized prefix and random part length of generated codes
+
+        Raises:
+            ValueError: If the format is invalid or too small for the quantity
         """
         # Ensure prefix is uppercase
         prefix = prefix.upper()
@@ -34,26 +100,26 @@ class CouponService:
         # Calculate random part length (subtract prefix length and 1 for the dash)
         random_length = max(4, length - len(prefix) - 1)
 
-        # Generate random part
-        characters = string.ascii_uppercase + string.digits
-        random_part = "".join(random.choice(characters) for _ in range(random_length))
-
-        # Combine prefix and random part
-        code = f"{prefix}-{random_part}"
-
-        # Validate the generated code
         try:
-            validate_coupon_code(code)
-        except Exception:
-            # If validation fails, try again with a simpler code
-            return CouponService.generate_code(prefix, length)
+            validate_coupon_code(f"{prefix}-{'A' * random_length}")
+        except ValidationError as e:
+            raise ValueError(f"Invalid coupon code format: {e}")
+
+        # Keep the code space sparse so random draws rarely collide
+        if quantity > len(CODE_CHARACTERS) ** random_length // 2:
+            raise ValueError(
+                f"Cannot generate {quantity} codes with {random_length} random characters"
+            )
 
-        # Check if code already exists
-        if Coupon.objects.filter(code=code).exists():
-            # If code exists, generate a new one
-            return CouponService.generate_code(prefix, length)
+        return prefix, random_length
 
-        return code
+    @staticmethod
+    def generate_code(prefix=DEFAULT_COUPON_PREFIX, length=DEFAULT_COUPON_LENGTH):
+        """
+        Generate a unique coupon code with prefix and random characters
+        """
+        prefix, random_length = CouponService._code_format(prefix, length)
+        return CouponService._draw_unique_codes(prefix, random_length, 1)[0]
 
     @staticmethod
     def create_coupon(shop, name, discount_type, value, start_date, end_date, **kwargs):
@@ -99,43 +165,99 @@ class CouponService:
         start_date,
         end_date,
         quantity,
+        prefix=DEFAULT_COUPON_PREFIX,
+        length=DEFAULT_COUPON_LENGTH,
+        progress_callback=None,
         **kwargs,
     ):
         """
         Generate multiple coupons with the same parameters but unique codes
-        """
-        coupons = []
 
-        for i in range(quantity):
-            name = name_template.format(i=i + 1)
-            code = CouponService.generate_code()
+        Coupons are written in chunks of COUPON_BATCH_SIZE: codes for a whole
+        chunk are drawn at once and checked with one query, then the coupons
+        and their service and category links are inserted with one bulk_create
+        each.
 
-            coupon = Coupon(
-                shop=shop,
-                name=name,
-                code=code,
-                discount_type=discount_type,
-                value=value,
-                start_date=start_date,
-                end_date=end_date,
-                **kwargs,
-            )
+        Args:
+            progress_callback: Optional callable receiving (created, quantity)
+                after each chunk
 
-            coupons.append(coupon)
+        Returns:
+            List of created coupons
+        """
+        prefix, random_length = CouponService._code_format(prefix, length, quantity)
 
-        # Bulk create the coupons
-        created_coupons = Coupon.objects.bulk_create(coupons)
+        services = kwargs.pop("services", None) or []
+        categories = kwargs.pop("categories", None) or []
+        service_ids = [getattr(service, "pk", service) for service in services]
+        category_ids = [getattr(category, "pk", category) for category in categories]
 
-        # Add services or categories if provided
-        services = kwargs.get("services")
-        categories = kwargs.get("categories")
+        # bulk_create skips save(), which derives the status from the dates
+        now = timezone.now()
+        if now < start_date:
+            coupon_status = "scheduled"
+        elif now > end_date:
+            coupon_status = "expired"
+        else:
+            coupon_status = "active"
+
+        ServiceLink = Coupon.services.through
+        CategoryLink = Coupon.categories.through
+
+        created_coupons = []
+        collisions = 0
+        while len(created_coupons) < quantity:
+            offset = len(created_coupons)
+            codes = CouponService._draw_unique_codes(
+                prefix, random_length, min(COUPON_BATCH_SIZE, quantity - offset)
+            )
+
+            coupons = [
+                Coupon(
+                    shop=shop,
+                    name=name_template.format(i=offset + index + 1),
+                    code=code,
+                    discount_type=discount_type,
+                    value=value,
+                    start_date=start_date,
+                    end_date=end_date,
+                    status=coupon_status,
+                    **kwargs,
+                )
+                for index, code in enumerate(codes)
+            ]
 
-        if services or categories:
-            for coupon in created_coupons:
-                if services:
-                    coupon.services.set(services)
-                if categories:
-                    coupon.categories.set(categories)
+            try:
+                with transaction.atomic():
+                    Coupon.objects.bulk_create(coupons)
+                    if service_ids:
+                        ServiceLink.objects.bulk_create(
+                            [
+                                ServiceLink(coupon_id=coupon.id, service_id=service_id)
+                                for coupon in coupons
+                                for service_id in service_ids
+                            ]
+                        )
+                    if category_ids:
+                        CategoryLink.objects.bulk_create(
+                            [
+                                CategoryLink(coupon_id=coupon.id, category_id=category_id)
+                                for coupon in coupons
+                                for category_id in category_ids
+                            ]
+                        )
+            except IntegrityError:
+                # A concurrent insert may have taken one of the codes
+                collisions += 1
+                if collisions > 3:
+                    raise
+                logger.warning("Coupon code collision during bulk generation, retrying")
+                continue
+
+            collisions = 0
+            created_coupons.extend(coupons)
+            if progress_callback:
+                progress_callback(len(created_coupons), quantity)
 
         return created_coupons
 
@@ -146,11 +268,15 @@ class CouponService:
         Returns (is_valid, message, coupon_obj)
         """
         try:
-            # Find the coupon
-            try:
-                coupon = Coupon.objects.get(code=code)
-            except Coupon.DoesNotExist:
-                return False, ERROR_CODE_INVALID, None
+            # Find the coupon, active coupons come from the shop's index
+            entry = DiscountEligibilityIndex.find_coupon(code)
+            if entry is not None:
+                coupon = entry.discount
+            else:
+                try:
+                    coupon = Coupon.objects.get(code=code)
+                except Coupon.DoesNotExist:
+                    return False, ERROR_CODE_INVALID, None
 
             # Check if the coupon is active
             if coupon.status != "active":
@@ -172,36 +298,20 @@ class CouponService:
 
             # Check if the coupon is single-use and has been used by this customer
             if customer and coupon.is_single_use:
-                if CouponUsage.objects.filter(
-                    coupon=coupon, customer=customer
-                ).exists():
+                if UsedCouponSet.contains(customer.id, coupon.id):
                     return False, ERROR_CODE_ALREADY_USED, coupon
 
             # Check minimum purchase amount
             if amount is not None and amount < coupon.min_purchase_amount:
                 return False, ERROR_CODE_MIN_AMOUNT, coupon
 
-            # Check service eligibility
+            # Check if any of the provided services, or their categories, are eligible
             if services and not coupon.apply_to_all_services:
-                # Check if any of the provided services are eligible
-
-                # First check if services are directly attached to the coupon
-                service_ids = [service.id for service in services]
-                coupon_service_ids = coupon.services.values_list("id", flat=True)
-
-                if not any(sid in coupon_service_ids for sid in service_ids):
-                    # If no direct service match, check categories
-                    service_category_ids = set()
-                    for service in services:
-                        if service.category_id:
-                            service_category_ids.add(service.category_id)
+                if entry is None:
+                    entry = IndexedDiscount.load(coupon)
 
-                    coupon_category_ids = coupon.categories.values_list("id", flat=True)
-
-                    if not any(
-                        cid in coupon_category_ids for cid in service_category_ids
-                    ):
-                        return False, ERROR_CODE_NOT_ELIGIBLE, coupon
+                if not entry.applies_to_any(services):
+                    return False, ERROR_CODE_NOT_ELIGIBLE, coupon
 
             # Coupon is valid
             return True, None, coupon
@@ -238,6 +348,11 @@ class CouponService:
         if discount_amount <= 0:
             return False, ERROR_CODE_MIN_AMOUNT, 0
 
+        # The indexed coupon may be stale, count usage on the locked row
+        coupon = Coupon.objects.select_for_update().get(id=coupon.id)
+        if coupon.usage_limit > 0 and coupon.used_count >= coupon.usage_limit:
+            return False, ERROR_CODE_USAGE_LIMIT, 0
+
         # Record coupon usage
         CouponUsage.objects.create(
             coupon=coupon, customer=customer, booking=booking, amount=discount_amount
@@ -4,6 +4,7 @@ from django.db.models import Q
 from django.utils import timezone
 
 from apps.discountapp.models import Coupon, ServiceDiscount
+from apps.discountapp.services.eligibility_index import DiscountEligibilityIndex, IndexedDiscount
 
 
 class DiscountService:
@@ -74,10 +75,8 @@ class DiscountService:
         if price <= 0 or not shop:
             return price, price, None
 
-        best_discount_amount = 0
-        best_discount_info = None
-
         # First check if a coupon code is provided
+        coupon = None
         if coupon_code and customer:
             from apps.discountapp.services.coupon_service import CouponService
 
@@ -87,48 +86,110 @@ class DiscountService:
                 services=[service] if service else None,
                 amount=price,
             )
+            if not is_valid:
+                coupon = None
 
-            if is_valid and coupon:
-                coupon_discount = coupon.calculate_discount_amount(price)
+        # Then check service discounts if applicable
+        discounts = []
+        if service:
+            discounts = DiscountEligibilityIndex.get(shop.id).discounts_for(service)
 
-                if coupon_discount > best_discount_amount:
-                    best_discount_amount = coupon_discount
-                    best_discount_info = {
-                        "type": "coupon",
-                        "id": str(coupon.id),
-                        "name": coupon.name,
-                        "code": coupon.code,
-                        "discount_type": coupon.discount_type,
-                        "value": coupon.value,
-                        "amount": best_discount_amount,
-                    }
+        return DiscountService._best_discount(price, coupon, discounts)
 
-        # Then check service discounts if applicable
-        if service and shop:
-            applicable_discounts = DiscountService.get_active_discounts(shop, service)
+    @staticmethod
+    def calculate_discounts(services, shop, customer=None, coupon_code=None):
+        """
+        Calculate the best discount for each service of a list at its price
 
-            # Find the best discount based on priority and amount
-            for discount in applicable_discounts:
-                # Skip if not combinable with existing discount
-                if (
-                    best_discount_info
-                    and best_discount_info["type"] == "coupon"
-                    and not discount.is_combinable
-                ):
-                    continue
+        The coupon is validated once and the shop's discounts are read from
+        its eligibility index once, so pricing a whole service list costs no
+        more than pricing a single service.
+        Returns {service_id: (discounted_price, original_price, discount_info)}
+        """
+        results = {}
+        if not shop:
+            return {service.id: (service.price, service.price, None) for service in services}
 
-                discount_amount = discount.calculate_discount_amount(price)
+        coupon_entry = None
+        if coupon_code and customer:
+            from apps.discountapp.services.coupon_service import CouponService
+
+            # Service eligibility and minimum amount are checked per service
+            is_valid, _, coupon = CouponService.validate_coupon(coupon_code, customer=customer)
+            if is_valid:
+                coupon_entry = DiscountEligibilityIndex.find_coupon(
+                    coupon_code
+                ) or IndexedDiscount.load(coupon)
+
+        index = DiscountEligibilityIndex.get(shop.id)
+        now = timezone.now()
+
+        for service in services:
+            price = service.price
+            if price <= 0:
+                results[service.id] = (price, price, None)
+                continue
+
+            coupon = None
+            if (
+                coupon_entry
+                and coupon_entry.applies_to(service)
+                and price >= coupon_entry.discount.min_purchase_amount
+            ):
+                coupon = coupon_entry.discount
+
+            results[service.id] = DiscountService._best_discount(
+                price, coupon, index.discounts_for(service, now)
+            )
+
+        return results
 
-                if discount_amount > best_discount_amount:
-                    best_discount_amount = discount_amount
-                    best_discount_info = {
-                        "type": "service_discount",
-                        "id": str(discount.id),
-                        "name": discount.name,
-                        "discount_type": discount.discount_type,
-                        "value": discount.value,
-                        "amount": best_discount_amount,
-                    }
+    @staticmethod
+    def _best_discount(price, coupon, discounts):
+        """
+        Pick the best of a validated coupon and applicable service discounts
+        Returns (discounted_price, original_price, discount_info)
+        """
+        best_discount_amount = 0
+        best_discount_info = None
+
+        if coupon:
+            coupon_discount = coupon.calculate_discount_amount(price)
+
+            if coupon_discount > best_discount_amount:
+                best_discount_amount = coupon_discount
+                best_discount_info = {
+                    "type": "coupon",
+                    "id": str(coupon.id),
+                    "name": coupon.name,
+                    "code": coupon.code,
+                    "discount_type": coupon.discount_type,
+                    "value": coupon.value,
+                    "amount": best_discount_amount,
+                }
+
+        # Find the best discount based on priority and amount
+        for discount in discounts:
+            # Skip if not combinable with existing discount
+            if (
+                best_discount_info
+                and best_discount_info["type"] == "coupon"
+                and not discount.is_combinable
+            ):
+                continue
+
+            discount_amount = discount.calculate_discount_amount(price)
+
+            if discount_amount > best_discount_amount:
+                best_discount_amount = discount_amount
+                best_discount_info = {
+                    "type": "service_discount",
+                    "id": str(discount.id),
+                    "name": discount.name,
+                    "discount_type": discount.discount_type,
+                    "value": discount.value,
+                    "amount": best_discount_amount,
+                }
 
         # Calculate final price
         discounted_price = max(0, price - best_discount_amount)
@@ -180,7 +241,9 @@ class DiscountService:
 
         # Then apply service discounts if applicable
         if service and shop:
-            applicable_discounts = DiscountService.get_active_discounts(shop, service)
+            applicable_discounts = DiscountEligibilityIndex.get(shop.id).discounts_for(
+                service
+            )
 
             # Filter to only include combinable discounts if we already have a coupon discount
             if discount_breakdown:
@@ -0,0 +1,271 @@
+# apps/discountapp/services/eligibility_index.py
+"""
+Cached discount eligibility per shop.
+
+The active coupons and service discounts of a shop are loaded once, together
+with the service and category IDs each one targets, and cached as a single
+index. Pricing a service or validating a coupon code then works on the cached
+index instead of querying discounts and their M2M tables every time.
+
+Indexes are versioned by generation counters bumped from discountapp signals
+whenever a coupon, a service discount or one of their targets changes. The
+coupons each customer has used are kept in a per-customer set, so single-use
+checks do not query CouponUsage either.
+"""
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.discountapp.models import Coupon, CouponUsage, ServiceDiscount
+from utils.cache_utils import bump_generations, generation_token, get_redis_client
+
+ALL_TAG = "discount_index:all"
+
+
+def shop_tag(shop_id):
+    return f"discount_index:shop:{shop_id}"
+
+
+class IndexedDiscount:
+    """A coupon or service discount with the services and categories it targets"""
+
+    def __init__(self, discount, service_ids, category_ids):
+        self.discount = discount
+        self.service_ids = frozenset(service_ids)
+        self.category_ids = frozenset(category_ids)
+
+    @classmethod
+    def load(cls, discount):
+        """Index a single coupon or service discount from the database."""
+        return cls(
+            discount,
+            {str(pk) for pk in discount.services.values_list("id", flat=True)},
+            {str(pk) for pk in discount.categories.values_list("id", flat=True)},
+        )
+
+    def applies_to(self, service):
+        """Check whether the discount covers a service."""
+        return (
+            self.discount.apply_to_all_services
+            or str(service.id) in self.service_ids
+            or (service.category_id is not None and str(service.category_id) in self.category_ids)
+        )
+
+    def applies_to_any(self, services):
+        """Check whether the discount covers any of the services."""
+        return any(self.applies_to(service) for service in services)
+
+    def is_current(self, now):
+        return self.discount.start_date <= now <= self.discount.end_date
+
+
+class DiscountEligibilityIndex:
+    """Per-shop index of active coupons and service discounts"""
+
+    KEY_PREFIX = "discount_index:"
+    CODE_KEY_PREFIX = "coupon_shop:"
+    TTL = 60 * 10
+
+    def __init__(self, coupons, discounts):
+        # Coupon code -> IndexedDiscount
+        self.coupons = coupons
+        # IndexedDiscount list of service discounts, highest priority first
+        self.discounts = discounts
+
+    @staticmethod
+    def _targets(model, ids):
+        """Map discount ID to the service and category IDs it targets."""
+        targets = {str(pk): (set(), set()) for pk in ids}
+        for position, field in enumerate([model.services, model.categories]):
+            source = f"{field.field.m2m_field_name()}_id"
+            target = f"{field.field.m2m_reverse_field_name()}_id"
+            for discount_id, target_id in field.through.objects.filter(
+                **{f"{source}__in": ids}
+            ).values_list(source, target):
+                targets[str(discount_id)][position].add(str(target_id))
+        return targets
+
+    @classmethod
+    def build(cls, shop_id):
+        """
+        Load the active coupons and service discounts of a shop.
+
+        Args:
+            shop_id: ID of the shop
+
+        Returns:
+            DiscountEligibilityIndex
+        """
+        now = timezone.now()
+
+        coupons = list(Coupon.objects.filter(shop_id=shop_id, status="active", end_date__gte=now))
+        discounts = list(
+            ServiceDiscount.objects.filter(
+                shop_id=shop_id, status="active", end_date__gte=now
+            ).order_by("-priority")
+        )
+
+        coupon_targets = cls._targets(Coupon, [coupon.id for coupon in coupons])
+        discount_targets = cls._targets(ServiceDiscount, [discount.id for discount in discounts])
+
+        return cls(
+            {
+                coupon.code: IndexedDiscount(coupon, *coupon_targets[str(coupon.id)])
+                for coupon in coupons
+            },
+            [
+                IndexedDiscount(discount, *discount_targets[str(discount.id)])
+                for discount in discounts
+            ],
+        )
+
+    @classmethod
+    def get(cls, shop_id):
+        """
+        Get the eligibility index of a shop.
+
+        Args:
+            shop_id: ID of the shop
+
+        Returns:
+            DiscountEligibilityIndex
+        """
+        token = generation_token([ALL_TAG, shop_tag(shop_id)])
+        cache_key = f"{cls.KEY_PREFIX}{shop_id}:{token}"
+
+        index = cache.get(cache_key)
+        if index is None:
+            index = cls.build(shop_id)
+            cache.set(cache_key, index, cls.TTL)
+        return index
+
+    @classmethod
+    def find_coupon(cls, code):
+        """
+        Find an active coupon by code.
+
+        Args:
+            code: Coupon code
+
+        Returns:
+            IndexedDiscount, or None when no active coupon has the code
+        """
+        code_key = f"{cls.CODE_KEY_PREFIX}{code}"
+        shop_id = cache.get(code_key)
+        if shop_id is None:
+            shop_id = Coupon.objects.filter(code=code).values_list("shop_id", flat=True).first()
+            if shop_id is None:
+                return None
+            cache.set(code_key, shop_id, cls.TTL)
+
+        return cls.get(shop_id).coupons.get(code)
+
+    def discounts_for(self, service, now=None):
+        """
+        Get the current service discounts covering a service.
+
+        Args:
+            service: Service being priced
+            now: Optional current time
+
+        Returns:
+            List of service discounts, highest priority first
+        """
+        now = now or timezone.now()
+        return [
+            entry.discount
+            for entry in self.discounts
+            if entry.is_current(now) and entry.applies_to(service)
+        ]
+
+    @staticmethod
+    def invalidate_shops(*shop_ids):
+        """Invalidate the indexes of shops."""
+        bump_generations(*(shop_tag(shop_id) for shop_id in shop_ids))
+
+    @staticmethod
+    def invalidate_all():
+        """Invalidate the indexes of every shop."""
+        bump_generations(ALL_TAG)
+
+    @classmethod
+    def forget_code(cls, code):
+        """Drop the cached shop of a coupon code."""
+        cache.delete(f"{cls.CODE_KEY_PREFIX}{code}")
+
+
+class UsedCouponSet:
+    """Per-customer set of used coupon IDs"""
+
+    KEY_PREFIX = "coupon_used:"
+    TTL = 60 * 60 * 24
+    # Member marking a set loaded from the database, never a coupon ID
+    LOADED = "*loaded*"
+
+    @classmethod
+    def _key(cls, customer_id):
+        return f"{cls.KEY_PREFIX}{customer_id}"
+
+    @staticmethod
+    def _load(customer_id):
+        return {
+            str(coupon_id)
+            for coupon_id in CouponUsage.objects.filter(customer_id=customer_id)
+            .values_list("coupon_id", flat=True)
+            .distinct()
+        }
+
+    @classmethod
+    def contains(cls, customer_id, coupon_id):
+        """
+        Check whether a customer has used a coupon.
+
+        Args:
+            customer_id: ID of the customer
+            coupon_id: ID of the coupon
+
+        Returns:
+            True if the customer has used the coupon
+        """
+        key = cls._key(customer_id)
+
+        client = get_redis_client()
+        if client is None:
+            used = cache.get(key)
+            if used is None:
+                used = cls._load(customer_id)
+                cache.set(key, used, cls.TTL)
+            return str(coupon_id) in used
+
+        with client.pipeline(transaction=False) as pipe:
+            pipe.sismember(key, cls.LOADED)
+            pipe.sismember(key, str(coupon_id))
+            loaded, member = pipe.execute()
+        if loaded:
+            return bool(member)
+
+        used = cls._load(customer_id)
+        with client.pipeline() as pipe:
+            pipe.sadd(key, cls.LOADED, *used)
+            pipe.expire(key, cls.TTL)
+            pipe.execute()
+        return str(coupon_id) in used
+
+    @classmethod
+    def add(cls, customer_id, coupon_id):
+        """Record that a customer used a coupon."""
+        key = cls._key(customer_id)
+
+        client = get_redis_client()
+        if client is None:
+            used = cache.get(key)
+            if used is not None:
+                used.add(str(coupon_id))
+                cache.set(key, used, cls.TTL)
+            return
+
+        # A set not loaded yet stays unmarked and is loaded on the next check
+        with client.pipeline() as pipe:
+            pipe.sadd(key, str(coupon_id))
+            pipe.expire(key, cls.TTL)
+            pipe.execute()
@@ -1,7 +1,8 @@
 # apps/discountapp/services/eligibility_service.py
 
 from apps.discountapp.constants import ERROR_CODE_NOT_ELIGIBLE
-from apps.discountapp.models import Coupon, CouponUsage
+from apps.discountapp.models import Coupon
+from apps.discountapp.services.eligibility_index import UsedCouponSet
 
 
 class EligibilityService:
@@ -40,10 +41,7 @@ class EligibilityService:
 
         # For coupons, check single use restriction
         if isinstance(discount_or_coupon, Coupon) and discount_or_coupon.is_single_use:
-            used = CouponUsage.objects.filter(
-                coupon=discount_or_coupon, customer=customer
-            ).exists()
-            if used:
+            if UsedCouponSet.contains(customer.id, discount_or_coupon.id):
                 return False, ERROR_CODE_NOT_ELIGIBLE
 
         return True, None
@@ -1,8 +1,10 @@
 # apps/discountapp/tasks.py
 from celery import shared_task
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from apps.discountapp.models import Coupon, PromotionalCampaign, ServiceDiscount
+from apps.discountapp.services.coupon_service import CouponService
 from apps.discountapp.services.discount_service import DiscountService
 from apps.notificationsapp.services.notification_service import NotificationService
 
@@ -156,3 +158,46 @@ def cleanup_expired_discounts(days_threshold=30):
     # old_coupons.delete()
 
     return f"Found {discount_count} old discounts and {coupon_count} old coupons"
+
+
+@shared_task(bind=True)
+def generate_bulk_coupons(
+    self,
+    shop_id,
+    name_template,
+    discount_type,
+    value,
+    start_date,
+    end_date,
+    quantity,
+    **kwargs,
+):
+    """
+    Task to generate a large batch of coupons, e.g. for a campaign
+
+    Progress is published as a PROGRESS state with created and total counts
+    after each chunk. Services and categories are passed as lists of IDs.
+    """
+    from apps.shopapp.models import Shop
+
+    shop = Shop.objects.get(id=shop_id)
+
+    def report_progress(created, total):
+        self.update_state(state="PROGRESS", meta={"created": created, "total": total})
+
+    coupons = CouponService.generate_bulk_coupons(
+        shop=shop,
+        name_template=name_template,
+        discount_type=discount_type,
+        value=value,
+        # Dates arrive as ISO strings through the JSON serializer
+        start_date=(parse_datetime(start_date) if isinstance(start_date, str) else start_date),
+        end_date=parse_datetime(end_date) if isinstance(end_date, str) else end_date,
+        quantity=quantity,
+        progress_callback=report_progress,
+        services=kwargs.pop("service_ids", None),
+        categories=kwargs.pop("category_ids", None),
+        **kwargs,
+    )
+
+    return {"shop_id": str(shop_id), "created": len(coupons)}
@@ -1,6 +1,7 @@
 # apps/discountapp/tests/test_services.py
 import datetime
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.utils import timezone
@@ -12,8 +13,9 @@ from apps.discountapp.constants import (
     ERROR_CODE_ALREADY_USED,
     ERROR_CODE_EXPIRED,
     ERROR_CODE_INVALID,
+    ERROR_CODE_USAGE_LIMIT,
 )
-from apps.discountapp.models import CouponUsage
+from apps.discountapp.models import Coupon, CouponUsage
 from apps.discountapp.services.coupon_service import CouponService
 from apps.discountapp.services.discount_service import DiscountService
 from apps.discountapp.services.eligibility_service import EligibilityService
@@ -78,6 +80,34 @@ class CouponServiceTestCase(TestCase):
         # Verify auto-generated code
         self.assertRegex(coupon.code, r"^[A-Z]+-[A-Z0-9]+$")
 
+    def test_generate_bulk_coupons(self):
+        """Test bulk coupon generation across several chunks"""
+        now = timezone.now()
+        progress = []
+
+        with patch("apps.discountapp.services.coupon_service.COUPON_BATCH_SIZE", 10):
+            coupons = CouponService.generate_bulk_coupons(
+                shop=self.shop,
+                name_template="Bulk {i}",
+                discount_type="percentage",
+                value=10,
+                start_date=now - datetime.timedelta(days=1),
+                end_date=now + datetime.timedelta(days=30),
+                quantity=25,
+                services=[self.service],
+                progress_callback=lambda created, total: progress.append(created),
+            )
+
+        # Verify codes are unique and coupons were saved with their services
+        self.assertEqual(len(coupons), 25)
+        self.assertEqual(len({coupon.code for coupon in coupons}), 25)
+        self.assertEqual(progress, [10, 20, 25])
+        self.assertEqual(coupons[24].name, "Bulk 25")
+
+        coupon = Coupon.objects.get(code=coupons[0].code)
+        self.assertEqual(coupon.status, "active")
+        self.assertEqual(list(coupon.services.all()), [self.service])
+
     def test_validate_coupon(self):
         """Test coupon validation logic"""
         # Create a valid coupon
@@ -185,6 +215,39 @@ class CouponServiceTestCase(TestCase):
         self.assertFalse(success)
         self.assertEqual(discount_amount, 0)
 
+    def test_apply_coupon_counts_usage_on_current_row(self):
+        """Test that a stale indexed coupon cannot exceed its usage limit"""
+        coupon = CouponFactory(
+            shop=self.shop,
+            discount_type="percentage",
+            value=20,
+            usage_limit=2,
+            is_single_use=False,
+        )
+        stale = Coupon.objects.get(id=coupon.id)
+        Coupon.objects.filter(id=coupon.id).update(used_count=1)
+
+        with patch.object(CouponService, "validate_coupon", return_value=(True, None, stale)):
+            success, _, _ = CouponService.apply_coupon(
+                coupon.code, self.customer, self.booking, Decimal("100")
+            )
+            self.assertTrue(success)
+
+            coupon.refresh_from_db()
+            self.assertEqual(coupon.used_count, 2)
+            self.assertEqual(coupon.status, "expired")
+
+            success, message, discount_amount = CouponService.apply_coupon(
+                coupon.code,
+                self.customer,
+                AppointmentFactory(shop=self.shop, customer=self.customer),
+                Decimal("100"),
+            )
+
+        self.assertFalse(success)
+        self.assertEqual(message, ERROR_CODE_USAGE_LIMIT)
+        self.assertEqual(discount_amount, 0)
+
 
 class DiscountServiceTestCase(TestCase):
     def setUp(self):
@@ -271,6 +334,59 @@ class DiscountServiceTestCase(TestCase):
         self.assertEqual(discount_info["type"], "coupon")
         self.assertEqual(discount_info["amount"], Decimal("20"))
 
+    def test_calculate_discounts(self):
+        """Test pricing a list of services at once"""
+        other_service = ServiceFactory(shop=self.shop)
+
+        discount = ServiceDiscountFactory(
+            shop=self.shop,
+            discount_type="percentage",
+            value=10,
+            apply_to_all_services=False,
+        )
+        discount.services.add(self.service)
+
+        results = DiscountService.calculate_discounts([self.service, other_service], self.shop)
+
+        # Only the targeted service is discounted
+        discounted_price, original_price, discount_info = results[self.service.id]
+        self.assertEqual(original_price, self.service.price)
+        self.assertEqual(discounted_price, self.service.price * Decimal("0.9"))
+        self.assertEqual(discount_info["id"], str(discount.id))
+
+        discounted_price, original_price, discount_info = results[other_service.id]
+        self.assertEqual(discounted_price, other_service.price)
+        self.assertIsNone(discount_info)
+
+        # A coupon only prices services meeting its minimum amount
+        service = ServiceFactory(shop=self.shop, price=Decimal("100"))
+        cheap_service = ServiceFactory(shop=self.shop, price=Decimal("30"))
+
+        coupon = CouponFactory(
+            shop=self.shop,
+            discount_type="percentage",
+            value=20,
+            min_purchase_amount=Decimal("50"),
+            apply_to_all_services=True,
+        )
+
+        results = DiscountService.calculate_discounts(
+            [service, cheap_service],
+            self.shop,
+            customer=self.customer,
+            coupon_code=coupon.code,
+        )
+
+        discounted_price, original_price, discount_info = results[service.id]
+        self.assertEqual(original_price, Decimal("100"))
+        self.assertEqual(discounted_price, Decimal("80"))
+        self.assertEqual(discount_info["type"], "coupon")
+
+        # Below the coupon minimum, matching calculate_discount
+        discounted_price, original_price, discount_info = results[cheap_service.id]
+        self.assertEqual(discounted_price, Decimal("30"))
+        self.assertIsNone(discount_info)
+
     def test_apply_multiple_discounts(self):
         """Test applying multiple combinable discounts"""
         # Create combinable discounts
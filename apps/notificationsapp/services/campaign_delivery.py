@@ -0,0 +1,148 @@
+"""
+Building blocks of streaming campaign delivery.
+
+Campaigns are sent in chunks, each handed to Celery as one send task. Two
+pieces keep that pipeline cheap and repeatable:
+
+- A/B variants come from a hash bucket of the campaign and customer, so a
+  customer always gets the same variant, whichever chunk or retry sends it,
+  without storing the assignment up front.
+- ChannelThrottle spreads chunks over fixed windows per channel. Each chunk
+  reserves room for its messages in the first window that still has some, and
+  its send task is delayed until that window opens.
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Number of hash buckets variants are split over
+VARIANT_BUCKETS = 10000
+
+
+def variant_weights(traffic_split):
+    """
+    Normalize an A/B test traffic split to variant weights.
+
+    Args:
+        traffic_split: Percentage of traffic sent to variant B, or a dict of
+            variant weights such as {"A": 50, "B": 50}
+
+    Returns:
+        List of (variant, weight) tuples, in variant order
+    """
+    if isinstance(traffic_split, dict):
+        return sorted((variant, weight) for variant, weight in traffic_split.items() if weight)
+    return [("A", 100 - traffic_split), ("B", traffic_split)]
+
+
+def assign_variant(campaign_id, customer_id, weights):
+    """
+    Pick the A/B test variant of a customer deterministically.
+
+    Args:
+        campaign_id: ID of the campaign
+        customer_id: ID of the customer
+        weights: List of (variant, weight) tuples from variant_weights
+
+    Returns:
+        Variant name
+    """
+    digest = hashlib.sha256(f"{campaign_id}:{customer_id}".encode()).digest()
+    bucket = int.from_bytes(digest[:8], "big") % VARIANT_BUCKETS
+
+    total = sum(weight for _, weight in weights)
+    threshold = 0
+    for variant, weight in weights:
+        threshold += weight * VARIANT_BUCKETS / total
+        if bucket < threshold:
+            return variant
+    return weights[-1][0]
+
+
+class ChannelThrottle:
+    """Fixed-window send rate limits per campaign channel"""
+
+    KEY_PREFIX = "campaign_throttle:"
+    # Seconds per window
+    WINDOW = 60
+    # Messages per window and channel; channels not listed are not throttled
+    RATE_LIMITS = getattr(
+        settings,
+        "CAMPAIGN_CHANNEL_RATE_LIMITS",
+        {"email": 3000, "sms": 600, "push": 12000},
+    )
+    # Windows ahead a chunk may be scheduled in
+    MAX_WINDOWS_AHEAD = 60 * 24
+
+    @classmethod
+    def reserve(cls, channel, count, now=None):
+        """
+        Reserve room for messages of a channel.
+
+        Chunks are reserved whole, so a window may exceed its limit by up to
+        one chunk.
+
+        Args:
+            channel: Channel name
+            count: Number of messages
+            now: Optional current timestamp
+
+        Returns:
+            Seconds to wait before sending the messages
+        """
+        limit = cls.RATE_LIMITS.get(channel)
+        if not limit or count <= 0:
+            return 0
+
+        now = time.time() if now is None else now
+        current = int(now // cls.WINDOW)
+        last = current + cls.MAX_WINDOWS_AHEAD
+        # Skip the windows already known to be full
+        hint_key = f"{cls.KEY_PREFIX}{channel}:open"
+        first = max(current, cache.get(hint_key, current))
+        counted = False
+        for window in range(first, last):
+            key = f"{cls.KEY_PREFIX}{channel}:{window}"
+            # Windows expire once they are over
+            cache.add(key, 0, (window - current + 2) * cls.WINDOW)
+            try:
+                used = cache.incr(key, count)
+            except ValueError:
+                # Window expired between add and incr
+                continue
+            counted = True
+            if used - count < limit:
+                if window > first:
+                    cache.set(hint_key, window, (window - current + 1) * cls.WINDOW)
+                return max(0, window * cls.WINDOW - now)
+
+        if not counted:
+            # A cache that cannot count must not hold every chunk back a day
+            logger.error(f"Cannot count {channel} campaign sends, sending without throttling")
+            return 0
+
+        logger.error(f"No {channel} campaign send window free for {count} messages")
+        return (cls.MAX_WINDOWS_AHEAD - 1) * cls.WINDOW
+
+    @classmethod
+    def reserve_chunk(cls, channel_counts, now=None):
+        """
+        Reserve room for a chunk sending through several channels.
+
+        Args:
+            channel_counts: Dict mapping channel to number of messages
+            now: Optional current timestamp
+
+        Returns:
+            Seconds to wait before sending the chunk
+        """
+        return max(
+            [cls.reserve(channel, count, now) for channel, count in channel_counts.items()],
+            default=0,
+        )
@@ -1,9 +1,23 @@
 import logging
 import uuid
+from collections import Counter
 from datetime import timedelta
+from functools import partial
 
 from django.conf import settings
-from django.db.models import Count, Q, Sum
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
 from django.utils import timezone
 
 from apps.customersapp.models import Customer
@@ -12,18 +26,44 @@ from apps.notificationsapp.models import (
     Campaign,
     CampaignRecipient,
     NotificationEvent,
+    UserNotificationSettings,
+)
+from apps.notificationsapp.services.campaign_delivery import (
+    ChannelThrottle,
+    assign_variant,
+    variant_weights,
 )
 from apps.notificationsapp.services.notification_service import NotificationService
 
 logger = logging.getLogger(__name__)
 
+# Channels customers can opt out of in their notification settings
+PREFERENCE_CHANNELS = ("email", "sms", "push")
+
+# Delivery status field of CampaignRecipient per channel: pending, sending,
+# sent or failed, and empty for channels the recipient doesn't get
+STATUS_FIELDS = {channel: f"{channel}_status" for channel in PREFERENCE_CHANNELS}
+
 
 class CampaignService:
     """
     Service for managing campaign workflows, execution, segmentation,
     and performance tracking.
+
+    Recipients are built and dispatched in primary-key order, one page at a
+    time, so the cost of a page doesn't grow with its position in the
+    audience. Each dispatched chunk is sent by one send_campaign_chunk task.
     """
 
+    # Recipients created per query
+    RECIPIENT_BATCH_SIZE = getattr(settings, "CAMPAIGN_RECIPIENT_BATCH_SIZE", 1000)
+    # Recipients sent per task
+    CHUNK_SIZE = getattr(settings, "CAMPAIGN_PROCESS_BATCH_SIZE", 500)
+    CHECKPOINT_KEY_PREFIX = "campaign_checkpoint:"
+    CHECKPOINT_TTL = 60 * 60 * 24 * 7
+    # Seconds after which recipients claimed by a send task are sent again
+    CLAIM_TIMEOUT = getattr(settings, "CAMPAIGN_CLAIM_TIMEOUT", 60 * 30)
+
     @classmethod
     def create_campaign(cls, data):
         """Create a new campaign with the provided data"""
@@ -133,12 +173,13 @@ class CampaignService:
         """
         # Clear existing recipients if any exist
         CampaignRecipient.objects.filter(campaign=campaign).delete()
+        cache.delete(f"{cls.CHECKPOINT_KEY_PREFIX}{campaign.id}")
 
-        target_audience = campaign.target_audience or {}
-        audience_type = target_audience.get("type", "all_customers")
+        target_audience = campaign.filter_data or {}
+        audience_type = campaign.filter_type
 
         # Base query for customers
-        customers_query = Customer.objects.filter(is_active=True)
+        customers_query = Customer.objects.filter(user__is_active=True)
 
         # Apply segmentation filters
         if audience_type == "segment":
@@ -264,67 +305,70 @@ class CampaignService:
                 bookings__shop_id__in=shop_ids
             ).distinct()
 
-        # Get the final list of customers
-        customers = customers_query.distinct()
+        # Get the final list of customers, with the notification settings of
+        # their users joined in
+        customers = customers_query.distinct().annotate(
+            **{
+                f"{channel}_enabled": Subquery(
+                    UserNotificationSettings.objects.filter(user_id=OuterRef("user_id")).values(
+                        f"{channel}_enabled"
+                    )[:1]
+                )
+                for channel in PREFERENCE_CHANNELS
+            }
+        )
+        fields = [
+            "id",
+            "user_id",
+            *(f"{channel}_enabled" for channel in PREFERENCE_CHANNELS),
+        ]
+        campaign_channels = cls._get_channels(campaign)
 
         # Create campaign recipients
-        batch_size = 1000
         recipient_count = 0
+        last_id = None
+
+        # Page through customers by primary key to avoid memory issues and
+        # growing offsets with large lists
+        while True:
+            page = customers.order_by("id")
+            if last_id is not None:
+                page = page.filter(id__gt=last_id)
+            batch = list(page.values(*fields)[: cls.RECIPIENT_BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1]["id"]
 
-        # Process in batches to avoid memory issues with large lists
-        for i in range(0, customers.count(), batch_size):
-            batch = customers[i : i + batch_size]
             recipients = []
-
             for customer in batch:
                 # Set channels based on customer preferences
-                channels = []
-
-                # Check if notification settings exist and respect preferences
-                try:
-                    notification_settings = customer.get_notification_settings()
-
-                    if (
-                        "email" in campaign.channels
-                        and notification_settings.email_enabled
-                    ):
-                        channels.append("email")
-
-                    if "sms" in campaign.channels and notification_settings.sms_enabled:
-                        channels.append("sms")
-
-                    if (
-                        "push" in campaign.channels
-                        and notification_settings.push_enabled
-                    ):
-                        channels.append("push")
-                except:
+                if customer["email_enabled"] is None:
                     # If no settings found, use all campaign channels
-                    channels = campaign.channels
+                    channels = campaign_channels
+                else:
+                    channels = [
+                        channel for channel in campaign_channels if customer[f"{channel}_enabled"]
+                    ]
 
                 if not channels:
                     continue  # Skip if no valid channels
 
-                recipient = CampaignRecipient(
-                    id=uuid.uuid4(),
-                    campaign=campaign,
-                    customer_id=customer.id,
-                    channels=channels,
-                    recipient_data={
-                        "first_name": customer.first_name,
-                        "last_name": customer.last_name,
-                        "email": customer.email,
-                        "phone_number": customer.phone_number,
-                    },
+                # Channels not sent to keep no status
+                recipients.append(
+                    CampaignRecipient(
+                        id=uuid.uuid4(),
+                        campaign=campaign,
+                        user_id=customer["user_id"],
+                        **{STATUS_FIELDS[channel]: "pending" for channel in channels},
+                    )
                 )
-                recipients.append(recipient)
 
             if recipients:
                 CampaignRecipient.objects.bulk_create(recipients)
                 recipient_count += len(recipients)
 
         # Update campaign with the count
-        campaign.recipient_count = recipient_count
+        campaign.audience_count = recipient_count
         campaign.save()
 
         return recipient_count
@@ -358,10 +402,10 @@ class CampaignService:
         """Cancel a scheduled campaign"""
         campaign = Campaign.objects.get(id=campaign_id)
 
-        if campaign.status not in ["scheduled", "in_progress"]:
+        if campaign.status not in ["scheduled", "sending"]:
             raise ValueError(f"Cannot cancel campaign with status '{campaign.status}'")
 
-        campaign.status = "cancelled"
+        campaign.status = "canceled"
         campaign.cancellation_reason = cancel_reason
         campaign.cancelled_at = timezone.now()
         campaign.save()
@@ -370,253 +414,349 @@ class CampaignService:
 
     @classmethod
     def process_campaign(cls, campaign):
-        """Process a campaign by sending notifications to recipients"""
-        # Only process scheduled campaigns
-        if campaign.status != "scheduled":
-            if campaign.status == "draft":
-                # Auto-build recipient list if needed
-                cls.build_recipient_list(campaign)
-                campaign.status = "scheduled"
-                campaign.save()
-            else:
-                return False
-
-        # Mark campaign as in progress
-        campaign.status = "in_progress"
-        campaign.started_at = timezone.now()
-        campaign.save()
+        """
+        Dispatch the pending recipients of a campaign to batched send tasks.
+
+        Each chunk is queued as one send_campaign_chunk task, delayed until
+        the channel throttle has room for its messages, and its recipients are
+        stamped with the time the task is due. The last dispatched recipient is
+        checkpointed, so processing a sending campaign again resumes after it.
+        Recipients whose send task died or never ran are reclaimed first, and
+        dispatching restarts from the beginning when any lie before the
+        checkpoint.
+
+        Returns:
+            Dict with the dispatched recipient and chunk counts and the
+            campaign status, or False if the campaign can't be processed
+        """
+        from apps.notificationsapp.tasks import send_campaign_chunk
+
+        if campaign.status == "draft":
+            # Auto-build recipient list if needed
+            cls.build_recipient_list(campaign)
+            campaign.status = "scheduled"
+            campaign.save()
+
+        if campaign.status == "scheduled":
+            # Mark campaign as sending
+            campaign.status = "sending"
+            campaign.sent_at = timezone.now()
+            campaign.save()
+        elif campaign.status != "sending":
+            return False
+
+        cls._reclaim_stale(campaign.id)
+        recipients = (
+            CampaignRecipient.objects.filter(campaign=campaign)
+            .filter(cls._status_q("pending"), cls._undispatched_q())
+            .order_by("id")
+        )
 
-        # Check if this is an A/B test campaign
-        is_ab_test = False
-        abtest = None
-        variant_assignment = {}
+        checkpoint_key = f"{cls.CHECKPOINT_KEY_PREFIX}{campaign.id}"
+        last_id = cache.get(checkpoint_key)
+        if last_id is not None and recipients.filter(id__lte=last_id).exists():
+            # Released or lost chunks lie before the checkpoint
+            last_id = None
+
+        dispatched_count = 0
+        chunk_count = 0
+        while True:
+            page = recipients if last_id is None else recipients.filter(id__gt=last_id)
+            chunk = list(page.values_list("id", *STATUS_FIELDS.values())[: cls.CHUNK_SIZE])
+            if not chunk:
+                break
+
+            countdown = ChannelThrottle.reserve_chunk(
+                Counter(
+                    channel
+                    for _, *statuses in chunk
+                    for channel, status in zip(STATUS_FIELDS, statuses)
+                    if status == "pending"
+                )
+            )
+            chunk_ids = [recipient_id for recipient_id, *_ in chunk]
+            CampaignRecipient.objects.filter(id__in=chunk_ids).update(
+                processed_at=timezone.now() + timedelta(seconds=countdown)
+            )
+            # Queue the chunk once its recipients and stamps are committed
+            transaction.on_commit(
+                partial(
+                    send_campaign_chunk.apply_async,
+                    args=[str(campaign.id), [str(recipient_id) for recipient_id in chunk_ids]],
+                    countdown=countdown,
+                )
+            )
 
-        if campaign.ab_test_id:
-            abtest = ABTest.objects.filter(id=campaign.ab_test_id).first()
-            if abtest and abtest.status == "active":
-                is_ab_test = True
+            last_id = chunk[-1][0]
+            cache.set(checkpoint_key, last_id, cls.CHECKPOINT_TTL)
+            dispatched_count += len(chunk)
+            chunk_count += 1
 
-                # Prepare distribution logic for A/B test
-                variant_distribution = abtest.traffic_split  # e.g., {'A': 50, 'B': 50}
+        # Campaigns without unsent recipients are done
+        cls._complete_if_done(campaign.id)
+        campaign.refresh_from_db()
 
-                # Get recipients and assign variants
-                recipients = CampaignRecipient.objects.filter(campaign=campaign)
+        return {
+            "dispatched_count": dispatched_count,
+            "chunk_count": chunk_count,
+            "status": campaign.status,
+        }
 
-                # Assign variants based on distribution
-                import random
+    @classmethod
+    def resume_campaigns(cls):
+        """
+        Process every sending campaign again.
 
-                variant_keys = list(variant_distribution.keys())
+        Recipients of send tasks that failed, died or never ran are
+        dispatched again, and campaigns with nothing left to send are
+        completed.
 
-                for recipient in recipients:
-                    # Weighted random choice based on distribution
-                    weights = [variant_distribution[k] for k in variant_keys]
-                    variant = random.choices(variant_keys, weights=weights, k=1)[0]
-                    variant_assignment[str(recipient.id)] = variant
+        Returns:
+            Number of campaigns processed
+        """
+        campaigns = Campaign.objects.filter(status="sending")
+        for campaign in campaigns:
+            cls.process_campaign(campaign)
+        return len(campaigns)
 
-        # Get all recipients for the campaign
-        recipients = CampaignRecipient.objects.filter(campaign=campaign)
+    @classmethod
+    def send_chunk(cls, campaign_id, recipient_ids):
+        """
+        Send a chunk of campaign recipients.
 
-        sent_count = 0
-        failed_count = 0
+        Recipients are claimed before sending, so a chunk dispatched twice is
+        only sent once. Claims of a chunk that fails are released, and claims
+        older than CLAIM_TIMEOUT are reclaimed by process_campaign, which
+        dispatches both again.
 
-        # Batch size for processing
-        batch_size = getattr(settings, "CAMPAIGN_PROCESS_BATCH_SIZE", 100)
+        Args:
+            campaign_id: ID of the campaign
+            recipient_ids: IDs of the recipients to send
 
-        for i in range(0, recipients.count(), batch_size):
-            batch = recipients[i : i + batch_size]
+        Returns:
+            Dict with the sent and failed counts of the chunk
+        """
+        campaign = Campaign.objects.get(id=campaign_id)
+        if campaign.status != "sending":
+            # Canceled or completed meanwhile
+            return {"sent_count": 0, "failed_count": 0}
+
+        with transaction.atomic():
+            recipients = list(
+                CampaignRecipient.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(id__in=recipient_ids)
+                .filter(cls._status_q("pending"))
+                .select_related("user")
+            )
+            claimed = CampaignRecipient.objects.filter(
+                id__in=[recipient.id for recipient in recipients]
+            )
+            claimed.update(
+                processed_at=timezone.now(),
+                **{
+                    field: Case(
+                        When(**{field: "pending"}, then=Value("sending")),
+                        default=F(field),
+                    )
+                    for field in STATUS_FIELDS.values()
+                },
+            )
 
-            for recipient in batch:
-                # Skip already processed recipients
-                if recipient.status in ["sent", "failed"]:
-                    if recipient.status == "sent":
-                        sent_count += 1
-                    else:
-                        failed_count += 1
-                    continue
+        try:
+            sent_count, failed_count = cls._send_recipients(campaign, recipients)
+        except Exception:
+            # Let the next run send them instead of leaving them claimed
+            cls._release(claimed)
+            raise
 
-                # Get notification templates based on A/B test variant if applicable
-                email_template = None
-                sms_template = None
-                push_template = None
-
-                if is_ab_test and str(recipient.id) in variant_assignment:
-                    variant = variant_assignment[str(recipient.id)]
-                    recipient.ab_test_variant = variant
-
-                    if variant == "A":
-                        if "email" in recipient.channels:
-                            email_template = campaign.email_template
-                        if "sms" in recipient.channels:
-                            sms_template = campaign.sms_template
-                        if "push" in recipient.channels:
-                            push_template = campaign.push_template
-                    else:  # Variant B
-                        if "email" in recipient.channels:
-                            email_template = abtest.variant_b_email_template
-                        if "sms" in recipient.channels:
-                            sms_template = abtest.variant_b_sms_template
-                        if "push" in recipient.channels:
-                            push_template = abtest.variant_b_push_template
-                else:
-                    # Standard campaign without A/B testing
-                    if "email" in recipient.channels:
-                        email_template = campaign.email_template
-                    if "sms" in recipient.channels:
-                        sms_template = campaign.sms_template
-                    if "push" in recipient.channels:
-                        push_template = campaign.push_template
+        cls._complete_if_done(campaign.id)
 
-                recipient_data = recipient.recipient_data or {}
+        return {"sent_count": sent_count, "failed_count": failed_count}
 
-                try:
-                    # Send notifications through each channel
-                    if "email" in recipient.channels and email_template:
-                        cls._send_email_notification(
-                            campaign, recipient, email_template, recipient_data
-                        )
+    @classmethod
+    def _send_recipients(cls, campaign, recipients):
+        """
+        Send claimed recipients through each of their pending channels.
 
-                    if "sms" in recipient.channels and sms_template:
-                        cls._send_sms_notification(
-                            campaign, recipient, sms_template, recipient_data
-                        )
+        Returns:
+            Tuple of (sent, failed) message counts
+        """
+        contents = cls._get_variant_contents(campaign)
+        weights = variant_weights(campaign.content.get("traffic_split", 50))
 
-                    if "push" in recipient.channels and push_template:
-                        cls._send_push_notification(
-                            campaign, recipient, push_template, recipient_data
-                        )
+        sent_count = 0
+        failed_count = 0
+        for recipient in recipients:
+            # Variant B content, if any, is assigned per user
+            variant = "A"
+            if len(contents) > 1:
+                variant = assign_variant(campaign.id, recipient.user_id, weights)
+
+            for channel, field in STATUS_FIELDS.items():
+                if getattr(recipient, field) != "pending":
+                    continue
 
-                    recipient.status = "sent"
-                    recipient.sent_at = timezone.now()
-                    recipient.save()
+                try:
+                    cls._send_channel(campaign, recipient, channel, contents[variant][channel])
+                    setattr(recipient, field, "sent")
                     sent_count += 1
 
                 except Exception as e:
                     logger.error(f"Failed to send campaign notification: {str(e)}")
-                    recipient.status = "failed"
-                    recipient.error_message = str(e)
-                    recipient.save()
+                    setattr(recipient, field, "failed")
                     failed_count += 1
 
-        # Update campaign with completion info
-        campaign.sent_count = sent_count
-        campaign.failed_count = failed_count
+        CampaignRecipient.objects.bulk_update(recipients, list(STATUS_FIELDS.values()))
+        return sent_count, failed_count
 
-        if sent_count + failed_count >= campaign.recipient_count:
-            campaign.status = "completed"
-            campaign.completed_at = timezone.now()
+    @staticmethod
+    def _get_channels(campaign):
+        """Get the configured channels of a campaign that it has content for."""
+        return [
+            channel
+            for channel in PREFERENCE_CHANNELS
+            if channel in campaign.channels and campaign.get_content_for_channel(channel)
+        ]
 
-        campaign.save()
+    @classmethod
+    def _get_variant_contents(cls, campaign):
+        """
+        Get the content of each variant of a campaign.
 
-        return {
-            "sent_count": sent_count,
-            "failed_count": failed_count,
-            "status": campaign.status,
+        Variant B overrides the channel content given under content["variant_b"].
+
+        Returns:
+            Dict mapping variant to its content per channel
+        """
+        contents = {
+            "A": {
+                channel: campaign.get_content_for_channel(channel)
+                for channel in PREFERENCE_CHANNELS
+            }
         }
 
+        variant_b = campaign.content.get("variant_b")
+        if variant_b:
+            contents["B"] = {**contents["A"], **variant_b}
+        return contents
+
+    @staticmethod
+    def _status_q(status):
+        """Match recipients with a channel in a delivery status."""
+        q = Q()
+        for field in STATUS_FIELDS.values():
+            q |= Q(**{field: status})
+        return q
+
     @classmethod
-    def _send_email_notification(cls, campaign, recipient, template, recipient_data):
-        """Send email notification for a campaign recipient"""
-        if not template:
-            raise ValueError("Email template is required")
-
-        # Get recipient email
-        email = recipient_data.get("email")
-        if not email:
-            raise ValueError("Recipient email is required")
+    def _undispatched_q(cls):
+        """Match recipients with no send task due, or one overdue by CLAIM_TIMEOUT."""
+        cutoff = timezone.now() - timedelta(seconds=cls.CLAIM_TIMEOUT)
+        return Q(processed_at__isnull=True) | Q(processed_at__lt=cutoff)
 
-        # Send notification through the notification service
-        notification_id = NotificationService.send_notification(
-            notification_type="campaign_email",
-            recipient_id=recipient.customer_id,
-            title=template.subject,
-            message=None,  # Not needed for email
-            channels=["email"],
-            data={
-                "campaign_id": str(campaign.id),
-                "recipient_id": str(recipient.id),
-                "template_id": str(template.id),
-            },
-            email_options={
-                "template_id": str(template.id),
-                "recipient_email": email,
-                "template_data": recipient_data,
+    @classmethod
+    def _release(cls, recipients):
+        """Return the claimed channels of recipients to pending, to be dispatched again."""
+        return recipients.update(
+            processed_at=None,
+            **{
+                field: Case(
+                    When(**{field: "sending"}, then=Value("pending")),
+                    default=F(field),
+                )
+                for field in STATUS_FIELDS.values()
             },
         )
 
-        # Store the notification ID for tracking
-        recipient.notification_ids = recipient.notification_ids or []
-        recipient.notification_ids.append(str(notification_id))
-        recipient.save()
+    @classmethod
+    def _reclaim_stale(cls, campaign_id):
+        """
+        Release recipients claimed longer than CLAIM_TIMEOUT ago.
 
-        return notification_id
+        Returns:
+            Number of recipients released
+        """
+        stale = CampaignRecipient.objects.filter(
+            campaign_id=campaign_id,
+            processed_at__lt=timezone.now() - timedelta(seconds=cls.CLAIM_TIMEOUT),
+        ).filter(cls._status_q("sending"))
+        return cls._release(stale)
 
     @classmethod
-    def _send_sms_notification(cls, campaign, recipient, template, recipient_data):
-        """Send SMS notification for a campaign recipient"""
-        if not template:
-            raise ValueError("SMS template is required")
-
-        # Get recipient phone number
-        phone_number = recipient_data.get("phone_number")
-        if not phone_number:
-            raise ValueError("Recipient phone number is required")
-
-        # Send notification through the notification service
-        notification_id = NotificationService.send_notification(
-            notification_type="campaign_sms",
-            recipient_id=recipient.customer_id,
-            title=None,  # Not needed for SMS
-            message=None,  # Will use template
-            channels=["sms"],
-            data={
-                "campaign_id": str(campaign.id),
-                "recipient_id": str(recipient.id),
-                "template_id": str(template.id),
-            },
-            sms_options={
-                "template_id": str(template.id),
-                "recipient_phone": phone_number,
-                "template_data": recipient_data,
-            },
+    def _complete_if_done(cls, campaign_id):
+        """Mark a sending campaign sent once no recipient is left to send"""
+        unsent = CampaignRecipient.objects.filter(campaign_id=campaign_id).filter(
+            cls._status_q("pending") | cls._status_q("sending")
         )
+        if unsent.exists():
+            return
+
+        counts = CampaignRecipient.objects.filter(campaign_id=campaign_id).aggregate(
+            **{
+                f"{channel}_{status}": Count("id", filter=Q(**{field: status}))
+                for channel, field in STATUS_FIELDS.items()
+                for status in ("sent", "failed")
+            }
+        )
+        with transaction.atomic():
+            campaign = (
+                Campaign.objects.select_for_update()
+                .filter(id=campaign_id, status="sending")
+                .first()
+            )
+            if campaign is None:
+                return
+
+            campaign.metrics = {
+                **campaign.metrics,
+                "sent": sum(counts[f"{channel}_sent"] for channel in PREFERENCE_CHANNELS),
+                "failed": sum(counts[f"{channel}_failed"] for channel in PREFERENCE_CHANNELS),
+                "by_channel": {
+                    channel: {
+                        "sent": counts[f"{channel}_sent"],
+                        "failed": counts[f"{channel}_failed"],
+                    }
+                    for channel in PREFERENCE_CHANNELS
+                },
+            }
+            campaign.status = "sent"
+            campaign.completed_at = timezone.now()
+            campaign.save()
 
-        # Store the notification ID for tracking
-        recipient.notification_ids = recipient.notification_ids or []
-        recipient.notification_ids.append(str(notification_id))
-        recipient.save()
+    @classmethod
+    def _send_channel(cls, campaign, recipient, channel, content):
+        """
+        Send the content of one channel to a campaign recipient.
 
-        return notification_id
+        Raises:
+            ValueError: If the channel has no content or the user can't be
+                reached through it
+        """
+        if not content:
+            raise ValueError(f"{channel} content is required")
+        if channel == "email" and not recipient.user.email:
+            raise ValueError("Recipient email is required")
+        if channel == "sms" and not recipient.user.phone_number:
+            raise ValueError("Recipient phone number is required")
 
-    @classmethod
-    def _send_push_notification(cls, campaign, recipient, template, recipient_data):
-        """Send push notification for a campaign recipient"""
-        if not template:
-            raise ValueError("Push notification template is required")
-
-        # Send notification through the notification service
-        notification_id = NotificationService.send_notification(
-            notification_type="campaign_push",
-            recipient_id=recipient.customer_id,
-            title=template.title,
-            message=template.body,
-            channels=["push"],
+        result = NotificationService.send_notification(
+            recipient_id=str(recipient.user_id),
+            notification_type=f"campaign_{channel}",
+            title=content.get("title") or content.get("subject"),
+            message=content.get("message") or content.get("body"),
+            channels=[channel],
             data={
                 "campaign_id": str(campaign.id),
                 "recipient_id": str(recipient.id),
-                "template_id": str(template.id),
-                "action_url": template.action_url,
-                "action_button_text": template.action_button_text,
-                "image_url": template.image_url,
+                **content.get("data", {}),
             },
-            template_data=recipient_data,
+            # Sends of reclaimed recipients are not duplicated
+            idempotency_key=f"campaign:{campaign.id}:{recipient.id}:{channel}",
         )
+        if not result.get("success"):
+            raise ValueError(result.get("message", f"{channel} send failed"))
 
-        # Store the notification ID for tracking
-        recipient.notification_ids = recipient.notification_ids or []
-        recipient.notification_ids.append(str(notification_id))
-        recipient.save()
-
-        return notification_id
+        return result.get("notification_id")
 
     @classmethod
     def get_campaign_report(cls, campaign_id):
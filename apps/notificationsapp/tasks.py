@@ -536,3 +536,41 @@ def clean_old_notifications():
             "success": False,
             "message": f"Error cleaning old notifications: {str(e)}",
         }
+
+
+@shared_task
+def send_campaign_chunk(campaign_id, recipient_ids):
+    """
+    Send a chunk of campaign recipients dispatched by CampaignService.
+
+    Args:
+        campaign_id: ID of the campaign
+        recipient_ids: IDs of the campaign recipients to send
+    """
+    try:
+        # Import inside the function to avoid circular import
+        from apps.notificationsapp.services.campaign_service import CampaignService
+
+        return CampaignService.send_chunk(campaign_id, recipient_ids)
+
+    except Exception as e:
+        logger.exception(f"Error sending chunk of campaign {campaign_id}: {str(e)}")
+        return {"sent_count": 0, "failed_count": 0}
+
+
+@shared_task
+def resume_campaigns():
+    """
+    Reclaim and dispatch unsent recipients of sending campaigns, and complete
+    campaigns with nothing left to send.
+    """
+    try:
+        # Import inside the function to avoid circular import
+        from apps.notificationsapp.services.campaign_service import CampaignService
+
+        count = CampaignService.resume_campaigns()
+        return {"success": True, "campaign_count": count}
+
+    except Exception as e:
+        logger.exception(f"Error resuming campaigns: {str(e)}")
+        return {"success": False, "message": f"Error resuming campaigns: {str(e)}"}
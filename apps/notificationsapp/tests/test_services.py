@@ -1,14 +1,33 @@
+import uuid
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from apps.authapp.models import User
-from apps.notificationsapp.models import DeviceToken, Notification, NotificationTemplate
+from apps.customersapp.models import Customer
+from apps.notificationsapp.models import (
+    Campaign,
+    CampaignRecipient,
+    DeviceToken,
+    Notification,
+    NotificationTemplate,
+    UserNotificationSettings,
+)
+from apps.notificationsapp.services.campaign_delivery import (
+    ChannelThrottle,
+    assign_variant,
+    variant_weights,
+)
+from apps.notificationsapp.services.campaign_service import CampaignService
 from apps.notificationsapp.services.channel_selector import ChannelSelector
 from apps.notificationsapp.services.notification_service import NotificationService
 from apps.notificationsapp.services.timing_optimizer import TimingOptimizer
 
+# Campaign throttling and claims count in the default cache
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 class NotificationServiceTest(TestCase):
     def setUp(self):
@@ -308,3 +327,247 @@ class TimingOptimizerTest(TestCase):
                 (7 <= user_hour <= 9) or (19 <= user_hour <= 21),  # Morning  # Evening
                 f"Scheduled for {user_hour} which is not an active time for this user",
             )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CampaignDeliveryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_assign_variant_is_deterministic(self):
+        """Test variants are stable per customer and follow the traffic split"""
+        campaign_id = uuid.uuid4()
+        customer_ids = [uuid.uuid4() for _ in range(2000)]
+        weights = variant_weights(20)
+
+        variants = [
+            assign_variant(campaign_id, customer_id, weights) for customer_id in customer_ids
+        ]
+
+        self.assertEqual(
+            variants,
+            [assign_variant(campaign_id, customer_id, weights) for customer_id in customer_ids],
+        )
+        self.assertAlmostEqual(variants.count("B") / len(variants), 0.2, delta=0.05)
+        self.assertEqual(variant_weights({"A": 50, "B": 50}), [("A", 50), ("B", 50)])
+
+    def test_channel_throttle_spreads_chunks(self):
+        """Test chunks beyond a window's limit are delayed to later windows"""
+        now = 600.0
+        with patch.dict(ChannelThrottle.RATE_LIMITS, {"sms": 100}):
+            delays = [ChannelThrottle.reserve("sms", 50, now) for _ in range(5)]
+            push_delay = ChannelThrottle.reserve_chunk({"push": 50}, now)
+
+        window = ChannelThrottle.WINDOW
+        self.assertEqual(delays, [0, 0, window, window, 2 * window])
+        self.assertEqual(push_delay, 0)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    )
+    def test_channel_throttle_without_counting_cache(self):
+        """Test chunks are not delayed when the cache cannot count sends"""
+        with patch.dict(ChannelThrottle.RATE_LIMITS, {"sms": 100}):
+            self.assertEqual(ChannelThrottle.reserve("sms", 50, 600.0), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@patch("apps.notificationsapp.tasks.send_campaign_chunk.apply_async")
+class CampaignServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        # No notification settings: every campaign channel
+        self.first = self.customer("966500000001")
+        # SMS disabled
+        self.second = self.customer("966500000002", sms_enabled=False)
+        # Everything disabled: skipped
+        self.customer("966500000003", email_enabled=False, sms_enabled=False, push_enabled=False)
+        # Inactive users are skipped
+        self.customer("966500000004", is_active=False)
+
+        self.campaign = Campaign.objects.create(
+            name="Spring offers",
+            campaign_type="promotion",
+            recipient_type="customers",
+            channels=["email", "sms"],
+            content={
+                "email": {"subject": "Spring", "body": "Offers inside"},
+                "sms": {"message": "Spring offers"},
+            },
+        )
+
+    def customer(self, phone_number, is_active=True, **notification_settings):
+        user = User.objects.create(
+            phone_number=phone_number,
+            email=f"{phone_number}@example.com",
+            is_active=is_active,
+        )
+        if notification_settings:
+            UserNotificationSettings.objects.create(user_id=user.id, **notification_settings)
+        Customer.objects.create(user=user)
+        return user
+
+    def dispatch(self, method, *args):
+        """Run a dispatching call and the chunk tasks queued on its commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return method(*args)
+
+    def statuses(self, user):
+        recipient = CampaignRecipient.objects.get(campaign=self.campaign, user=user)
+        return recipient.email_status, recipient.sms_status, recipient.push_status
+
+    def test_build_recipient_list(self, mock_apply_async):
+        """Test recipients get pending statuses for their enabled channels"""
+        self.assertEqual(CampaignService.build_recipient_list(self.campaign), 2)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.audience_count, 2)
+        self.assertEqual(self.statuses(self.first), ("pending", "pending", None))
+        self.assertEqual(self.statuses(self.second), ("pending", None, None))
+
+    def test_recipient_list_limited_to_campaign_channels(self, mock_apply_async):
+        """Test content for a channel the campaign does not use is not sent"""
+        self.campaign.channels = ["email"]
+        self.campaign.content["push"] = {"title": "Spring", "body": "Offers inside"}
+        self.campaign.save()
+
+        self.assertEqual(CampaignService.build_recipient_list(self.campaign), 2)
+
+        self.assertEqual(self.statuses(self.first), ("pending", None, None))
+        self.assertEqual(self.statuses(self.second), ("pending", None, None))
+
+    def test_process_campaign_dispatches_chunks(self, mock_apply_async):
+        """Test pending recipients are dispatched once, one task per chunk"""
+        with patch.object(CampaignService, "CHUNK_SIZE", 1):
+            with self.captureOnCommitCallbacks(execute=True):
+                result = CampaignService.process_campaign(self.campaign)
+                # Chunks are queued only once their recipients are committed
+                mock_apply_async.assert_not_called()
+
+        self.assertEqual(result, {"dispatched_count": 2, "chunk_count": 2, "status": "sending"})
+        recipient_ids = {
+            recipient_id
+            for call in mock_apply_async.call_args_list
+            for recipient_id in call.kwargs["args"][1]
+        }
+        self.assertEqual(
+            recipient_ids,
+            {
+                str(recipient_id)
+                for recipient_id in CampaignRecipient.objects.values_list("id", flat=True)
+            },
+        )
+
+        # Processing again resumes after the checkpoint
+        result = self.dispatch(CampaignService.process_campaign, self.campaign)
+        self.assertEqual(result["dispatched_count"], 0)
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+    @patch(
+        "apps.notificationsapp.services.campaign_service.NotificationService.send_notification",
+        return_value={"success": True, "notification_id": "notification"},
+    )
+    def test_send_chunk_sends_and_completes(self, mock_send, mock_apply_async):
+        """Test a chunk sends each pending channel once and completes the campaign"""
+        self.dispatch(CampaignService.process_campaign, self.campaign)
+        recipient_ids = mock_apply_async.call_args.kwargs["args"][1]
+
+        result = CampaignService.send_chunk(self.campaign.id, recipient_ids)
+
+        self.assertEqual(result, {"sent_count": 3, "failed_count": 0})
+        self.assertEqual(self.statuses(self.first), ("sent", "sent", None))
+        self.assertEqual(self.statuses(self.second), ("sent", None, None))
+        self.assertEqual(
+            sorted(call.kwargs["channels"][0] for call in mock_send.call_args_list),
+            ["email", "email", "sms"],
+        )
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sent")
+        self.assertEqual(self.campaign.metrics["sent"], 3)
+        self.assertEqual(self.campaign.metrics["failed"], 0)
+
+        # A chunk dispatched twice is only sent once
+        Campaign.objects.filter(id=self.campaign.id).update(status="sending")
+        result = CampaignService.send_chunk(self.campaign.id, recipient_ids)
+        self.assertEqual(result, {"sent_count": 0, "failed_count": 0})
+        self.assertEqual(mock_send.call_count, 3)
+
+    @patch(
+        "apps.notificationsapp.services.campaign_service.NotificationService.send_notification",
+        return_value={"success": True, "notification_id": "notification"},
+    )
+    def test_failed_chunk_releases_claims(self, mock_send, mock_apply_async):
+        """Test recipients of a chunk that fails are dispatched and sent again"""
+        self.dispatch(CampaignService.process_campaign, self.campaign)
+        recipient_ids = mock_apply_async.call_args.kwargs["args"][1]
+
+        with patch.object(CampaignService, "_send_recipients", side_effect=RuntimeError("down")):
+            with self.assertRaises(RuntimeError):
+                CampaignService.send_chunk(self.campaign.id, recipient_ids)
+
+        self.assertEqual(self.statuses(self.first), ("pending", "pending", None))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sending")
+
+        # The released recipients lie before the checkpoint
+        self.assertEqual(self.dispatch(CampaignService.resume_campaigns), 1)
+        self.assertEqual(mock_apply_async.call_count, 2)
+        self.assertEqual(
+            sorted(mock_apply_async.call_args.kwargs["args"][1]), sorted(recipient_ids)
+        )
+
+        CampaignService.send_chunk(self.campaign.id, recipient_ids)
+        self.assertEqual(self.statuses(self.first), ("sent", "sent", None))
+        self.assertEqual(self.statuses(self.second), ("sent", None, None))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sent")
+
+    def test_lost_chunks_dispatched_again(self, mock_apply_async):
+        """Test chunks whose task never ran are dispatched again"""
+        self.dispatch(CampaignService.process_campaign, self.campaign)
+        recipient_ids = mock_apply_async.call_args.kwargs["args"][1]
+
+        # Dispatched chunks still due are left alone
+        self.dispatch(CampaignService.resume_campaigns)
+        self.assertEqual(mock_apply_async.call_count, 1)
+
+        # The task was due long ago but never claimed its recipients
+        CampaignRecipient.objects.update(
+            processed_at=timezone.now()
+            - timezone.timedelta(seconds=CampaignService.CLAIM_TIMEOUT + 1)
+        )
+        self.dispatch(CampaignService.resume_campaigns)
+        self.assertEqual(mock_apply_async.call_count, 2)
+        self.assertEqual(
+            sorted(mock_apply_async.call_args.kwargs["args"][1]), sorted(recipient_ids)
+        )
+
+    def test_stale_claims_reclaimed(self, mock_apply_async):
+        """Test recipients claimed by a task that died are dispatched again"""
+        self.dispatch(CampaignService.process_campaign, self.campaign)
+        self.assertEqual(mock_apply_async.call_count, 1)
+
+        # Claimed long ago by a task that never finished
+        CampaignRecipient.objects.filter(user=self.first).update(
+            email_status="sending",
+            sms_status="sending",
+            processed_at=timezone.now()
+            - timezone.timedelta(seconds=CampaignService.CLAIM_TIMEOUT + 1),
+        )
+        # Claimed recently, still being sent
+        CampaignRecipient.objects.filter(user=self.second).update(
+            email_status="sending", processed_at=timezone.now()
+        )
+
+        self.assertEqual(self.dispatch(CampaignService.resume_campaigns), 1)
+
+        self.assertEqual(mock_apply_async.call_count, 2)
+        recipient = CampaignRecipient.objects.get(user=self.first)
+        self.assertEqual(mock_apply_async.call_args.kwargs["args"][1], [str(recipient.id)])
+        self.assertEqual(self.statuses(self.first), ("pending", "pending", None))
+        self.assertEqual(self.statuses(self.second), ("sending", None, None))
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sending")
@@ -10,6 +10,7 @@ from django.core.serializers.json import DjangoJSONEncoder
 
 from apps.authapp.services.token_service import TokenService
 
+from .services.broadcast_service import QueueBroadcastService
 from .services.queue_service import QueueService
 
 logger = logging.getLogger(__name__)
@@ -165,6 +166,8 @@ class QueueConsumer(AsyncWebsocketConsumer):
                 await self.handle_cancel_ticket(data)
             elif message_type == "get_queue_state":
                 await self.handle_get_queue_state()
+            elif message_type == "resync":
+                await self.handle_resync()
             else:
                 await self.send_error(f"Unknown message type: {message_type}")
 
@@ -345,6 +348,26 @@ class QueueConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error getting queue state: {str(e)}")
             await self.send_error("Failed to retrieve queue state")
 
+    async def handle_resync(self):
+        """Send the full broadcast state to a client that missed a delta"""
+        try:
+            text, _ = await database_sync_to_async(self.get_snapshot)()
+            await self.send(text_data=text)
+        except Exception as e:
+            logger.error(f"Error getting queue snapshot: {str(e)}")
+            await self.send_error("Failed to retrieve queue snapshot")
+
+    async def queue_broadcast(self, event):
+        """Forward a coalesced queue delta encoded once for the whole group"""
+        try:
+            await self.send(text_data=event["text"])
+        except Exception as e:
+            logger.error(f"Error sending queue delta: {str(e)}")
+
+    def get_snapshot(self):
+        """Get the encoded broadcast state of the queue"""
+        return QueueBroadcastService.encode(QueueBroadcastService.snapshot(self.queue_id))
+
     async def queue_update(self, event):
         """Send queue update to WebSocket"""
         try:
@@ -0,0 +1,423 @@
+"""
+Coalesced, delta-encoded queue broadcasts.
+
+Ticket changes are not sent to the queue group one by one. publish() records
+them as pending per queue once their transaction commits, and the first change
+in a window schedules a single flush; no other flush of the queue is scheduled
+until it has saved the new state. The flush compares the pending tickets with
+the state last broadcast, sends only the fields that changed as one versioned
+queue_delta message, and encodes that message once: the JSON text and its
+zlib-compressed bytes travel in the group event, so consumers forward them
+without serializing again.
+
+Clients apply deltas in version order. A client that misses a version asks for
+a resync and receives a full queue_snapshot of the broadcast state.
+"""
+
+import json
+import logging
+import zlib
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from apps.queueapp.models import QueueTicket
+from utils.cache_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Tickets kept in the broadcast state; others are dropped from it once sent
+TRACKED_STATUSES = ["waiting", "called", "serving"]
+
+# Broadcast fields of a ticket, in state tuple order
+TICKET_FIELDS = ["ticket_number", "status", "position", "estimated_wait_time"]
+
+
+class QueueBroadcastService:
+    """Per-queue coalescing and delta encoding of queue_update broadcasts"""
+
+    KEY_PREFIX = "queue_broadcast:"
+    # Updates of a queue arriving within this window go out as one message
+    WINDOW_SECONDS = getattr(settings, "QUEUE_BROADCAST_WINDOW_MS", 150) / 1000
+    # Scheduled marks expire on their own if the flush task is lost
+    SCHEDULED_TTL = 60
+    STATE_TTL = 60 * 60 * 24
+
+    COMPRESSION_LEVEL = getattr(settings, "WEBSOCKET_COMPRESSION_LEVEL", 6)
+
+    # ------------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _key(cls, queue_id, name):
+        # The hash tag keeps every key of a queue in the same cluster slot
+        return f"{cls.KEY_PREFIX}{{{queue_id}}}:{name}"
+
+    @staticmethod
+    def ticket_values(ticket):
+        """Get the broadcast fields of a ticket instance as a dict."""
+        return {
+            "id": str(ticket.id),
+            **{field: getattr(ticket, field) for field in TICKET_FIELDS},
+        }
+
+    # ------------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def publish(cls, queue_id, tickets=(), removed=()):
+        """
+        Record ticket changes of a queue for the next coalesced broadcast.
+
+        Args:
+            queue_id: ID of the queue
+            tickets: Dicts with the id and broadcast fields of changed tickets
+            removed: IDs of deleted tickets
+        """
+        changes = {
+            str(ticket["id"]): json.dumps(
+                [ticket.get(field) for field in TICKET_FIELDS], cls=DjangoJSONEncoder
+            )
+            for ticket in tickets
+        }
+        # An empty value marks a deleted ticket
+        changes.update({str(ticket_id): "" for ticket_id in removed})
+        if not changes:
+            return
+
+        # Changes of rolled back transactions are never recorded
+        transaction.on_commit(lambda: cls._record(queue_id, changes))
+
+    @classmethod
+    def _record(cls, queue_id, changes):
+        """Add committed changes to the pending changes of a queue."""
+        pending_key = cls._key(queue_id, "pending")
+        try:
+            client = get_redis_client()
+            if client is None:
+                pending = cache.get(pending_key) or {}
+                pending.update(changes)
+                cache.set(pending_key, pending, cls.SCHEDULED_TTL)
+            else:
+                with client.pipeline() as pipe:
+                    pipe.hset(pending_key, mapping=changes)
+                    pipe.expire(pending_key, cls.SCHEDULED_TTL)
+                    pipe.execute()
+
+            cls._schedule_flush(queue_id)
+
+        except Exception as e:
+            logger.error(f"Error publishing queue update: {str(e)}")
+
+    @classmethod
+    def _schedule_flush(cls, queue_id):
+        """Schedule a flush unless one is already scheduled or running."""
+        scheduled_key = cls._key(queue_id, "scheduled")
+
+        client = get_redis_client()
+        if client is None:
+            scheduled = cache.add(scheduled_key, True, cls.SCHEDULED_TTL)
+        else:
+            scheduled = client.set(scheduled_key, 1, nx=True, ex=cls.SCHEDULED_TTL)
+        if not scheduled:
+            return
+
+        from apps.queueapp.tasks import flush_queue_broadcast
+
+        try:
+            flush_queue_broadcast.apply_async(args=[str(queue_id)], countdown=cls.WINDOW_SECONDS)
+        except Exception:
+            cls._clear_schedule(queue_id)
+            raise
+
+    @classmethod
+    def _clear_schedule(cls, queue_id):
+        """
+        Clear the scheduled mark of a queue.
+
+        Returns:
+            True when changes are pending, which then need another flush
+        """
+        scheduled_key = cls._key(queue_id, "scheduled")
+        pending_key = cls._key(queue_id, "pending")
+
+        client = get_redis_client()
+        if client is None:
+            cache.delete(scheduled_key)
+            return bool(cache.get(pending_key))
+
+        # Changes recorded before the mark is cleared are seen here, later
+        # ones schedule their own flush
+        with client.pipeline() as pipe:
+            pipe.delete(scheduled_key)
+            pipe.exists(pending_key)
+            _, pending = pipe.execute()
+        return bool(pending)
+
+    # ------------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _take_pending(cls, queue_id):
+        """Read and clear the pending changes of a queue."""
+        pending_key = cls._key(queue_id, "pending")
+
+        client = get_redis_client()
+        if client is None:
+            pending = cache.get(pending_key) or {}
+            cache.delete(pending_key)
+            return pending
+
+        with client.pipeline() as pipe:
+            pipe.hgetall(pending_key)
+            pipe.delete(pending_key)
+            raw, _ = pipe.execute()
+        return {key.decode(): value.decode() for key, value in raw.items()}
+
+    @classmethod
+    def _get_state(cls, queue_id):
+        """
+        Get the last broadcast state of a queue.
+
+        Returns:
+            Tuple of (version, state) where state maps ticket ID to a list of
+            TICKET_FIELDS values, or (None, None) when no state is stored
+        """
+        state_key = cls._key(queue_id, "state")
+        version_key = cls._key(queue_id, "version")
+
+        client = get_redis_client()
+        if client is None:
+            stored = cache.get(state_key)
+            if stored is None:
+                return None, None
+            return cache.get(version_key, 0), stored
+
+        with client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(state_key)
+            pipe.get(version_key)
+            raw, version = pipe.execute()
+        # The version outlives an empty state hash, which Redis deletes
+        if version is None:
+            return None, None
+        return int(version), {key.decode(): json.loads(value) for key, value in raw.items()}
+
+    @classmethod
+    def _save_state(cls, queue_id, state, updated, dropped, replace=False):
+        """
+        Store state changes and advance the version of a queue.
+
+        Args:
+            queue_id: ID of the queue
+            state: Full state after the changes
+            updated: IDs of tickets added or changed in the state
+            dropped: IDs of tickets removed from the state
+            replace: Discard any previously stored state first
+
+        Returns:
+            New version
+        """
+        state_key = cls._key(queue_id, "state")
+        version_key = cls._key(queue_id, "version")
+
+        client = get_redis_client()
+        if client is None:
+            cache.set(state_key, state, cls.STATE_TTL)
+            version = cache.get(version_key, 0) + 1
+            cache.set(version_key, version, cls.STATE_TTL)
+            return version
+
+        with client.pipeline() as pipe:
+            if replace:
+                pipe.delete(state_key)
+            if updated:
+                pipe.hset(
+                    state_key,
+                    mapping={
+                        ticket_id: json.dumps(state[ticket_id], cls=DjangoJSONEncoder)
+                        for ticket_id in updated
+                    },
+                )
+            if dropped:
+                pipe.hdel(state_key, *dropped)
+            pipe.incr(version_key)
+            pipe.expire(state_key, cls.STATE_TTL)
+            pipe.expire(version_key, cls.STATE_TTL)
+            results = pipe.execute()
+        return results[-3]
+
+    @staticmethod
+    def _diff(state, pending):
+        """
+        Apply pending changes to a state.
+
+        Args:
+            state: Ticket ID -> field values, updated in place
+            pending: Ticket ID -> encoded field values, empty when deleted
+
+        Returns:
+            Tuple of (changes, removed, updated, dropped)
+        """
+        changes, removed, updated, dropped = [], [], [], []
+
+        for ticket_id, encoded in pending.items():
+            previous = state.get(ticket_id)
+
+            if not encoded:
+                if previous is not None:
+                    removed.append(ticket_id)
+                    dropped.append(ticket_id)
+                    del state[ticket_id]
+                continue
+
+            values = json.loads(encoded)
+            # Only the fields that changed since the last broadcast are sent
+            change = {
+                field: value
+                for index, (field, value) in enumerate(zip(TICKET_FIELDS, values))
+                if previous is None or previous[index] != value
+            }
+            if change:
+                changes.append({"id": ticket_id, **change})
+
+            status = values[TICKET_FIELDS.index("status")]
+            if status in TRACKED_STATUSES:
+                if change:
+                    state[ticket_id] = values
+                    updated.append(ticket_id)
+            elif previous is not None:
+                removed.append(ticket_id)
+                dropped.append(ticket_id)
+                del state[ticket_id]
+
+        return changes, removed, updated, dropped
+
+    @classmethod
+    def flush(cls, queue_id):
+        """
+        Send the pending changes of a queue as one delta message.
+
+        Args:
+            queue_id: ID of the queue
+
+        Returns:
+            Version sent, or None when nothing changed
+        """
+        # The scheduled mark is held until the new state is saved, so flushes
+        # of a queue never overlap and versions go out in order
+        try:
+            version = cls._flush_pending(queue_id)
+        finally:
+            if cls._clear_schedule(queue_id):
+                cls._schedule_flush(queue_id)
+        return version
+
+    @classmethod
+    def _flush_pending(cls, queue_id):
+        pending = cls._take_pending(queue_id)
+        if not pending:
+            return None
+
+        version, state = cls._get_state(queue_id)
+        if state is None:
+            version, state = cls.build_state(queue_id)
+
+        changes, removed, updated, dropped = cls._diff(state, pending)
+        if not changes and not removed:
+            return None
+
+        version = cls._save_state(queue_id, state, updated, dropped)
+        cls._send(
+            queue_id,
+            {
+                "type": "queue_delta",
+                "queue_id": str(queue_id),
+                "version": version,
+                "changes": changes,
+                "removed": removed,
+            },
+        )
+        return version
+
+    @classmethod
+    def encode(cls, message):
+        """
+        Encode a broadcast message once for every consumer.
+
+        Args:
+            message: Message dict
+
+        Returns:
+            Tuple of (JSON text, zlib-compressed bytes)
+        """
+        text = json.dumps(message, cls=DjangoJSONEncoder)
+        return text, zlib.compress(text.encode("utf-8"), cls.COMPRESSION_LEVEL)
+
+    @classmethod
+    def _send(cls, queue_id, message):
+        text, compressed = cls.encode(message)
+        async_to_sync(get_channel_layer().group_send)(
+            f"queue_{queue_id}",
+            {
+                "type": "queue_broadcast",
+                "version": message["version"],
+                "text": text,
+                "compressed": compressed,
+            },
+        )
+
+    # ------------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def build_state(cls, queue_id):
+        """
+        Rebuild the broadcast state of a queue from the database.
+
+        Returns:
+            Tuple of (version, state)
+        """
+        state = {
+            str(row["id"]): [row[field] for field in TICKET_FIELDS]
+            for row in QueueTicket.objects.filter(
+                queue_id=queue_id, status__in=TRACKED_STATUSES
+            ).values("id", *TICKET_FIELDS)
+        }
+        version = cls._save_state(queue_id, state, list(state), [], replace=True)
+        return version, state
+
+    @classmethod
+    def snapshot(cls, queue_id):
+        """
+        Get the full broadcast state of a queue for a (re)connecting client.
+
+        Args:
+            queue_id: ID of the queue
+
+        Returns:
+            queue_snapshot message dict
+        """
+        version, state = cls._get_state(queue_id)
+        if state is None:
+            version, state = cls.build_state(queue_id)
+
+        tickets = [
+            {"id": ticket_id, **dict(zip(TICKET_FIELDS, values))}
+            for ticket_id, values in state.items()
+        ]
+        tickets.sort(key=lambda ticket: ticket["position"] or 0)
+
+        return {
+            "type": "queue_snapshot",
+            "queue_id": str(queue_id),
+            "version": version,
+            "tickets": tickets,
+        }
@@ -0,0 +1,575 @@
+"""
+Live queue state engine backed by Redis sorted sets.
+
+Each active service queue keeps its waiting entries in a sorted set scored by
+(priority, check-in time), so a position lookup is a single ZRANK and calling
+the next customer is an atomic Lua pop instead of a locked ORDER BY scan.
+Entries that prefer a specialist are also indexed in a per-specialist sorted
+set so call-next can honour the preference within the same script.
+
+Postgres remains the system of record. Queue positions are written back
+asynchronously by a debounced Celery task, a queue whose state is missing from
+Redis (cold start, eviction) is rebuilt from the database on first use, and a
+consistency checker compares both sides and rebuilds on divergence.
+
+Scores always fall in the band of the entry priority, but within a band the
+live order may differ from check-in order: QueueOptimizer reorders positions,
+and rebuilds keep that order by handing the band's check-in scores out in
+position order.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from utils.cache_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Highest QueuePriority value; higher priorities must sort first
+MAX_PRIORITY = 5
+# Check-in timestamps in milliseconds stay below this for centuries, and the
+# combined score stays well inside the exact integer range of a double
+PRIORITY_SCALE = 10**13
+
+# KEYS: waiting set, preferred specialist set, entry -> specialist hash
+# ARGV: key prefix of the per-specialist sets
+CALL_NEXT_SCRIPT = """
+local entry = false
+if KEYS[2] ~= '' then
+    entry = redis.call('ZRANGE', KEYS[2], 0, 0)[1]
+end
+if not entry then
+    entry = redis.call('ZRANGE', KEYS[1], 0, 0)[1]
+end
+if not entry then
+    return false
+end
+redis.call('ZREM', KEYS[1], entry)
+local preferred = redis.call('HGET', KEYS[3], entry)
+if preferred then
+    redis.call('ZREM', ARGV[1] .. preferred, entry)
+    redis.call('HDEL', KEYS[3], entry)
+end
+return entry
+"""
+
+
+def entry_score(priority, check_in_time):
+    """
+    Get the sorted set score of a queue entry.
+
+    Lower scores are served first: higher priorities come first, and entries
+    with the same priority are ordered by check-in time.
+
+    Args:
+        priority: Priority value of the entry
+        check_in_time: Check-in datetime of the entry
+
+    Returns:
+        Sorted set score
+    """
+    check_in_ms = int(check_in_time.timestamp() * 1000)
+    return (MAX_PRIORITY - int(priority)) * PRIORITY_SCALE + check_in_ms
+
+
+def ordered_scores(entries):
+    """
+    Score queue entries so they are served in the given order.
+
+    Entries keep the band of their priority. The check-in scores of each band
+    are handed out in sorted order to the band's entries as they come, so
+    entries added later still fall in place by check-in time.
+
+    Args:
+        entries: Waiting entries in service order
+
+    Returns:
+        List of (entry, score) tuples
+    """
+    bands = {}
+    for entry in entries:
+        bands.setdefault(int(entry.priority), []).append(
+            entry_score(entry.priority, entry.check_in_time)
+        )
+    for scores in bands.values():
+        scores.sort(reverse=True)
+
+    return [(entry, bands[int(entry.priority)].pop()) for entry in entries]
+
+
+class LiveQueueState:
+    """Redis sorted set view of the waiting entries of each service queue"""
+
+    KEY_PREFIX = "live_queue:"
+    SYNC_PENDING_PREFIX = "live_queue:sync_pending:"
+    SYNC_DELAY_SECONDS = getattr(settings, "LIVE_QUEUE_SYNC_DELAY_SECONDS", 2)
+    # Pending marks expire on their own if the scheduled task is lost
+    SYNC_PENDING_TTL = 60
+    # Seconds a loaded queue is trusted before it is rebuilt from the database
+    READY_TTL = getattr(settings, "LIVE_QUEUE_READY_TTL", 60 * 60 * 24)
+    ENABLED = getattr(settings, "LIVE_QUEUE_STATE_ENABLED", True)
+
+    _call_next_script = None
+
+    # ------------------------------------------------------------------------
+    # Keys and connection
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _base_key(cls, queue_id):
+        # The hash tag keeps every key of a queue in the same cluster slot
+        return f"{cls.KEY_PREFIX}{{{queue_id}}}"
+
+    @classmethod
+    def _waiting_key(cls, queue_id):
+        return f"{cls._base_key(queue_id)}:waiting"
+
+    @classmethod
+    def _specialist_prefix(cls, queue_id):
+        return f"{cls._base_key(queue_id)}:specialist:"
+
+    @classmethod
+    def _specialists_key(cls, queue_id):
+        # Specialists that have a per-specialist set, so rebuilds can find them
+        return f"{cls._base_key(queue_id)}:specialists"
+
+    @classmethod
+    def _preferences_key(cls, queue_id):
+        return f"{cls._base_key(queue_id)}:preferences"
+
+    @classmethod
+    def _ready_key(cls, queue_id):
+        return f"{cls._base_key(queue_id)}:ready"
+
+    @classmethod
+    def get_client(cls):
+        """
+        Get the raw Redis client of the default cache.
+
+        Returns:
+            Redis client, or None when live state is disabled or unavailable
+        """
+        if not cls.ENABLED:
+            return None
+        return get_redis_client()
+
+    @classmethod
+    def _ensure_loaded(cls, client, queue_id):
+        if not client.exists(cls._ready_key(queue_id)):
+            cls.rebuild(queue_id, client=client)
+
+    @staticmethod
+    def _decode(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    # ------------------------------------------------------------------------
+    # State updates
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def add(cls, entry):
+        """
+        Add or re-score a waiting entry.
+
+        Args:
+            entry: Waiting queue entry
+
+        Returns:
+            True if the live state was updated, False otherwise
+        """
+        client = cls.get_client()
+        if client is None:
+            return False
+
+        try:
+            queue_id = str(entry.queue_id)
+            cls._ensure_loaded(client, queue_id)
+
+            pipe = client.pipeline()
+            cls._add_to_pipeline(pipe, queue_id, entry)
+            pipe.execute()
+            return True
+
+        except Exception as e:
+            logger.error(f"Error adding entry to live queue state: {str(e)}")
+            return False
+
+    @classmethod
+    def _add_to_pipeline(cls, pipe, queue_id, entry, score=None):
+        entry_id = str(entry.id)
+        if score is None:
+            score = entry_score(entry.priority, entry.check_in_time)
+
+        pipe.zadd(cls._waiting_key(queue_id), {entry_id: score})
+        if entry.specialist_id:
+            specialist_id = str(entry.specialist_id)
+            pipe.zadd(f"{cls._specialist_prefix(queue_id)}{specialist_id}", {entry_id: score})
+            pipe.sadd(cls._specialists_key(queue_id), specialist_id)
+            pipe.hset(cls._preferences_key(queue_id), entry_id, specialist_id)
+
+    @classmethod
+    def remove(cls, queue_id, entry_id):
+        """
+        Remove an entry that is no longer waiting.
+
+        Args:
+            queue_id: ID of the service queue
+            entry_id: ID of the queue entry
+        """
+        client = cls.get_client()
+        if client is None:
+            return
+
+        try:
+            queue_id = str(queue_id)
+            entry_id = str(entry_id)
+            preferred = client.hget(cls._preferences_key(queue_id), entry_id)
+
+            pipe = client.pipeline()
+            pipe.zrem(cls._waiting_key(queue_id), entry_id)
+            if preferred:
+                pipe.zrem(
+                    f"{cls._specialist_prefix(queue_id)}{cls._decode(preferred)}",
+                    entry_id,
+                )
+                pipe.hdel(cls._preferences_key(queue_id), entry_id)
+            pipe.execute()
+
+        except Exception as e:
+            logger.error(f"Error removing entry from live queue state: {str(e)}")
+
+    @classmethod
+    def pop_next(cls, queue_id, specialist_id=None):
+        """
+        Atomically take the next waiting entry off the queue.
+
+        Entries that prefer the calling specialist are served first, matching
+        QueueManager.call_next.
+
+        Args:
+            queue_id: ID of the service queue
+            specialist_id: Optional ID of the calling specialist
+
+        Returns:
+            Tuple of (available, entry_id). available is False when the live
+            state cannot be used; entry_id is None when nobody is waiting.
+        """
+        client = cls.get_client()
+        if client is None:
+            return False, None
+
+        try:
+            queue_id = str(queue_id)
+            cls._ensure_loaded(client, queue_id)
+
+            if cls._call_next_script is None:
+                cls._call_next_script = client.register_script(CALL_NEXT_SCRIPT)
+
+            specialist_key = (
+                f"{cls._specialist_prefix(queue_id)}{specialist_id}" if specialist_id else ""
+            )
+            entry_id = cls._call_next_script(
+                keys=[
+                    cls._waiting_key(queue_id),
+                    specialist_key,
+                    cls._preferences_key(queue_id),
+                ],
+                args=[cls._specialist_prefix(queue_id)],
+                client=client,
+            )
+            return True, cls._decode(entry_id) if entry_id else None
+
+        except Exception as e:
+            logger.error(f"Error popping from live queue state: {str(e)}")
+            return False, None
+
+    # ------------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def get_rank(cls, queue_id, entry_id):
+        """
+        Get the 1-based position of a waiting entry.
+
+        Args:
+            queue_id: ID of the service queue
+            entry_id: ID of the queue entry
+
+        Returns:
+            Tuple of (available, position). position is None when the entry is
+            not waiting.
+        """
+        client = cls.get_client()
+        if client is None:
+            return False, None
+
+        try:
+            queue_id = str(queue_id)
+            cls._ensure_loaded(client, queue_id)
+
+            rank = client.zrank(cls._waiting_key(queue_id), str(entry_id))
+            return True, None if rank is None else rank + 1
+
+        except Exception as e:
+            logger.error(f"Error reading live queue position: {str(e)}")
+            return False, None
+
+    @classmethod
+    def get_size(cls, queue_id):
+        """
+        Get the number of waiting entries of a queue.
+
+        Args:
+            queue_id: ID of the service queue
+
+        Returns:
+            Number of waiting entries, or None if the live state is unavailable
+        """
+        client = cls.get_client()
+        if client is None:
+            return None
+
+        try:
+            queue_id = str(queue_id)
+            cls._ensure_loaded(client, queue_id)
+            return client.zcard(cls._waiting_key(queue_id))
+
+        except Exception as e:
+            logger.error(f"Error reading live queue size: {str(e)}")
+            return None
+
+    @classmethod
+    def get_order(cls, queue_id, client=None):
+        """
+        Get the waiting entry IDs of a queue in service order.
+
+        Args:
+            queue_id: ID of the service queue
+            client: Optional Redis client
+
+        Returns:
+            List of entry IDs, or None if the live state is unavailable
+        """
+        client = client or cls.get_client()
+        if client is None:
+            return None
+
+        try:
+            queue_id = str(queue_id)
+            cls._ensure_loaded(client, queue_id)
+            return [
+                cls._decode(entry_id)
+                for entry_id in client.zrange(cls._waiting_key(queue_id), 0, -1)
+            ]
+
+        except Exception as e:
+            logger.error(f"Error reading live queue order: {str(e)}")
+            return None
+
+    # ------------------------------------------------------------------------
+    # Rebuild, write-behind and consistency
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def rebuild(cls, queue_id, client=None):
+        """
+        Rebuild the live state of a queue from the database.
+
+        The previous state is replaced atomically in a single MULTI/EXEC.
+        Entries keep their database order within each priority, so positions
+        set by QueueOptimizer survive the rebuild.
+
+        Args:
+            queue_id: ID of the service queue
+            client: Optional Redis client
+
+        Returns:
+            Number of waiting entries loaded, or None on failure
+        """
+        client = client or cls.get_client()
+        if client is None:
+            return None
+
+        try:
+            from apps.queueapp.models import QueueEntry
+
+            queue_id = str(queue_id)
+            entries = list(
+                QueueEntry.objects.filter(queue_id=queue_id, status="waiting")
+                .order_by("-priority", "position", "check_in_time")
+                .only("id", "queue_id", "specialist_id", "priority", "position", "check_in_time")
+            )
+
+            specialist_prefix = cls._specialist_prefix(queue_id)
+            stale_keys = [
+                f"{specialist_prefix}{cls._decode(specialist_id)}"
+                for specialist_id in client.smembers(cls._specialists_key(queue_id))
+            ]
+
+            pipe = client.pipeline(transaction=True)
+            pipe.delete(
+                cls._waiting_key(queue_id),
+                cls._preferences_key(queue_id),
+                cls._specialists_key(queue_id),
+                *stale_keys,
+            )
+            for entry, score in ordered_scores(entries):
+                cls._add_to_pipeline(pipe, queue_id, entry, score)
+            pipe.set(cls._ready_key(queue_id), 1, ex=cls.READY_TTL)
+            pipe.execute()
+
+            return len(entries)
+
+        except Exception as e:
+            logger.error(f"Error rebuilding live queue state: {str(e)}")
+            return None
+
+    @classmethod
+    def schedule_rebuild(cls, queue_id):
+        """
+        Rebuild the live state of a queue once the current transaction commits.
+
+        Used after the database order was changed behind the live state, such
+        as by QueueOptimizer.
+
+        Args:
+            queue_id: ID of the service queue
+        """
+        transaction.on_commit(lambda: cls.rebuild(queue_id))
+
+    @classmethod
+    def schedule_sync(cls, queue_id):
+        """
+        Schedule a write-behind of queue positions to the database.
+
+        Once the current transaction commits, the first call in a sync window
+        enqueues a task; a rolled back transaction schedules nothing.
+
+        Args:
+            queue_id: ID of the service queue
+        """
+        from apps.queueapp.tasks import sync_live_queue_positions
+
+        def schedule():
+            if cache.add(f"{cls.SYNC_PENDING_PREFIX}{queue_id}", True, cls.SYNC_PENDING_TTL):
+                sync_live_queue_positions.apply_async(
+                    args=[str(queue_id)], countdown=cls.SYNC_DELAY_SECONDS
+                )
+
+        transaction.on_commit(schedule)
+
+    @classmethod
+    def clear_sync_pending(cls, queue_id):
+        """Allow the next schedule_sync call to schedule a new write-behind."""
+        cache.delete(f"{cls.SYNC_PENDING_PREFIX}{queue_id}")
+
+    @classmethod
+    def sync_positions(cls, queue_id):
+        """
+        Write the live queue order back to the position column.
+
+        Only rows whose position changed are written, with one bulk_update.
+
+        Args:
+            queue_id: ID of the service queue
+
+        Returns:
+            Number of rows updated, or None if the live state is unavailable
+        """
+        order = cls.get_order(queue_id)
+        if order is None:
+            return None
+
+        from apps.queueapp.models import QueueEntry
+
+        positions = {entry_id: index for index, entry_id in enumerate(order, 1)}
+
+        with transaction.atomic():
+            current = QueueEntry.objects.filter(
+                queue_id=queue_id, status="waiting", id__in=list(positions)
+            ).values_list("id", "position")
+
+            changed = [
+                QueueEntry(id=entry_id, position=positions[str(entry_id)])
+                for entry_id, position in current
+                if positions[str(entry_id)] != position
+            ]
+            if changed:
+                QueueEntry.objects.bulk_update(changed, ["position"])
+
+        return len(changed)
+
+    @classmethod
+    def check_consistency(cls, queue_id, repair=True):
+        """
+        Compare the live state of a queue against the database.
+
+        Every waiting entry must be live and scored in the band of its
+        priority. The order within a band is owned by the live state and
+        written back by sync_positions, so it is not compared.
+
+        Args:
+            queue_id: ID of the service queue
+            repair: Whether to rebuild the live state when they diverge
+
+        Returns:
+            Dict with the entries missing from, unknown to and misplaced in
+            the live state, and whether a rebuild was done
+        """
+        client = cls.get_client()
+        if client is None:
+            return {"success": False, "message": "Live queue state unavailable"}
+
+        from apps.queueapp.models import QueueEntry
+
+        try:
+            queue_id = str(queue_id)
+            cls._ensure_loaded(client, queue_id)
+            live_bands = {
+                cls._decode(entry_id): int(score) // PRIORITY_SCALE
+                for entry_id, score in client.zrange(
+                    cls._waiting_key(queue_id), 0, -1, withscores=True
+                )
+            }
+            db_bands = {
+                str(entry_id): MAX_PRIORITY - int(priority)
+                for entry_id, priority in QueueEntry.objects.filter(
+                    queue_id=queue_id, status="waiting"
+                ).values_list("id", "priority")
+            }
+
+            missing = sorted(set(db_bands) - set(live_bands))
+            unknown = sorted(set(live_bands) - set(db_bands))
+            misplaced = sorted(
+                entry_id
+                for entry_id, band in db_bands.items()
+                if entry_id in live_bands and live_bands[entry_id] != band
+            )
+            consistent = not (missing or unknown or misplaced)
+
+            rebuilt = False
+            if not consistent and repair:
+                logger.warning(
+                    f"Live queue state diverged for queue {queue_id}: "
+                    f"{len(missing)} missing, {len(unknown)} unknown, "
+                    f"{len(misplaced)} misplaced"
+                )
+                rebuilt = cls.rebuild(queue_id, client=client) is not None
+
+            return {
+                "success": True,
+                "queue_id": queue_id,
+                "consistent": consistent,
+                "missing": missing,
+                "unknown": unknown,
+                "misplaced": misplaced,
+                "rebuilt": rebuilt,
+            }
+
+        except Exception as e:
+            logger.error(f"Error checking live queue consistency: {str(e)}")
+            return {"success": False, "message": str(e)}
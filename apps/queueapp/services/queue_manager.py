@@ -26,6 +26,8 @@ from django.utils import timezone
 from apps.bookingapp.models import Appointment
 from apps.notificationsapp.services.notification_service import NotificationService
 from apps.queueapp.models import QueueEntry, ServiceQueue
+from apps.queueapp.services.live_queue_state import LiveQueueState
+from apps.queueapp.services.service_time_stats import ServiceTimeStats
 from apps.specialistsapp.models import Specialist
 
 logger = logging.getLogger(__name__)
@@ -216,6 +218,12 @@ class QueueManager:
                 # Update service queue statistics
                 cls._update_queue_statistics(service_queue.id)
 
+            # Register the entry in the live state and take its effective position
+            if LiveQueueState.add(entry):
+                live, live_position = LiveQueueState.get_rank(service_queue.id, entry.id)
+                if live and live_position is not None:
+                    position = live_position
+
             # Estimate wait time
             estimated_wait = cls.estimate_wait_time(entry.id)
 
@@ -286,6 +294,9 @@ class QueueManager:
                 entry.notes = f"{entry.notes}\nRemoved: {reason}"
                 entry.save()
 
+                # Drop the entry from the live state once the removal commits
+                transaction.on_commit(lambda: LiveQueueState.remove(entry.queue_id, entry_id))
+
                 # Notify customer if available
                 if entry.customer_id:
                     cls._notify_customer_removed(
@@ -326,6 +337,7 @@ class QueueManager:
         Returns:
             QueueActionResult with next customer details
         """
+        popped_entry = None
         try:
             # Check if specialist has any customers currently being served
             active_entries = QueueEntry.objects.filter(
@@ -362,23 +374,29 @@ class QueueManager:
 
             # Get the next entry in the queue based on priority and position
             with transaction.atomic():
-                # Lock the queue to prevent race conditions
-                service_queue = ServiceQueue.objects.select_for_update().get(
-                    id=queue_id
-                )
+                # The live state pops atomically, so no queue lock is needed
+                live, next_entry = cls._pop_live_entry(queue_id, specialist_id)
+                popped_entry = next_entry
 
-                # Find the next entry - first by priority, then by position
-                next_entries = QueueEntry.objects.filter(
-                    queue_id=queue_id, status="waiting"
-                ).order_by("-priority", "position")
-
-                # Filter by specialist preference if any entries have it
-                specialist_preferred = next_entries.filter(specialist_id=specialist_id)
-                if specialist_preferred.exists():
-                    next_entry = specialist_preferred.first()
-                elif next_entries.exists():
-                    next_entry = next_entries.first()
+                if live:
+                    service_queue = ServiceQueue.objects.get(id=queue_id)
                 else:
+                    # Lock the queue to prevent race conditions
+                    service_queue = ServiceQueue.objects.select_for_update().get(id=queue_id)
+
+                    # Find the next entry - first by priority, then by position
+                    next_entries = QueueEntry.objects.filter(
+                        queue_id=queue_id, status="waiting"
+                    ).order_by("-priority", "position")
+
+                    # Filter by specialist preference if any entries have it
+                    specialist_preferred = next_entries.filter(specialist_id=specialist_id)
+                    if specialist_preferred.exists():
+                        next_entry = specialist_preferred.first()
+                    else:
+                        next_entry = next_entries.first()
+
+                if next_entry is None:
                     return QueueActionResult(
                         success=False,
                         message="No customers waiting in queue",
@@ -449,6 +467,8 @@ class QueueManager:
 
         except Exception as e:
             logger.error(f"Error calling next customer: {str(e)}")
+            if popped_entry is not None:
+                cls._restore_live_entry(popped_entry)
             return QueueActionResult(
                 success=False,
                 message=f"Error calling next customer: {str(e)}",
@@ -577,8 +597,20 @@ class QueueManager:
                     except Appointment.DoesNotExist:
                         pass
 
-                # Update queue statistics
-                cls._update_queue_statistics(entry.queue_id)
+                # Fold the service time into the streaming statistics
+                if entry.start_time:
+                    transaction.on_commit(
+                        lambda: ServiceTimeStats.record(
+                            (entry.end_time - entry.start_time).total_seconds() / 60,
+                            entry.queue_id,
+                            service_id=entry.queue.service_id,
+                            specialist_id=entry.specialist_id,
+                            when=entry.start_time,
+                        )
+                    )
+
+                # Update queue statistics once the service time is recorded
+                transaction.on_commit(lambda: cls._update_queue_statistics(entry.queue_id))
 
             # Calculate service duration
             service_duration = 0
@@ -648,6 +680,9 @@ class QueueManager:
                 entry.notes = f"{entry.notes}\nPriority changed: {old_priority} -> {new_priority.value}"
                 entry.save(update_fields=["notes"])
 
+                # Re-score the entry in the live state once the change commits
+                transaction.on_commit(lambda: LiveQueueState.add(entry))
+
                 # Update position in queue
                 cls._reorder_queue(entry.queue_id)
 
@@ -763,12 +798,19 @@ class QueueManager:
             Current position in queue or None if not in queue
         """
         try:
-            # Find the entry
-            try:
-                entry = QueueEntry.objects.get(id=entry_id)
-            except QueueEntry.DoesNotExist:
+            # Resolve the queue and take the rank from the live state
+            queue_id = (
+                QueueEntry.objects.filter(id=entry_id).values_list("queue_id", flat=True).first()
+            )
+            if queue_id is None:
                 return None
 
+            live, position = LiveQueueState.get_rank(queue_id, entry_id)
+            if live:
+                return position
+
+            entry = QueueEntry.objects.get(id=entry_id)
+
             # Only return position if status is waiting
             if entry.status != "waiting":
                 return None
@@ -994,6 +1036,17 @@ class QueueManager:
             # Get the queue
             service_queue = ServiceQueue.objects.get(id=queue_id)
 
+            # The streaming statistics already hold a smoothed service time
+            stats = ServiceTimeStats.get(queue_id=queue_id)
+            if stats and stats["count"] >= ServiceTimeStats.MIN_SAMPLES:
+                avg_time = round(stats["mean"])
+                if service_queue.current_wait_time != avg_time:
+                    service_queue.current_wait_time = avg_time
+                    service_queue.save(update_fields=["current_wait_time"])
+
+                cache.delete(f"{cls.CACHE_PREFIX}status:{queue_id}")
+                return
+
             # Get recently completed entries (last 24 hours)
             recent_entries = QueueEntry.objects.filter(
                 queue_id=queue_id,
@@ -1036,6 +1089,12 @@ class QueueManager:
     def _reorder_queue(cls, queue_id: str) -> None:
         """Reorder queue entries based on priority and check-in time."""
         try:
+            # With live state the order is already current; positions are
+            # written back to the database asynchronously
+            if LiveQueueState.get_client() is not None:
+                LiveQueueState.schedule_sync(queue_id)
+                return
+
             # Get waiting entries ordered by priority (desc) and check-in time (asc)
             entries = QueueEntry.objects.filter(
                 queue_id=queue_id, status="waiting"
@@ -1052,6 +1111,46 @@ class QueueManager:
         except Exception as e:
             logger.error(f"Error reordering queue: {str(e)}")
 
+    @classmethod
+    def _pop_live_entry(cls, queue_id: str, specialist_id: str):
+        """
+        Pop the next waiting entry from the live queue state.
+
+        Entries popped from the live state that are no longer waiting in the
+        database are skipped.
+
+        Args:
+            queue_id: ID of the service queue
+            specialist_id: ID of the calling specialist
+
+        Returns:
+            Tuple of (live, entry). live is False when the live state is
+            unavailable; entry is None when nobody is waiting.
+        """
+        while True:
+            live, entry_id = LiveQueueState.pop_next(queue_id, specialist_id)
+            if not live or entry_id is None:
+                return live, None
+
+            entry = (
+                QueueEntry.objects.select_for_update()
+                .filter(id=entry_id, queue_id=queue_id, status="waiting")
+                .first()
+            )
+            if entry:
+                return True, entry
+
+            logger.warning(f"Skipping stale live queue entry {entry_id}")
+
+    @staticmethod
+    def _restore_live_entry(entry) -> None:
+        """Put a popped entry back into the live state if it is still waiting."""
+        try:
+            if QueueEntry.objects.filter(id=entry.id, status="waiting").exists():
+                LiveQueueState.add(entry)
+        except Exception as e:
+            logger.error(f"Error restoring live queue entry: {str(e)}")
+
     @staticmethod
     def _count_by_entry_type(entries: QuerySet) -> Dict[str, int]:
         """Count entries by entry type."""
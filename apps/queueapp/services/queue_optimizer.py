@@ -23,6 +23,7 @@ from django.db import transaction
 from django.utils import timezone
 
 from apps.queueapp.models import QueueEntry, ServiceQueue
+from apps.queueapp.services.live_queue_state import LiveQueueState
 from apps.specialistsapp.models import Specialist
 
 logger = logging.getLogger(__name__)
@@ -238,6 +239,10 @@ class QueueOptimizer:
                             }
                         )
 
+                # Carry the new priorities and order over to the live state
+                if entries_modified:
+                    LiveQueueState.schedule_rebuild(queue_id)
+
             # Return optimization results
             return {
                 "success": True,
@@ -430,6 +435,11 @@ class QueueOptimizer:
                                 }
                             )
 
+                # Move the entries to their new specialists in the live state
+                if reassignments:
+                    for queue, _ in active_queues:
+                        LiveQueueState.schedule_rebuild(queue.id)
+
             return {
                 "success": True,
                 "message": f"Balanced queues with {len(reassignments)} specialist reassignments",
@@ -556,6 +566,11 @@ class QueueOptimizer:
                             entries_modified += 1
                         position += 1
 
+                # Carry the new priorities and order over to the live state
+                if entries_modified:
+                    for queue in active_queues:
+                        LiveQueueState.schedule_rebuild(queue.id)
+
             return {
                 "success": True,
                 "message": f"Optimized queues with {entries_modified} modifications for appointments",
@@ -7,6 +7,7 @@ from django.utils import timezone
 
 from apps.notificationsapp.services.notification_service import NotificationService
 from apps.queueapp.models import Queue, QueueTicket
+from apps.queueapp.services.service_time_stats import ServiceTimeStats
 
 logger = logging.getLogger(__name__)
 
@@ -61,98 +62,16 @@ class QueueService:
         - Day of week patterns
         """
         try:
-            queue = Queue.objects.get(id=queue_id)
-
-            # Get average service time for recently served tickets
-            recent_tickets = QueueTicket.objects.filter(
-                queue=queue,
-                status="served",
-                complete_time__isnull=False,
-                serve_time__isnull=False,
-            ).order_by("-complete_time")[:20]
-
-            if recent_tickets:
-                # Calculate average service duration in minutes
-                avg_service_time = 0
-                count = 0
-
-                for ticket in recent_tickets:
-                    if ticket.serve_time and ticket.complete_time:
-                        service_duration = (
-                            ticket.complete_time - ticket.serve_time
-                        ).total_seconds() / 60
-                        if 0 < service_duration < 120:  # Ignore outliers
-                            avg_service_time += service_duration
-                            count += 1
-
-                if count > 0:
-                    avg_service_time /= count
-                else:
-                    avg_service_time = 10  # Default if no valid data
-            else:
-                avg_service_time = 10  # Default estimate
+            queue = Queue.objects.select_related("shop").get(id=queue_id)
+            context = QueueService.get_wait_time_context(queue)
 
             # Get number of tickets ahead
             tickets_ahead = QueueTicket.objects.filter(
                 queue=queue, position__lt=position, status__in=["waiting", "called"]
             ).count()
 
-            # Calculate base wait time
-            estimated_wait = tickets_ahead * avg_service_time
-
-            # Get number of active specialists to factor in parallel processing
-            from apps.specialistsapp.models import Specialist
-
-            active_specialists = Specialist.objects.filter(
-                employee__shop=queue.shop, employee__is_active=True
-            ).count()
-
-            # Adjust for multiple specialists
-            if active_specialists > 1:
-                # Each specialist can handle customers in parallel
-                # But there's diminishing returns (not linear scaling)
-                parallelism_factor = 0.7 + (
-                    0.3 / active_specialists
-                )  # Between 0.7 and 1.0
-                estimated_wait = estimated_wait / (
-                    active_specialists * parallelism_factor
-                )
-
-            # Factor in time of day - certain times might be busier
-            now = timezone.now()
-            hour = now.hour
-
-            # Get historical efficiency for this hour
-            hour_efficiency = (
-                QueueTicket.objects.filter(
-                    queue=queue, status="served", serve_time__hour=hour
-                ).aggregate(avg_wait=Avg("actual_wait_time"))["avg_wait"]
-                or avg_service_time
-            )
-
-            hour_factor = hour_efficiency / avg_service_time
-            hour_factor = max(0.8, min(1.2, hour_factor))  # Limit impact to ±20%
-
-            estimated_wait *= hour_factor
-
-            # Factor in day of week patterns
-            day_of_week = now.weekday()
-
-            # Get historical efficiency for this day
-            day_efficiency = (
-                QueueTicket.objects.filter(
-                    queue=queue, status="served", join_time__week_day=day_of_week
-                ).aggregate(avg_wait=Avg("actual_wait_time"))["avg_wait"]
-                or avg_service_time
-            )
-
-            day_factor = day_efficiency / avg_service_time
-            day_factor = max(0.9, min(1.1, day_factor))  # Limit impact to ±10%
-
-            estimated_wait *= day_factor
-
             # Check service types in the queue for more accurate prediction
-            service_factor = 1.0
+            avg_duration = None
             tickets_with_service = QueueTicket.objects.filter(
                 queue=queue,
                 position__lt=position,
@@ -172,20 +91,7 @@ class QueueService:
                     or 30
                 )
 
-                # Compare with our general average
-                if avg_duration > 0:
-                    service_factor = avg_duration / 30  # Assuming 30 min is baseline
-                    service_factor = max(0.8, min(1.2, service_factor))  # Limit impact
-
-                    estimated_wait *= service_factor
-
-            # Add base wait time (5 minutes) for check-in, etc.
-            estimated_wait += 5
-
-            # Round to nearest whole minute and ensure reasonable bounds
-            estimated_wait = max(1, min(120, round(estimated_wait)))
-
-            return estimated_wait
+            return QueueService.compute_wait_time(context, tickets_ahead, avg_duration)
 
         except Queue.DoesNotExist:
             return 0  # Return 0 if queue doesn't exist
@@ -193,6 +99,131 @@ class QueueService:
             logger.error(f"Error estimating wait time: {str(e)}")
             return 15  # Default fallback
 
+    @staticmethod
+    def get_wait_time_context(queue):
+        """
+        Load the queue-level inputs of the wait time model.
+
+        These inputs are the same for every ticket of a queue, so callers that
+        estimate many tickets at once should load them a single time.
+
+        Returns:
+            Dict with avg_service_time, active_specialists, hour_efficiency
+            and day_efficiency
+        """
+        avg_service_time = 10  # Default estimate
+        now = timezone.now()
+
+        # Use the streaming service time statistics when they have enough data
+        stats = ServiceTimeStats.get(queue_id=queue.id)
+        if stats and stats["count"] >= ServiceTimeStats.MIN_SAMPLES:
+            avg_service_time = stats["mean"]
+
+            # The hour-of-week record already carries the day of week pattern,
+            # so it sets the hour factor and the day factor stays neutral
+            hour_stats = ServiceTimeStats.get(
+                queue_id=queue.id, hour_of_week=ServiceTimeStats.hour_of_week(now)
+            )
+            if hour_stats and hour_stats["count"] >= ServiceTimeStats.MIN_SAMPLES:
+                hour_efficiency = hour_stats["mean"]
+            else:
+                hour_efficiency = avg_service_time
+            day_efficiency = avg_service_time
+        else:
+            # Get average service time for recently served tickets
+            recent_tickets = QueueTicket.objects.filter(
+                queue=queue,
+                status="served",
+                complete_time__isnull=False,
+                serve_time__isnull=False,
+            ).order_by("-complete_time")[:20]
+
+            durations = [
+                (ticket.complete_time - ticket.serve_time).total_seconds() / 60
+                for ticket in recent_tickets
+                if ticket.serve_time and ticket.complete_time
+            ]
+            durations = [d for d in durations if 0 < d < 120]  # Ignore outliers
+            if durations:
+                avg_service_time = sum(durations) / len(durations)
+
+            # Get historical efficiency for this hour and day of week
+            hour_efficiency = (
+                QueueTicket.objects.filter(
+                    queue=queue, status="served", serve_time__hour=now.hour
+                ).aggregate(avg_wait=Avg("actual_wait_time"))["avg_wait"]
+                or avg_service_time
+            )
+            day_efficiency = (
+                QueueTicket.objects.filter(
+                    queue=queue, status="served", join_time__week_day=now.weekday()
+                ).aggregate(avg_wait=Avg("actual_wait_time"))["avg_wait"]
+                or avg_service_time
+            )
+
+        # Get number of active specialists to factor in parallel processing
+        from apps.specialistsapp.models import Specialist
+
+        active_specialists = Specialist.objects.filter(
+            employee__shop=queue.shop, employee__is_active=True
+        ).count()
+
+        return {
+            "avg_service_time": avg_service_time,
+            "active_specialists": active_specialists,
+            "hour_efficiency": hour_efficiency,
+            "day_efficiency": day_efficiency,
+        }
+
+    @staticmethod
+    def compute_wait_time(context, tickets_ahead, avg_duration=None):
+        """
+        Compute a wait time estimate from preloaded queue inputs.
+
+        Args:
+            context: Queue-level inputs from get_wait_time_context
+            tickets_ahead: Number of waiting/called tickets ahead
+            avg_duration: Average duration of the services waiting ahead, or
+                None if no ticket ahead has a service
+
+        Returns:
+            Estimated wait time in minutes
+        """
+        avg_service_time = context["avg_service_time"]
+
+        # Calculate base wait time
+        estimated_wait = tickets_ahead * avg_service_time
+
+        # Adjust for multiple specialists
+        active_specialists = context["active_specialists"]
+        if active_specialists > 1:
+            # Each specialist can handle customers in parallel
+            # But there's diminishing returns (not linear scaling)
+            parallelism_factor = 0.7 + (0.3 / active_specialists)  # Between 0.7 and 1.0
+            estimated_wait = estimated_wait / (active_specialists * parallelism_factor)
+
+        # Factor in time of day - certain times might be busier
+        hour_factor = context["hour_efficiency"] / avg_service_time
+        hour_factor = max(0.8, min(1.2, hour_factor))  # Limit impact to ±20%
+        estimated_wait *= hour_factor
+
+        # Factor in day of week patterns
+        day_factor = context["day_efficiency"] / avg_service_time
+        day_factor = max(0.9, min(1.1, day_factor))  # Limit impact to ±10%
+        estimated_wait *= day_factor
+
+        # Compare the service mix ahead with our general average
+        if avg_duration is not None and avg_duration > 0:
+            service_factor = avg_duration / 30  # Assuming 30 min is baseline
+            service_factor = max(0.8, min(1.2, service_factor))  # Limit impact
+            estimated_wait *= service_factor
+
+        # Add base wait time (5 minutes) for check-in, etc.
+        estimated_wait += 5
+
+        # Round to nearest whole minute and ensure reasonable bounds
+        return max(1, min(120, round(estimated_wait)))
+
     @staticmethod
     @transaction.atomic
     def join_queue(
@@ -483,8 +514,8 @@ class QueueService:
             ticket.complete_time = timezone.now()
             ticket.save()
 
-            # Update queue - recalculate wait times for remaining tickets
-            QueueService.recalculate_wait_times(ticket.queue_id)
+            # Fold the service time into the streaming statistics
+            transaction.on_commit(lambda: ServiceTimeStats.record_ticket(ticket))
 
             # Send feedback request notification
             NotificationService.send_notification(
@@ -511,31 +542,16 @@ class QueueService:
             return {"error": f"An error occurred: {str(e)}"}
 
     @staticmethod
-    @transaction.atomic
     def recalculate_wait_times(queue_id):
-        """Recalculate wait times for all waiting tickets in queue"""
-        try:
-            queue = Queue.objects.get(id=queue_id)
-
-            waiting_tickets = QueueTicket.objects.filter(
-                queue=queue, status="waiting"
-            ).order_by("position")
-
-            for ticket in waiting_tickets:
-                estimated_wait = QueueService.estimate_wait_time(
-                    queue_id, ticket.position
-                )
-                ticket.estimated_wait_time = estimated_wait
-                ticket.save(update_fields=["estimated_wait_time"])
+        """
+        Recalculate wait times for all waiting tickets in queue.
 
-            return True
+        Runs the one-pass recompute immediately; signal handlers should use
+        QueueRecomputeService.mark_dirty to coalesce bursts of updates instead.
+        """
+        from apps.queueapp.services.recompute_service import QueueRecomputeService
 
-        except Queue.DoesNotExist:
-            logger.error(f"Queue not found for recalculation: {queue_id}")
-            return False
-        except Exception as e:
-            logger.error(f"Error recalculating wait times: {str(e)}")
-            return False
+        return QueueRecomputeService.recompute(queue_id)
 
     @staticmethod
     @transaction.atomic
@@ -561,9 +577,6 @@ class QueueService:
                 queue_id=queue_id, position__gt=position, status="waiting"
             ).update(position=F("position") - 1)
 
-            # Recalculate wait times
-            QueueService.recalculate_wait_times(queue_id)
-
             # Send notification
             NotificationService.send_notification(
                 user_id=ticket.customer.id,
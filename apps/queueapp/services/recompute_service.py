@@ -0,0 +1,176 @@
+"""
+Coalesced wait time recompute pipeline for queues.
+
+Ticket saves only mark their queue dirty. The first mark in a debounce window
+schedules a single recompute task per queue; later marks in the same window
+are absorbed. The recompute reads every active ticket of the queue with one
+snapshot query, derives all ETAs from it in a single pass, persists them with
+bulk_update (which fires no post_save signals) and publishes the tickets to
+QueueBroadcastService, which sends only what changed.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.queueapp.models import Queue, QueueTicket
+from apps.queueapp.services.broadcast_service import QueueBroadcastService
+from apps.queueapp.services.queue_service import QueueService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ["waiting", "called"]
+
+
+class QueueRecomputeService:
+    """Debounced, single-pass recomputation of queue positions and ETAs"""
+
+    PENDING_KEY_PREFIX = "queue_recompute:pending:"
+    DEBOUNCE_SECONDS = getattr(settings, "QUEUE_RECOMPUTE_DEBOUNCE_SECONDS", 2)
+    # Pending marks expire on their own if the scheduled task is lost
+    PENDING_TTL = 60
+
+    @classmethod
+    def mark_dirty(cls, queue_id):
+        """
+        Mark a queue as needing a recompute.
+
+        Once the current transaction commits, the first mark in a debounce
+        window schedules a task; later marks are absorbed. Marks made in a
+        transaction that rolls back leave nothing behind.
+
+        Args:
+            queue_id: ID of the queue
+        """
+        from apps.queueapp.tasks import recompute_queue_wait_times
+
+        def schedule():
+            if cache.add(f"{cls.PENDING_KEY_PREFIX}{queue_id}", True, cls.PENDING_TTL):
+                recompute_queue_wait_times.apply_async(
+                    args=[str(queue_id)], countdown=cls.DEBOUNCE_SECONDS
+                )
+
+        transaction.on_commit(schedule)
+
+    @classmethod
+    def clear_pending(cls, queue_id):
+        """Allow the next mark_dirty call to schedule a new recompute."""
+        cache.delete(f"{cls.PENDING_KEY_PREFIX}{queue_id}")
+
+    @classmethod
+    def recompute(cls, queue_id, broadcast=True):
+        """
+        Recompute wait times for all waiting tickets of a queue in one pass.
+
+        Args:
+            queue_id: ID of the queue
+            broadcast: Whether to publish the recomputed tickets
+
+        Returns:
+            True on success, False otherwise
+        """
+        try:
+            with transaction.atomic():
+                queue = Queue.objects.select_related("shop").get(id=queue_id)
+                context = QueueService.get_wait_time_context(queue)
+
+                snapshot = list(
+                    QueueTicket.objects.filter(queue=queue, status__in=ACTIVE_STATUSES)
+                    .order_by("position")
+                    .values(
+                        "id",
+                        "ticket_number",
+                        "status",
+                        "position",
+                        "estimated_wait_time",
+                        "service_id",
+                        "service__duration",
+                    )
+                )
+
+                estimates = cls.compute_estimates(snapshot, context)
+
+                changed = [
+                    QueueTicket(id=row["id"], estimated_wait_time=estimates[row["id"]])
+                    for row in snapshot
+                    if row["id"] in estimates and estimates[row["id"]] != row["estimated_wait_time"]
+                ]
+                if changed:
+                    QueueTicket.objects.bulk_update(changed, ["estimated_wait_time"])
+
+                if broadcast:
+                    tickets = [
+                        {
+                            "id": str(row["id"]),
+                            "ticket_number": row["ticket_number"],
+                            "status": row["status"],
+                            "position": row["position"],
+                            "estimated_wait_time": estimates.get(
+                                row["id"], row["estimated_wait_time"]
+                            ),
+                        }
+                        for row in snapshot
+                    ]
+                    QueueBroadcastService.publish(queue_id, tickets)
+
+            return True
+
+        except Queue.DoesNotExist:
+            logger.error(f"Queue not found for recalculation: {queue_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Error recalculating wait times: {str(e)}")
+            return False
+
+    @staticmethod
+    def compute_estimates(snapshot, context):
+        """
+        Compute ETAs for the waiting tickets of a position-ordered snapshot.
+
+        Tickets are swept in position order while keeping running totals of the
+        active tickets and the distinct waiting services ahead, which matches
+        QueueService.estimate_wait_time without any per-ticket query.
+
+        Args:
+            snapshot: Active ticket rows ordered by position
+            context: Queue-level inputs from QueueService.get_wait_time_context
+
+        Returns:
+            Dict mapping ticket ID to estimated wait time for waiting tickets
+        """
+        estimates = {}
+        tickets_ahead = 0
+        service_durations = {}  # distinct waiting services ahead -> duration
+        has_service_ahead = False
+
+        index = 0
+        while index < len(snapshot):
+            # Tickets sharing a position do not count as being ahead of each other
+            position = snapshot[index]["position"]
+            group_end = index
+            while group_end < len(snapshot) and snapshot[group_end]["position"] == position:
+                group_end += 1
+            group = snapshot[index:group_end]
+
+            avg_duration = None
+            if has_service_ahead:
+                durations = [d for d in service_durations.values() if d is not None]
+                avg_duration = (sum(durations) / len(durations) if durations else 0) or 30
+
+            for row in group:
+                if row["status"] == "waiting":
+                    estimates[row["id"]] = QueueService.compute_wait_time(
+                        context, tickets_ahead, avg_duration
+                    )
+
+            for row in group:
+                tickets_ahead += 1
+                if row["status"] == "waiting" and row["service_id"] is not None:
+                    has_service_ahead = True
+                    service_durations[row["service_id"]] = row["service__duration"]
+
+            index = group_end
+
+        return estimates
@@ -0,0 +1,369 @@
+"""
+Streaming service time statistics for queue ETA estimation.
+
+Every served ticket updates a handful of statistics records once, when it is
+completed. The records are keyed by combinations of queue, service, specialist
+and hour-of-week, and hold an exponentially weighted mean and variance plus P²
+estimators for the median and 90th percentile. Reading the statistics is a
+constant-time hash lookup, so ETA estimation no longer re-scans recent tickets.
+
+Records live in Redis hashes when the default cache is django-redis, updated
+under WATCH/MULTI so concurrent completions do not lose observations. Other
+cache backends store them as plain cache entries.
+"""
+
+import json
+import logging
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from redis.exceptions import WatchError
+
+from utils.cache_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class P2Quantile:
+    """
+    P² single-quantile estimator (Jain & Chlamtac, 1985).
+
+    Tracks one quantile with five markers in constant space. The state is a
+    plain dict so it can be stored alongside the other statistics.
+    """
+
+    def __init__(self, p, state=None):
+        self.p = p
+        state = state or {}
+        self.heights = list(state.get("q", []))
+        self.positions = list(state.get("n", []))
+
+    def to_state(self):
+        return {"q": self.heights, "n": self.positions}
+
+    def add(self, value):
+        """Add an observation."""
+        heights = self.heights
+
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            if len(heights) == 5:
+                self.positions = [1, 2, 3, 4, 5]
+            return
+
+        positions = self.positions
+
+        # Find the cell the observation falls in, stretching the extremes
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        for index in range(cell + 1, 5):
+            positions[index] += 1
+
+        # Move the middle markers towards their desired positions
+        count = positions[4]
+        increments = (0, self.p / 2, self.p, (1 + self.p) / 2, 1)
+        for index in range(1, 4):
+            desired = 1 + (count - 1) * increments[index]
+            delta = desired - positions[index]
+
+            if (delta >= 1 and positions[index + 1] - positions[index] > 1) or (
+                delta <= -1 and positions[index - 1] - positions[index] < -1
+            ):
+                step = 1 if delta > 0 else -1
+                height = self._parabolic(index, step)
+                if not heights[index - 1] < height < heights[index + 1]:
+                    height = self._linear(index, step)
+                heights[index] = height
+                positions[index] += step
+
+    def _parabolic(self, index, step):
+        q, n = self.heights, self.positions
+        return q[index] + step / (n[index + 1] - n[index - 1]) * (
+            (n[index] - n[index - 1] + step) * (q[index + 1] - q[index]) / (n[index + 1] - n[index])
+            + (n[index + 1] - n[index] - step)
+            * (q[index] - q[index - 1])
+            / (n[index] - n[index - 1])
+        )
+
+    def _linear(self, index, step):
+        q, n = self.heights, self.positions
+        return q[index] + step * (q[index + step] - q[index]) / (n[index + step] - n[index])
+
+    def value(self):
+        """Get the current quantile estimate, or None without observations."""
+        if not self.heights:
+            return None
+        if not self.positions or self.positions[4] == 5:
+            # Nearest rank on the few observations seen so far
+            rank = max(0, math.ceil(self.p * len(self.heights)) - 1)
+            return self.heights[rank]
+        return self.heights[2]
+
+
+class ServiceTimeStats:
+    """Incrementally maintained service time statistics"""
+
+    KEY_PREFIX = "service_time_stats:"
+    # Weight of the newest observation in the exponentially weighted moments
+    ALPHA = getattr(settings, "SERVICE_TIME_EWMA_ALPHA", 0.1)
+    # Records of combinations that stop seeing traffic expire on their own
+    TTL = 60 * 60 * 24 * 30
+    # Service times outside this range (minutes) are treated as data errors
+    MIN_DURATION = 0
+    MAX_DURATION = 180
+    MAX_RETRIES = 5
+    # Minimum observations before the statistics replace a history scan
+    MIN_SAMPLES = 5
+
+    QUANTILES = {"p50": 0.5, "p90": 0.9}
+
+    # ------------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _key(cls, queue_id=None, service_id=None, specialist_id=None, hour_of_week=None):
+        parts = []
+        if queue_id:
+            parts.append(f"queue:{queue_id}")
+        if service_id:
+            parts.append(f"service:{service_id}")
+        if specialist_id:
+            parts.append(f"specialist:{specialist_id}")
+        if hour_of_week is not None:
+            parts.append(f"how:{hour_of_week}")
+        return f"{cls.KEY_PREFIX}{'|'.join(parts)}"
+
+    @classmethod
+    def _keys_for_observation(cls, queue_id, service_id, specialist_id, hour_of_week):
+        """Get the records an observation is folded into."""
+        keys = [
+            cls._key(queue_id=queue_id),
+            cls._key(queue_id=queue_id, hour_of_week=hour_of_week),
+        ]
+        if service_id:
+            keys.append(cls._key(service_id=service_id))
+        if specialist_id:
+            keys.append(cls._key(specialist_id=specialist_id))
+        return keys
+
+    @staticmethod
+    def hour_of_week(moment):
+        """Get the local hour of the week (0 = Monday 00:00) of a datetime."""
+        local = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+        return local.weekday() * 24 + local.hour
+
+    # ------------------------------------------------------------------------
+    # Record updates
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _update_record(cls, record, value):
+        """Fold one observation into a statistics record."""
+        record = dict(record or {})
+        count = int(record.get("count", 0))
+
+        if count == 0:
+            mean, variance = value, 0.0
+            minimum = maximum = value
+        else:
+            mean = float(record["mean"])
+            variance = float(record["var"])
+            # Plain running moments until the window fills, to avoid a cold
+            # start biased towards the first observations
+            alpha = max(cls.ALPHA, 1 / (count + 1))
+            diff = value - mean
+            increment = alpha * diff
+            mean += increment
+            variance = (1 - alpha) * (variance + diff * increment)
+            minimum = min(float(record["min"]), value)
+            maximum = max(float(record["max"]), value)
+
+        record.update(
+            {
+                "count": count + 1,
+                "mean": mean,
+                "var": variance,
+                "min": minimum,
+                "max": maximum,
+            }
+        )
+
+        for name, p in cls.QUANTILES.items():
+            state = record.get(name)
+            estimator = P2Quantile(p, json.loads(state) if state else None)
+            estimator.add(value)
+            record[name] = json.dumps(estimator.to_state())
+
+        return record
+
+    @staticmethod
+    def _decode_record(raw):
+        return {
+            (key.decode() if isinstance(key, bytes) else key): (
+                value.decode() if isinstance(value, bytes) else value
+            )
+            for key, value in raw.items()
+        }
+
+    @classmethod
+    def record(cls, duration_minutes, queue_id, service_id=None, specialist_id=None, when=None):
+        """
+        Record one observed service time.
+
+        Args:
+            duration_minutes: Service time in minutes
+            queue_id: ID of the queue the customer was served from
+            service_id: Optional ID of the service provided
+            specialist_id: Optional ID of the specialist who served
+            when: When the service started (defaults to now)
+
+        Returns:
+            True if the observation was recorded, False otherwise
+        """
+        if not cls.MIN_DURATION < duration_minutes < cls.MAX_DURATION:
+            return False
+
+        try:
+            keys = cls._keys_for_observation(
+                str(queue_id),
+                str(service_id) if service_id else None,
+                str(specialist_id) if specialist_id else None,
+                cls.hour_of_week(when or timezone.now()),
+            )
+
+            client = get_redis_client()
+            if client is None:
+                records = cache.get_many(keys)
+                cache.set_many(
+                    {key: cls._update_record(records.get(key), duration_minutes) for key in keys},
+                    cls.TTL,
+                )
+                return True
+
+            for _ in range(cls.MAX_RETRIES):
+                try:
+                    with client.pipeline() as pipe:
+                        pipe.watch(*keys)
+                        records = [cls._decode_record(pipe.hgetall(key)) for key in keys]
+
+                        pipe.multi()
+                        for key, record in zip(keys, records):
+                            pipe.hset(
+                                key,
+                                mapping=cls._update_record(record, duration_minutes),
+                            )
+                            pipe.expire(key, cls.TTL)
+                        pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+            logger.warning(f"Gave up recording service time for queue {queue_id}")
+            return False
+
+        except Exception as e:
+            logger.error(f"Error recording service time: {str(e)}")
+            return False
+
+    @classmethod
+    def record_ticket(cls, ticket):
+        """
+        Record the service time of a served queue ticket.
+
+        Args:
+            ticket: QueueTicket with serve_time and complete_time set
+
+        Returns:
+            True if the observation was recorded, False otherwise
+        """
+        if not ticket.serve_time or not ticket.complete_time:
+            return False
+
+        return cls.record(
+            (ticket.complete_time - ticket.serve_time).total_seconds() / 60,
+            ticket.queue_id,
+            service_id=ticket.service_id,
+            specialist_id=ticket.specialist_id,
+            when=ticket.serve_time,
+        )
+
+    # ------------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def get(
+        cls,
+        queue_id=None,
+        service_id=None,
+        specialist_id=None,
+        hour_of_week=None,
+        z=1.96,
+    ):
+        """
+        Get the service time statistics of a combination of dimensions.
+
+        Only the combinations recorded by record() are available: the queue,
+        the queue per hour-of-week, the service and the specialist.
+
+        Args:
+            queue_id: Optional queue ID
+            service_id: Optional service ID
+            specialist_id: Optional specialist ID
+            hour_of_week: Optional hour of the week (0 = Monday 00:00)
+            z: Normal quantile used for the confidence interval
+
+        Returns:
+            Dict with count, mean, std_dev, min, max, median, p90 and
+            confidence_interval, or None when nothing has been recorded
+        """
+        try:
+            key = cls._key(queue_id, service_id, specialist_id, hour_of_week)
+
+            client = get_redis_client()
+            if client is None:
+                record = cache.get(key)
+            else:
+                record = cls._decode_record(client.hgetall(key))
+
+            if not record or not int(record.get("count", 0)):
+                return None
+
+            mean = float(record["mean"])
+            std_dev = math.sqrt(max(0.0, float(record["var"])))
+            quantiles = {
+                name: P2Quantile(p, json.loads(record[name])).value()
+                for name, p in cls.QUANTILES.items()
+                if record.get(name)
+            }
+
+            return {
+                "count": int(record["count"]),
+                "mean": mean,
+                "std_dev": std_dev,
+                "min": float(record["min"]),
+                "max": float(record["max"]),
+                "median": quantiles.get("p50", mean),
+                "p90": quantiles.get("p90", mean),
+                "confidence_interval": (
+                    max(0.0, mean - z * std_dev),
+                    mean + z * std_dev,
+                ),
+            }
+
+        except Exception as e:
+            logger.error(f"Error reading service time statistics: {str(e)}")
+            return None
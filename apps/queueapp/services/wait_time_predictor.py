@@ -1,8 +1,10 @@
 import logging
-from collections import defaultdict
-from datetime import timedelta
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 
 import numpy as np
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Avg, Count, ExpressionWrapper, F, fields
 from django.utils import timezone
 
@@ -10,6 +12,9 @@ from apps.queueapp.models import QueueTicket
 
 logger = logging.getLogger(__name__)
 
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
 
 class WaitTimePredictor:
     """
@@ -17,6 +22,10 @@ class WaitTimePredictor:
     and machine learning techniques.
     """
 
+    # Bump when the model layout changes so stale cached models are ignored
+    MODEL_VERSION = 1
+    MODEL_CACHE_TTL = getattr(settings, "WAIT_TIME_MODEL_CACHE_TTL", 60 * 60 * 24)
+
     @staticmethod
     def predict_wait_time(queue_id, position, service_id=None, specialist_id=None):
         """
@@ -231,8 +240,9 @@ class WaitTimePredictor:
         Train a more sophisticated wait time prediction model
         using historical data for a specific shop.
 
-        This builds a predictive model that can be saved and used
-        for future predictions, improving accuracy over time.
+        The ticket history is read once into NumPy arrays and the coefficient
+        tables are computed with grouped reductions. The trained model is
+        stored in a versioned cache so predict_with_model can reuse it.
         """
         try:
             # Get all completed tickets for this shop
@@ -242,102 +252,77 @@ class WaitTimePredictor:
             end_date = timezone.now()
             start_date = end_date - timedelta(days=90)
 
-            completed_tickets = QueueTicket.objects.filter(
-                queue__shop_id=shop_id,
-                status="served",
-                join_time__gte=start_date,
-                join_time__lte=end_date,
-                actual_wait_time__isnull=False,
-            ).select_related("queue", "service", "specialist")
+            rows = list(
+                QueueTicket.objects.filter(
+                    queue__shop_id=shop_id,
+                    status="served",
+                    join_time__gte=start_date,
+                    join_time__lte=end_date,
+                    actual_wait_time__isnull=False,
+                ).values_list(
+                    "queue_id",
+                    "service_id",
+                    "specialist_id",
+                    "join_time",
+                    "actual_wait_time",
+                )
+            )
 
-            if completed_tickets.count() < 100:
+            if len(rows) < 100:
                 return {
                     "success": False,
                     "message": "Insufficient data for model training. Need at least 100 completed tickets.",
-                    "data_points": completed_tickets.count(),
+                    "data_points": len(rows),
                 }
 
-            # Prepare features and target
-            data = []
-            targets = []
-
-            for ticket in completed_tickets:
-                # Extract features
-                features = {
-                    "hour": ticket.join_time.hour,
-                    "day_of_week": ticket.join_time.weekday(),
-                    "position": ticket.position,
-                    "queue_id": str(ticket.queue_id),
-                    "service_id": str(ticket.service_id) if ticket.service else "none",
-                    "specialist_id": (
-                        str(ticket.specialist_id) if ticket.specialist else "none"
-                    ),
-                    "ticket_count": QueueTicket.objects.filter(
-                        queue=ticket.queue,
-                        status__in=["waiting", "called", "serving"],
-                        join_time__lt=ticket.join_time,
-                        join_time__gte=ticket.join_time - timedelta(hours=1),
-                    ).count(),
-                }
-                data.append(features)
-                targets.append(ticket.actual_wait_time)
+            queue_ids, service_ids, specialist_ids, join_times, waits = zip(*rows)
+            targets = np.array(waits, dtype=np.float64)
+            join_micros = WaitTimePredictor._to_epoch_micros(join_times)
+
+            # Hour and weekday of the join time (UTC, like the stored values)
+            epoch_seconds = join_micros // 1_000_000
+            hours = (epoch_seconds // 3600) % 24
+            days_of_week = (epoch_seconds // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+
+            # Queue depth when each ticket joined: active tickets of the same
+            # queue that joined within the preceding hour
+            active_rows = list(
+                QueueTicket.objects.filter(
+                    queue__shop_id=shop_id,
+                    status__in=["waiting", "called", "serving"],
+                    join_time__gte=start_date - timedelta(hours=1),
+                    join_time__lte=end_date,
+                ).values_list("queue_id", "join_time")
+            )
+            active_queue_ids, active_join_times = zip(*active_rows) if active_rows else ((), ())
+            ticket_counts = WaitTimePredictor._queue_depths(
+                queue_ids,
+                join_micros,
+                active_queue_ids,
+                WaitTimePredictor._to_epoch_micros(active_join_times),
+                window_micros=3600 * 1_000_000,
+            )
 
             # Build a simple model (linear regression for demo)
             # In a real implementation, this would use more sophisticated ML
             # like RandomForest, XGBoost, etc.
 
-            # Calculate coefficients for different factors
-            hour_coefficients = defaultdict(list)
-            day_coefficients = defaultdict(list)
-            service_coefficients = defaultdict(list)
-            specialist_coefficients = defaultdict(list)
-
-            for features, target in zip(data, targets):
-                hour_coefficients[features["hour"]].append(target)
-                day_coefficients[features["day_of_week"]].append(target)
-                service_coefficients[features["service_id"]].append(target)
-                specialist_coefficients[features["specialist_id"]].append(target)
-
-            # Calculate average wait time by feature
-            hour_factors = {
-                hour: np.mean(waits)
-                for hour, waits in hour_coefficients.items()
-                if len(waits) >= 5
-            }
-
-            day_factors = {
-                day: np.mean(waits)
-                for day, waits in day_coefficients.items()
-                if len(waits) >= 5
-            }
-
-            service_factors = {
-                service: np.mean(waits)
-                for service, waits in service_coefficients.items()
-                if len(waits) >= 5
-            }
-
-            specialist_factors = {
-                specialist: np.mean(waits)
-                for specialist, waits in specialist_coefficients.items()
-                if len(waits) >= 5
-            }
-
             # Calculate global average
-            global_avg = np.mean(targets)
-
-            # Normalize factors
-            for hour in hour_factors:
-                hour_factors[hour] /= global_avg
-
-            for day in day_factors:
-                day_factors[day] /= global_avg
-
-            for service in service_factors:
-                service_factors[service] /= global_avg
-
-            for specialist in specialist_factors:
-                specialist_factors[specialist] /= global_avg
+            global_avg = float(targets.mean())
+
+            # Average wait time by feature, normalized by the global average
+            hour_factors = WaitTimePredictor._group_factors(hours, targets, global_avg)
+            day_factors = WaitTimePredictor._group_factors(days_of_week, targets, global_avg)
+            service_factors = WaitTimePredictor._group_factors(
+                [str(value) if value else "none" for value in service_ids],
+                targets,
+                global_avg,
+            )
+            specialist_factors = WaitTimePredictor._group_factors(
+                [str(value) if value else "none" for value in specialist_ids],
+                targets,
+                global_avg,
+            )
 
             # Build model (as a dict of coefficients)
             model = {
@@ -346,16 +331,21 @@ class WaitTimePredictor:
                 "day_factors": day_factors,
                 "service_factors": service_factors,
                 "specialist_factors": specialist_factors,
+                "avg_ticket_count": float(ticket_counts.mean()),
                 "updated_at": timezone.now().isoformat(),
                 "data_points": len(targets),
             }
 
-            # In a real implementation, we'd save this model to a database
-            # or a file for future use
+            cache.set(
+                WaitTimePredictor._model_cache_key(shop_id),
+                model,
+                WaitTimePredictor.MODEL_CACHE_TTL,
+            )
 
             return {
                 "success": True,
                 "message": f"Model trained successfully with {len(targets)} data points",
+                "model": model,
                 "model_summary": {
                     "global_avg_wait": round(global_avg, 2),
                     "hour_factor_range": [
@@ -374,6 +364,87 @@ class WaitTimePredictor:
             logger.error(f"Error training wait time model: {str(e)}")
             return {"success": False, "message": f"Error training model: {str(e)}"}
 
+    @staticmethod
+    def _model_cache_key(shop_id):
+        """Get the cache key of the trained model of a shop."""
+        return f"wait_time_model:v{WaitTimePredictor.MODEL_VERSION}:{shop_id}"
+
+    @staticmethod
+    def _to_epoch_micros(datetimes):
+        """Convert aware datetimes to an array of microseconds since the epoch."""
+        return np.array(
+            [(value - EPOCH) // ONE_MICROSECOND for value in datetimes],
+            dtype=np.int64,
+        )
+
+    @staticmethod
+    def _queue_depths(queue_ids, join_micros, active_queue_ids, active_micros, window_micros):
+        """
+        Count, for each ticket, the active tickets of the same queue that
+        joined within the window before it.
+
+        Queue and time are packed into one sortable key so a single pair of
+        searchsorted calls answers every ticket.
+
+        Args:
+            queue_ids: Queue ID of each ticket
+            join_micros: Join time of each ticket in epoch microseconds
+            active_queue_ids: Queue ID of each active ticket
+            active_micros: Join time of each active ticket in epoch microseconds
+            window_micros: Window length in microseconds
+
+        Returns:
+            Array of counts aligned with the tickets
+        """
+        if len(active_micros) == 0:
+            return np.zeros(len(join_micros), dtype=np.int64)
+
+        # Map queue IDs to dense indexes shared by both arrays
+        queue_index = {}
+        ticket_queues = np.array(
+            [queue_index.setdefault(value, len(queue_index)) for value in queue_ids],
+            dtype=np.int64,
+        )
+        active_queues = np.array(
+            [queue_index.setdefault(value, len(queue_index)) for value in active_queue_ids],
+            dtype=np.int64,
+        )
+
+        # Offset times so the packed key stays within int64
+        origin = min(join_micros.min(), active_micros.min()) - window_micros
+        stride = max(join_micros.max(), active_micros.max()) - origin + 1
+
+        active_keys = np.sort(active_queues * stride + (active_micros - origin))
+        ticket_keys = ticket_queues * stride + (join_micros - origin)
+
+        upper = np.searchsorted(active_keys, ticket_keys, side="left")
+        lower = np.searchsorted(active_keys, ticket_keys - window_micros, side="left")
+        return upper - lower
+
+    @staticmethod
+    def _group_factors(keys, targets, global_avg, min_count=5):
+        """
+        Average the targets per key and normalize by the global average.
+
+        Args:
+            keys: Group key of each target
+            targets: Array of target values
+            global_avg: Global average of the targets
+            min_count: Minimum number of samples for a group to be kept
+
+        Returns:
+            Dict mapping the string form of each key to its factor
+        """
+        unique_keys, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=targets)
+
+        return {
+            str(key): float(total / count / global_avg)
+            for key, total, count in zip(unique_keys.tolist(), sums, counts)
+            if count >= min_count
+        }
+
     @staticmethod
     def predict_with_model(
         shop_id, position, hour=None, day=None, service_id=None, specialist_id=None
@@ -381,22 +452,24 @@ class WaitTimePredictor:
         """
         Make a prediction using a pre-trained model.
 
-        In a real implementation, this would load the model
-        from the database or a file.
+        The model is loaded from the versioned cache and only trained when
+        no model is cached for the shop.
         """
         try:
-            # In a real implementation, load the saved model
-            # For now, we'll train it on the fly (inefficient but demonstrates the concept)
-            model_result = WaitTimePredictor.train_wait_time_model(shop_id)
+            model = cache.get(WaitTimePredictor._model_cache_key(shop_id))
+
+            if model is None:
+                model_result = WaitTimePredictor.train_wait_time_model(shop_id)
+
+                if not model_result["success"]:
+                    # Fallback to simpler prediction
+                    from apps.queueapp.services.queue_service import QueueService
 
-            if not model_result["success"]:
-                # Fallback to simpler prediction
-                from apps.queueapp.services.queue_service import QueueService
+                    return QueueService.estimate_wait_time(None, position)
 
-                return QueueService.estimate_wait_time(None, position)
+                model = model_result["model"]
 
             # Extract model components
-            model = model_result.get("model", {})
             global_avg = model.get("global_avg", 15)  # Default 15 min
             hour_factors = model.get("hour_factors", {})
             day_factors = model.get("day_factors", {})
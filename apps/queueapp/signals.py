@@ -1,10 +1,9 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from .models import QueueTicket
-from .services.queue_service import QueueService
+from .services.broadcast_service import QueueBroadcastService
+from .services.recompute_service import QueueRecomputeService
 
 
 @receiver(post_save, sender=QueueTicket)
@@ -14,49 +13,26 @@ def ticket_saved(sender, instance, created, **kwargs):
     if created:
         return
 
-    # Recalculate wait times for affected tickets
-    QueueService.recalculate_wait_times(instance.queue_id)
+    # Saving only the estimate cannot change anyone else's wait time
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) == {"estimated_wait_time"}:
+        return
+
+    # Coalesce wait time recalculation for the whole queue
+    QueueRecomputeService.mark_dirty(instance.queue_id)
 
-    # Notify relevant channels about the update
+    # Notify relevant channels about the update, coalesced per queue
     if instance.status in ["waiting", "called", "serving", "served", "cancelled"]:
-        channel_layer = get_channel_layer()
-
-        # Send update to queue group
-        queue_group_name = f"queue_{instance.queue_id}"
-
-        async_to_sync(channel_layer.group_send)(
-            queue_group_name,
-            {
-                "type": "queue_update",
-                "action": "update",
-                "ticket": {
-                    "id": str(instance.id),
-                    "ticket_number": instance.ticket_number,
-                    "status": instance.status,
-                    "position": instance.position,
-                    "estimated_wait_time": instance.estimated_wait_time,
-                },
-            },
+        QueueBroadcastService.publish(
+            instance.queue_id, tickets=[QueueBroadcastService.ticket_values(instance)]
         )
 
 
 @receiver(post_delete, sender=QueueTicket)
 def ticket_deleted(sender, instance, **kwargs):
     """Signal fired when a queue ticket is deleted"""
-    # Recalculate wait times for remaining tickets
-    QueueService.recalculate_wait_times(instance.queue_id)
-
-    # Notify relevant channels about the deletion
-    channel_layer = get_channel_layer()
-
-    # Send update to queue group
-    queue_group_name = f"queue_{instance.queue_id}"
-
-    async_to_sync(channel_layer.group_send)(
-        queue_group_name,
-        {
-            "type": "queue_update",
-            "action": "delete",
-            "ticket": {"id": str(instance.id), "ticket_number": instance.ticket_number},
-        },
-    )
+    # Coalesce wait time recalculation for remaining tickets
+    QueueRecomputeService.mark_dirty(instance.queue_id)
+
+    # Notify relevant channels about the deletion, coalesced per queue
+    QueueBroadcastService.publish(instance.queue_id, removed=[instance.id])
@@ -6,7 +6,10 @@ from django.utils import timezone
 from apps.notificationsapp.services.notification_service import NotificationService
 
 from .models import Queue, QueueTicket
+from .services.broadcast_service import QueueBroadcastService
+from .services.live_queue_state import LiveQueueState
 from .services.queue_service import QueueService
+from .services.recompute_service import QueueRecomputeService
 
 logger = logging.getLogger(__name__)
 
@@ -94,3 +97,70 @@ def update_queue_wait_times():
     except Exception as e:
         logger.error(f"Error updating queue wait times: {str(e)}")
         return f"Error: {str(e)}"
+
+
+@shared_task
+def recompute_queue_wait_times(queue_id):
+    """Run the coalesced wait time recompute for a queue marked dirty"""
+    # Clear the pending mark first so updates arriving during the recompute
+    # schedule another run instead of being lost
+    QueueRecomputeService.clear_pending(queue_id)
+
+    if QueueRecomputeService.recompute(queue_id):
+        return f"Recomputed wait times for queue {queue_id}"
+    return f"Error recomputing wait times for queue {queue_id}"
+
+
+@shared_task
+def flush_queue_broadcast(queue_id):
+    """Send the coalesced ticket changes of a queue to its websocket group"""
+    try:
+        version = QueueBroadcastService.flush(queue_id)
+        if version is None:
+            return f"No queue changes to broadcast for queue {queue_id}"
+        return f"Broadcast version {version} of queue {queue_id}"
+    except Exception as e:
+        logger.error(f"Error broadcasting queue {queue_id}: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def sync_live_queue_positions(queue_id):
+    """Write the live queue order of a service queue back to the database"""
+    # Clear the pending mark first so reorders arriving during the sync
+    # schedule another run instead of being lost
+    LiveQueueState.clear_sync_pending(queue_id)
+
+    try:
+        updated = LiveQueueState.sync_positions(queue_id)
+        if updated is None:
+            return f"Live queue state unavailable for queue {queue_id}"
+        return f"Synced {updated} queue positions for queue {queue_id}"
+    except Exception as e:
+        logger.error(f"Error syncing live queue positions: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def check_live_queue_consistency():
+    """Compare the live state of every active service queue with the database"""
+    try:
+        from .models import ServiceQueue
+
+        queue_ids = ServiceQueue.objects.filter(status="active").values_list("id", flat=True)
+
+        rebuilt = 0
+        failed = 0
+        for queue_id in queue_ids:
+            result = LiveQueueState.check_consistency(queue_id)
+            if not result["success"]:
+                logger.error(f"Error checking live queue {queue_id}: {result['message']}")
+                failed += 1
+                continue
+            if result["rebuilt"]:
+                rebuilt += 1
+
+        return f"Checked {len(queue_ids)} live queues, rebuilt {rebuilt}, failed {failed}"
+    except Exception as e:
+        logger.error(f"Error checking live queue consistency: {str(e)}")
+        return f"Error: {str(e)}"
@@ -1,16 +1,33 @@
+from types import SimpleNamespace
+from unittest import skipUnless
 from unittest.mock import MagicMock, patch
 
-from django.test import TestCase
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.authapp.models import User
 from apps.categoriesapp.models import Category
 from apps.companiesapp.models import Company
 from apps.queueapp.models import Queue, QueueTicket
+from apps.queueapp.services.broadcast_service import QueueBroadcastService
+from apps.queueapp.services.live_queue_state import LiveQueueState, entry_score
 from apps.queueapp.services.queue_service import QueueService
+from apps.queueapp.services.recompute_service import QueueRecomputeService
+from apps.queueapp.services.service_time_stats import P2Quantile, ServiceTimeStats
+from apps.queueapp.services.wait_time_predictor import WaitTimePredictor
 from apps.serviceapp.models import Service
 from apps.shopapp.models import Shop
 
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis needs it to run the call-next script
+except ImportError:
+    fakeredis = None
+
 
 class QueueServiceTest(TestCase):
     def setUp(self):
@@ -216,11 +233,10 @@ class QueueServiceTest(TestCase):
             serve_time=timezone.now(),
         )
 
-        # Mock recalculate_wait_times to avoid DB queries
+        # Wait times are recomputed through the coalesced dirty mark
         with patch(
             "apps.queueapp.services.queue_service.QueueService.recalculate_wait_times"
-        ) as mock_recalc:
-            mock_recalc.return_value = True
+        ) as mock_recalc, patch.object(QueueRecomputeService, "mark_dirty") as mock_mark_dirty:
 
             # Mark as served
             result = QueueService.mark_served(ticket.id)
@@ -231,8 +247,9 @@ class QueueServiceTest(TestCase):
             self.assertEqual(result.status, "served")
             self.assertIsNotNone(result.complete_time)
 
-            # recalculate_wait_times should have been called
-            mock_recalc.assert_called_once_with(self.queue.id)
+            # Only the dirty mark recomputes the queue
+            mock_recalc.assert_not_called()
+            mock_mark_dirty.assert_called_with(self.queue.id)
 
             # Notification should have been sent
             mock_notification_service.send_notification.assert_called_once()
@@ -261,11 +278,10 @@ class QueueServiceTest(TestCase):
             status="waiting",
         )
 
-        # Mock recalculate_wait_times to avoid DB queries
+        # Wait times are recomputed through the coalesced dirty mark
         with patch(
             "apps.queueapp.services.queue_service.QueueService.recalculate_wait_times"
-        ) as mock_recalc:
-            mock_recalc.return_value = True
+        ) as mock_recalc, patch.object(QueueRecomputeService, "mark_dirty") as mock_mark_dirty:
 
             # Cancel ticket1
             result = QueueService.cancel_ticket(ticket1.id)
@@ -281,8 +297,390 @@ class QueueServiceTest(TestCase):
             # Position of ticket2 should now be 1
             self.assertEqual(ticket2.position, 1)
 
-            # recalculate_wait_times should have been called
-            mock_recalc.assert_called_once_with(self.queue.id)
+            # Only the dirty mark recomputes the queue
+            mock_recalc.assert_not_called()
+            mock_mark_dirty.assert_called_with(self.queue.id)
 
             # Notification should have been sent
             mock_notification_service.send_notification.assert_called_once()
+
+    def test_recompute_matches_estimate_wait_time(self):
+        """Test that the one-pass recompute matches per-ticket estimates"""
+        for position in range(1, 6):
+            QueueTicket.objects.create(
+                queue=self.queue,
+                ticket_number=f"Q-123456-{position:03d}",
+                customer=User.objects.create(
+                    phone_number=f"55500000{position:02d}", user_type="customer"
+                ),
+                service=self.service if position % 2 else None,
+                position=position,
+                status="called" if position == 1 else "waiting",
+            )
+
+        expected = {
+            ticket.id: QueueService.estimate_wait_time(self.queue.id, ticket.position)
+            for ticket in QueueTicket.objects.filter(queue=self.queue, status="waiting")
+        }
+
+        # Constant number of queries, independent of the queue length
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(QueueRecomputeService.recompute(self.queue.id, broadcast=False))
+        self.assertLessEqual(len(queries), 10)
+
+        for ticket in QueueTicket.objects.filter(queue=self.queue, status="waiting"):
+            self.assertEqual(ticket.estimated_wait_time, expected[ticket.id])
+
+    @patch("apps.queueapp.tasks.recompute_queue_wait_times.apply_async")
+    def test_mark_dirty_coalesces(self, mock_apply_async):
+        """Test that repeated dirty marks schedule a single recompute"""
+        with self.settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                QueueRecomputeService.mark_dirty(self.queue.id)
+                QueueRecomputeService.mark_dirty(self.queue.id)
+            self.assertEqual(mock_apply_async.call_count, 1)
+
+            QueueRecomputeService.clear_pending(self.queue.id)
+
+            # A rolled back mark leaves no pending key to hide later marks
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                QueueRecomputeService.mark_dirty(self.queue.id)
+                raise RuntimeError
+
+            with self.captureOnCommitCallbacks(execute=True):
+                QueueRecomputeService.mark_dirty(self.queue.id)
+            self.assertEqual(mock_apply_async.call_count, 2)
+
+
+@patch("apps.queueapp.services.broadcast_service.get_redis_client", return_value=None)
+class QueueBroadcastServiceTest(SimpleTestCase):
+    def setUp(self):
+        self.override = self.settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        cache.clear()
+
+    @staticmethod
+    def ticket(ticket_id, position, status="waiting", wait=10):
+        return {
+            "id": ticket_id,
+            "ticket_number": f"T{ticket_id}",
+            "status": status,
+            "position": position,
+            "estimated_wait_time": wait,
+        }
+
+    @patch("apps.queueapp.tasks.flush_queue_broadcast.apply_async")
+    @patch.object(QueueBroadcastService, "_send")
+    @patch.object(QueueBroadcastService, "build_state", return_value=(0, {}))
+    @patch(
+        "apps.queueapp.services.broadcast_service.transaction.on_commit",
+        side_effect=lambda func: func(),
+    )
+    def test_flush_sends_coalesced_delta(
+        self, mock_on_commit, mock_build, mock_send, mock_apply_async, mock_client
+    ):
+        """Test that a window of updates goes out as one versioned delta"""
+        QueueBroadcastService.publish("queue", [self.ticket("1", 1)])
+        QueueBroadcastService.publish("queue", [self.ticket("2", 2)])
+        QueueBroadcastService.publish("queue", [self.ticket("1", 1, "called")])
+        self.assertEqual(mock_apply_async.call_count, 1)
+
+        self.assertEqual(QueueBroadcastService.flush("queue"), 1)
+        message = mock_send.call_args[0][1]
+        self.assertEqual(message["version"], 1)
+        self.assertEqual(
+            sorted(message["changes"], key=lambda change: change["id"]),
+            [self.ticket("1", 1, "called"), self.ticket("2", 2)],
+        )
+
+        # Only changed fields are sent, finished tickets leave the state
+        QueueBroadcastService.publish("queue", [self.ticket("1", 1, "served"), self.ticket("2", 1)])
+        self.assertEqual(QueueBroadcastService.flush("queue"), 2)
+        message = mock_send.call_args[0][1]
+        self.assertEqual(
+            sorted(message["changes"], key=lambda change: change["id"]),
+            [{"id": "1", "status": "served"}, {"id": "2", "position": 1}],
+        )
+        self.assertEqual(message["removed"], ["1"])
+
+        # Unchanged tickets produce no message
+        QueueBroadcastService.publish("queue", [self.ticket("2", 1)])
+        self.assertIsNone(QueueBroadcastService.flush("queue"))
+
+        snapshot = QueueBroadcastService.snapshot("queue")
+        self.assertEqual(snapshot["version"], 2)
+        self.assertEqual(snapshot["tickets"], [self.ticket("2", 1)])
+        mock_build.assert_called_once()
+
+    @patch("apps.queueapp.tasks.flush_queue_broadcast.apply_async")
+    @patch("apps.queueapp.services.broadcast_service.transaction.on_commit")
+    def test_rolled_back_changes_not_recorded(self, mock_on_commit, mock_apply_async, mock_client):
+        """Test that changes are only recorded once their transaction commits"""
+        # Never committed
+        QueueBroadcastService.publish("queue", [self.ticket("1", 1)])
+        mock_apply_async.assert_not_called()
+
+        # A later commit still schedules a flush, without the rolled back change
+        QueueBroadcastService.publish("queue", [self.ticket("2", 2)])
+        mock_on_commit.call_args[0][0]()
+        mock_apply_async.assert_called_once()
+        self.assertEqual(list(QueueBroadcastService._take_pending("queue")), ["2"])
+
+    @patch("apps.queueapp.tasks.flush_queue_broadcast.apply_async")
+    @patch.object(QueueBroadcastService, "build_state", return_value=(0, {}))
+    @patch(
+        "apps.queueapp.services.broadcast_service.transaction.on_commit",
+        side_effect=lambda func: func(),
+    )
+    def test_changes_during_flush_wait_for_it(
+        self, mock_on_commit, mock_build, mock_apply_async, mock_client
+    ):
+        """Test that a running flush is not overlapped by the next one"""
+        QueueBroadcastService.publish("queue", [self.ticket("1", 1)])
+        self.assertEqual(mock_apply_async.call_count, 1)
+
+        def send(queue_id, message):
+            QueueBroadcastService.publish("queue", [self.ticket("2", 2)])
+            self.assertEqual(mock_apply_async.call_count, 1)
+
+        with patch.object(QueueBroadcastService, "_send", side_effect=send):
+            self.assertEqual(QueueBroadcastService.flush("queue"), 1)
+
+        # Scheduled once the first flush has saved its state
+        self.assertEqual(mock_apply_async.call_count, 2)
+        with patch.object(QueueBroadcastService, "_send") as mock_send:
+            self.assertEqual(QueueBroadcastService.flush("queue"), 2)
+        self.assertEqual(mock_send.call_args[0][1]["changes"], [self.ticket("2", 2)])
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+
+class LiveQueueStateTest(SimpleTestCase):
+    def test_entry_score_orders_by_priority_then_check_in(self):
+        """Test that higher priorities and earlier check-ins sort first"""
+        now = timezone.now()
+        earlier = now - timezone.timedelta(minutes=5)
+
+        self.assertLess(entry_score(3, now), entry_score(2, earlier))
+        self.assertLess(entry_score(2, earlier), entry_score(2, now))
+        self.assertLess(entry_score(5, now), entry_score(1, earlier))
+
+    @patch.object(LiveQueueState, "get_client", return_value=None)
+    def test_unavailable_state_reports_fallback(self, mock_get_client):
+        """Test that callers are told to fall back to the database"""
+        self.assertEqual(LiveQueueState.pop_next("queue", "specialist"), (False, None))
+        self.assertEqual(LiveQueueState.get_rank("queue", "entry"), (False, None))
+        self.assertIsNone(LiveQueueState.get_size("queue"))
+        self.assertIsNone(LiveQueueState.get_order("queue"))
+
+
+@skipUnless(fakeredis, "fakeredis with Lua support is not installed")
+class LiveQueueStateRedisTest(SimpleTestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis()
+        patcher = patch.object(LiveQueueState, "get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        LiveQueueState._call_next_script = None
+
+        self.now = timezone.now()
+        # Mark the queue loaded so reads do not rebuild from the database
+        self.client.set(LiveQueueState._ready_key("queue"), 1)
+
+    def entry(self, entry_id, priority=1, minutes_ago=0, specialist_id=None, position=0):
+        return SimpleNamespace(
+            id=entry_id,
+            queue_id="queue",
+            specialist_id=specialist_id,
+            priority=priority,
+            position=position,
+            check_in_time=self.now - timezone.timedelta(minutes=minutes_ago),
+        )
+
+    def rebuild_from(self, entries):
+        with patch("apps.queueapp.models.QueueEntry", create=True) as mock_entry:
+            queryset = mock_entry.objects.filter.return_value
+            queryset.order_by.return_value.only.return_value = entries
+            return LiveQueueState.rebuild("queue")
+
+    def test_order_follows_priority_then_check_in(self):
+        """Test that positions come from the sorted set order"""
+        LiveQueueState.add(self.entry("late", minutes_ago=1))
+        LiveQueueState.add(self.entry("early", minutes_ago=10))
+        LiveQueueState.add(self.entry("urgent", priority=3))
+
+        self.assertEqual(LiveQueueState.get_order("queue"), ["urgent", "early", "late"])
+        self.assertEqual(LiveQueueState.get_rank("queue", "late"), (True, 3))
+        self.assertEqual(LiveQueueState.get_rank("queue", "gone"), (True, None))
+        self.assertEqual(LiveQueueState.get_size("queue"), 3)
+
+        # Re-scoring an entry moves it
+        LiveQueueState.add(self.entry("late", priority=4, minutes_ago=1))
+        self.assertEqual(LiveQueueState.get_order("queue"), ["late", "urgent", "early"])
+
+    def test_pop_next_prefers_the_calling_specialist(self):
+        """Test that call-next serves entries preferring the specialist first"""
+        LiveQueueState.add(self.entry("first", minutes_ago=10))
+        LiveQueueState.add(self.entry("preferred", minutes_ago=5, specialist_id="s1"))
+        LiveQueueState.add(self.entry("last", minutes_ago=1))
+
+        self.assertEqual(LiveQueueState.pop_next("queue", "s1"), (True, "preferred"))
+        self.assertEqual(LiveQueueState.pop_next("queue", "s1"), (True, "first"))
+        self.assertEqual(LiveQueueState.pop_next("queue", "s2"), (True, "last"))
+        self.assertEqual(LiveQueueState.pop_next("queue"), (True, None))
+
+        self.assertFalse(self.client.exists(LiveQueueState._preferences_key("queue")))
+        self.assertFalse(self.client.exists(f"{LiveQueueState._specialist_prefix('queue')}s1"))
+
+    def test_rebuild_replaces_state_in_database_order(self):
+        """Test that a rebuild drops stale keys and keeps optimizer order"""
+        LiveQueueState.add(self.entry("stale", specialist_id="old"))
+
+        # The optimizer placed the later check-in first within priority 1
+        loaded = self.rebuild_from(
+            [
+                self.entry("urgent", priority=3, minutes_ago=1, position=1),
+                self.entry("moved_up", minutes_ago=1, specialist_id="s1", position=2),
+                self.entry("moved_down", minutes_ago=10, position=3),
+            ]
+        )
+
+        self.assertEqual(loaded, 3)
+        self.assertEqual(LiveQueueState.get_order("queue"), ["urgent", "moved_up", "moved_down"])
+        self.assertEqual(self.client.smembers(LiveQueueState._specialists_key("queue")), {b"s1"})
+        self.assertFalse(self.client.exists(f"{LiveQueueState._specialist_prefix('queue')}old"))
+        self.assertGreater(self.client.ttl(LiveQueueState._ready_key("queue")), 0)
+
+        # Entries added later still fall in place by check-in time
+        LiveQueueState.add(self.entry("new", minutes_ago=5))
+        self.assertEqual(
+            LiveQueueState.get_order("queue"), ["urgent", "moved_up", "new", "moved_down"]
+        )
+
+    def test_check_consistency_compares_membership_and_priority(self):
+        """Test that drift is detected by membership and priority band"""
+        LiveQueueState.add(self.entry("a", minutes_ago=1))
+        LiveQueueState.add(self.entry("b", priority=3, minutes_ago=10))
+        LiveQueueState.add(self.entry("stale"))
+
+        with patch("apps.queueapp.models.QueueEntry", create=True) as mock_entry:
+            mock_entry.objects.filter.return_value.values_list.return_value = [
+                ("a", 1),
+                ("b", 1),
+                ("c", 2),
+            ]
+            with patch.object(LiveQueueState, "rebuild") as mock_rebuild:
+                result = LiveQueueState.check_consistency("queue")
+
+        self.assertFalse(result["consistent"])
+        self.assertEqual(result["missing"], ["c"])
+        self.assertEqual(result["unknown"], ["stale"])
+        self.assertEqual(result["misplaced"], ["b"])
+        mock_rebuild.assert_called_once_with("queue", client=self.client)
+
+
+class WaitTimePredictorTest(TestCase):
+    def test_queue_depths_match_windowed_counts(self):
+        """Test that the searchsorted sweep counts active tickets per window"""
+        depths = WaitTimePredictor._queue_depths(
+            ["a", "a", "b"],
+            np.array([100, 250, 100], dtype=np.int64),
+            ["a", "a", "a", "b"],
+            np.array([0, 50, 200, 150], dtype=np.int64),
+            window_micros=100,
+        )
+
+        # [t - window, t) per queue: a@100 -> {0, 50}, a@250 -> {200}, b@100 -> {}
+        self.assertEqual(depths.tolist(), [2, 1, 0])
+
+    @patch.object(WaitTimePredictor, "train_wait_time_model")
+    def test_predict_with_model_uses_cached_model(self, mock_train):
+        """Test that predictions read the cached model instead of retraining"""
+        model = {
+            "global_avg": 20.0,
+            "hour_factors": {"10": 1.5},
+            "day_factors": {},
+            "service_factors": {},
+            "specialist_factors": {},
+        }
+        with self.settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        ):
+            from django.core.cache import cache
+
+            shop_id = "00000000-0000-0000-0000-000000000001"
+            cache.set(WaitTimePredictor._model_cache_key(shop_id), model)
+            prediction = WaitTimePredictor.predict_with_model(shop_id, position=1, hour=10, day=0)
+
+        mock_train.assert_not_called()
+        self.assertEqual(prediction, 30)
+
+
+@patch("apps.queueapp.services.service_time_stats.get_redis_client", return_value=None)
+class ServiceTimeStatsTest(SimpleTestCase):
+    def setUp(self):
+        self.override = self.settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def test_record_updates_all_dimensions(self, mock_client):
+        """Test that one observation is visible from every recorded dimension"""
+        when = timezone.now()
+        for minutes in (10, 20, 30, 40, 50):
+            self.assertTrue(
+                ServiceTimeStats.record(minutes, "queue", service_id="service", when=when)
+            )
+
+        for lookup in (
+            {"queue_id": "queue"},
+            {"service_id": "service"},
+            {"queue_id": "queue", "hour_of_week": ServiceTimeStats.hour_of_week(when)},
+        ):
+            stats = ServiceTimeStats.get(**lookup)
+            self.assertEqual(stats["count"], 5)
+            self.assertEqual(stats["median"], 30)
+            self.assertEqual((stats["min"], stats["max"]), (10, 50))
+            low, high = stats["confidence_interval"]
+            self.assertLess(low, stats["mean"])
+            self.assertGreater(high, stats["mean"])
+
+        self.assertIsNone(ServiceTimeStats.get(specialist_id="specialist"))
+
+    def test_record_ignores_outliers(self, mock_client):
+        """Test that implausible service times are not recorded"""
+        self.assertFalse(ServiceTimeStats.record(0, "queue"))
+        self.assertFalse(ServiceTimeStats.record(500, "queue"))
+        self.assertIsNone(ServiceTimeStats.get(queue_id="queue"))
+
+    def test_p2_quantile_tracks_median(self, mock_client):
+        """Test that the P² estimator converges on the sample median"""
+        estimator = P2Quantile(0.5)
+        for value in range(1, 1002):
+            estimator.add(value * 7919 % 1001)
+
+        self.assertAlmostEqual(estimator.value(), 500, delta=10)
+
+    @patch("apps.specialistsapp.models.Specialist")
+    @patch("apps.queueapp.services.queue_service.QueueTicket")
+    def test_wait_time_context_reads_statistics(self, mock_ticket, mock_specialist, mock_client):
+        """Test that recorded statistics replace the per-request aggregates"""
+        mock_specialist.objects.filter.return_value.count.return_value = 2
+        now = timezone.now()
+        for minutes in (10, 10, 10, 10, 10):
+            ServiceTimeStats.record(minutes, "queue", when=now - timezone.timedelta(days=1))
+        for minutes in (20, 20, 20, 20, 20):
+            ServiceTimeStats.record(minutes, "queue", when=now)
+
+        context = QueueService.get_wait_time_context(SimpleNamespace(id="queue", shop="shop"))
+
+        mock_ticket.objects.filter.assert_not_called()
+        self.assertAlmostEqual(context["avg_service_time"], 15, delta=5)
+        self.assertAlmostEqual(context["hour_efficiency"], 20)
+        self.assertEqual(context["day_efficiency"], context["avg_service_time"])
+        self.assertEqual(context["active_specialists"], 2)
@@ -0,0 +1,264 @@
+"""
+Precomputed candidate pools for the "For You" reel feed.
+
+A periodic task scores every published reel once, from a fixed number of
+grouped queries: the engagement of the reel (likes + 2×comments + 3×shares,
+capped at 10 points) plus its recency (10 points, fading to 0 over 20 days).
+The best reels are kept per city, per category and overall, as Redis sorted
+sets scored by that base score, next to the shop, city, services and
+categories of each reel.
+
+Serving a feed reads a few hundred candidates from the pools matching the
+user's city and strongest category interests, and adds the user's affinity
+for each candidate's services, categories and shop. Pools are replaced as a
+whole by publishing a new version, so readers never see a half-built pool.
+"""
+
+import json
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from utils.cache_utils import get_redis_client
+
+from ..models import Reel, ReelComment, ReelLike, ReelShare
+
+logger = logging.getLogger(__name__)
+
+
+def base_score(engagement, created_at, now):
+    """Engagement and recency score of a reel, out of 20 points."""
+    days_old = (now - created_at).days
+    return min(engagement / 10, 10) + max(10 - (days_old / 2), 0)
+
+
+class FeedCandidatePool:
+    """Versioned per-city and per-category pools of scored feed candidates"""
+
+    KEY_PREFIX = "reel_feed:"
+    VERSION_KEY = "reel_feed:version"
+    # Reels kept per pool
+    POOL_SIZE = getattr(settings, "REEL_FEED_POOL_SIZE", 1000)
+    # Pools outlive the rebuild interval, so readers of the previous version
+    # finish before it expires
+    TTL = getattr(settings, "REEL_FEED_POOL_TTL", 60 * 60 * 2)
+
+    @classmethod
+    def _key(cls, version, pool):
+        return f"{cls.KEY_PREFIX}{version}:{pool}"
+
+    @staticmethod
+    def city_pool(city):
+        return f"city:{city}" if city else "all"
+
+    @staticmethod
+    def category_pool(category_id):
+        return f"category:{category_id}"
+
+    # ------------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _counts(model, reel_ids=None):
+        """Count the rows of an engagement model per published reel."""
+        queryset = model.objects.filter(reel__status="published")
+        if reel_ids is not None:
+            queryset = queryset.filter(reel_id__in=reel_ids)
+        return {
+            str(row["reel_id"]): row["count"]
+            for row in queryset.values("reel_id").annotate(count=Count("id"))
+        }
+
+    @staticmethod
+    def _targets(field, reel_ids=None):
+        """Map reel ID to the IDs of its services or categories."""
+        through = field.through.objects.all()
+        source = f"{field.field.m2m_field_name()}_id"
+        target = f"{field.field.m2m_reverse_field_name()}_id"
+        if reel_ids is not None:
+            through = through.filter(**{f"{source}__in": reel_ids})
+
+        targets = defaultdict(list)
+        for reel_id, target_id in through.values_list(source, target):
+            targets[str(reel_id)].append(str(target_id))
+        return targets
+
+    @classmethod
+    def score_reels(cls, queryset, limit=None):
+        """
+        Score published reels with a fixed number of queries.
+
+        Args:
+            queryset: Published Reel queryset
+            limit: Optional number of reels of the queryset to score
+
+        Returns:
+            List of candidate dicts, best base score first
+        """
+        now = timezone.now()
+        fields = ("id", "shop_id", "city", "created_at")
+        if limit is None:
+            rows = list(queryset.values(*fields))
+            reel_ids = None
+        else:
+            rows = list(queryset.values(*fields)[:limit])
+            reel_ids = [row["id"] for row in rows]
+
+        likes = cls._counts(ReelLike, reel_ids)
+        comments = cls._counts(ReelComment, reel_ids)
+        shares = cls._counts(ReelShare, reel_ids)
+        services = cls._targets(Reel.services, reel_ids)
+        categories = cls._targets(Reel.categories, reel_ids)
+
+        candidates = []
+        for row in rows:
+            reel_id = str(row["id"])
+            engagement = (
+                likes.get(reel_id, 0) + comments.get(reel_id, 0) * 2 + shares.get(reel_id, 0) * 3
+            )
+            candidates.append(
+                {
+                    "id": reel_id,
+                    "score": round(base_score(engagement, row["created_at"], now), 6),
+                    "shop_id": str(row["shop_id"]),
+                    "city": row["city"],
+                    "services": services.get(reel_id, []),
+                    "categories": categories.get(reel_id, []),
+                }
+            )
+
+        candidates.sort(key=lambda candidate: (-candidate["score"], candidate["id"]))
+        return candidates
+
+    @classmethod
+    def group(cls, candidates):
+        """
+        Split scored candidates into pools of at most POOL_SIZE reels.
+
+        Args:
+            candidates: Candidate dicts, best base score first
+
+        Returns:
+            Dict mapping pool name to its candidates, best first
+        """
+        pools = defaultdict(list)
+        for candidate in candidates:
+            names = [cls.city_pool(None)]
+            if candidate["city"]:
+                names.append(cls.city_pool(candidate["city"]))
+            names.extend(cls.category_pool(category_id) for category_id in candidate["categories"])
+            for name in names:
+                if len(pools[name]) < cls.POOL_SIZE:
+                    pools[name].append(candidate)
+        return pools
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Score every published reel and publish a new version of the pools.
+
+        Returns:
+            Number of pools built
+        """
+        pools = cls.group(cls.score_reels(Reel.objects.filter(status="published")))
+        version = int(time.time() * 1000)
+
+        client = get_redis_client()
+        if client is None:
+            entries = {cls._key(version, name): items for name, items in pools.items()}
+            cache.set_many(entries, cls.TTL)
+        else:
+            members = {
+                candidate["id"]: candidate for items in pools.values() for candidate in items
+            }
+            meta_key = cls._key(version, "meta")
+            with client.pipeline(transaction=False) as pipe:
+                for name, items in pools.items():
+                    key = cls._key(version, name)
+                    pipe.zadd(key, {item["id"]: item["score"] for item in items})
+                    pipe.expire(key, cls.TTL)
+                if members:
+                    pipe.hset(
+                        meta_key,
+                        mapping={
+                            reel_id: json.dumps(candidate) for reel_id, candidate in members.items()
+                        },
+                    )
+                pipe.expire(meta_key, cls.TTL)
+                pipe.execute()
+
+        # Publish the complete version
+        cache.set(cls.VERSION_KEY, version, cls.TTL)
+
+        logger.info(f"Built {len(pools)} reel feed pools")
+        return len(pools)
+
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def get_candidates(cls, pool_limits):
+        """
+        Read the best candidates of several pools.
+
+        Args:
+            pool_limits: List of (pool name, number of candidates) tuples
+
+        Returns:
+            Dict mapping reel ID to candidate dict, or None when no pools
+            have been built
+        """
+        version = cache.get(cls.VERSION_KEY)
+        if version is None:
+            return None
+
+        client = get_redis_client()
+        if client is None:
+            keys = {cls._key(version, name): limit for name, limit in pool_limits}
+            pools = cache.get_many(list(keys))
+            return {
+                candidate["id"]: candidate
+                for key, items in pools.items()
+                for candidate in items[: keys[key]]
+            }
+
+        with client.pipeline(transaction=False) as pipe:
+            for name, limit in pool_limits:
+                pipe.zrevrange(cls._key(version, name), 0, limit - 1)
+            ranked = pipe.execute()
+
+        reel_ids = list(dict.fromkeys(reel_id for ids in ranked for reel_id in ids))
+        if not reel_ids:
+            return {}
+
+        values = client.hmget(cls._key(version, "meta"), reel_ids)
+        return {
+            reel_id.decode(): json.loads(value)
+            for reel_id, value in zip(reel_ids, values)
+            if value is not None
+        }
+
+    @classmethod
+    def get_fallback_candidates(cls, city, limit):
+        """
+        Score the most recent reels of a city while no pools are built.
+
+        Args:
+            city: City to read reels of (None for every city)
+            limit: Number of reels to score
+
+        Returns:
+            Dict mapping reel ID to candidate dict
+        """
+        queryset = Reel.objects.filter(status="published")
+        if city:
+            queryset = queryset.filter(city=city)
+        candidates = cls.score_reels(queryset.order_by("-created_at"), limit)
+        return {candidate["id"]: candidate for candidate in candidates}
@@ -1,20 +1,32 @@
-from django.contrib.auth import get_user_model
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Case, Count, IntegerField, Value, When
-from django.utils import timezone
 
-from apps.customersapp.models import CustomerPreference
+from apps.bookingapp.models import Appointment
+from apps.customersapp.models import CustomerCategory
 from apps.followapp.models import Follow
 from apps.geoapp.services.distance_service import DistanceService
 from apps.shopapp.models import Shop
 
-from ..models import Reel
-
-User = get_user_model()
+from ..models import Reel, ReelComment, ReelLike, ReelView
+from .feed_candidates import FeedCandidatePool
 
 
 class FeedCuratorService:
     """Advanced service for curating personalized reel feeds"""
 
+    AFFINITY_KEY_PREFIX = "reel_feed_affinity:"
+    AFFINITY_TTL = 60 * 5
+    PAGE_SIZE = 20
+    # Candidates read from the pool of the user's city
+    CITY_CANDIDATES = getattr(settings, "REEL_FEED_CITY_CANDIDATES", 300)
+    # Candidates read from the pool of each of the user's top categories
+    CATEGORY_CANDIDATES = 50
+    TOP_CATEGORIES = 5
+
     @staticmethod
     def get_nearby_feed(user_id, city=None, location=None):
         """
@@ -91,128 +103,160 @@ class FeedCuratorService:
         # Ensure we don't have duplicates
         return queryset.distinct()
 
-    @staticmethod
-    def get_personalized_feed(user_id, city=None):
+    @classmethod
+    def get_affinity(cls, user_id):
         """
-        Get personalized "For You" feed based on user's preferences and engagement
+        Get the affinity vector of a user
 
         Args:
-            user_id: UUID of the user requesting the feed
-            city: City to filter by (optional, will use user's city if not provided)
+            user_id: UUID of the user
 
         Returns:
-            QuerySet of Reel objects
+            Dict with the IDs of booked services, category ID -> affinity
+            score (0-1), and the IDs of shops whose reels the user engaged with
         """
-        # Start with published reels
-        queryset = Reel.objects.filter(status="published")
+        cache_key = f"{cls.AFFINITY_KEY_PREFIX}{user_id}"
+        affinity = cache.get(cache_key)
+        if affinity is not None:
+            return affinity
+
+        shops = set()
+        for model in (ReelLike, ReelComment, ReelView):
+            shops.update(
+                str(shop_id)
+                for shop_id in model.objects.filter(user_id=user_id)
+                .values_list("reel__shop_id", flat=True)
+                .distinct()
+            )
 
-        # Filter by city if provided
-        if city:
-            queryset = queryset.filter(city=city)
+        affinity = {
+            "services": {
+                str(service_id)
+                for service_id in Appointment.objects.filter(customer_id=user_id)
+                .values_list("service_id", flat=True)
+                .distinct()
+            },
+            "categories": {
+                str(category_id): score
+                for category_id, score in CustomerCategory.objects.filter(
+                    customer__user_id=user_id
+                ).values_list("category_id", "affinity_score")
+            },
+            "shops": shops,
+        }
+        cache.set(cache_key, affinity, cls.AFFINITY_TTL)
+        return affinity
 
-        # Get user's engagement history
-        user = User.objects.get(id=user_id)
+    @staticmethod
+    def rank_score(candidate, affinity):
+        """
+        Score a feed candidate for a user
 
-        # Get services user has booked or viewed
-        booked_service_ids = set()
-        if hasattr(user, "appointments"):
-            booked_service_ids = set(
-                user.appointments.values_list("service_id", flat=True).distinct()
-            )
+        Args:
+            candidate: Candidate dict from FeedCandidatePool
+            affinity: Affinity vector from get_affinity
 
-        # Get categories user has shown interest in
-        category_ids = set()
-        try:
-            if hasattr(user, "customer") and hasattr(user.customer, "preferences"):
-                category_preferences = CustomerPreference.objects.filter(
-                    customer=user.customer, preference_type="category"
-                )
-                category_ids = set(
-                    category_preferences.values_list(
-                        "category_id", flat=True
-                    ).distinct()
-                )
-        except Exception:
-            # If customer preferences are not accessible, continue without them
-            pass
-
-        # Get shops user has interacted with
-        liked_reel_shop_ids = set(
-            user.reel_likes.values_list("reel__shop_id", flat=True).distinct()
-        )
+        Returns:
+            Base score of the reel plus the user's affinity for it
+        """
+        score = candidate["score"]
 
-        commented_reel_shop_ids = set(
-            user.reel_comments.values_list("reel__shop_id", flat=True).distinct()
-        )
+        # Service match - if reel features services user has booked
+        if any(service_id in affinity["services"] for service_id in candidate["services"]):
+            score += 5
 
-        viewed_reel_shop_ids = set(
-            user.reel_views.values_list("reel__shop_id", flat=True).distinct()
+        # Category match - weighted by the user's strongest interest
+        score += 3 * max(
+            (affinity["categories"].get(category_id, 0) for category_id in candidate["categories"]),
+            default=0,
         )
 
-        interacted_shop_ids = liked_reel_shop_ids.union(
-            commented_reel_shop_ids, viewed_reel_shop_ids
-        )
+        # Shop interaction - if user has interacted with this shop before
+        if candidate["shop_id"] in affinity["shops"]:
+            score += 3
 
-        # Calculate relevance score based on different factors
-        rankings = []
-
-        for reel in queryset:
-            score = 0
-
-            # Engagement factor - reels with higher engagement get higher score
-            engagement_score = reel.get_engagement_score()
-            score += min(engagement_score / 10, 10)  # Cap at 10 points
-
-            # Recency factor - newer reels get higher score
-            days_old = (timezone.now() - reel.created_at).days
-            recency_score = max(
-                10 - (days_old / 2), 0
-            )  # Newer = higher score, 0 after 20 days
-            score += recency_score
-
-            # Service match - if reel features services user has booked
-            if any(
-                service_id in booked_service_ids
-                for service_id in reel.services.values_list("id", flat=True)
-            ):
-                score += 5
-
-            # Category match - if reel is in categories user is interested in
-            if any(
-                category_id in category_ids
-                for category_id in reel.categories.values_list("id", flat=True)
-            ):
-                score += 3
-
-            # Shop interaction - if user has interacted with this shop before
-            if str(reel.shop_id) in interacted_shop_ids:
-                score += 3
-
-            rankings.append((reel, score))
-
-        # Sort by score (descending)
-        rankings.sort(key=lambda x: x[1], reverse=True)
-
-        # Get reel IDs in the ranked order
-        reel_ids = [reel.id for reel, _ in rankings]
-
-        # Requery to get a proper queryset in the correct order
-        if reel_ids:
-            # Create a Case statement for ordering
-            preserved_order = Case(
-                *[When(id=pk, then=Value(i)) for i, pk in enumerate(reel_ids)],
-                output_field=IntegerField()
-            )
+        return round(score, 6)
 
-            # Return queryset in the calculated order
-            return (
-                queryset.filter(id__in=reel_ids)
-                .annotate(custom_order=preserved_order)
-                .order_by("custom_order")
-            )
+    @staticmethod
+    def encode_cursor(score, reel_id):
+        """Encode the position after a ranked reel as an opaque cursor"""
+        return base64.urlsafe_b64encode(f"{score}|{reel_id}".encode()).decode()
 
-        # Fallback to default ordering if no reels found
-        return queryset.order_by("-created_at")
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Decode a cursor from encode_cursor
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            score, reel_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return float(score), reel_id
+        except (binascii.Error, UnicodeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    @classmethod
+    def get_personalized_feed(cls, user_id, city=None, cursor=None, limit=None):
+        """
+        Get personalized "For You" feed based on user's preferences and engagement
+
+        Candidates come from the precomputed pools of the user's city and
+        strongest category interests, so the number of queries does not grow
+        with the catalogue.
+
+        Args:
+            user_id: UUID of the user requesting the feed
+            city: City to filter by (optional)
+            cursor: Cursor returned with the previous page (optional)
+            limit: Number of reels per page (optional)
+
+        Returns:
+            Tuple of (list of Reel objects, cursor of the next page or None)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        limit = limit or cls.PAGE_SIZE
+        after = cls.decode_cursor(cursor) if cursor else None
+
+        affinity = cls.get_affinity(user_id)
+        top_categories = sorted(
+            affinity["categories"], key=affinity["categories"].get, reverse=True
+        )[: cls.TOP_CATEGORIES]
+
+        pool_limits = [(FeedCandidatePool.city_pool(city), cls.CITY_CANDIDATES)] + [
+            (FeedCandidatePool.category_pool(category_id), cls.CATEGORY_CANDIDATES)
+            for category_id in top_categories
+        ]
+        candidates = FeedCandidatePool.get_candidates(pool_limits)
+        if candidates is None:
+            # No pools built yet
+            candidates = FeedCandidatePool.get_fallback_candidates(city, cls.CITY_CANDIDATES)
+
+        # Category pools span every city
+        ranked = sorted(
+            (-cls.rank_score(candidate, affinity), reel_id)
+            for reel_id, candidate in candidates.items()
+            if not city or candidate["city"] == city
+        )
+        if after is not None:
+            position = (-after[0], after[1])
+            ranked = [item for item in ranked if item > position]
+
+        page = ranked[:limit]
+        reels = {
+            str(reel.id): reel
+            for reel in Reel.objects.filter(
+                id__in=[reel_id for _, reel_id in page], status="published"
+            ).select_related("shop")
+        }
+
+        next_cursor = None
+        if len(ranked) > limit:
+            next_cursor = cls.encode_cursor(-page[-1][0], page[-1][1])
+
+        return [reels[reel_id] for _, reel_id in page if reel_id in reels], next_cursor
 
     @staticmethod
     def get_following_feed(user_id):
@@ -10,9 +10,9 @@ from algorithms.recommendation.content_ranker import (
     weighted_content_ranking,
 )
 from apps.customersapp.models import CustomerPreference
-from apps.followapp.services.follow_service import FollowService
 
 from ..models import Reel, ReelLike, ReelView
+from .similarity_index import UserSimilarityIndex
 
 logger = logging.getLogger(__name__)
 
@@ -314,57 +314,14 @@ class RecommendationService:
                         )
                     )
 
-            # 2. Similar follow patterns
-            following_shops = set(FollowService.get_following_shop_ids(customer))
-
-            if following_shops:
-                # Find customers who follow similar shops
-                user_customers = CustomerPreference.objects.values_list(
-                    "customer_id", flat=True
-                ).distinct()
-                similar_by_follows = []
-
-                # This would be better as a database query, but for illustration:
-                for other_customer_id in user_customers:
-                    if other_customer_id == customer.id:
-                        continue
-
-                    # Get shops this customer follows
-                    other_following = set(
-                        FollowService.get_following_shop_ids_by_customer_id(
-                            other_customer_id
-                        )
+            # 2. Similar follow and engagement patterns (precomputed offline)
+            for other_user_id, similarity in UserSimilarityIndex.get_neighbours(user_id):
+                similar_users.append(
+                    (
+                        other_user_id,
+                        similarity * 0.6,  # Weight for follow similarity (more important)
                     )
-
-                    # Calculate Jaccard similarity
-                    if other_following:
-                        intersection = len(
-                            following_shops.intersection(other_following)
-                        )
-                        union = len(following_shops.union(other_following))
-                        if union > 0:
-                            similarity = intersection / union
-                            if similarity > 0.1:  # Only consider significant similarity
-                                other_user_id = (
-                                    CustomerPreference.objects.filter(
-                                        customer_id=other_customer_id
-                                    )
-                                    .values_list("customer__user_id", flat=True)
-                                    .first()
-                                )
-
-                                if other_user_id:
-                                    similar_by_follows.append(
-                                        (
-                                            str(other_user_id),
-                                            similarity
-                                            * 0.6,  # Weight for follow similarity (more important)
-                                        )
-                                    )
-
-                # Sort by similarity and take top results
-                similar_by_follows.sort(key=lambda x: x[1], reverse=True)
-                similar_users.extend(similar_by_follows[:30])
+                )
 
             # 3. Similar city (lower weight)
             if city and hasattr(customer, "city") and customer.city:
@@ -0,0 +1,203 @@
+"""
+Precomputed user similarity for reel recommendations.
+
+Users are compared by the shops they engage with: shops they follow and shops
+whose reels they liked recently. A periodic task builds a binary user×shop
+CSR matrix from two values_list queries, computes the Jaccard similarity of
+every pair of users sharing a shop with one sparse product per block of rows,
+and stores the top-k neighbours of each user in the cache. Serving a feed then
+costs a single cache lookup.
+"""
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from scipy import sparse
+
+from apps.followapp.models import Follow
+
+from ..models import ReelLike
+
+logger = logging.getLogger(__name__)
+
+
+class UserSimilarityIndex:
+    """Offline top-k Jaccard neighbours over the user×shop engagement matrix"""
+
+    KEY_PREFIX = "reel_similar_users:"
+    TTL = getattr(settings, "REEL_SIMILARITY_TTL", 60 * 60 * 24)
+    # Neighbours computed on demand between two builds expire sooner
+    ON_DEMAND_TTL = 60 * 60
+    TOP_K = getattr(settings, "REEL_SIMILARITY_TOP_K", 30)
+    # Pairs below this similarity are not worth keeping
+    MIN_SIMILARITY = 0.1
+    # Liked reels older than this no longer count as shop engagement
+    INTERACTION_DAYS = 90
+    # Rows multiplied per sparse product, bounds the memory of one block
+    BLOCK_SIZE = 2000
+
+    @classmethod
+    def _key(cls, user_id):
+        return f"{cls.KEY_PREFIX}{user_id}"
+
+    @classmethod
+    def _engagement_pairs(cls, user_ids=None, shop_ids=None):
+        """Get distinct (user_id, shop_id) engagement pairs."""
+        follows = Follow.objects.all()
+        likes = ReelLike.objects.filter(
+            created_at__gte=timezone.now() - timezone.timedelta(days=cls.INTERACTION_DAYS)
+        )
+        if user_ids is not None:
+            follows = follows.filter(customer_id__in=user_ids)
+            likes = likes.filter(user_id__in=user_ids)
+        if shop_ids is not None:
+            follows = follows.filter(shop_id__in=shop_ids)
+            likes = likes.filter(reel__shop_id__in=shop_ids)
+
+        pairs = set(follows.values_list("customer_id", "shop_id"))
+        pairs.update(likes.values_list("user_id", "reel__shop_id"))
+        return pairs
+
+    @staticmethod
+    def build_matrix(pairs):
+        """
+        Build the binary user×shop matrix of engagement pairs.
+
+        Args:
+            pairs: Iterable of (user_id, shop_id) tuples
+
+        Returns:
+            Tuple of (CSR matrix, array of user IDs indexing its rows)
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return sparse.csr_matrix((0, 0), dtype=np.float32), np.array([])
+
+        users, shops = zip(*pairs)
+        user_ids, rows = np.unique(np.array(users, dtype=object), return_inverse=True)
+        shop_ids, cols = np.unique(np.array(shops, dtype=object), return_inverse=True)
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (rows, cols)),
+            shape=(len(user_ids), len(shop_ids)),
+        )
+        # Duplicate pairs would otherwise be summed
+        matrix.data[:] = 1
+        return matrix, user_ids
+
+    @classmethod
+    def top_neighbours(cls, matrix, user_ids, rows=None, top_k=None):
+        """
+        Compute the top-k Jaccard neighbours of matrix rows.
+
+        Intersections come from one sparse product per block of rows, so only
+        pairs of users sharing at least one shop are ever materialized.
+
+        Args:
+            matrix: Binary user×shop CSR matrix
+            user_ids: User IDs indexing the matrix rows
+            rows: Optional row indices to compute (defaults to every row)
+            top_k: Neighbours kept per user (defaults to TOP_K)
+
+        Returns:
+            Dict mapping user ID to a list of (user_id, similarity) tuples,
+            most similar first
+        """
+        top_k = top_k or cls.TOP_K
+        row_sizes = np.asarray(matrix.sum(axis=1)).ravel()
+        transposed = matrix.T.tocsr()
+        rows = np.arange(matrix.shape[0]) if rows is None else np.asarray(rows)
+
+        neighbours = {}
+        for start in range(0, len(rows), cls.BLOCK_SIZE):
+            block = rows[start : start + cls.BLOCK_SIZE]
+            intersections = (matrix[block] @ transposed).tocsr()
+
+            counts = np.diff(intersections.indptr)
+            sources = np.repeat(block, counts)
+            targets = intersections.indices
+            shared = intersections.data
+            similarity = shared / (row_sizes[sources] + row_sizes[targets] - shared)
+
+            keep = (similarity > cls.MIN_SIMILARITY) & (sources != targets)
+            indptr = np.concatenate(([0], np.cumsum(counts)))
+
+            for offset, row in enumerate(block):
+                lo, hi = indptr[offset], indptr[offset + 1]
+                mask = keep[lo:hi]
+                scores = similarity[lo:hi][mask]
+                candidates = targets[lo:hi][mask]
+                if len(scores) > top_k:
+                    best = np.argpartition(-scores, top_k - 1)[:top_k]
+                    scores, candidates = scores[best], candidates[best]
+                order = np.argsort(-scores, kind="stable")
+                neighbours[str(user_ids[row])] = [
+                    (str(user_ids[candidates[i]]), float(scores[i])) for i in order
+                ]
+
+        return neighbours
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Rebuild the neighbour lists of every engaged user.
+
+        Returns:
+            Number of users indexed
+        """
+        matrix, user_ids = cls.build_matrix(cls._engagement_pairs())
+        neighbours = cls.top_neighbours(matrix, user_ids)
+
+        cache.set_many(
+            {cls._key(user_id): items for user_id, items in neighbours.items()},
+            cls.TTL,
+        )
+
+        logger.info(f"Indexed reel similarity for {len(neighbours)} users")
+        return len(neighbours)
+
+    @classmethod
+    def compute_for_user(cls, user_id):
+        """
+        Compute the neighbours of one user on demand.
+
+        Only the engagement of users sharing a shop with this user is read.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            List of (user_id, similarity) tuples, most similar first
+        """
+        shop_ids = {shop_id for _, shop_id in cls._engagement_pairs(user_ids=[user_id])}
+        if not shop_ids:
+            return []
+
+        peers = {peer_id for peer_id, _ in cls._engagement_pairs(shop_ids=list(shop_ids))}
+        matrix, user_ids = cls.build_matrix(cls._engagement_pairs(user_ids=list(peers)))
+
+        row = np.flatnonzero(user_ids.astype(str) == str(user_id))
+        return cls.top_neighbours(matrix, user_ids, rows=row).get(str(user_id), [])
+
+    @classmethod
+    def get_neighbours(cls, user_id):
+        """
+        Get the most similar users of a user.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            List of (user_id, similarity) tuples, most similar first
+        """
+        neighbours = cache.get(cls._key(user_id))
+        if neighbours is not None:
+            return neighbours
+
+        # Users who started engaging after the last build
+        neighbours = cls.compute_for_user(user_id)
+        cache.set(cls._key(user_id), neighbours, cls.ON_DEMAND_TTL)
+        return neighbours
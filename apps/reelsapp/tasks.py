@@ -121,3 +121,23 @@ def remove_old_draft_reels():
 
     # Delete them (which will cascade to related objects)
     old_drafts.delete()
+
+
+@shared_task
+def rebuild_user_similarity_index():
+    """
+    Rebuild the precomputed similar-user lists used by reel recommendations.
+    """
+    from .services.similarity_index import UserSimilarityIndex
+
+    return UserSimilarityIndex.rebuild()
+
+
+@shared_task
+def rebuild_feed_candidates():
+    """
+    Rescore published reels and rebuild the "For You" feed candidate pools.
+    """
+    from .services.feed_candidates import FeedCandidatePool
+
+    return FeedCandidatePool.rebuild()
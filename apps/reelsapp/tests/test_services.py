@@ -4,7 +4,7 @@ from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from apps.companiesapp.models import Company
 from apps.followapp.models import Follow
@@ -12,8 +12,10 @@ from apps.shopapp.models import Shop
 
 from ..models import Reel, ReelView
 from ..services.engagement_service import EngagementService
+from ..services.feed_candidates import FeedCandidatePool
 from ..services.feed_curator import FeedCuratorService
 from ..services.reel_service import ReelService
+from ..services.similarity_index import UserSimilarityIndex
 
 User = get_user_model()
 
@@ -244,3 +246,91 @@ class FeedCuratorServiceTest(TestCase):
         self.assertIn(self.riyadh_reel1, reels)
         self.assertIn(self.riyadh_reel2, reels)
         self.assertNotIn(self.jeddah_reel, reels)
+
+    def test_get_personalized_feed(self):
+        """Test paginating the "For You" feed of a city by cursor"""
+        FeedCandidatePool.rebuild()
+
+        reels, next_cursor = FeedCuratorService.get_personalized_feed(
+            self.user.id, city="Riyadh", limit=1
+        )
+        self.assertEqual(len(reels), 1)
+        self.assertIsNotNone(next_cursor)
+
+        more_reels, last_cursor = FeedCuratorService.get_personalized_feed(
+            self.user.id, city="Riyadh", cursor=next_cursor, limit=1
+        )
+        self.assertEqual(
+            {reels[0].id, more_reels[0].id},
+            {self.riyadh_reel1.id, self.riyadh_reel2.id},
+        )
+        self.assertIsNone(last_cursor)
+
+        with self.assertRaises(ValueError):
+            FeedCuratorService.get_personalized_feed(self.user.id, cursor="invalid")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class UserSimilarityIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(phone_number="1234567890", user_type="admin")
+        cls.company = Company.objects.create(
+            name="Test Company", contact_phone="9876543210", owner=cls.owner
+        )
+        cls.shops = [
+            Shop.objects.create(
+                company=cls.company,
+                name=f"Shop {index}",
+                phone_number=f"55500000{index}",
+                username=f"shop{index}",
+                city="Riyadh",
+            )
+            for index in range(3)
+        ]
+
+        cls.user = User.objects.create(phone_number="5550000010", user_type="customer")
+        cls.close = User.objects.create(phone_number="5550000011", user_type="customer")
+        cls.far = User.objects.create(phone_number="5550000012", user_type="customer")
+
+        # user: {0, 1}, close: {0, 1} (Jaccard 1), far: {1, 2} (Jaccard 1/3)
+        for customer, shops in (
+            (cls.user, cls.shops[:2]),
+            (cls.close, cls.shops[:2]),
+            (cls.far, cls.shops[1:]),
+        ):
+            for shop in shops:
+                Follow.objects.create(customer=customer, shop=shop)
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_rebuild_ranks_neighbours_by_jaccard(self):
+        """Test the offline build stores neighbours most similar first"""
+        self.assertEqual(UserSimilarityIndex.rebuild(), 3)
+
+        neighbours = UserSimilarityIndex.get_neighbours(self.user.id)
+
+        self.assertEqual(
+            [user_id for user_id, _ in neighbours],
+            [str(self.close.id), str(self.far.id)],
+        )
+        self.assertAlmostEqual(neighbours[0][1], 1.0)
+        self.assertAlmostEqual(neighbours[1][1], 1 / 3)
+
+    def test_get_neighbours_is_a_cache_lookup_after_rebuild(self):
+        """Test serving neighbours of an indexed user runs no query"""
+        UserSimilarityIndex.rebuild()
+
+        with self.assertNumQueries(0):
+            UserSimilarityIndex.get_neighbours(self.user.id)
+
+    def test_compute_for_user_matches_rebuild(self):
+        """Test on-demand neighbours match the offline build"""
+        on_demand = UserSimilarityIndex.get_neighbours(self.far.id)
+
+        UserSimilarityIndex.rebuild()
+
+        self.assertEqual(on_demand, UserSimilarityIndex.get_neighbours(self.far.id))
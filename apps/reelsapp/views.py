@@ -354,10 +354,12 @@ class CustomerReelViewSet(
             type: Feed type (nearby, for_you, following, default: nearby)
             lat: Latitude for location-based feed (optional)
             lng: Longitude for location-based feed (optional)
+            cursor: Cursor of the next "for_you" page (optional)
 
         Feed types:
         - nearby: Reels from shops in the same city, sorted by distance
-        - for_you: Personalized feed based on engagement and preferences
+        - for_you: Personalized feed based on engagement and preferences,
+          returned with the cursor of its next page
         - following: Reels from shops the customer follows
 
         Returns:
@@ -387,9 +389,19 @@ class CustomerReelViewSet(
         # Get nearby reels
         if feed_type == "nearby":
             reels = FeedCuratorService.get_nearby_feed(user.id, city, location)
-        # Get "For You" reels
+        # Get "For You" reels, paginated by cursor
         elif feed_type == "for_you":
-            reels = FeedCuratorService.get_personalized_feed(user.id, city)
+            try:
+                reels, next_cursor = FeedCuratorService.get_personalized_feed(
+                    user.id, city, cursor=request.query_params.get("cursor")
+                )
+            except ValueError:
+                return Response(
+                    {"detail": "Invalid cursor."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            serializer = self.get_serializer(reels, many=True)
+            return Response({"next_cursor": next_cursor, "results": serializer.data})
         # Get reels from followed shops
         elif feed_type == "following":
             reels = FeedCuratorService.get_following_feed(user.id)
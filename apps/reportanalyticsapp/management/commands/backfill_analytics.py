@@ -0,0 +1,59 @@
+# apps/reportanalyticsapp/management/commands/backfill_analytics.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reportanalyticsapp.services.rollup_service import AnalyticsRollupService
+
+
+class Command(BaseCommand):
+    help = "Recompute daily shop and specialist analytics for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("start_date", type=str, help="First date (YYYY-MM-DD)")
+        parser.add_argument(
+            "end_date",
+            type=str,
+            nargs="?",
+            help="Last date (YYYY-MM-DD), defaults to the start date",
+        )
+        parser.add_argument("--shop-ids", type=str, nargs="*", help="Only roll up these shops")
+        parser.add_argument(
+            "--specialist-ids",
+            type=str,
+            nargs="*",
+            help="Only roll up these specialists",
+        )
+        parser.add_argument(
+            "--skip-shops", action="store_true", help="Do not roll up shop analytics"
+        )
+        parser.add_argument(
+            "--skip-specialists",
+            action="store_true",
+            help="Do not roll up specialist analytics",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.date.fromisoformat(options["start_date"])
+            end_date = datetime.date.fromisoformat(options["end_date"] or options["start_date"])
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        if end_date < start_date:
+            raise CommandError("End date must not be before start date")
+
+        current = start_date
+        while current <= end_date:
+            shops = specialists = 0
+            if not options["skip_shops"]:
+                shops = AnalyticsRollupService.rollup_shop_analytics(current, options["shop_ids"])
+            if not options["skip_specialists"]:
+                specialists = AnalyticsRollupService.rollup_specialist_analytics(
+                    current, options["specialist_ids"]
+                )
+
+            self.stdout.write(
+                self.style.SUCCESS(f"{current}: {shops} shop and {specialists} specialist rows")
+            )
+            current += datetime.timedelta(days=1)
@@ -9,17 +9,18 @@ establishments within their category or region.
 
 from datetime import timedelta
 
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.utils import timezone
 
-from apps.bookingapp.models import Appointment
-from apps.categoryapp.models import Category
-from apps.queueapp.models import QueueTicket
+from apps.categoriesapp.models import Category
 from apps.reportanalyticsapp.services.analytics_service import AnalyticsService
-from apps.reviewapp.models import Review
-from apps.serviceapp.models import Service
+from apps.reportanalyticsapp.services.cohort_benchmark_service import (
+    LOWER_IS_BETTER,
+    METRICS,
+    CohortBenchmarkService,
+    is_benchmarkable,
+)
 from apps.shopapp.models import Shop
-from apps.specialistsapp.models import Specialist
 from core.cache.cache_manager import cache_with_key_prefix
 
 
@@ -30,16 +31,7 @@ class BenchmarkService:
     """
 
     # Benchmark metrics that can be compared
-    BENCHMARK_METRICS = [
-        "average_rating",
-        "cancellation_rate",
-        "no_show_rate",
-        "wait_time",
-        "service_time",
-        "revenue_per_appointment",
-        "appointments_per_specialist",
-        "customer_return_rate",
-    ]
+    BENCHMARK_METRICS = METRICS
 
     @staticmethod
     @cache_with_key_prefix("shop_benchmarks", timeout=86400)  # Cache for 1 day
@@ -61,6 +53,11 @@ class BenchmarkService:
         except Shop.DoesNotExist:
             return {"error": "Shop not found"}
 
+        # Nightly precomputed cohorts, see CohortBenchmarkService
+        cohort = CohortBenchmarkService.get_cohort(shop_id, period, comparison_type)
+        if cohort is not None:
+            return BenchmarkService._get_cohort_benchmarks(shop, period, comparison_type, cohort)
+
         # Calculate date range
         days = AnalyticsService.TIME_PERIODS.get(period, 30)
         end_date = timezone.now()
@@ -204,59 +201,57 @@ class BenchmarkService:
                 "error": f"Invalid metric. Supported metrics are: {', '.join(BenchmarkService.BENCHMARK_METRICS)}"
             }
 
-        # Get shop benchmarks
-        benchmarks = BenchmarkService.get_shop_benchmarks(
-            shop_id, period, comparison_type
-        )
+        # Nightly precomputed cohorts, see CohortBenchmarkService
+        cohort = CohortBenchmarkService.get_cohort(shop_id, period, comparison_type)
 
-        if "error" in benchmarks:
-            return benchmarks
+        if cohort is not None:
+            shop_value = cohort["shop_metrics"][metric]
+            sorted_values = cohort["values"][metric]
+            total_shops = len(cohort["members"])
+        else:
+            # Get shop benchmarks
+            benchmarks = BenchmarkService.get_shop_benchmarks(shop_id, period, comparison_type)
 
-        # Get shop and benchmark values for the metric
-        shop_value = benchmarks["shop_metrics"].get(metric, 0)
+            if "error" in benchmarks:
+                return benchmarks
 
-        # Get all shops for calculating percentile
-        similar_shop_ids = []
-        for shop in BenchmarkService._get_similar_shops(
-            Shop.objects.get(id=shop_id), comparison_type
-        ):
-            similar_shop_ids.append(shop.id)
+            # Get shop and benchmark values for the metric
+            shop_value = benchmarks["shop_metrics"].get(metric, 0)
 
-        # Add current shop to the list
-        similar_shop_ids.append(shop_id)
+            # Get all shops for calculating percentile
+            similar_shop_ids = [
+                shop.id
+                for shop in BenchmarkService._get_similar_shops(
+                    Shop.objects.get(id=shop_id), comparison_type
+                )
+            ]
 
-        # Calculate date range
-        days = AnalyticsService.TIME_PERIODS.get(period, 30)
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+            # Add current shop to the list
+            if shop_id not in similar_shop_ids:
+                similar_shop_ids.append(shop_id)
+            total_shops = len(similar_shop_ids)
 
-        # Get all values for the metric across similar shops
-        metric_values = BenchmarkService._get_metric_values_by_shop(
-            similar_shop_ids, metric, start_date, end_date
-        )
+            # Calculate date range
+            days = AnalyticsService.TIME_PERIODS.get(period, 30)
+            end_date = timezone.now()
+            start_date = end_date - timedelta(days=days)
+
+            # Get all values for the metric across similar shops
+            sorted_values = sorted(
+                BenchmarkService._get_metric_values_by_shop(
+                    similar_shop_ids, metric, start_date, end_date
+                )
+            )
 
-        if not metric_values:
+        if not sorted_values:
             return {
                 "error": "Insufficient data to calculate percentile",
                 "shop_id": shop_id,
                 "metric": metric,
             }
 
-        # Calculate percentile
-        sorted_values = sorted(metric_values)
-        shop_index = 0
-
-        for i, value in enumerate(sorted_values):
-            if value >= shop_value:
-                shop_index = i
-                break
-
-        # For metrics where lower is better, invert the percentile
-        invert_metrics = ["cancellation_rate", "no_show_rate", "wait_time"]
-        percentile = shop_index / len(sorted_values) * 100
-
-        if metric in invert_metrics:
-            percentile = 100 - percentile
+        # Calculate percentile (inverted for metrics where lower is better)
+        percentile = CohortBenchmarkService.percentile(metric, sorted_values, shop_value)
 
         # Determine performance level based on percentile
         performance_level = BenchmarkService._get_performance_level(percentile)
@@ -266,7 +261,7 @@ class BenchmarkService:
             "metric": metric,
             "shop_value": shop_value,
             "percentile": round(percentile, 2),
-            "total_shops": len(similar_shop_ids),
+            "total_shops": total_shops,
             "performance_level": performance_level,
             "comparison_type": comparison_type,
         }
@@ -561,7 +556,7 @@ class BenchmarkService:
 
         elif comparison_type == "size":
             # Get shops of similar size (by specialist count)
-            specialist_count = shop.specialists.count()
+            specialist_count = shop.specialist_count
 
             # Define size ranges (small: 1-3, medium: 4-10, large: 11+)
             if specialist_count <= 3:
@@ -574,14 +569,11 @@ class BenchmarkService:
                 min_specialists = 11
                 max_specialists = 1000  # No upper limit
 
-            similar_shops = (
-                Shop.objects.annotate(specialist_count=Count("specialists"))
-                .filter(
-                    specialist_count__gte=min_specialists,
-                    specialist_count__lte=max_specialists,
-                    is_active=True,
-                )
-                .distinct()
+            # Denormalized counter, see ShopCounterService
+            similar_shops = Shop.objects.filter(
+                specialist_count__gte=min_specialists,
+                specialist_count__lte=max_specialists,
+                is_active=True,
             )
 
         else:
@@ -592,57 +584,54 @@ class BenchmarkService:
         return similar_shops[:max_shops]
 
     @staticmethod
-    def _calculate_shop_metrics(shop_id, start_date, end_date):
-        """Calculate metrics for a specific shop"""
-        metrics = {}
-
-        # Average rating
-        metrics["average_rating"] = BenchmarkService._calculate_average_rating(
-            shop_id, start_date, end_date
-        )
+    def _get_cohort_benchmarks(shop, period, comparison_type, cohort):
+        """Build shop benchmarks from a precomputed cohort"""
+        shop_key = str(shop.id)
+        similar_shop_count = len(cohort["members"]) - (shop_key in cohort["members"])
 
-        # Cancellation rate
-        metrics["cancellation_rate"] = BenchmarkService._calculate_cancellation_rate(
-            shop_id, start_date, end_date
-        )
+        if not similar_shop_count:
+            return {
+                "error": "No similar shops found for benchmarking",
+                "shop_id": shop.id,
+                "comparison_type": comparison_type,
+            }
 
-        # No-show rate
-        metrics["no_show_rate"] = BenchmarkService._calculate_no_show_rate(
-            shop_id, start_date, end_date
-        )
+        shop_metrics = cohort["shop_metrics"]
 
-        # Average wait time
-        metrics["wait_time"] = BenchmarkService._calculate_wait_time(
-            shop_id, start_date, end_date
-        )
+        # Benchmark against the cohort without the shop itself
+        values = cohort["values"]
+        if shop_key in cohort["members"]:
+            values = {
+                metric: CohortBenchmarkService.without(metric_values, shop_metrics[metric])
+                for metric, metric_values in values.items()
+            }
 
-        # Average service time
-        metrics["service_time"] = BenchmarkService._calculate_service_time(
-            shop_id, start_date, end_date
-        )
+        benchmark_metrics = {}
+        for metric, metric_values in values.items():
+            summary = CohortBenchmarkService.summarize(metric_values)
+            if summary is not None:
+                benchmark_metrics[metric] = summary
 
-        # Revenue per appointment
-        metrics["revenue_per_appointment"] = (
-            BenchmarkService._calculate_revenue_per_appointment(
-                shop_id, start_date, end_date
-            )
-        )
+        comparison = BenchmarkService._create_comparison(shop_metrics, benchmark_metrics, values)
 
-        # Appointments per specialist
-        metrics["appointments_per_specialist"] = (
-            BenchmarkService._calculate_appointments_per_specialist(
-                shop_id, start_date, end_date
-            )
-        )
-
-        # Customer return rate
-        metrics["customer_return_rate"] = (
-            BenchmarkService._calculate_customer_return_rate(
-                shop_id, start_date, end_date
-            )
-        )
+        return {
+            "shop_id": shop.id,
+            "shop_name": shop.name,
+            "period": period,
+            "comparison_type": comparison_type,
+            "start_date": cohort["start_date"],
+            "end_date": cohort["end_date"],
+            "similar_shop_count": similar_shop_count,
+            "shop_metrics": shop_metrics,
+            "benchmark_metrics": benchmark_metrics,
+            "comparison": comparison,
+        }
 
-        return metrics
+    @staticmethod
+    def _calculate_shop_metrics(shop_id, start_date, end_date):
+        """Calculate metrics for a specific shop"""
+        metrics = CohortBenchmarkService.compute_metrics([shop_id], start_date, end_date)
+        return metrics[shop_id]
 
     @staticmethod
     def _calculate_benchmark_metrics(shop_ids, start_date, end_date):
@@ -650,150 +639,26 @@ class BenchmarkService:
         if not shop_ids:
             return {}
 
-        results = {}
-
-        # Average rating across shops
-        avg_ratings = []
-        for shop_id in shop_ids:
-            rating = BenchmarkService._calculate_average_rating(
-                shop_id, start_date, end_date
-            )
-            if rating > 0:
-                avg_ratings.append(rating)
-
-        if avg_ratings:
-            results["average_rating"] = {
-                "mean": round(sum(avg_ratings) / len(avg_ratings), 2),
-                "min": round(min(avg_ratings), 2),
-                "max": round(max(avg_ratings), 2),
-                "count": len(avg_ratings),
-            }
-
-        # Cancellation rate across shops
-        cancellation_rates = []
-        for shop_id in shop_ids:
-            rate = BenchmarkService._calculate_cancellation_rate(
-                shop_id, start_date, end_date
-            )
-            if rate >= 0:
-                cancellation_rates.append(rate)
-
-        if cancellation_rates:
-            results["cancellation_rate"] = {
-                "mean": round(sum(cancellation_rates) / len(cancellation_rates), 2),
-                "min": round(min(cancellation_rates), 2),
-                "max": round(max(cancellation_rates), 2),
-                "count": len(cancellation_rates),
-            }
-
-        # No-show rate across shops
-        no_show_rates = []
-        for shop_id in shop_ids:
-            rate = BenchmarkService._calculate_no_show_rate(
-                shop_id, start_date, end_date
-            )
-            if rate >= 0:
-                no_show_rates.append(rate)
-
-        if no_show_rates:
-            results["no_show_rate"] = {
-                "mean": round(sum(no_show_rates) / len(no_show_rates), 2),
-                "min": round(min(no_show_rates), 2),
-                "max": round(max(no_show_rates), 2),
-                "count": len(no_show_rates),
-            }
-
-        # Wait time across shops
-        wait_times = []
-        for shop_id in shop_ids:
-            time = BenchmarkService._calculate_wait_time(shop_id, start_date, end_date)
-            if time > 0:
-                wait_times.append(time)
-
-        if wait_times:
-            results["wait_time"] = {
-                "mean": round(sum(wait_times) / len(wait_times), 2),
-                "min": round(min(wait_times), 2),
-                "max": round(max(wait_times), 2),
-                "count": len(wait_times),
-            }
-
-        # Service time across shops
-        service_times = []
-        for shop_id in shop_ids:
-            time = BenchmarkService._calculate_service_time(
-                shop_id, start_date, end_date
-            )
-            if time > 0:
-                service_times.append(time)
-
-        if service_times:
-            results["service_time"] = {
-                "mean": round(sum(service_times) / len(service_times), 2),
-                "min": round(min(service_times), 2),
-                "max": round(max(service_times), 2),
-                "count": len(service_times),
-            }
-
-        # Revenue per appointment across shops
-        revenues = []
-        for shop_id in shop_ids:
-            revenue = BenchmarkService._calculate_revenue_per_appointment(
-                shop_id, start_date, end_date
-            )
-            if revenue > 0:
-                revenues.append(revenue)
-
-        if revenues:
-            results["revenue_per_appointment"] = {
-                "mean": round(sum(revenues) / len(revenues), 2),
-                "min": round(min(revenues), 2),
-                "max": round(max(revenues), 2),
-                "count": len(revenues),
-            }
-
-        # Appointments per specialist across shops
-        appointments_per_specialist = []
-        for shop_id in shop_ids:
-            count = BenchmarkService._calculate_appointments_per_specialist(
-                shop_id, start_date, end_date
-            )
-            if count > 0:
-                appointments_per_specialist.append(count)
-
-        if appointments_per_specialist:
-            results["appointments_per_specialist"] = {
-                "mean": round(
-                    sum(appointments_per_specialist) / len(appointments_per_specialist),
-                    2,
-                ),
-                "min": round(min(appointments_per_specialist), 2),
-                "max": round(max(appointments_per_specialist), 2),
-                "count": len(appointments_per_specialist),
-            }
+        values = CohortBenchmarkService.sorted_values(
+            CohortBenchmarkService.compute_metrics(shop_ids, start_date, end_date).values()
+        )
 
-        # Customer return rate across shops
-        return_rates = []
-        for shop_id in shop_ids:
-            rate = BenchmarkService._calculate_customer_return_rate(
-                shop_id, start_date, end_date
-            )
-            if rate >= 0:
-                return_rates.append(rate)
-
-        if return_rates:
-            results["customer_return_rate"] = {
-                "mean": round(sum(return_rates) / len(return_rates), 2),
-                "min": round(min(return_rates), 2),
-                "max": round(max(return_rates), 2),
-                "count": len(return_rates),
-            }
+        results = {}
+        for metric, metric_values in values.items():
+            summary = CohortBenchmarkService.summarize(metric_values)
+            if summary is not None:
+                results[metric] = summary
 
         return results
 
     @staticmethod
-    def _create_comparison(shop_metrics, benchmark_metrics):
-        """Create comparison between shop and benchmark metrics"""
+    def _create_comparison(shop_metrics, benchmark_metrics, values=None):
+        """
+        Create comparison between shop and benchmark metrics
+
+        Percentiles are exact when the sorted benchmark values of each metric
+        are given, and interpolated between min and max otherwise.
+        """
         comparison = {}
 
         for metric, value in shop_metrics.items():
@@ -806,28 +671,24 @@ class BenchmarkService:
                 else:
                     relative = 0 if value == 0 else 100
 
-                # Determine if higher is better for this metric
-                higher_is_better = metric not in [
-                    "cancellation_rate",
-                    "no_show_rate",
-                    "wait_time",
-                ]
-
-                # Determine percentile (approximate)
-                if value <= benchmark["min"]:
-                    percentile = 0
-                elif value >= benchmark["max"]:
-                    percentile = 100
+                if values and values.get(metric):
+                    percentile = CohortBenchmarkService.percentile(metric, values[metric], value)
                 else:
-                    range_size = benchmark["max"] - benchmark["min"]
-                    if range_size > 0:
-                        percentile = ((value - benchmark["min"]) / range_size) * 100
+                    # Determine percentile (approximate)
+                    if value <= benchmark["min"]:
+                        percentile = 0
+                    elif value >= benchmark["max"]:
+                        percentile = 100
                     else:
-                        percentile = 50  # Default to middle if min=max
+                        range_size = benchmark["max"] - benchmark["min"]
+                        if range_size > 0:
+                            percentile = ((value - benchmark["min"]) / range_size) * 100
+                        else:
+                            percentile = 50  # Default to middle if min=max
 
-                # Invert percentile for metrics where lower is better
-                if not higher_is_better:
-                    percentile = 100 - percentile
+                    # Invert percentile for metrics where lower is better
+                    if metric in LOWER_IS_BETTER:
+                        percentile = 100 - percentile
 
                 # Determine performance level
                 performance_level = BenchmarkService._get_performance_level(percentile)
@@ -847,52 +708,14 @@ class BenchmarkService:
     @staticmethod
     def _get_metric_values_by_shop(shop_ids, metric, start_date, end_date):
         """Get values for a specific metric for multiple shops"""
-        values = []
-
-        for shop_id in shop_ids:
-            if metric == "average_rating":
-                value = BenchmarkService._calculate_average_rating(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "cancellation_rate":
-                value = BenchmarkService._calculate_cancellation_rate(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "no_show_rate":
-                value = BenchmarkService._calculate_no_show_rate(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "wait_time":
-                value = BenchmarkService._calculate_wait_time(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "service_time":
-                value = BenchmarkService._calculate_service_time(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "revenue_per_appointment":
-                value = BenchmarkService._calculate_revenue_per_appointment(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "appointments_per_specialist":
-                value = BenchmarkService._calculate_appointments_per_specialist(
-                    shop_id, start_date, end_date
-                )
-            elif metric == "customer_return_rate":
-                value = BenchmarkService._calculate_customer_return_rate(
-                    shop_id, start_date, end_date
-                )
-            else:
-                value = 0
-
-            # Only include valid values
-            if value > 0 or (
-                metric in ["cancellation_rate", "no_show_rate", "customer_return_rate"]
-                and value >= 0
-            ):
-                values.append(value)
+        metrics = CohortBenchmarkService.compute_metrics(shop_ids, start_date, end_date)
 
-        return values
+        # Only include valid values
+        return [
+            shop_metrics[metric]
+            for shop_metrics in metrics.values()
+            if is_benchmarkable(metric, shop_metrics[metric])
+        ]
 
     @staticmethod
     def _find_potential_competitors(shop):
@@ -916,82 +739,32 @@ class BenchmarkService:
     @staticmethod
     def _get_top_performers(shop_ids, start_date, end_date):
         """Get top performing shops for each metric"""
+        metrics = CohortBenchmarkService.compute_metrics(shop_ids, start_date, end_date)
+        shop_names = dict(Shop.objects.filter(id__in=list(metrics)).values_list("id", "name"))
+
         top_performers = {}
 
         for metric in BenchmarkService.BENCHMARK_METRICS:
-            # Get all values for this metric
-            shop_values = []
-
-            for shop_id in shop_ids:
-                # Continuing benchmark_service.py from where we left off
-                if metric == "average_rating":
-                    value = BenchmarkService._calculate_average_rating(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "cancellation_rate":
-                    value = BenchmarkService._calculate_cancellation_rate(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "no_show_rate":
-                    value = BenchmarkService._calculate_no_show_rate(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "wait_time":
-                    value = BenchmarkService._calculate_wait_time(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "service_time":
-                    value = BenchmarkService._calculate_service_time(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "revenue_per_appointment":
-                    value = BenchmarkService._calculate_revenue_per_appointment(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "appointments_per_specialist":
-                    value = BenchmarkService._calculate_appointments_per_specialist(
-                        shop_id, start_date, end_date
-                    )
-                elif metric == "customer_return_rate":
-                    value = BenchmarkService._calculate_customer_return_rate(
-                        shop_id, start_date, end_date
-                    )
-                else:
-                    value = 0
-
-                # Only include valid values
-                if value > 0 or (
-                    metric in ["cancellation_rate", "no_show_rate"] and value >= 0
-                ):
-                    try:
-                        shop = Shop.objects.get(id=shop_id)
-                        shop_values.append(
-                            {
-                                "shop_id": str(shop_id),
-                                "shop_name": shop.name,
-                                "value": value,
-                            }
-                        )
-                    except Shop.DoesNotExist:
-                        continue
+            # Only include valid values of existing shops
+            shop_values = [
+                {
+                    "shop_id": str(shop_id),
+                    "shop_name": shop_names[shop_id],
+                    "value": shop_metrics[metric],
+                }
+                for shop_id, shop_metrics in metrics.items()
+                if shop_id in shop_names and is_benchmarkable(metric, shop_metrics[metric])
+            ]
 
             if not shop_values:
                 continue
 
-            # Determine if higher is better for this metric
-            higher_is_better = metric not in [
-                "cancellation_rate",
-                "no_show_rate",
-                "wait_time",
-            ]
-
-            # Sort values (ascending or descending based on metric)
-            if higher_is_better:
-                sorted_values = sorted(
-                    shop_values, key=lambda x: x["value"], reverse=True
-                )
-            else:
-                sorted_values = sorted(shop_values, key=lambda x: x["value"])
+            # Sort values (ascending when lower is better)
+            sorted_values = sorted(
+                shop_values,
+                key=lambda x: x["value"],
+                reverse=metric not in LOWER_IS_BETTER,
+            )
 
             # Get top 5 performers
             top_performers[metric] = sorted_values[:5]
@@ -1047,247 +820,3 @@ class BenchmarkService:
         significance = (abs(normalized_slope) * 0.7 + cv * 0.3) * 100
 
         return round(min(significance, 100), 2)  # Cap at 100
-
-    # Individual metric calculation methods
-
-    @staticmethod
-    def _calculate_average_rating(shop_id, start_date, end_date):
-        """Calculate average rating for a shop"""
-        # Get shop reviews
-        shop_reviews = Review.objects.filter(
-            content_type__model="shop",
-            object_id=shop_id,
-            created_at__gte=start_date,
-            created_at__lte=end_date,
-        )
-
-        # Get specialist reviews for the shop
-        specialist_ids = Specialist.objects.filter(
-            employee__shop_id=shop_id
-        ).values_list("id", flat=True)
-
-        specialist_reviews = Review.objects.filter(
-            content_type__model="specialist",
-            object_id__in=specialist_ids,
-            created_at__gte=start_date,
-            created_at__lte=end_date,
-        )
-
-        # Get service reviews for the shop
-        service_ids = Service.objects.filter(shop_id=shop_id).values_list(
-            "id", flat=True
-        )
-
-        service_reviews = Review.objects.filter(
-            content_type__model="service",
-            object_id__in=service_ids,
-            created_at__gte=start_date,
-            created_at__lte=end_date,
-        )
-
-        # Combine all reviews
-        all_reviews = (
-            list(shop_reviews) + list(specialist_reviews) + list(service_reviews)
-        )
-
-        # Calculate average rating
-        if all_reviews:
-            avg_rating = sum(review.rating for review in all_reviews) / len(all_reviews)
-            return round(avg_rating, 2)
-        else:
-            return 0
-
-    @staticmethod
-    def _calculate_cancellation_rate(shop_id, start_date, end_date):
-        """Calculate cancellation rate for a shop"""
-        # Get all appointments
-        appointments = Appointment.objects.filter(
-            shop_id=shop_id, start_time__gte=start_date, start_time__lte=end_date
-        )
-
-        total_count = appointments.count()
-
-        if total_count == 0:
-            return -1  # No appointments
-
-        # Count cancelled appointments
-        cancelled_count = appointments.filter(status="cancelled").count()
-
-        # Calculate cancellation rate
-        cancellation_rate = (cancelled_count / total_count) * 100
-
-        return round(cancellation_rate, 2)
-
-    @staticmethod
-    def _calculate_no_show_rate(shop_id, start_date, end_date):
-        """Calculate no-show rate for a shop"""
-        # Get all appointments
-        appointments = Appointment.objects.filter(
-            shop_id=shop_id, start_time__gte=start_date, start_time__lte=end_date
-        )
-
-        total_count = appointments.count()
-
-        if total_count == 0:
-            return -1  # No appointments
-
-        # Count no-show appointments
-        no_show_count = appointments.filter(status="no_show").count()
-
-        # Calculate no-show rate
-        no_show_rate = (no_show_count / total_count) * 100
-
-        return round(no_show_rate, 2)
-
-    @staticmethod
-    def _calculate_wait_time(shop_id, start_date, end_date):
-        """Calculate average wait time for a shop"""
-        # Get queue tickets
-        tickets = QueueTicket.objects.filter(
-            queue__shop_id=shop_id,
-            join_time__gte=start_date,
-            join_time__lte=end_date,
-            status="served",
-            join_time__isnull=False,
-            serve_time__isnull=False,
-        )
-
-        if not tickets.exists():
-            return 0  # No queue data
-
-        # Calculate average wait time
-        total_wait_time = 0
-        count = 0
-
-        for ticket in tickets:
-            wait_time = (
-                ticket.serve_time - ticket.join_time
-            ).total_seconds() / 60  # in minutes
-            total_wait_time += wait_time
-            count += 1
-
-        if count == 0:
-            return 0
-
-        avg_wait_time = total_wait_time / count
-
-        return round(avg_wait_time, 2)
-
-    @staticmethod
-    def _calculate_service_time(shop_id, start_date, end_date):
-        """Calculate average service time for a shop"""
-        # Get completed appointments
-        appointments = Appointment.objects.filter(
-            shop_id=shop_id,
-            start_time__gte=start_date,
-            start_time__lte=end_date,
-            status="completed",
-            start_time__isnull=False,
-            end_time__isnull=False,
-        )
-
-        if not appointments.exists():
-            return 0  # No completed appointments
-
-        # Calculate average service time
-        total_service_time = 0
-        count = 0
-
-        for appointment in appointments:
-            service_time = (
-                appointment.end_time - appointment.start_time
-            ).total_seconds() / 60  # in minutes
-            total_service_time += service_time
-            count += 1
-
-        if count == 0:
-            return 0
-
-        avg_service_time = total_service_time / count
-
-        return round(avg_service_time, 2)
-
-    @staticmethod
-    def _calculate_revenue_per_appointment(shop_id, start_date, end_date):
-        """Calculate average revenue per appointment for a shop"""
-        # Get completed appointments
-        appointments = Appointment.objects.filter(
-            shop_id=shop_id,
-            start_time__gte=start_date,
-            start_time__lte=end_date,
-            status="completed",
-        )
-
-        if not appointments.exists():
-            return 0  # No completed appointments
-
-        # Calculate total revenue
-        total_revenue = 0
-
-        for appointment in appointments:
-            # Assuming service price is the revenue
-            total_revenue += appointment.service.price
-
-        # Calculate average revenue per appointment
-        avg_revenue = total_revenue / appointments.count()
-
-        return round(avg_revenue, 2)
-
-    @staticmethod
-    def _calculate_appointments_per_specialist(shop_id, start_date, end_date):
-        """Calculate average appointments per specialist for a shop"""
-        # Get specialists for the shop
-        specialists = Specialist.objects.filter(
-            employee__shop_id=shop_id, employee__is_active=True
-        )
-
-        if not specialists.exists():
-            return 0  # No specialists
-
-        # Get completed appointments
-        appointments = Appointment.objects.filter(
-            shop_id=shop_id,
-            start_time__gte=start_date,
-            start_time__lte=end_date,
-            status="completed",
-        )
-
-        if not appointments.exists():
-            return 0  # No completed appointments
-
-        # Calculate appointments per specialist
-        appointments_per_specialist = appointments.count() / specialists.count()
-
-        return round(appointments_per_specialist, 2)
-
-    @staticmethod
-    def _calculate_customer_return_rate(shop_id, start_date, end_date):
-        """Calculate customer return rate for a shop"""
-        # Get all customers who had appointments in the period
-        customer_ids = (
-            Appointment.objects.filter(
-                shop_id=shop_id, start_time__gte=start_date, start_time__lte=end_date
-            )
-            .values_list("customer_id", flat=True)
-            .distinct()
-        )
-
-        if not customer_ids:
-            return -1  # No customers
-
-        # Count returning customers (those who had previous appointments)
-        returning_count = 0
-
-        for customer_id in customer_ids:
-            # Check if customer had previous appointments before the start date
-            previous_appointments = Appointment.objects.filter(
-                shop_id=shop_id, customer_id=customer_id, start_time__lt=start_date
-            ).exists()
-
-            if previous_appointments:
-                returning_count += 1
-
-        # Calculate return rate
-        return_rate = (returning_count / len(customer_ids)) * 100
-
-        return round(return_rate, 2)
@@ -0,0 +1,512 @@
+# apps/reportanalyticsapp/services/cohort_benchmark_service.py
+"""
+Cohort Benchmark Service
+
+Precomputed benchmark cohorts for BenchmarkService. A nightly build computes
+every benchmark metric for every active shop with a handful of grouped
+queries per batch of shops, then groups the shops into cohorts by category,
+by city and by size band (the comparison types of BenchmarkService).
+
+Each cohort is stored with the metrics of its members and, per metric, the
+sorted values of the members that have data. A percentile is then a binary
+search in a sorted list, and benchmark statistics are read off the same list,
+instead of recomputing the metrics of the whole cohort on every request.
+
+Snapshots are versioned per period and replaced as a whole, so readers never
+mix cohorts of two builds.
+"""
+
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Avg,
+    Count,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+)
+from django.utils import timezone
+
+from apps.bookingapp.models import Appointment
+from apps.queueapp.models import QueueTicket
+from apps.reportanalyticsapp.services.analytics_service import AnalyticsService
+from apps.reviewapp.models import ServiceReview, ShopReview, SpecialistReview
+from apps.serviceapp.models import Service
+from apps.shopapp.models import Shop
+from apps.specialistsapp.models import Specialist
+from utils.cache_utils import LocalLRU
+
+logger = logging.getLogger(__name__)
+
+# Benchmark metrics that can be compared
+METRICS = [
+    "average_rating",
+    "cancellation_rate",
+    "no_show_rate",
+    "wait_time",
+    "service_time",
+    "revenue_per_appointment",
+    "appointments_per_specialist",
+    "customer_return_rate",
+]
+
+# Metrics where a lower value is better
+LOWER_IS_BETTER = ["cancellation_rate", "no_show_rate", "wait_time"]
+
+# Rates are -1 for shops without appointments and count from 0; every other
+# metric is 0 when a shop has no data
+RATE_METRICS = ["cancellation_rate", "no_show_rate", "customer_return_rate"]
+
+
+def is_benchmarkable(metric, value):
+    """Whether a shop's metric value has data to benchmark against."""
+    return value >= 0 if metric in RATE_METRICS else value > 0
+
+
+def size_band(specialist_count):
+    """Size band of a shop (small: up to 3, medium: 4-10, large: 11+ specialists)."""
+    if specialist_count <= 3:
+        return "small"
+    elif specialist_count <= 10:
+        return "medium"
+    return "large"
+
+
+def _minutes(total, count):
+    return round(total.total_seconds() / 60 / count, 2) if total and count else 0
+
+
+def _rate(part, total):
+    return round(part / total * 100, 2) if total else -1
+
+
+class CohortBenchmarkService:
+    """
+    Service for building and reading precomputed benchmark cohorts.
+    """
+
+    KEY_PREFIX = "cohort_benchmarks:"
+
+    # Periods built every night
+    PERIODS = ["last_30_days", "last_90_days", "last_year"]
+
+    # Snapshots outlive a missed nightly build
+    TTL = getattr(settings, "COHORT_BENCHMARK_TTL", 60 * 60 * 48)
+
+    # Number of shops whose metrics are computed per set of queries
+    BATCH_SIZE = 500
+
+    # Cohorts are immutable per version, so they are kept in-process as well
+    _local = LocalLRU(maxsize=getattr(settings, "COHORT_BENCHMARK_LOCAL_SIZE", 256))
+
+    @classmethod
+    def _version_key(cls, period):
+        return f"{cls.KEY_PREFIX}{period}:version"
+
+    @classmethod
+    def _key(cls, period, version, kind, name):
+        return f"{cls.KEY_PREFIX}{period}:{version}:{kind}:{name}"
+
+    # ------------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _batches(ids, size):
+        ids = list(ids)
+        for start in range(0, len(ids), size):
+            yield ids[start : start + size]
+
+    @classmethod
+    def compute_metrics(cls, shop_ids, start_date, end_date):
+        """
+        Compute every benchmark metric for many shops.
+
+        Args:
+            shop_ids: Shop IDs
+            start_date: Start of the period
+            end_date: End of the period
+
+        Returns:
+            Dict mapping shop ID to a dict of metric values
+        """
+        metrics = {}
+        for batch in cls._batches(shop_ids, cls.BATCH_SIZE):
+            metrics.update(cls._compute_batch(batch, start_date, end_date))
+        return metrics
+
+    @staticmethod
+    def _compute_batch(shop_ids, start_date, end_date):
+        appointments = Appointment.objects.filter(
+            shop_id__in=shop_ids, start_time__gte=start_date, start_time__lte=end_date
+        )
+        completed = Q(status="completed")
+        timed = Q(status="completed", end_time__isnull=False)
+
+        # Status counts, revenue, service time and customers in one grouped query
+        booking_stats = {
+            str(row["shop_id"]): row
+            for row in appointments.values("shop_id").annotate(
+                total=Count("id"),
+                cancelled=Count("id", filter=Q(status="cancelled")),
+                no_show=Count("id", filter=Q(status="no_show")),
+                completed=Count("id", filter=completed),
+                revenue=Avg("service__price", filter=completed),
+                timed=Count("id", filter=timed),
+                service_time=Sum(
+                    ExpressionWrapper(
+                        F("end_time") - F("start_time"), output_field=DurationField()
+                    ),
+                    filter=timed,
+                ),
+                customers=Count("customer_id", distinct=True),
+            )
+        }
+
+        # Customers with an earlier booking at the same shop (semi-join)
+        earlier_bookings = Appointment.objects.filter(
+            shop_id=OuterRef("shop_id"),
+            customer_id=OuterRef("customer_id"),
+            start_time__lt=start_date,
+        )
+        returning = {
+            str(row["shop_id"]): row["returning"]
+            for row in appointments.filter(Exists(earlier_bookings))
+            .values("shop_id")
+            .annotate(returning=Count("customer_id", distinct=True))
+        }
+
+        wait_times = {
+            str(row["shop_id"]): row
+            for row in QueueTicket.objects.filter(
+                queue__shop_id__in=shop_ids,
+                join_time__gte=start_date,
+                join_time__lte=end_date,
+                status="served",
+                serve_time__isnull=False,
+            )
+            .values(shop_id=F("queue__shop_id"))
+            .annotate(
+                total=Sum(
+                    ExpressionWrapper(
+                        F("serve_time") - F("join_time"), output_field=DurationField()
+                    )
+                ),
+                count=Count("id"),
+            )
+        }
+
+        specialists = {
+            str(row["shop_id"]): row["count"]
+            for row in Specialist.objects.filter(
+                employee__shop_id__in=shop_ids, employee__is_active=True
+            )
+            .values(shop_id=F("employee__shop_id"))
+            .annotate(count=Count("id"))
+        }
+
+        # Reviews of the shop, its specialists and its services
+        ratings = defaultdict(lambda: [0, 0])
+        for model, shop_field in (
+            (ShopReview, "shop_id"),
+            (SpecialistReview, "specialist__employee__shop_id"),
+            (ServiceReview, "service__shop_id"),
+        ):
+            for row in (
+                model.objects.filter(
+                    **{f"{shop_field}__in": shop_ids},
+                    created_at__gte=start_date,
+                    created_at__lte=end_date,
+                )
+                .values(shop_field)
+                .annotate(total=Sum("rating"), count=Count("id"))
+            ):
+                ratings[str(row[shop_field])][0] += row["total"]
+                ratings[str(row[shop_field])][1] += row["count"]
+
+        # Keyed by the IDs as given, whether UUIDs or strings
+        metrics = {}
+        for shop_id in shop_ids:
+            key = str(shop_id)
+            stats = booking_stats.get(key, {})
+            total = stats.get("total", 0)
+            completed_count = stats.get("completed", 0)
+            rating_total, rating_count = ratings.get(key, (0, 0))
+            wait = wait_times.get(key, {})
+            specialist_count = specialists.get(key, 0)
+
+            metrics[shop_id] = {
+                "average_rating": (round(rating_total / rating_count, 2) if rating_count else 0),
+                "cancellation_rate": _rate(stats.get("cancelled", 0), total),
+                "no_show_rate": _rate(stats.get("no_show", 0), total),
+                "wait_time": _minutes(wait.get("total"), wait.get("count", 0)),
+                "service_time": _minutes(stats.get("service_time"), stats.get("timed", 0)),
+                "revenue_per_appointment": (
+                    round(float(stats["revenue"]), 2) if completed_count else 0
+                ),
+                "appointments_per_specialist": (
+                    round(completed_count / specialist_count, 2)
+                    if completed_count and specialist_count
+                    else 0
+                ),
+                "customer_return_rate": _rate(returning.get(key, 0), stats.get("customers", 0)),
+            }
+        return metrics
+
+    # ------------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def sorted_values(shop_metrics):
+        """
+        Get the sorted benchmarkable values of each metric.
+
+        Args:
+            shop_metrics: Iterable of metric dicts
+
+        Returns:
+            Dict mapping each metric to a sorted list of values
+        """
+        values = {metric: [] for metric in METRICS}
+        for metrics in shop_metrics:
+            for metric in METRICS:
+                value = metrics.get(metric, 0)
+                if is_benchmarkable(metric, value):
+                    values[metric].append(value)
+        for metric_values in values.values():
+            metric_values.sort()
+        return values
+
+    @staticmethod
+    def without(values, value):
+        """Get a copy of sorted values with one occurrence of a value removed."""
+        index = bisect_left(values, value)
+        if index < len(values) and values[index] == value:
+            return values[:index] + values[index + 1 :]
+        return values
+
+    @staticmethod
+    def summarize(values):
+        """
+        Summarize the sorted values of a metric.
+
+        Returns:
+            Dict with mean, min, max and count, or None without values
+        """
+        if not values:
+            return None
+        return {
+            "mean": round(sum(values) / len(values), 2),
+            "min": round(values[0], 2),
+            "max": round(values[-1], 2),
+            "count": len(values),
+        }
+
+    @staticmethod
+    def percentile(metric, values, value):
+        """
+        Percentile rank of a value among the sorted values of a metric.
+
+        The share of values below it, inverted for metrics where lower is
+        better.
+        """
+        percentile = bisect_left(values, value) / len(values) * 100
+        if metric in LOWER_IS_BETTER:
+            percentile = 100 - percentile
+        return percentile
+
+    # ------------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def cohort_names(comparison_type, categories, location, specialist_count):
+        """
+        Names of the cohorts a shop is compared against.
+
+        Args:
+            comparison_type: 'category', 'region' or 'size' (anything else
+                compares against every shop)
+            categories: Category IDs of the shop's services
+            location: Tuple of (city ID, country ID), or None
+            specialist_count: Number of specialists of the shop
+
+        Returns:
+            List of cohort names
+        """
+        if comparison_type == "category":
+            return [f"category:{category_id}" for category_id in categories]
+        elif comparison_type == "region":
+            return [f"region:{location[0]}:{location[1]}"] if location else []
+        elif comparison_type == "size":
+            return [f"size:{size_band(specialist_count)}"]
+        return ["all"]
+
+    @classmethod
+    def build(cls, periods=None):
+        """
+        Compute the metrics of every active shop and publish new cohorts.
+
+        Args:
+            periods: Optional periods to build (defaults to PERIODS)
+
+        Returns:
+            Number of cohorts built
+        """
+        shops = {
+            row["id"]: row
+            for row in Shop.objects.filter(is_active=True).values(
+                "id",
+                "specialist_count",
+                "location__city_id",
+                "location__country_id",
+            )
+        }
+        categories = defaultdict(list)
+        for shop_id, category_id in (
+            Service.objects.filter(shop_id__in=list(shops))
+            .values_list("shop_id", "category_id")
+            .distinct()
+        ):
+            categories[shop_id].append(category_id)
+
+        shop_cohorts = {}
+        for shop_id, shop in shops.items():
+            location = (
+                (shop["location__city_id"], shop["location__country_id"])
+                if shop["location__city_id"]
+                else None
+            )
+            shop_cohorts[shop_id] = {
+                comparison_type: cls.cohort_names(
+                    comparison_type,
+                    categories[shop_id],
+                    location,
+                    shop["specialist_count"],
+                )
+                for comparison_type in ("category", "region", "size", "all")
+            }
+
+        built = 0
+        end_date = timezone.now()
+        for period in periods or cls.PERIODS:
+            days = AnalyticsService.TIME_PERIODS.get(period, 30)
+            start_date = end_date - timedelta(days=days)
+            metrics = cls.compute_metrics(list(shops), start_date, end_date)
+
+            members = defaultdict(dict)
+            for shop_id, names in shop_cohorts.items():
+                for cohort_names in names.values():
+                    for name in cohort_names:
+                        members[name][str(shop_id)] = metrics[shop_id]
+
+            version = int(end_date.timestamp())
+            entries = {}
+            for shop_id, names in shop_cohorts.items():
+                entries[cls._key(period, version, "shop", shop_id)] = {
+                    "metrics": metrics[shop_id],
+                    "cohorts": names,
+                }
+            for name, cohort_members in members.items():
+                entries[cls._key(period, version, "cohort", name)] = {
+                    "members": cohort_members,
+                    "values": cls.sorted_values(cohort_members.values()),
+                }
+            cache.set_many(entries, cls.TTL)
+
+            # Publish the complete snapshot
+            cache.set(
+                cls._version_key(period),
+                {
+                    "version": version,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                },
+                cls.TTL,
+            )
+            built += len(members)
+
+        logger.info(f"Built {built} benchmark cohorts for {len(shops)} shops")
+        return built
+
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _get_cohorts(cls, keys):
+        """Read cohorts from the in-process LRU, then the shared cache."""
+        cohorts = {}
+        missing = []
+        for key in keys:
+            cohort = cls._local.get(key)
+            if cohort is None:
+                missing.append(key)
+            else:
+                cohorts[key] = cohort
+
+        if missing:
+            for key, cohort in cache.get_many(missing).items():
+                cls._local.set(key, cohort)
+                cohorts[key] = cohort
+        return cohorts
+
+    @classmethod
+    def get_cohort(cls, shop_id, period, comparison_type):
+        """
+        Get the precomputed cohort a shop is compared against.
+
+        Shops in several categories are compared against the union of their
+        category cohorts.
+
+        Args:
+            shop_id: Shop ID
+            period: Time period (one of PERIODS)
+            comparison_type: 'category', 'region' or 'size'
+
+        Returns:
+            Dict with start_date, end_date, shop_metrics, members (shop ID to
+            metrics, including the shop) and values (metric to sorted values),
+            or None when no snapshot covers the shop
+        """
+        snapshot = cache.get(cls._version_key(period))
+        if snapshot is None:
+            return None
+
+        version = snapshot["version"]
+        shop = cache.get(cls._key(period, version, "shop", shop_id))
+        if shop is None:
+            return None
+
+        names = shop["cohorts"].get(comparison_type, shop["cohorts"]["all"])
+        keys = [cls._key(period, version, "cohort", name) for name in names]
+        cohorts = cls._get_cohorts(keys)
+        if len(cohorts) != len(keys):
+            return None
+
+        if len(keys) == 1:
+            cohort = cohorts[keys[0]]
+            members, values = cohort["members"], cohort["values"]
+        else:
+            members = {}
+            for cohort in cohorts.values():
+                members.update(cohort["members"])
+            values = cls.sorted_values(members.values())
+
+        return {
+            "start_date": snapshot["start_date"],
+            "end_date": snapshot["end_date"],
+            "shop_metrics": shop["metrics"],
+            "members": members,
+            "values": values,
+        }
@@ -0,0 +1,315 @@
+# apps/reportanalyticsapp/services/rollup_service.py
+"""
+Analytics Rollup Service
+
+Set-based daily rollups for ShopAnalytics and SpecialistAnalytics. Each metric
+is computed for a whole batch of shops or specialists with a single grouped
+query (conditional aggregation for status counts, one GROUP BY hour for the
+peak hour histogram, one anti-join for new versus returning customers), and
+the analytics rows are written back with bulk operations.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Count,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+)
+from django.db.models.functions import ExtractHour
+
+from apps.bookingapp.models import Appointment
+from apps.queueapp.models import QueueTicket
+from apps.reportanalyticsapp.models import ShopAnalytics, SpecialistAnalytics
+from apps.reviewapp.models import ShopReview, SpecialistReview
+from apps.shopapp.models import Shop
+from apps.specialistsapp.models import Specialist, SpecialistWorkingHours
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsRollupService:
+    """
+    Service for computing daily shop and specialist analytics in bulk.
+    """
+
+    # Number of shops or specialists rolled up per set of queries
+    BATCH_SIZE = 500
+
+    STATUS_COUNTS = {
+        "total_bookings": Count("id"),
+        "bookings_completed": Count("id", filter=Q(status="completed")),
+        "bookings_cancelled": Count("id", filter=Q(status="cancelled")),
+        "bookings_no_show": Count("id", filter=Q(status="no_show")),
+    }
+
+    SHOP_FIELDS = [
+        "total_bookings",
+        "bookings_completed",
+        "bookings_cancelled",
+        "bookings_no_show",
+        "total_revenue",
+        "avg_wait_time",
+        "peak_hours",
+        "customer_ratings",
+        "new_customers",
+        "returning_customers",
+        "updated_at",
+    ]
+
+    SPECIALIST_FIELDS = [
+        "total_bookings",
+        "bookings_completed",
+        "bookings_cancelled",
+        "bookings_no_show",
+        "total_service_time",
+        "avg_service_duration",
+        "customer_ratings",
+        "utilization_rate",
+        "updated_at",
+    ]
+
+    @staticmethod
+    def _batches(ids, size):
+        ids = list(ids)
+        for start in range(0, len(ids), size):
+            yield ids[start : start + size]
+
+    @staticmethod
+    def _ratings(model, owner_field, owner_ids, date_obj):
+        """Average rating per reviewed shop or specialist on a date."""
+        return {
+            row[owner_field]: row["avg"]
+            for row in model.objects.filter(
+                **{f"{owner_field}__in": owner_ids},
+                created_at__date=date_obj,
+            )
+            .values(owner_field)
+            .annotate(avg=Avg("rating"))
+            if row["avg"] is not None
+        }
+
+    @staticmethod
+    def _upsert(model, owner_field, owner_ids, date_obj, fields, apply):
+        """
+        Load or instantiate the analytics rows of a batch, let apply() fill
+        them in and write them back with one bulk_update and one bulk_create.
+        """
+        existing = {
+            getattr(row, f"{owner_field}_id"): row
+            for row in model.objects.filter(**{f"{owner_field}_id__in": owner_ids}, date=date_obj)
+        }
+
+        to_update, to_create = [], []
+        for owner_id in owner_ids:
+            row = existing.get(owner_id)
+            if row is None:
+                row = model(**{f"{owner_field}_id": owner_id}, date=date_obj)
+                to_create.append(row)
+            else:
+                to_update.append(row)
+            apply(owner_id, row)
+
+        with transaction.atomic():
+            if to_update:
+                for row in to_update:
+                    # bulk_update bypasses save(), so refresh auto_now by hand
+                    model._meta.get_field("updated_at").pre_save(row, add=False)
+                model.objects.bulk_update(to_update, fields)
+            if to_create:
+                model.objects.bulk_create(to_create)
+
+        return len(to_update) + len(to_create)
+
+    @classmethod
+    def rollup_shop_analytics(cls, date_obj, shop_ids=None):
+        """
+        Compute ShopAnalytics rows for many shops on a date.
+
+        Args:
+            date_obj: Date to roll up
+            shop_ids: Optional shop IDs (defaults to every shop)
+
+        Returns:
+            Number of analytics rows written
+        """
+        if shop_ids is None:
+            shop_ids = Shop.objects.values_list("id", flat=True)
+        else:
+            # Unknown shops are skipped, like a missing Shop row
+            shop_ids = Shop.objects.filter(id__in=list(shop_ids)).values_list("id", flat=True)
+
+        written = 0
+        for batch in cls._batches(shop_ids, cls.BATCH_SIZE):
+            written += cls._rollup_shop_batch(date_obj, batch)
+        return written
+
+    @classmethod
+    def _rollup_shop_batch(cls, date_obj, shop_ids):
+        bookings = Appointment.objects.filter(shop_id__in=shop_ids, start_time__date=date_obj)
+        tickets = QueueTicket.objects.filter(queue__shop_id__in=shop_ids, join_time__date=date_obj)
+
+        # Status counts, revenue and unique customers in one grouped query
+        booking_stats = {
+            row["shop_id"]: row
+            for row in bookings.values("shop_id").annotate(
+                **cls.STATUS_COUNTS,
+                revenue=Sum("service__price", filter=Q(status="completed")),
+                unique_customers=Count("customer_id", distinct=True),
+            )
+        }
+
+        wait_times = {
+            row["shop_id"]: row["avg_wait"]
+            for row in tickets.filter(status="served", actual_wait_time__isnull=False)
+            .values(shop_id=F("queue__shop_id"))
+            .annotate(avg_wait=Avg("actual_wait_time"))
+        }
+
+        # Hour histogram of bookings and tickets, one GROUP BY each
+        peak_hours = defaultdict(lambda: {str(hour): 0 for hour in range(24)})
+        for row in (
+            bookings.annotate(hour=ExtractHour("start_time"))
+            .values("shop_id", "hour")
+            .annotate(count=Count("id"))
+        ):
+            peak_hours[row["shop_id"]][str(row["hour"])] += row["count"]
+        for row in (
+            tickets.annotate(hour=ExtractHour("join_time"))
+            .values("hour", shop_id=F("queue__shop_id"))
+            .annotate(count=Count("id"))
+        ):
+            peak_hours[row["shop_id"]][str(row["hour"])] += row["count"]
+
+        ratings = cls._ratings(ShopReview, "shop_id", shop_ids, date_obj)
+
+        # Customers without any earlier booking at the shop (anti-join)
+        prior_bookings = Appointment.objects.filter(
+            shop_id=OuterRef("shop_id"),
+            customer_id=OuterRef("customer_id"),
+            start_time__date__lt=date_obj,
+        )
+        new_customers = {
+            row["shop_id"]: row["new_customers"]
+            for row in bookings.filter(~Exists(prior_bookings))
+            .values("shop_id")
+            .annotate(new_customers=Count("customer_id", distinct=True))
+        }
+
+        def apply(shop_id, analytics):
+            stats = booking_stats.get(shop_id, {})
+            analytics.total_bookings = stats.get("total_bookings", 0)
+            analytics.bookings_completed = stats.get("bookings_completed", 0)
+            analytics.bookings_cancelled = stats.get("bookings_cancelled", 0)
+            analytics.bookings_no_show = stats.get("bookings_no_show", 0)
+            analytics.total_revenue = stats.get("revenue") or 0
+
+            if shop_id in wait_times:
+                analytics.avg_wait_time = wait_times[shop_id]
+
+            analytics.peak_hours = peak_hours[shop_id]
+
+            if shop_id in ratings:
+                analytics.customer_ratings = ratings[shop_id]
+
+            new_count = new_customers.get(shop_id, 0)
+            analytics.new_customers = new_count
+            analytics.returning_customers = stats.get("unique_customers", 0) - new_count
+
+        return cls._upsert(ShopAnalytics, "shop", shop_ids, date_obj, cls.SHOP_FIELDS, apply)
+
+    @classmethod
+    def rollup_specialist_analytics(cls, date_obj, specialist_ids=None):
+        """
+        Compute SpecialistAnalytics rows for many specialists on a date.
+
+        Args:
+            date_obj: Date to roll up
+            specialist_ids: Optional specialist IDs (defaults to every specialist)
+
+        Returns:
+            Number of analytics rows written
+        """
+        if specialist_ids is None:
+            specialist_ids = Specialist.objects.values_list("id", flat=True)
+        else:
+            specialist_ids = Specialist.objects.filter(id__in=list(specialist_ids)).values_list(
+                "id", flat=True
+            )
+
+        written = 0
+        for batch in cls._batches(specialist_ids, cls.BATCH_SIZE):
+            written += cls._rollup_specialist_batch(date_obj, batch)
+        return written
+
+    @classmethod
+    def _rollup_specialist_batch(cls, date_obj, specialist_ids):
+        bookings = Appointment.objects.filter(
+            specialist_id__in=specialist_ids, start_time__date=date_obj
+        )
+
+        booking_stats = {
+            row["specialist_id"]: row
+            for row in bookings.values("specialist_id").annotate(
+                **cls.STATUS_COUNTS,
+                service_time=Sum(
+                    ExpressionWrapper(
+                        F("end_time") - F("start_time"), output_field=DurationField()
+                    ),
+                    filter=Q(status="completed"),
+                ),
+            )
+        }
+
+        ratings = cls._ratings(SpecialistReview, "specialist_id", specialist_ids, date_obj)
+
+        # Working hours for this day of week (0 = Sunday)
+        weekday = (date_obj.weekday() + 1) % 7
+        working_minutes = {}
+        for hours in SpecialistWorkingHours.objects.filter(
+            specialist_id__in=specialist_ids, weekday=weekday, is_off=False
+        ):
+            if hours.specialist_id not in working_minutes:
+                working_minutes[hours.specialist_id] = (
+                    hours.to_hour.hour * 60 + hours.to_hour.minute
+                ) - (hours.from_hour.hour * 60 + hours.from_hour.minute)
+
+        def apply(specialist_id, analytics):
+            stats = booking_stats.get(specialist_id, {})
+            analytics.total_bookings = stats.get("total_bookings", 0)
+            analytics.bookings_completed = stats.get("bookings_completed", 0)
+            analytics.bookings_cancelled = stats.get("bookings_cancelled", 0)
+            analytics.bookings_no_show = stats.get("bookings_no_show", 0)
+
+            completed = analytics.bookings_completed
+            service_time = stats.get("service_time") or timedelta(0)
+            if completed:
+                total_time = service_time.total_seconds() / 60
+                analytics.total_service_time = int(total_time)
+                analytics.avg_service_duration = int(total_time / completed)
+
+            if specialist_id in ratings:
+                analytics.customer_ratings = ratings[specialist_id]
+
+            total_available_minutes = working_minutes.get(specialist_id, 0)
+            if total_available_minutes > 0:
+                utilization = (analytics.total_service_time / total_available_minutes) * 100
+                analytics.utilization_rate = min(utilization, 100)  # Cap at 100%
+
+        return cls._upsert(
+            SpecialistAnalytics,
+            "specialist",
+            specialist_ids,
+            date_obj,
+            cls.SPECIALIST_FIELDS,
+            apply,
+        )
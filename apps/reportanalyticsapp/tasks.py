@@ -2,7 +2,6 @@ import logging
 from datetime import datetime, timedelta
 
 from celery import shared_task
-from django.db.models import Avg, Sum
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -11,108 +10,17 @@ logger = logging.getLogger(__name__)
 @shared_task
 def update_shop_analytics(shop_id, date):
     """Update analytics for a shop on a specific date"""
-    from django.contrib.contenttypes.models import ContentType
-
-    from apps.bookingapp.models import Appointment
-    from apps.queueapp.models import QueueTicket
-    from apps.reportanalyticsapp.models import ShopAnalytics
-    from apps.reviewapp.models import Review
+    from apps.reportanalyticsapp.services.rollup_service import AnalyticsRollupService
     from apps.shopapp.models import Shop
 
     try:
         # Parse date string to date object
         date_obj = datetime.fromisoformat(date).date()
 
-        # Get shop
-        shop = Shop.objects.get(id=shop_id)
-
-        # Get or create analytics record
-        analytics, created = ShopAnalytics.objects.get_or_create(
-            shop=shop, date=date_obj
-        )
-
-        # Time range for the day
-        # unused_unused_day_start = datetime.combine(date_obj, datetime.min.time())
-        # unused_unused_day_end = datetime.combine(date_obj, datetime.max.time())
-
-        # Update booking metrics
-        bookings = Appointment.objects.filter(shop=shop, start_time__date=date_obj)
-
-        analytics.total_bookings = bookings.count()
-        analytics.bookings_completed = bookings.filter(status="completed").count()
-        analytics.bookings_cancelled = bookings.filter(status="cancelled").count()
-        analytics.bookings_no_show = bookings.filter(status="no_show").count()
-
-        # Update revenue metrics
-        revenue = (
-            bookings.filter(status="completed").aggregate(total=Sum("service__price"))[
-                "total"
-            ]
-            or 0
-        )
-        analytics.total_revenue = revenue
-
-        # Queue metrics
-        tickets = QueueTicket.objects.filter(queue__shop=shop, join_time__date=date_obj)
-
-        # Average wait time
-        wait_time_data = tickets.filter(
-            status="served", actual_wait_time__isnull=False
-        ).aggregate(avg_wait=Avg("actual_wait_time"))
-
-        if wait_time_data["avg_wait"] is not None:
-            analytics.avg_wait_time = wait_time_data["avg_wait"]
-
-        # Calculate peak hours
-        hour_distribution = {}
-        for hour in range(24):
-            bookings_count = bookings.filter(start_time__hour=hour).count()
-
-            tickets_count = tickets.filter(join_time__hour=hour).count()
+        if not AnalyticsRollupService.rollup_shop_analytics(date_obj, [shop_id]):
+            raise Shop.DoesNotExist(f"Shop {shop_id} does not exist")
 
-            hour_distribution[str(hour)] = bookings_count + tickets_count
-
-        analytics.peak_hours = hour_distribution
-
-        # Customer ratings
-        shop_content_type = ContentType.objects.get_for_model(Shop)
-        reviews = Review.objects.filter(
-            content_type=shop_content_type, object_id=shop.id, created_at__date=date_obj
-        )
-
-        if reviews.exists():
-            avg_rating = reviews.aggregate(avg=Avg("rating"))["avg"]
-            if avg_rating is not None:
-                analytics.customer_ratings = avg_rating
-
-        # Customer metrics
-        unique_customers = (
-            Appointment.objects.filter(shop=shop, start_time__date=date_obj)
-            .values("customer")
-            .distinct()
-            .count()
-        )
-
-        # Check which are new vs returning
-        customer_ids = bookings.values_list("customer_id", flat=True).distinct()
-
-        new_count = 0
-        for customer_id in customer_ids:
-            # Check if customer has previous bookings
-            previous_bookings = Appointment.objects.filter(
-                shop=shop, customer_id=customer_id, start_time__date__lt=date_obj
-            ).exists()
-
-            if not previous_bookings:
-                new_count += 1
-
-        analytics.new_customers = new_count
-        analytics.returning_customers = unique_customers - new_count
-
-        # Save updated analytics
-        analytics.save()
-
-        logger.info(f"Updated analytics for shop {shop.name} on {date}")
+        logger.info(f"Updated analytics for shop {shop_id} on {date}")
 
         return f"Analytics updated for shop {shop_id} on {date}"
 
@@ -124,114 +32,59 @@ def update_shop_analytics(shop_id, date):
 @shared_task
 def update_specialist_analytics(specialist_id, date):
     """Update analytics for a specialist on a specific date"""
-    from django.contrib.contenttypes.models import ContentType
-
-    from apps.bookingapp.models import Appointment
-    from apps.reportanalyticsapp.models import SpecialistAnalytics
-    from apps.reviewapp.models import Review
+    from apps.reportanalyticsapp.services.rollup_service import AnalyticsRollupService
     from apps.specialistsapp.models import Specialist
 
     try:
         # Parse date string to date object
         date_obj = datetime.fromisoformat(date).date()
 
-        # Get specialist
-        specialist = Specialist.objects.get(id=specialist_id)
+        if not AnalyticsRollupService.rollup_specialist_analytics(
+            date_obj, [specialist_id]
+        ):
+            raise Specialist.DoesNotExist(f"Specialist {specialist_id} does not exist")
 
-        # Get or create analytics record
-        analytics, created = SpecialistAnalytics.objects.get_or_create(
-            specialist=specialist, date=date_obj
-        )
-
-        # Time range for the day
-        # unused_unused_day_start = datetime.combine(date_obj, datetime.min.time())
-        # unused_unused_day_end = datetime.combine(date_obj, datetime.max.time())
+        logger.info(f"Updated analytics for specialist {specialist_id} on {date}")
 
-        # Update booking metrics
-        bookings = Appointment.objects.filter(
-            specialist=specialist, start_time__date=date_obj
-        )
+        return f"Analytics updated for specialist {specialist_id} on {date}"
 
-        analytics.total_bookings = bookings.count()
-        analytics.bookings_completed = bookings.filter(status="completed").count()
-        analytics.bookings_cancelled = bookings.filter(status="cancelled").count()
-        analytics.bookings_no_show = bookings.filter(status="no_show").count()
-
-        # Calculate service time and duration metrics
-        completed_bookings = bookings.filter(status="completed")
-        if completed_bookings.exists():
-            # Total service time (in minutes)
-            total_time = sum(
-                [
-                    (booking.end_time - booking.start_time).total_seconds() / 60
-                    for booking in completed_bookings
-                ]
-            )
-            analytics.total_service_time = int(total_time)
+    except Exception as e:
+        logger.error(f"Error updating specialist analytics: {e}")
+        raise
 
-            # Average service duration
-            analytics.avg_service_duration = int(
-                total_time / completed_bookings.count()
-            )
 
-        # Customer ratings
-        specialist_content_type = ContentType.objects.get_for_model(Specialist)
-        reviews = Review.objects.filter(
-            content_type=specialist_content_type,
-            object_id=specialist.id,
-            created_at__date=date_obj,
-        )
+@shared_task
+def rollup_daily_analytics(date=None):
+    """Roll up shop and specialist analytics for every entity on a date"""
+    from apps.reportanalyticsapp.services.rollup_service import AnalyticsRollupService
 
-        if reviews.exists():
-            avg_rating = reviews.aggregate(avg=Avg("rating"))["avg"]
-            if avg_rating is not None:
-                analytics.customer_ratings = avg_rating
+    date_obj = (
+        datetime.fromisoformat(date).date() if date else (timezone.now() - timedelta(days=1)).date()
+    )
 
-        # Calculate utilization rate
-        try:
-            from apps.specialistsapp.models import SpecialistWorkingHours
-
-            # Get working hours for this day of week
-            weekday = date_obj.weekday()
-            # Adjust to match our 0-indexed weekday (0 = Sunday)
-            if weekday == 6:  # If Python's Sunday (6)
-                weekday = 0
-            else:
-                weekday += 1
-
-            working_hours = SpecialistWorkingHours.objects.filter(
-                specialist=specialist, weekday=weekday, is_off=False
-            ).first()
-
-            if working_hours:
-                # Calculate total available minutes
-                from_time = working_hours.from_hour
-                to_time = working_hours.to_hour
-
-                # Convert to minutes since midnight
-                from_minutes = from_time.hour * 60 + from_time.minute
-                to_minutes = to_time.hour * 60 + to_time.minute
-
-                total_available_minutes = to_minutes - from_minutes
-
-                # Calculate utilization
-                if total_available_minutes > 0:
-                    utilization = (
-                        analytics.total_service_time / total_available_minutes
-                    ) * 100
-                    analytics.utilization_rate = min(utilization, 100)  # Cap at 100%
-        except Exception as e:
-            logger.warning(f"Error calculating utilization rate: {e}")
+    try:
+        shops = AnalyticsRollupService.rollup_shop_analytics(date_obj)
+        specialists = AnalyticsRollupService.rollup_specialist_analytics(date_obj)
 
-        # Save updated analytics
-        analytics.save()
+        logger.info(
+            f"Rolled up analytics for {shops} shops and {specialists} specialists on {date_obj}"
+        )
+        return f"Analytics rolled up for {date_obj}"
+    except Exception as e:
+        logger.error(f"Error rolling up daily analytics: {e}")
+        raise
 
-        logger.info(f"Updated analytics for specialist {specialist_id} on {date}")
 
-        return f"Analytics updated for specialist {specialist_id} on {date}"
+@shared_task
+def build_cohort_benchmarks():
+    """Rebuild the precomputed benchmark cohorts of every period"""
+    from apps.reportanalyticsapp.services.cohort_benchmark_service import CohortBenchmarkService
 
+    try:
+        cohorts = CohortBenchmarkService.build()
+        return f"Built {cohorts} benchmark cohorts"
     except Exception as e:
-        logger.error(f"Error updating specialist analytics: {e}")
+        logger.error(f"Error building benchmark cohorts: {e}")
         raise
 
 
@@ -3,13 +3,28 @@
 from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.authapp.models import User
+from apps.bookingapp.models import Appointment
+from apps.categoriesapp.models import Category
 from apps.companiesapp.models import Company
+from apps.reportanalyticsapp.models import ShopAnalytics, SpecialistAnalytics
+from apps.reportanalyticsapp.services.benchmark_service import BenchmarkService
+from apps.reportanalyticsapp.services.cohort_benchmark_service import CohortBenchmarkService
 from apps.reportanalyticsapp.services.report_service import ReportService
+from apps.reportanalyticsapp.services.rollup_service import AnalyticsRollupService
+from apps.reviewapp.models import ShopReview, SpecialistReview
+from apps.serviceapp.models import Service
 from apps.shopapp.models import Shop
+from apps.specialistsapp.models import Specialist
+
+# Cohort benchmarks are stored in the default cache
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 
 class ReportServiceTest(TestCase):
@@ -186,3 +201,178 @@ class ReportServiceTest(TestCase):
         mock_get_data.assert_called_once_with(
             "business_overview", str(self.shop.id), "shop", "weekly", None, None
         )
+
+
+class AnalyticsRollupServiceTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(phone_number="1234567890", is_active=True)
+        self.company = Company.objects.create(
+            name="Test Company", contact_phone="9876543210", owner=self.owner
+        )
+        self.shops = [
+            Shop.objects.create(
+                company=self.company,
+                name=f"Shop {index}",
+                phone_number="9876543210",
+                username=f"rollupshop{index}",
+            )
+            for index in range(2)
+        ]
+        self.specialist = Specialist.objects.create()
+        self.day = timezone.localtime().replace(hour=10, minute=0, second=0)
+
+    def _book(self, shop, customer, start_time, status="completed"):
+        service = Service.objects.create(name="Service", shop=shop, price=50.00, duration=30)
+        return Appointment.objects.create(
+            customer=customer,
+            service=service,
+            specialist=self.specialist,
+            shop=shop,
+            start_time=start_time,
+            end_time=start_time + timedelta(minutes=30),
+            status=status,
+        )
+
+    def test_rollup_shop_analytics_in_bulk(self):
+        """Test that many shops are rolled up with a fixed number of queries"""
+        regular = User.objects.create(phone_number="5550000001")
+        newcomer = User.objects.create(phone_number="5550000002")
+
+        self._book(self.shops[0], regular, self.day - timedelta(days=3))
+        self._book(self.shops[0], regular, self.day)
+        self._book(self.shops[0], newcomer, self.day, status="cancelled")
+        self._book(self.shops[1], newcomer, self.day + timedelta(hours=2))
+
+        for customer, rating in ((regular, 5), (newcomer, 2)):
+            ShopReview.objects.create(
+                shop=self.shops[0],
+                user=customer,
+                title="Review",
+                rating=rating,
+                content="Review content",
+            )
+
+        # Constant number of queries, independent of the number of shops
+        with CaptureQueriesContext(connection) as queries:
+            written = AnalyticsRollupService.rollup_shop_analytics(
+                self.day.date(), [shop.id for shop in self.shops]
+            )
+        self.assertLessEqual(len(queries), 12)
+        self.assertEqual(written, 2)
+
+        first = ShopAnalytics.objects.get(shop=self.shops[0], date=self.day.date())
+        self.assertEqual(first.total_bookings, 2)
+        self.assertEqual(first.bookings_completed, 1)
+        self.assertEqual(first.bookings_cancelled, 1)
+        self.assertEqual(first.total_revenue, 50)
+        self.assertEqual(first.peak_hours["10"], 2)
+        self.assertEqual(first.new_customers, 1)
+        self.assertEqual(first.returning_customers, 1)
+        self.assertEqual(first.customer_ratings, 3.5)
+
+        second = ShopAnalytics.objects.get(shop=self.shops[1], date=self.day.date())
+        self.assertEqual(second.peak_hours["12"], 1)
+        self.assertEqual(second.new_customers, 1)
+        self.assertEqual(second.customer_ratings, 0)
+
+    def test_rollup_specialist_ratings(self):
+        """Test that specialist ratings come from the specialist's reviews"""
+        customer = User.objects.create(phone_number="5550000001")
+        self._book(self.shops[0], customer, self.day)
+        SpecialistReview.objects.create(
+            specialist=self.specialist,
+            user=customer,
+            title="Review",
+            rating=4,
+            content="Review content",
+        )
+
+        written = AnalyticsRollupService.rollup_specialist_analytics(
+            self.day.date(), [self.specialist.id]
+        )
+        self.assertEqual(written, 1)
+
+        analytics = SpecialistAnalytics.objects.get(
+            specialist=self.specialist, date=self.day.date()
+        )
+        self.assertEqual(analytics.bookings_completed, 1)
+        self.assertEqual(analytics.customer_ratings, 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BenchmarkServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(phone_number="1234567890", is_active=True)
+        self.company = Company.objects.create(
+            name="Test Company", contact_phone="9876543210", owner=self.owner
+        )
+        self.category = Category.objects.create(name="Test Category")
+        self.specialist = Specialist.objects.create()
+        customer = User.objects.create(phone_number="5550000003")
+        start_time = timezone.now() - timedelta(days=2)
+
+        # Shop N cancels N of its 4 bookings
+        self.shops = []
+        for index in range(3):
+            shop = Shop.objects.create(
+                company=self.company,
+                name=f"Shop {index}",
+                phone_number="9876543210",
+                username=f"benchmarkshop{index}",
+            )
+            service = Service.objects.create(
+                name="Service",
+                shop=shop,
+                category=self.category,
+                price=50.00,
+                duration=30,
+            )
+            for booking in range(4):
+                Appointment.objects.create(
+                    customer=customer,
+                    service=service,
+                    specialist=self.specialist,
+                    shop=shop,
+                    start_time=start_time + timedelta(hours=booking),
+                    end_time=start_time + timedelta(hours=booking, minutes=30),
+                    status="cancelled" if booking < index else "completed",
+                )
+            self.shops.append(shop)
+
+    def test_percentile_from_cohort_store(self):
+        """Test that percentiles are read from the prebuilt cohorts"""
+        CohortBenchmarkService.build(["last_30_days"])
+
+        with CaptureQueriesContext(connection) as queries:
+            result = BenchmarkService.get_performance_percentile(
+                self.shops[0].id, "cancellation_rate"
+            )
+        self.assertEqual(len(queries), 0)
+
+        # Fewest cancellations of the cohort
+        self.assertEqual(result["shop_value"], 0)
+        self.assertEqual(result["percentile"], 100)
+        self.assertEqual(result["total_shops"], 3)
+        self.assertEqual(result["performance_level"], "excellent")
+
+    def test_shop_benchmarks_exclude_the_shop(self):
+        """Test that cohort benchmarks match the live computation"""
+        CohortBenchmarkService.build(["last_30_days"])
+
+        benchmarks = BenchmarkService.get_shop_benchmarks(self.shops[2].id)
+
+        self.assertEqual(benchmarks["similar_shop_count"], 2)
+        self.assertEqual(benchmarks["shop_metrics"]["cancellation_rate"], 50)
+        self.assertEqual(
+            benchmarks["benchmark_metrics"]["cancellation_rate"],
+            {"mean": 12.5, "min": 0, "max": 25, "count": 2},
+        )
+        self.assertEqual(benchmarks["comparison"]["cancellation_rate"]["performance_level"], "poor")
+
+        live = BenchmarkService._calculate_benchmark_metrics(
+            [shop.id for shop in self.shops[:2]],
+            benchmarks["start_date"],
+            benchmarks["end_date"],
+        )
+        self.assertEqual(live, benchmarks["benchmark_metrics"])
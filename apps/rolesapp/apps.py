@@ -28,3 +28,6 @@ class RolesappConfig(AppConfig):
             from apps.rolesapp.services.permission_service import PermissionService
 
             PermissionService.create_default_permissions()
+
+        # Import signals to register them
+        import apps.rolesapp.permission_signals  # noqa
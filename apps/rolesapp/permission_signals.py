@@ -0,0 +1,74 @@
+# apps/rolesapp/permission_signals.py
+"""
+Invalidate compiled permissions when roles or role assignments change.
+
+signals.py holds the default role handlers for new shops and companies,
+which are not registered.
+"""
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.rolesapp.models import Role, UserRole
+from apps.rolesapp.services.permission_resolver import PermissionResolver
+
+
+def _invalidate_permissions(**kwargs):
+    """Invalidate compiled permissions now and again after commit"""
+    # A request between the two would otherwise compile the old permissions
+    PermissionResolver.invalidate_permission_cache(**kwargs)
+    transaction.on_commit(lambda: PermissionResolver.invalidate_permission_cache(**kwargs))
+
+
+@receiver(post_save, sender=Role)
+def role_saved(sender, instance, created, **kwargs):
+    """
+    Signal handler for role creation/updates
+
+    Invalidates permission cache when a role is saved.
+    """
+    # Users holding the role or inheriting from it through child roles
+    _invalidate_permissions(role_id=instance.id)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def role_permissions_changed(sender, instance, action, **kwargs):
+    """
+    Signal handler for permissions added to or removed from a role
+
+    Invalidates permission cache when a role's permissions change.
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        _invalidate_permissions(role_id=instance.id)
+
+
+@receiver(post_delete, sender=Role)
+def role_deleted(sender, instance, **kwargs):
+    """
+    Signal handler for role deletion
+
+    Invalidates permission cache when a role is deleted.
+    """
+    # Invalidate all permission cache
+    _invalidate_permissions()
+
+
+@receiver(post_save, sender=UserRole)
+def user_role_saved(sender, instance, created, **kwargs):
+    """
+    Signal handler for user role creation/updates
+
+    Invalidates permission cache for the user.
+    """
+    _invalidate_permissions(user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=UserRole)
+def user_role_deleted(sender, instance, **kwargs):
+    """
+    Signal handler for user role deletion
+
+    Invalidates permission cache for the user.
+    """
+    _invalidate_permissions(user_id=instance.user_id)
@@ -0,0 +1,187 @@
+# apps/rolesapp/services/permission_compiler.py
+"""
+Compiled per-user permission sets.
+
+A user's active roles and their parent chains are flattened once into
+immutable sets of (resource, action) pairs: one for all roles, and one per
+(context model, context ID) the user holds roles in. The compiled entry lives
+in a per-process LRU in front of the shared cache, so permission checks are
+set lookups instead of queries.
+
+Entries are versioned by generation counters: a global one bumped whenever a
+role or its permissions change, and one per user bumped whenever the user's
+role assignments change. Local entries are trusted for LOCAL_TTL seconds
+before their generations are checked against the shared cache again.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.rolesapp.models import Role, UserRole
+from utils.cache_utils import LocalLRU, bump_generations, generation_token
+
+logger = logging.getLogger(__name__)
+
+ROLES_TAG = "perm:roles"
+WILDCARD = "*"
+
+
+def user_tag(user_id):
+    return f"perm:user:{user_id}"
+
+
+class CompiledPermissions:
+    """Immutable permission sets of one user"""
+
+    def __init__(self, permission_ids, pairs, contexts, role_types):
+        self.permission_ids = frozenset(permission_ids)
+        self.pairs = frozenset(pairs)
+        # (context model, context ID) -> (permission IDs, (resource, action) pairs)
+        self.contexts = {
+            key: (frozenset(ids), frozenset(context_pairs))
+            for key, (ids, context_pairs) in contexts.items()
+        }
+        self.role_types = frozenset(role_types)
+
+    @staticmethod
+    def _allows(pairs, resource, action):
+        return (
+            (WILDCARD, WILDCARD) in pairs
+            or (resource, WILDCARD) in pairs
+            or (WILDCARD, action) in pairs
+            or (resource, action) in pairs
+        )
+
+    def allows(self, resource, action):
+        """Check a permission across all of the user's roles."""
+        return self._allows(self.pairs, resource, action)
+
+    def allows_in_context(self, context_type, context_id, resource, action):
+        """Check a permission among the user's roles in one context."""
+        _, pairs = self.context(context_type, context_id)
+        return self._allows(pairs, resource, action)
+
+    def context(self, context_type, context_id):
+        """Get the (permission IDs, pairs) of the user's roles in one context."""
+        return self.contexts.get(
+            (context_type.lower(), str(context_id)), (frozenset(), frozenset())
+        )
+
+
+class PermissionCompiler:
+    """Compile, cache and invalidate per-user permission sets"""
+
+    KEY_PREFIX = "perm_compiled:"
+    TTL = getattr(settings, "PERMISSION_COMPILED_TTL", 60 * 60)
+    # Seconds a process trusts its local entry before re-checking generations
+    LOCAL_TTL = getattr(settings, "PERMISSION_LOCAL_TTL", 5)
+
+    _local = LocalLRU(getattr(settings, "PERMISSION_LRU_SIZE", 4096))
+
+    @staticmethod
+    def compile(user_id):
+        """
+        Flatten a user's active roles and their parent chains.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            CompiledPermissions
+        """
+        assignments = list(
+            UserRole.objects.filter(user_id=user_id, role__is_active=True).values_list(
+                "role_id",
+                "role__role_type",
+                "role__content_type__model",
+                "role__object_id",
+            )
+        )
+
+        # Walk the parent chains one level per query
+        parents = {}
+        frontier = {role_id for role_id, _, _, _ in assignments}
+        while frontier:
+            rows = Role.objects.filter(id__in=frontier).values_list("id", "parent_id")
+            frontier = set()
+            for role_id, parent_id in rows:
+                parents[role_id] = parent_id
+                if parent_id and parent_id not in parents:
+                    frontier.add(parent_id)
+
+        grants = Role.permissions.through.objects.filter(role_id__in=parents).values_list(
+            "role_id", "permission_id", "permission__resource", "permission__action"
+        )
+        role_permissions = {}
+        for role_id, permission_id, resource, action in grants:
+            role_permissions.setdefault(role_id, []).append((permission_id, (resource, action)))
+
+        def chain(role_id):
+            seen = set()
+            while role_id and role_id not in seen:
+                seen.add(role_id)
+                yield from role_permissions.get(role_id, [])
+                role_id = parents.get(role_id)
+
+        permission_ids, pairs, contexts, role_types = set(), set(), {}, set()
+        for role_id, role_type, context_model, object_id in assignments:
+            role_types.add(role_type)
+            context = None
+            if context_model and object_id:
+                context = contexts.setdefault((context_model, str(object_id)), (set(), set()))
+
+            for permission_id, pair in chain(role_id):
+                permission_ids.add(permission_id)
+                pairs.add(pair)
+                if context is not None:
+                    context[0].add(permission_id)
+                    context[1].add(pair)
+
+        return CompiledPermissions(permission_ids, pairs, contexts, role_types)
+
+    @classmethod
+    def get(cls, user_id):
+        """
+        Get the compiled permissions of a user.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            CompiledPermissions
+        """
+        local_key = str(user_id)
+        now = time.monotonic()
+
+        entry = cls._local.get(local_key)
+        if entry is not None and now - entry[1] < cls.LOCAL_TTL:
+            return entry[2]
+
+        token = generation_token([ROLES_TAG, user_tag(user_id)])
+        if entry is not None and entry[0] == token:
+            cls._local.set(local_key, (token, now, entry[2]))
+            return entry[2]
+
+        cache_key = f"{cls.KEY_PREFIX}{user_id}:{token}"
+        compiled = cache.get(cache_key)
+        if compiled is None:
+            compiled = cls.compile(user_id)
+            cache.set(cache_key, compiled, cls.TTL)
+
+        cls._local.set(local_key, (token, now, compiled))
+        return compiled
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Invalidate the compiled permissions of one user."""
+        bump_generations(user_tag(user_id))
+        cls._local.discard(str(user_id))
+
+    @classmethod
+    def invalidate_all(cls):
+        """Invalidate the compiled permissions of every user."""
+        bump_generations(ROLES_TAG)
+        cls._local.clear()
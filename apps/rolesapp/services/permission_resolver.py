@@ -6,6 +6,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 
 from apps.rolesapp.models import Permission, UserRole
+from apps.rolesapp.services.permission_compiler import PermissionCompiler
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,8 @@ def cache_permission_result(ttl=300):  # Cache for 5 minutes by default
     Decorator to cache permission results
 
     This is a performance optimization for frequent permission checks.
-    The cache key is based on the function name and arguments.
+    The cache key is based on the function name and arguments, with model
+    instances (such as the user) keyed by their primary key.
     """
 
     def decorator(func):
@@ -24,8 +26,8 @@ def cache_permission_result(ttl=300):  # Cache for 5 minutes by default
         def wrapper(*args, **kwargs):
             # Generate a cache key based on function name and arguments
             key_parts = [func.__name__]
-            key_parts.extend([str(arg) for arg in args])
-            key_parts.extend([f"{k}={v}" for k, v in kwargs.items()])
+            key_parts.extend([str(getattr(arg, "pk", arg)) for arg in args])
+            key_parts.extend([f"{k}={getattr(v, 'pk', v)}" for k, v in kwargs.items()])
             cache_key = f"permission_{'_'.join(key_parts)}"
 
             # Try to get result from cache
@@ -53,7 +55,6 @@ class PermissionResolver:
     """
 
     @staticmethod
-    @cache_permission_result(ttl=60)
     def get_user_permissions(user, context_type=None, context_id=None):
         """
         Get all permissions for a user, optionally in a specific context
@@ -70,44 +71,24 @@ class PermissionResolver:
             # Superuser has all permissions
             return Permission.objects.all()
 
-        # Get all user roles
+        compiled = PermissionCompiler.get(user.id)
         if context_type and context_id:
             # For context-specific roles
-            content_type = ContentType.objects.get(
-                app_label="apps", model=context_type.lower()
-            )
-            user_roles = UserRole.objects.filter(
-                user=user,
-                role__content_type=content_type,
-                role__object_id=context_id,
-                role__is_active=True,
-            )
+            permission_ids, _ = compiled.context(context_type, context_id)
         else:
             # For all roles
-            user_roles = UserRole.objects.filter(user=user, role__is_active=True)
+            permission_ids = compiled.permission_ids
 
-        # Get permissions from all roles
-        permissions = Permission.objects.none()
-        for user_role in user_roles:
-            # Get direct permissions
-            role_permissions = user_role.role.permissions.all()
-            permissions = permissions | role_permissions
-
-            # Get inherited permissions from parent roles
-            current_role = user_role.role
-            while current_role.parent:
-                parent_permissions = current_role.parent.permissions.all()
-                permissions = permissions | parent_permissions
-                current_role = current_role.parent
-
-        return permissions.distinct()
+        return Permission.objects.filter(id__in=permission_ids)
 
     @staticmethod
-    @cache_permission_result()
     def has_permission(user, resource, action):
         """
         Check if user has a specific permission
 
+        Resolved in memory against the user's compiled permission set,
+        including wildcard permissions.
+
         Args:
             user: The user to check permissions for
             resource: The resource to check (e.g., 'shop', 'service')
@@ -120,28 +101,15 @@ class PermissionResolver:
         if user.is_superuser:
             return True
 
-        # Check for Queue Me Admin role (special case)
-        if PermissionResolver.is_queue_me_admin(user):
-            return True
-
-        # Special wildcard check for "*" permissions
-        user_permissions = PermissionResolver.get_user_permissions(user)
+        compiled = PermissionCompiler.get(user.id)
 
-        # Check for wildcard permissions
-        if user_permissions.filter(resource="*", action="*").exists():
-            return True
-
-        if user_permissions.filter(resource=resource, action="*").exists():
-            return True
-
-        if user_permissions.filter(resource="*", action=action).exists():
+        # Check for Queue Me Admin role (special case)
+        if "queue_me_admin" in compiled.role_types:
             return True
 
-        # Check for specific permission
-        return user_permissions.filter(resource=resource, action=action).exists()
+        return compiled.allows(resource, action)
 
     @staticmethod
-    @cache_permission_result()
     def has_context_permission(user, context_type, context_id, resource, action):
         """
         Check if user has permission for a resource in a specific context
@@ -160,70 +128,44 @@ class PermissionResolver:
         if user.is_superuser:
             return True
 
-        # Check for Queue Me Admin role (special case)
-        if PermissionResolver.is_queue_me_admin(user):
-            return True
-
         try:
-            # Get context-specific permissions
-            context_permissions = PermissionResolver.get_user_permissions(
-                user, context_type, context_id
-            )
+            compiled = PermissionCompiler.get(user.id)
 
-            # Check for wildcard permissions in context
-            if context_permissions.filter(resource="*", action="*").exists():
+            # Check for Queue Me Admin role (special case)
+            if "queue_me_admin" in compiled.role_types:
                 return True
 
-            if context_permissions.filter(resource=resource, action="*").exists():
-                return True
-
-            if context_permissions.filter(resource="*", action=action).exists():
-                return True
-
-            # Check for specific permission in context
-            context_has_permission = context_permissions.filter(
-                resource=resource, action=action
-            ).exists()
-
-            if context_has_permission:
+            # Check context-specific permissions first
+            if compiled.allows_in_context(context_type, context_id, resource, action):
                 return True
 
             # If not found in context, check for global permission
-            return PermissionResolver.has_permission(user, resource, action)
+            return compiled.allows(resource, action)
 
         except Exception as e:
             logger.error(f"Error checking context permission: {e}")
             return False
 
     @staticmethod
-    @cache_permission_result()
     def is_queue_me_admin(user):
         """Check if user is a Queue Me Admin"""
         if user.is_superuser:
             return True
 
-        return UserRole.objects.filter(
-            user=user, role__role_type="queue_me_admin", role__is_active=True
-        ).exists()
+        return PermissionResolver.has_role_type(user, "queue_me_admin")
 
     @staticmethod
-    @cache_permission_result()
     def is_queue_me_employee(user):
         """Check if user is a Queue Me Employee or Admin"""
         if PermissionResolver.is_queue_me_admin(user):
             return True
 
-        return UserRole.objects.filter(
-            user=user, role__role_type="queue_me_employee", role__is_active=True
-        ).exists()
+        return PermissionResolver.has_role_type(user, "queue_me_employee")
 
     @staticmethod
-    @cache_permission_result()
     def is_company_owner(user):
         """Check if user is a Company Owner"""
-        return UserRole.objects.filter(
-            user=user, role__role_type="company", role__is_active=True
-        ).exists()
+        return "company" in PermissionCompiler.get(user.id).role_types
 
     @staticmethod
     @cache_permission_result()
@@ -247,12 +189,9 @@ class PermissionResolver:
         ).exists()
 
     @staticmethod
-    @cache_permission_result()
     def is_shop_manager(user):
         """Check if user is a Shop Manager"""
-        return UserRole.objects.filter(
-            user=user, role__role_type="shop_manager", role__is_active=True
-        ).exists()
+        return "shop_manager" in PermissionCompiler.get(user.id).role_types
 
     @staticmethod
     @cache_permission_result()
@@ -296,7 +235,6 @@ class PermissionResolver:
         )
 
     @staticmethod
-    @cache_permission_result()
     def has_role_type(user, role_types):
         """
         Check if user has any of the specified role types
@@ -314,9 +252,7 @@ class PermissionResolver:
         if user.is_superuser:
             return True
 
-        return UserRole.objects.filter(
-            user=user, role__role_type__in=role_types, role__is_active=True
-        ).exists()
+        return not PermissionCompiler.get(user.id).role_types.isdisjoint(role_types)
 
     @staticmethod
     @cache_permission_result()
@@ -368,8 +304,17 @@ class PermissionResolver:
             user_id: Optional user ID to invalidate cache for a specific user
             role_id: Optional role ID to invalidate cache for a specific role
         """
-        # This is a simplified implementation that clears the entire cache
-        # A more sophisticated implementation would target specific cache keys
+        # Compiled permission sets are versioned, bumping is enough
+        if user_id:
+            PermissionCompiler.invalidate_user(user_id)
+        if role_id or not user_id:
+            # Role changes reach every user inheriting from the role
+            PermissionCompiler.invalidate_all()
+
+        # Results cached by cache_permission_result need a pattern delete
+        if not hasattr(cache, "delete_pattern"):
+            return
+
         if user_id:
             pattern = f"permission_*_*{user_id}*"
             cache.delete_pattern(pattern)
@@ -3,60 +3,15 @@ import logging
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from apps.rolesapp.models import Role, UserRole
-from apps.rolesapp.services.permission_resolver import PermissionResolver
+from apps.rolesapp.models import Role
 from apps.rolesapp.services.permission_service import PermissionService
 
 logger = logging.getLogger(__name__)
 
 
-@receiver(post_save, sender=Role)
-def role_saved(sender, instance, created, **kwargs):
-    """
-    Signal handler for role creation/updates
-
-    Invalidates permission cache when a role is saved.
-    """
-    # Invalidate cache for users with this role
-    user_ids = UserRole.objects.filter(role=instance).values_list("user_id", flat=True)
-    for user_id in user_ids:
-        PermissionResolver.invalidate_permission_cache(user_id=user_id)
-
-
-@receiver(post_delete, sender=Role)
-def role_deleted(sender, instance, **kwargs):
-    """
-    Signal handler for role deletion
-
-    Invalidates permission cache when a role is deleted.
-    """
-    # Invalidate all permission cache
-    PermissionResolver.invalidate_permission_cache()
-
-
-@receiver(post_save, sender=UserRole)
-def user_role_saved(sender, instance, created, **kwargs):
-    """
-    Signal handler for user role creation/updates
-
-    Invalidates permission cache for the user.
-    """
-    PermissionResolver.invalidate_permission_cache(user_id=instance.user_id)
-
-
-@receiver(post_delete, sender=UserRole)
-def user_role_deleted(sender, instance, **kwargs):
-    """
-    Signal handler for user role deletion
-
-    Invalidates permission cache for the user.
-    """
-    PermissionResolver.invalidate_permission_cache(user_id=instance.user_id)
-
-
 # We don't want to run these signals during test
 if not settings.TESTING:
     # Shop entity signals
@@ -535,3 +535,35 @@ class PermissionResolverTest(TestCase):
         self.assertFalse(
             PermissionResolver.has_role_type(self.normal_user, "non_existent_type")
         )
+
+    def test_parent_role_permissions_are_inherited(self):
+        """Test permissions of parent roles are compiled in"""
+        parent_role = Role.objects.create(name="Parent Role", role_type="custom", is_active=True)
+        parent_role.permissions.add(Permission.objects.create(resource="queue", action="manage"))
+        self.employee_role.parent = parent_role
+        self.employee_role.save()
+
+        self.assertTrue(PermissionResolver.has_permission(self.normal_user, "queue", "manage"))
+
+    def test_role_permission_changes_invalidate(self):
+        """Test adding a permission to a role is seen by the next check"""
+        self.assertFalse(PermissionResolver.has_permission(self.normal_user, "shop", "delete"))
+
+        self.employee_role.permissions.add(
+            Permission.objects.create(resource="shop", action="delete")
+        )
+
+        self.assertTrue(PermissionResolver.has_permission(self.normal_user, "shop", "delete"))
+
+    def test_compiled_checks_run_no_queries(self):
+        """Test repeated checks are resolved without touching the database"""
+        PermissionResolver.has_permission(self.normal_user, "shop", "view")
+
+        with self.assertNumQueries(0):
+            self.assertTrue(PermissionResolver.has_permission(self.normal_user, "shop", "view"))
+            self.assertTrue(
+                PermissionResolver.has_context_permission(
+                    self.normal_user, "shop", self.shop.id, "shop", "add"
+                )
+            )
+            self.assertFalse(PermissionResolver.is_shop_manager(self.normal_user))
@@ -7,4 +7,4 @@ class ServiceAppConfig(AppConfig):
     verbose_name = _("Services")
 
     def ready(self):
-        pass
+        import apps.serviceapp.calendar_signals  # noqa
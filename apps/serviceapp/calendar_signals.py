@@ -0,0 +1,56 @@
+# apps/serviceapp/calendar_signals.py
+"""
+Invalidate cached availability calendars when bookings, hours or services change.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.bookingapp.models import Appointment
+from apps.serviceapp.models import Service, ServiceAvailability, ServiceException
+from apps.serviceapp.services.availability_calendar import AvailabilityCalendar
+from apps.shopapp.models import ShopHours
+from apps.specialistsapp.models import SpecialistService, SpecialistWorkingHours
+
+
+def _invalidate(invalidate, *ids):
+    """Invalidate now and again after commit, so no read caches the old rows"""
+    invalidate(*ids)
+    transaction.on_commit(partial(invalidate, *ids))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=ShopHours)
+@receiver(post_delete, sender=ShopHours)
+def invalidate_shop_calendars(sender, instance, **kwargs):
+    """Invalidate the calendars of every service of the shop"""
+    _invalidate(AvailabilityCalendar.invalidate_shops, instance.shop_id)
+
+
+@receiver(post_save, sender=SpecialistWorkingHours)
+@receiver(post_delete, sender=SpecialistWorkingHours)
+def invalidate_specialist_calendars(sender, instance, **kwargs):
+    """Invalidate the calendars of the specialist's shop"""
+    _invalidate(AvailabilityCalendar.invalidate_shops, instance.specialist.employee.shop_id)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_calendar(sender, instance, **kwargs):
+    """Invalidate the calendar of a service"""
+    _invalidate(AvailabilityCalendar.invalidate_services, instance.id)
+
+
+@receiver(post_save, sender=ServiceAvailability)
+@receiver(post_delete, sender=ServiceAvailability)
+@receiver(post_save, sender=ServiceException)
+@receiver(post_delete, sender=ServiceException)
+@receiver(post_save, sender=SpecialistService)
+@receiver(post_delete, sender=SpecialistService)
+def invalidate_service_calendar_hours(sender, instance, **kwargs):
+    """Invalidate the calendar of the service the hours or specialists belong to"""
+    _invalidate(AvailabilityCalendar.invalidate_services, instance.service_id)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
@@ -301,6 +302,7 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         availability_data = validated_data.pop("availability", [])
         faqs_data = validated_data.pop("faqs", [])
@@ -308,26 +310,37 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
         steps_data = validated_data.pop("steps", [])
         aftercare_tips_data = validated_data.pop("aftercare_tips", [])
 
-        # Create service
-        service = Service.objects.create(**validated_data)
+        from apps.subscriptionapp.services.usage_monitor import UsageMonitor
 
-        # Create related objects
-        for availability in availability_data:
-            ServiceAvailability.objects.create(service=service, **availability)
+        shop_id = validated_data["shop"].id
+        with UsageMonitor.reserve_service(shop_id) as (reserved, current, limit):
+            if not reserved:
+                raise serializers.ValidationError(
+                    _("Service limit reached ({current}/{limit}).").format(
+                        current=current, limit=limit
+                    )
+                )
+
+            # Create service
+            service = Service.objects.create(**validated_data)
+
+            # Create related objects
+            for availability in availability_data:
+                ServiceAvailability.objects.create(service=service, **availability)
 
-        for faq in faqs_data:
-            ServiceFAQ.objects.create(service=service, **faq)
+            for faq in faqs_data:
+                ServiceFAQ.objects.create(service=service, **faq)
 
-        for overview in overviews_data:
-            ServiceOverview.objects.create(service=service, **overview)
+            for overview in overviews_data:
+                ServiceOverview.objects.create(service=service, **overview)
 
-        for step in steps_data:
-            ServiceStep.objects.create(service=service, **step)
+            for step in steps_data:
+                ServiceStep.objects.create(service=service, **step)
 
-        for tip in aftercare_tips_data:
-            ServiceAftercare.objects.create(service=service, **tip)
+            for tip in aftercare_tips_data:
+                ServiceAftercare.objects.create(service=service, **tip)
 
-        return service
+            return service
 
 
 class ServiceUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,314 @@
+# apps/serviceapp/services/availability_calendar.py
+"""
+Month-range availability calendar for services.
+
+AvailabilityService.get_service_availability answers one day with several
+queries per slot and specialist. For calendar views only whether a day still
+has capacity matters, so the calendar loads everything a date range depends on
+(exceptions, shop and service hours, specialist working hours and bookings) in
+a handful of queries and sweeps the days in one pass.
+
+For each day the calendar keeps the start of the latest bookable slot. A day
+has capacity while that start is still beyond the minimum booking notice and
+the day is within the advance booking window, so the summary stays exact as
+time passes without being recomputed. Summaries are cached per service and
+month, versioned by generation counters bumped from serviceapp signals when
+bookings, hours or the service change.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+
+import pytz
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.bookingapp.models import Appointment
+from apps.serviceapp.models import Service, ServiceAvailability, ServiceException
+from apps.shopapp.models import ShopHours
+from apps.specialistsapp.models import SpecialistService, SpecialistWorkingHours
+from utils.cache_utils import bump_generations, generation_token
+
+# Appointments in these statuses take up specialist time
+BLOCKING_STATUSES = ["scheduled", "confirmed", "in_progress"]
+
+SHOP_TIMEZONE = pytz.timezone("Asia/Riyadh")
+
+
+def service_tag(service_id):
+    return f"availability_calendar:service:{service_id}"
+
+
+def shop_tag(shop_id):
+    return f"availability_calendar:shop:{shop_id}"
+
+
+def schema_weekday(day):
+    """Weekday of a date in the schema's numbering (0 = Sunday)."""
+    return (day.weekday() + 1) % 7
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class AvailabilityCalendar:
+    """Latest bookable slot start of each day of a date range for a service"""
+
+    KEY_PREFIX = "availability_calendar:"
+    TTL = 60 * 10
+
+    def __init__(self, service, start_date, end_date):
+        """
+        Load everything availability of a service depends on for a date range.
+
+        Args:
+            service: Service instance
+            start_date: First day of the range
+            end_date: Last day of the range
+        """
+        self.service = service
+        self.start_date = start_date
+        self.end_date = end_date
+
+        self.exceptions = {
+            exception.date: exception
+            for exception in ServiceException.objects.filter(
+                service=service, date__range=(start_date, end_date)
+            )
+        }
+        self.shop_hours = {
+            hours.weekday: hours for hours in ShopHours.objects.filter(shop_id=service.shop_id)
+        }
+        self.service_hours = {}
+        if service.has_custom_availability:
+            self.service_hours = {
+                hours.weekday: hours
+                for hours in ServiceAvailability.objects.filter(service=service)
+            }
+
+        self.specialist_ids = list(
+            SpecialistService.objects.filter(service=service).values_list(
+                "specialist_id", flat=True
+            )
+        )
+        self.working_hours = {
+            (hours.specialist_id, hours.weekday): hours
+            for hours in SpecialistWorkingHours.objects.filter(
+                specialist_id__in=self.specialist_ids
+            )
+        }
+
+        # Per specialist: appointment starts in order, and the latest end of
+        # the appointments up to each one, to find overlaps by bisection
+        self.bookings = {}
+        appointments = (
+            Appointment.objects.filter(
+                specialist_id__in=self.specialist_ids,
+                status__in=BLOCKING_STATUSES,
+                start_time__lt=SHOP_TIMEZONE.localize(
+                    datetime.combine(end_date + timedelta(days=2), time())
+                ),
+                end_time__gt=SHOP_TIMEZONE.localize(
+                    datetime.combine(start_date - timedelta(days=1), time())
+                ),
+            )
+            .order_by("start_time")
+            .values_list("specialist_id", "start_time", "end_time")
+        )
+        for specialist_id, start_time, end_time in appointments:
+            starts, latest_ends = self.bookings.setdefault(specialist_id, ([], []))
+            starts.append(start_time)
+            latest_ends.append(max(end_time, latest_ends[-1]) if latest_ends else end_time)
+
+    def _opening_hours(self, day):
+        """
+        Get the hours a service can be booked on a day.
+
+        Returns:
+            Tuple of (open, close) times, or None when closed
+        """
+        exception = self.exceptions.get(day)
+        if exception is not None:
+            if exception.is_closed or not (exception.from_hour and exception.to_hour):
+                return None
+            return exception.from_hour, exception.to_hour
+
+        weekday = schema_weekday(day)
+        shop_hours = self.shop_hours.get(weekday)
+        if shop_hours is None or shop_hours.is_closed:
+            return None
+        open_hour, close_hour = shop_hours.from_hour, shop_hours.to_hour
+
+        service_hours = self.service_hours.get(weekday)
+        if service_hours is not None:
+            if service_hours.is_closed:
+                return None
+            # Most restrictive hours (latest open, earliest close)
+            open_hour = max(open_hour, service_hours.from_hour)
+            close_hour = min(close_hour, service_hours.to_hour)
+            if open_hour >= close_hour:
+                return None
+
+        return open_hour, close_hour
+
+    def _specialist_available(self, specialist_id, day, slot_start, slot_end):
+        """Check a slot against the working hours and bookings of a specialist."""
+        hours = self.working_hours.get((specialist_id, schema_weekday(day)))
+        if hours is None or hours.is_off:
+            return False
+        if slot_start.time() < hours.from_hour or slot_end.time() > hours.to_hour:
+            return False
+
+        bookings = self.bookings.get(specialist_id)
+        if bookings is None:
+            return True
+        starts, latest_ends = bookings
+
+        busy_start = SHOP_TIMEZONE.localize(
+            slot_start - timedelta(minutes=self.service.buffer_before)
+        )
+        busy_end = SHOP_TIMEZONE.localize(slot_end + timedelta(minutes=self.service.buffer_after))
+        # Appointments starting before the slot ends overlap it unless all of
+        # them end before it starts
+        index = bisect_left(starts, busy_end)
+        return index == 0 or latest_ends[index - 1] <= busy_start
+
+    def latest_slot_start(self, day, min_notice):
+        """
+        Get the start of the latest bookable slot of a day.
+
+        Args:
+            day: Date to check
+            min_notice: Earliest bookable slot start
+
+        Returns:
+            Aware datetime, or None when no slot can be booked
+        """
+        hours = self._opening_hours(day)
+        if hours is None or not self.specialist_ids:
+            return None
+
+        service = self.service
+        open_dt = datetime.combine(day, hours[0])
+        close_dt = datetime.combine(day, hours[1])
+        duration = timedelta(minutes=service.duration)
+        step = timedelta(minutes=service.slot_granularity)
+
+        slot_starts = []
+        current = open_dt + timedelta(minutes=service.buffer_before)
+        while current + duration + timedelta(minutes=service.buffer_after) <= close_dt:
+            slot_starts.append(current)
+            current += step
+
+        # Latest slots first, so the sweep stops at the first bookable one
+        for slot_start in reversed(slot_starts):
+            # Slot times are compared with the notice as UTC, as in
+            # AvailabilityService.get_service_availability
+            bookable_at = slot_start.replace(tzinfo=pytz.UTC)
+            if bookable_at < min_notice:
+                return None
+            slot_end = slot_start + duration
+            if any(
+                self._specialist_available(specialist_id, day, slot_start, slot_end)
+                for specialist_id in self.specialist_ids
+            ):
+                return bookable_at
+
+        return None
+
+    def summarize(self, now=None):
+        """
+        Get the latest bookable slot start of every day of the range.
+
+        Args:
+            now: Optional current time
+
+        Returns:
+            Dict mapping each date to an aware datetime or None
+        """
+        now = now or timezone.now()
+        today = now.date()
+        min_notice = now + timedelta(minutes=self.service.min_booking_notice)
+
+        summary = {}
+        day = self.start_date
+        while day <= self.end_date:
+            summary[day] = self.latest_slot_start(day, min_notice) if day >= today else None
+            day += timedelta(days=1)
+        return summary
+
+    @classmethod
+    def get_days(cls, service_id, start_date, end_date):
+        """
+        Get whether each day of a date range has bookable capacity.
+
+        Cached month summaries are read in one round trip; missing months are
+        built together from a single load.
+
+        Args:
+            service_id: ID of the service
+            start_date: First day of the range
+            end_date: Last day of the range
+
+        Returns:
+            Dict mapping each date, in order, to True when it has capacity
+        """
+        service = Service.objects.get(id=service_id)
+        if end_date < start_date:
+            return {}
+
+        token = generation_token([service_tag(service.id), shop_tag(service.shop_id)])
+        months = []
+        month = month_start(start_date)
+        while month <= end_date:
+            months.append(month)
+            month = next_month(month)
+        keys = {month: f"{cls.KEY_PREFIX}{service.id}:{month:%Y-%m}:{token}" for month in months}
+
+        cached = cache.get_many(list(keys.values()))
+        summary = {}
+        missing = []
+        for month in months:
+            if keys[month] in cached:
+                summary.update(cached[keys[month]])
+            else:
+                missing.append(month)
+
+        if missing:
+            calendar = cls(service, missing[0], next_month(missing[-1]) - timedelta(days=1))
+            built = calendar.summarize()
+            entries = {}
+            for month in missing:
+                month_summary = {
+                    day: latest for day, latest in built.items() if month <= day < next_month(month)
+                }
+                entries[keys[month]] = month_summary
+                summary.update(month_summary)
+            cache.set_many(entries, cls.TTL)
+
+        now = timezone.now()
+        min_notice = now + timedelta(minutes=service.min_booking_notice)
+        last_day = now.date() + timedelta(days=service.max_advance_booking_days)
+
+        days = {}
+        day = start_date
+        while day <= end_date:
+            latest = summary.get(day)
+            days[day] = latest is not None and day <= last_day and latest >= min_notice
+            day += timedelta(days=1)
+        return days
+
+    @staticmethod
+    def invalidate_services(*service_ids):
+        """Invalidate the calendars of services."""
+        bump_generations(*(service_tag(service_id) for service_id in service_ids))
+
+    @staticmethod
+    def invalidate_shops(*shop_ids):
+        """Invalidate the calendars of every service of shops."""
+        bump_generations(*(shop_tag(shop_id) for shop_id in shop_ids))
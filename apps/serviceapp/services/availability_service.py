@@ -5,6 +5,7 @@ from django.utils import timezone
 
 from apps.bookingapp.models import Appointment
 from apps.serviceapp.models import Service, ServiceAvailability, ServiceException
+from apps.serviceapp.services.availability_calendar import AvailabilityCalendar
 from apps.shopapp.models import ShopHours
 from apps.specialistsapp.models import SpecialistService, SpecialistWorkingHours
 
@@ -284,61 +285,10 @@ class AvailabilityService:
         Get a list of days where a service has at least one available slot
 
         This is a performance-optimized version for showing a calendar UI,
-        where we just need to know which days have any availability.
+        where we just need to know which days have any availability. Days are
+        answered from the cached month summaries of AvailabilityCalendar.
 
         Returns a list of dates that have at least one available slot
         """
-        service = Service.objects.get(id=service_id)
-
-        # Initialize empty available days list
-        available_days = []
-
-        # Check each day in the range
-        current_date = start_date
-        while current_date <= end_date:
-            # Skip quickly if service/shop is closed on this day
-            weekday = current_date.weekday()
-            if weekday == 6:  # If Python's Sunday (6)
-                weekday = 0  # Set to our Sunday (0)
-            else:
-                weekday += 1  # Otherwise add 1
-
-            # Check for service exception
-            exception_exists = ServiceException.objects.filter(
-                service=service, date=current_date, is_closed=True
-            ).exists()
-
-            if exception_exists:
-                current_date += timedelta(days=1)
-                continue
-
-            # Quick check for shop hours
-            shop_closed = ShopHours.objects.filter(
-                shop=service.shop, weekday=weekday, is_closed=True
-            ).exists()
-
-            if shop_closed:
-                current_date += timedelta(days=1)
-                continue
-
-            # Quick check for service availability if enabled
-            if service.has_custom_availability:
-                service_closed = ServiceAvailability.objects.filter(
-                    service=service, weekday=weekday, is_closed=True
-                ).exists()
-
-                if service_closed:
-                    current_date += timedelta(days=1)
-                    continue
-
-            # If we reach here, do a full availability check
-            slots = AvailabilityService.get_service_availability(
-                service_id, current_date
-            )
-
-            if slots:
-                available_days.append(current_date)
-
-            current_date += timedelta(days=1)
-
-        return available_days
+        days = AvailabilityCalendar.get_days(service_id, start_date, end_date)
+        return [day for day, available in days.items() if available]
@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
 
 from apps.categoriesapp.models import Category
 from apps.serviceapp.models import (
@@ -40,51 +42,59 @@ class ServiceService:
         shop = Shop.objects.get(id=shop_id)
         category = Category.objects.get(id=category_id)
 
-        # Create service
-        service = Service.objects.create(
-            shop=shop,
-            category=category,
-            name=service_data.get("name"),
-            description=service_data.get("description", ""),
-            short_description=service_data.get("short_description", ""),
-            image=service_data.get("image"),
-            price=service_data.get("price"),
-            duration=service_data.get("duration"),
-            slot_granularity=service_data.get("slot_granularity", 30),
-            buffer_before=service_data.get("buffer_before", 0),
-            buffer_after=service_data.get("buffer_after", 0),
-            service_location=service_data.get("service_location"),
-            has_custom_availability=service_data.get("has_custom_availability", False),
-            min_booking_notice=service_data.get("min_booking_notice", 0),
-            max_advance_booking_days=service_data.get("max_advance_booking_days", 30),
-            order=service_data.get("order", 0),
-            is_featured=service_data.get("is_featured", False),
-            status=service_data.get("status", "active"),
-        )
+        from apps.subscriptionapp.services.usage_monitor import UsageMonitor
 
-        # Create availability if provided
-        if availability_data:
-            for availability in availability_data:
-                ServiceAvailability.objects.create(
-                    service=service,
-                    weekday=availability.get("weekday"),
-                    from_hour=availability.get("from_hour"),
-                    to_hour=availability.get("to_hour"),
-                    is_closed=availability.get("is_closed", False),
+        with UsageMonitor.reserve_service(shop.id) as (reserved, current, limit):
+            if not reserved:
+                raise ValidationError(
+                    _("Service limit reached ({current}/{limit}).").format(
+                        current=current, limit=limit
+                    )
                 )
 
-        # Assign specialists if provided
-        if specialist_ids:
-            for specialist_id in specialist_ids:
-                specialist = Specialist.objects.get(id=specialist_id)
+            # Create service
+            service = Service.objects.create(
+                shop=shop,
+                category=category,
+                name=service_data.get("name"),
+                description=service_data.get("description", ""),
+                short_description=service_data.get("short_description", ""),
+                image=service_data.get("image"),
+                price=service_data.get("price"),
+                duration=service_data.get("duration"),
+                slot_granularity=service_data.get("slot_granularity", 30),
+                buffer_before=service_data.get("buffer_before", 0),
+                buffer_after=service_data.get("buffer_after", 0),
+                service_location=service_data.get("service_location"),
+                has_custom_availability=service_data.get("has_custom_availability", False),
+                min_booking_notice=service_data.get("min_booking_notice", 0),
+                max_advance_booking_days=service_data.get("max_advance_booking_days", 30),
+                order=service_data.get("order", 0),
+                is_featured=service_data.get("is_featured", False),
+                status=service_data.get("status", "active"),
+            )
 
-                # Ensure specialist belongs to the same shop
-                if specialist.employee.shop_id == shop.id:
-                    SpecialistService.objects.create(
-                        specialist=specialist, service=service
+            # Create availability if provided
+            if availability_data:
+                for availability in availability_data:
+                    ServiceAvailability.objects.create(
+                        service=service,
+                        weekday=availability.get("weekday"),
+                        from_hour=availability.get("from_hour"),
+                        to_hour=availability.get("to_hour"),
+                        is_closed=availability.get("is_closed", False),
                     )
 
-        return service
+            # Assign specialists if provided
+            if specialist_ids:
+                for specialist_id in specialist_ids:
+                    specialist = Specialist.objects.get(id=specialist_id)
+
+                    # Ensure specialist belongs to the same shop
+                    if specialist.employee.shop_id == shop.id:
+                        SpecialistService.objects.create(specialist=specialist, service=service)
+
+            return service
 
     @staticmethod
     @transaction.atomic
@@ -14,6 +14,7 @@ from apps.serviceapp.models import (
     ServiceFAQ,
     ServiceOverview,
 )
+from apps.serviceapp.services.availability_calendar import AvailabilityCalendar
 from apps.serviceapp.services.availability_service import AvailabilityService
 from apps.serviceapp.services.service_service import ServiceService
 from apps.shopapp.models import Shop, ShopHours
@@ -22,6 +23,8 @@ from apps.specialistsapp.models import (
     SpecialistService,
     SpecialistWorkingHours,
 )
+from apps.subscriptionapp.constants import STATUS_ACTIVE
+from apps.subscriptionapp.models import Subscription
 
 
 class AvailabilityServiceTest(TestCase):
@@ -226,6 +229,47 @@ class AvailabilityServiceTest(TestCase):
         last_slot = slots[-1]
         self.assertEqual(last_slot["start"], "13:00")
 
+    def test_calendar_matches_daily_availability(self):
+        """Test that the calendar agrees with the per-day slot computation"""
+        ServiceException.objects.create(
+            service=self.service,
+            date=timezone.now().date() + datetime.timedelta(days=3),
+            is_closed=True,
+        )
+        start_date = timezone.now().date() - datetime.timedelta(days=2)
+        end_date = start_date + datetime.timedelta(days=45)
+
+        days = AvailabilityCalendar.get_days(self.service.id, start_date, end_date)
+
+        self.assertEqual(len(days), 46)
+        for day, available in days.items():
+            slots = AvailabilityService.get_service_availability(self.service.id, day)
+            self.assertEqual(available, bool(slots), day)
+
+    def test_calendar_invalidated_by_exception(self):
+        """Test that a new service exception invalidates the cached calendar"""
+        today = timezone.now().date()
+        days_ahead = 1 - today.weekday()
+        if days_ahead <= 0:
+            days_ahead += 7
+        future_monday = today + datetime.timedelta(days=days_ahead)
+
+        self.assertIn(
+            future_monday,
+            AvailabilityService.get_service_available_days(
+                self.service.id, future_monday, future_monday
+            ),
+        )
+
+        ServiceException.objects.create(service=self.service, date=future_monday, is_closed=True)
+
+        self.assertEqual(
+            AvailabilityService.get_service_available_days(
+                self.service.id, future_monday, future_monday
+            ),
+            [],
+        )
+
 
 class ServiceServiceTest(TestCase):
     """Test the ServiceService"""
@@ -239,6 +283,9 @@ class ServiceServiceTest(TestCase):
             name="Test Company", owner=self.user, contact_phone="9876543210"
         )
 
+        # Active subscription for the plan limits
+        Subscription.objects.create(company=self.company, status=STATUS_ACTIVE)
+
         # Create test shop
         self.shop = Shop.objects.create(
             name="Test Shop",
@@ -49,6 +49,7 @@ from .serializers import (
     ServiceStepSerializer,
     ServiceUpdateSerializer,
 )
+from .services.availability_calendar import AvailabilityCalendar
 from .services.availability_service import AvailabilityService
 from .services.duration_refiner import DurationRefiner
 from .services.service_matcher import ServiceMatcher
@@ -783,6 +784,80 @@ class ServiceViewSet(viewsets.ModelViewSet):
 
         return Response(available_days_str)
 
+    @document_api_endpoint(
+        summary="Get availability calendar",
+        description=(
+            "Get for each day of a 60-90 day range whether the service has bookable capacity"
+        ),
+        responses={
+            200: "Success - Returns whether each day has capacity",
+            400: "Bad Request - Invalid date format or number of days",
+            404: "Not Found - Service not found",
+        },
+        path_params=[{"name": "pk", "description": "Service ID", "type": "string"}],
+        query_params=[
+            {
+                "name": "start_date",
+                "description": "Start date (YYYY-MM-DD, default: today)",
+                "required": False,
+                "type": "string",
+            },
+            {
+                "name": "days",
+                "description": "Number of days (default: 60, max: 90)",
+                "required": False,
+                "type": "integer",
+            },
+        ],
+        tags=["Services", "Availability"],
+    )
+    @action(detail=True, methods=["get"], url_path="availability-calendar")
+    def availability_calendar(self, request, pk=None):
+        """
+        Get a month view of the days when the service has bookable capacity
+
+        Query parameters:
+        - start_date: Start date (YYYY-MM-DD, default: today)
+        - days: Number of days (default: 60, max: 90)
+        """
+        service = self.get_object()
+
+        try:
+            start_date_str = request.query_params.get("start_date")
+            if start_date_str:
+                start_date = datetime.datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            else:
+                start_date = datetime.date.today()
+        except ValueError:
+            return Response(
+                {"detail": _("Invalid date format. Use YYYY-MM-DD")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            days = int(request.query_params.get("days", 60))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= 90:
+            return Response(
+                {"detail": _("Days must be a number between 1 and 90")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        end_date = start_date + datetime.timedelta(days=days - 1)
+        calendar = AvailabilityCalendar.get_days(service.id, start_date, end_date)
+
+        return Response(
+            {
+                "start_date": start_date.strftime("%Y-%m-%d"),
+                "end_date": end_date.strftime("%Y-%m-%d"),
+                "days": [
+                    {"date": day.strftime("%Y-%m-%d"), "available": available}
+                    for day, available in calendar.items()
+                ],
+            }
+        )
+
 
 @document_api_viewset(
     summary="Service Availability",
@@ -0,0 +1,385 @@
+"""
+Declarative KPI evaluation for shop dashboards.
+
+Every scalar KPI is declared as a function of a few conditional aggregates
+over one source table (appointments, payments, queue tickets, reviews, reel
+and story views). The engine gathers the aggregates the requested KPIs need,
+renders each of them once per period with the period's date range as the
+aggregate filter, and evaluates each source with a single grouped query over
+all requested shops and periods. Ranking KPIs (most booked service, top
+specialist) take one extra grouped query each.
+
+The number of queries depends on the requested KPIs only, not on the number
+of shops or periods.
+"""
+
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    DateTimeField,
+    Exists,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+# Aggregates: name -> (source table, aggregate of the rows matching a period)
+AGGREGATES = {
+    "bookings": ("appointments", lambda when: Count("id", filter=when)),
+    "completed": (
+        "appointments",
+        lambda when: Count("id", filter=when & Q(status="completed")),
+    ),
+    "paid_completed": (
+        "appointments",
+        lambda when: Count("id", filter=when & Q(status="completed", payment_status="paid")),
+    ),
+    "cancelled": (
+        "appointments",
+        lambda when: Count("id", filter=when & Q(status="cancelled")),
+    ),
+    "no_show": (
+        "appointments",
+        lambda when: Count("id", filter=when & Q(status="no_show")),
+    ),
+    "customers": (
+        "appointments",
+        lambda when: Count("customer_id", distinct=True, filter=when),
+    ),
+    # Customers with a booking at the shop before the period started
+    "returning_customers": (
+        "appointments",
+        lambda when: Count("customer_id", distinct=True, filter=when & Q(has_prior=True)),
+    ),
+    "revenue": ("payments", lambda when: Sum("amount", filter=when)),
+    "avg_wait": ("queue", lambda when: Avg("actual_wait_time", filter=when)),
+    "avg_rating": ("reviews", lambda when: Avg("rating", filter=when)),
+    "reel_views": ("reel_views", lambda when: Count("id", filter=when)),
+    "story_views": ("story_views", lambda when: Count("id", filter=when)),
+}
+
+
+def _rate(part, total):
+    return part / total * 100 if total > 0 else 0
+
+
+def _count(value):
+    return {"value": value, "formatted": str(value)}
+
+
+def _percentage(value):
+    return {"value": value, "formatted": f"{value:.1f}%"}
+
+
+def _total_revenue(row):
+    revenue = row["revenue"]
+    return {"value": revenue, "formatted": f"{revenue:.2f} SAR"}
+
+
+def _avg_revenue_per_booking(row):
+    if not row["paid_completed"]:
+        return {"value": 0, "formatted": "0 SAR"}
+    average = row["revenue"] / row["paid_completed"]
+    return {"value": average, "formatted": f"{average:.2f} SAR"}
+
+
+def _returning_customer_rate(row):
+    if not row["customers"]:
+        return {"value": 0, "formatted": "0%"}
+    return _percentage(_rate(row["returning_customers"], row["customers"]))
+
+
+def _avg_queue_wait_time(row):
+    wait = row["avg_wait"]
+    return {"value": wait, "formatted": f"{wait:.1f} min"}
+
+
+def _avg_rating(row):
+    rating = row["avg_rating"]
+    return {"value": rating, "formatted": f"{rating:.1f} ★"}
+
+
+# Scalar KPIs: (aggregates read, value from a period's aggregates)
+SCALAR_KPIS = {
+    "total_revenue": (["revenue"], _total_revenue),
+    "avg_revenue_per_booking": (
+        ["revenue", "paid_completed"],
+        _avg_revenue_per_booking,
+    ),
+    "total_bookings": (["bookings"], lambda row: _count(row["bookings"])),
+    "completed_bookings": (["completed"], lambda row: _count(row["completed"])),
+    "cancellation_rate": (
+        ["cancelled", "bookings"],
+        lambda row: _percentage(_rate(row["cancelled"], row["bookings"])),
+    ),
+    "no_show_rate": (
+        ["no_show", "bookings"],
+        lambda row: _percentage(_rate(row["no_show"], row["bookings"])),
+    ),
+    "total_customers": (["customers"], lambda row: _count(row["customers"])),
+    "new_customers": (
+        ["customers", "returning_customers"],
+        lambda row: _count(row["customers"] - row["returning_customers"]),
+    ),
+    "returning_customer_rate": (
+        ["customers", "returning_customers"],
+        _returning_customer_rate,
+    ),
+    "avg_queue_wait_time": (["avg_wait"], _avg_queue_wait_time),
+    "avg_rating": (["avg_rating"], _avg_rating),
+    "reel_views": (["reel_views"], lambda row: _count(row["reel_views"])),
+    "story_views": (["story_views"], lambda row: _count(row["story_views"])),
+}
+
+# Ranking KPIs: the most booked service or specialist of each period
+RANKING_KPIS = {
+    "most_popular_service": "service_id",
+    "top_specialist": "specialist_id",
+}
+
+
+def period_bounds(start_date, end_date):
+    """Aware datetimes spanning a date range, start and end day included."""
+    return (
+        timezone.make_aware(timezone.datetime.combine(start_date, timezone.datetime.min.time())),
+        timezone.make_aware(timezone.datetime.combine(end_date, timezone.datetime.max.time())),
+    )
+
+
+class KPIEngine:
+    """
+    Evaluates dashboard KPIs for many shops and periods with one grouped
+    query per source table.
+    """
+
+    @staticmethod
+    def _sources():
+        """
+        Source tables: name -> (queryset builder, shop field, date field).
+
+        Builders receive the shop IDs, the overall time window, the periods and
+        the aggregates needed, and return the rows the aggregates filter.
+        """
+        return {
+            "appointments": (KPIEngine._appointments, "shop_id", "start_time"),
+            "payments": (
+                KPIEngine._payments,
+                "appointment_shop",
+                "appointment_start",
+            ),
+            "queue": (KPIEngine._queue_tickets, "queue__shop_id", "join_time"),
+            "reviews": (KPIEngine._reviews, "shop_id", "created_at"),
+            "reel_views": (KPIEngine._reel_views, "reel__shop_id", "created_at"),
+            "story_views": (KPIEngine._story_views, "story__shop_id", "viewed_at"),
+        }
+
+    # ------------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _appointments(shop_ids, window, periods, aggregates):
+        from apps.bookingapp.models import Appointment
+
+        queryset = Appointment.objects.filter(shop_id__in=shop_ids, start_time__range=window)
+        if "returning_customers" not in aggregates:
+            return queryset
+
+        # Start of the period each booking falls in, to look for earlier ones
+        period_start = Case(
+            *[When(start_time__range=bounds, then=Value(bounds[0])) for bounds in periods.values()],
+            output_field=DateTimeField(),
+        )
+        earlier_bookings = Appointment.objects.filter(
+            shop_id=OuterRef("shop_id"),
+            customer_id=OuterRef("customer_id"),
+            start_time__lt=OuterRef("period_start"),
+        )
+        return queryset.annotate(period_start=period_start).annotate(
+            has_prior=Exists(earlier_bookings)
+        )
+
+    @staticmethod
+    def _payments(shop_ids, window, periods, aggregates):
+        from apps.bookingapp.models import Appointment
+        from apps.payment.models import Transaction
+
+        appointments = Appointment.objects.filter(
+            shop_id__in=shop_ids,
+            start_time__range=window,
+            status="completed",
+            payment_status="paid",
+        )
+        appointment = Appointment.objects.filter(id=OuterRef("object_id"))
+
+        # Succeeded payments of paid bookings, with the booking's shop and
+        # start time to group and filter them like the bookings themselves
+        return Transaction.objects.filter(
+            content_type=ContentType.objects.get_for_model(Appointment),
+            object_id__in=appointments.values("id"),
+            status="succeeded",
+        ).annotate(
+            appointment_shop=Subquery(appointment.values("shop_id")[:1]),
+            appointment_start=Subquery(appointment.values("start_time")[:1]),
+        )
+
+    @staticmethod
+    def _queue_tickets(shop_ids, window, periods, aggregates):
+        from apps.queueapp.models import QueueTicket
+
+        return QueueTicket.objects.filter(
+            queue__shop_id__in=shop_ids,
+            join_time__range=window,
+            status="served",
+            actual_wait_time__isnull=False,
+        )
+
+    @staticmethod
+    def _reviews(shop_ids, window, periods, aggregates):
+        from apps.reviewapp.models import ShopReview
+
+        return ShopReview.objects.filter(shop_id__in=shop_ids, created_at__range=window)
+
+    @staticmethod
+    def _reel_views(shop_ids, window, periods, aggregates):
+        from apps.reelsapp.models import ReelView
+
+        return ReelView.objects.filter(reel__shop_id__in=shop_ids, created_at__range=window)
+
+    @staticmethod
+    def _story_views(shop_ids, window, periods, aggregates):
+        from apps.storiesapp.models import StoryView
+
+        return StoryView.objects.filter(story__shop_id__in=shop_ids, viewed_at__range=window)
+
+    # ------------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def evaluate(cls, shop_ids, periods, kpi_keys):
+        """
+        Evaluate KPIs for many shops over several periods.
+
+        Args:
+            shop_ids: Shop IDs
+            periods: Dict mapping period name to a (start_date, end_date) tuple
+            kpi_keys: KPI keys to evaluate (unknown keys are skipped)
+
+        Returns:
+            Dict mapping shop ID (str) to period name to KPI key to a
+            {"value", "formatted"} dict
+        """
+        shop_ids = list(shop_ids)
+        bounds = {name: period_bounds(*dates) for name, dates in periods.items()}
+        window = (
+            min(start for start, _ in bounds.values()),
+            max(end for _, end in bounds.values()),
+        )
+
+        # Aggregates needed per source
+        needed = defaultdict(set)
+        for key in kpi_keys:
+            if key in SCALAR_KPIS:
+                for name in SCALAR_KPIS[key][0]:
+                    needed[AGGREGATES[name][0]].add(name)
+
+        # One grouped query per source over every shop and period
+        rows = defaultdict(lambda: defaultdict(dict))
+        sources = cls._sources()
+        for source, names in needed.items():
+            build, shop_field, date_field = sources[source]
+            queryset = build(shop_ids, window, bounds, names)
+            annotations = {
+                f"{period}_{name}": AGGREGATES[name][1](Q(**{f"{date_field}__range": period_range}))
+                for period, period_range in bounds.items()
+                for name in names
+            }
+            for row in queryset.values(shop_field).annotate(**annotations):
+                shop_rows = rows[str(row[shop_field])]
+                for period in bounds:
+                    for name in names:
+                        shop_rows[period][name] = row[f"{period}_{name}"]
+
+        # Shops without rows have zero counts, and empty averages read as 0
+        results = {}
+        for shop_id in shop_ids:
+            shop_rows = rows.get(str(shop_id), {})
+            results[str(shop_id)] = {}
+            for period in bounds:
+                period_rows = shop_rows.get(period, {})
+                results[str(shop_id)][period] = {
+                    key: value({name: period_rows.get(name) or 0 for name in aggregates})
+                    for key, (aggregates, value) in SCALAR_KPIS.items()
+                    if key in kpi_keys
+                }
+
+        for key in kpi_keys:
+            if key in RANKING_KPIS:
+                cls._rank(key, shop_ids, window, bounds, results)
+
+        return results
+
+    @staticmethod
+    def _rank(kpi_key, shop_ids, window, bounds, results):
+        """Fill in the most booked service or specialist of each shop and period."""
+        from apps.bookingapp.models import Appointment
+        from apps.serviceapp.models import Service
+        from apps.specialistsapp.models import Specialist
+
+        group_field = RANKING_KPIS[kpi_key]
+        counts = (
+            Appointment.objects.filter(shop_id__in=shop_ids, start_time__range=window)
+            .values("shop_id", group_field)
+            .annotate(
+                **{
+                    period: Count("id", filter=Q(start_time__range=period_range))
+                    for period, period_range in bounds.items()
+                }
+            )
+        )
+
+        # Highest count per shop and period
+        top = {}
+        for row in counts:
+            if row[group_field] is None:
+                continue
+            for period in bounds:
+                key = (str(row["shop_id"]), period)
+                if row[period] and (key not in top or row[period] > top[key][1]):
+                    top[key] = (row[group_field], row[period])
+
+        top_ids = {object_id for object_id, _ in top.values()}
+        if group_field == "service_id":
+            names = dict(Service.objects.filter(id__in=top_ids).values_list("id", "name"))
+        else:
+            names = {
+                specialist_id: f"{first_name} {last_name}"
+                for specialist_id, first_name, last_name in Specialist.objects.filter(
+                    id__in=top_ids
+                ).values_list("id", "employee__first_name", "employee__last_name")
+            }
+
+        for shop_id in shop_ids:
+            for period in bounds:
+                value = {"value": None, "formatted": "N/A"}
+                entry = top.get((str(shop_id), period))
+                if entry is not None and entry[0] in names:
+                    object_id, booking_count = entry
+                    value = {
+                        "value": {
+                            "id": str(object_id),
+                            "name": names[object_id],
+                            "booking_count": booking_count,
+                        },
+                        "formatted": f"{names[object_id]} ({booking_count})",
+                    }
+                results[str(shop_id)][period][kpi_key] = value
@@ -1,3 +1,5 @@
+from datetime import date
+
 from celery import shared_task
 from django.utils import timezone
 
@@ -81,6 +83,15 @@ def generate_and_send_report(report_id):
         raise ReportGenerationException(f"Error generating report: {str(e)}")
 
 
+@shared_task
+def refresh_shop_kpis(shop_ids, start_date, end_date):
+    """Recompute the cached KPIs of shops for a date range"""
+    from apps.shopDashboardApp.services.kpi_service import KPIService
+
+    KPIService().refresh(shop_ids, date.fromisoformat(start_date), date.fromisoformat(end_date))
+    return f"Refreshed KPIs of {len(shop_ids)} shops"
+
+
 def generate_report_data(shop_id, start_date, end_date, kpi_keys, chart_sources):
     """Generate data for report"""
     from apps.shopDashboardApp.services.kpi_service import KPIService
@@ -1,16 +1,29 @@
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from apps.authapp.models import User
+from apps.bookingapp.models import Appointment
+from apps.categoriesapp.models import Category
 from apps.companiesapp.models import Company
+from apps.employeeapp.models import Employee
+from apps.serviceapp.models import Service
 from apps.shopapp.models import Shop
 from apps.shopDashboardApp.models import DashboardLayout, DashboardSettings
 from apps.shopDashboardApp.services.dashboard_service import DashboardService
 from apps.shopDashboardApp.services.kpi_service import KPIService
 from apps.shopDashboardApp.services.settings_service import SettingsService
+from apps.specialistsapp.models import Specialist
 
+# KPIs are cached in the default cache
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class DashboardServicesTestCase(TestCase):
     """Test cases for Dashboard app services"""
 
@@ -37,6 +50,8 @@ class DashboardServicesTestCase(TestCase):
             username="testshop",
         )
 
+        cache.clear()
+
         # Initialize services
         self.dashboard_service = DashboardService()
         self.kpi_service = KPIService()
@@ -118,3 +133,85 @@ class DashboardServicesTestCase(TestCase):
         self.assertTrue(len(widgets["kpi_widgets"]) > 0)
         self.assertTrue(len(widgets["chart_widgets"]) > 0)
         self.assertTrue(len(widgets["table_widgets"]) > 0)
+
+    def _create_appointments(self, shop, day, statuses):
+        """Create one appointment per status at noon on a day"""
+        index = Appointment.objects.count()
+        category = Category.objects.create(name=f"Category {index}")
+        service = Service.objects.create(
+            shop=shop,
+            category=category,
+            name="Haircut",
+            price=100.00,
+            duration=30,
+            service_location="in_shop",
+        )
+        employee_user = User.objects.create(phone_number=f"55{index:08d}", user_type="employee")
+        employee = Employee.objects.create(
+            user=employee_user, shop=shop, first_name="Test", last_name="Specialist"
+        )
+        specialist = Specialist.objects.create(employee=employee)
+
+        start_time = timezone.make_aware(datetime.combine(day, time(12)))
+        for status in statuses:
+            Appointment.objects.create(
+                customer=self.user,
+                service=service,
+                specialist=specialist,
+                shop=shop,
+                start_time=start_time,
+                end_time=start_time + timedelta(minutes=30),
+                status=status,
+            )
+
+    def test_get_kpis(self):
+        """Test KPIs of both periods are evaluated together and cached"""
+        end_date = date.today()
+        start_date = end_date - timedelta(days=6)
+        self._create_appointments(
+            self.shop, end_date, ["completed", "completed", "cancelled", "scheduled"]
+        )
+        self._create_appointments(
+            self.shop, start_date - timedelta(days=1), ["completed", "cancelled"]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            kpis = self.kpi_service.get_kpis(
+                self.shop.id,
+                start_date,
+                end_date,
+                ["total_bookings", "cancellation_rate"],
+            )
+        # One grouped query per source and per ranking, whatever the periods
+        self.assertLessEqual(len(queries), 12)
+
+        kpis = {kpi["key"]: kpi for kpi in kpis}
+        self.assertEqual(kpis["total_bookings"]["value"]["value"], 4)
+        self.assertEqual(kpis["total_bookings"]["comparison_value"]["value"], 2)
+        self.assertEqual(kpis["total_bookings"]["change_percentage"], 100.0)
+        self.assertEqual(kpis["cancellation_rate"]["value"]["value"], 25.0)
+        self.assertEqual(kpis["cancellation_rate"]["comparison_value"]["value"], 50.0)
+
+        # Fresh KPIs are served from the cache
+        with CaptureQueriesContext(connection) as queries:
+            self.kpi_service.get_kpis(self.shop.id, start_date, end_date)
+        self.assertEqual(len(queries), 0)
+
+    def test_get_kpis_for_shops(self):
+        """Test KPIs of several shops are evaluated together"""
+        other_shop = Shop.objects.create(
+            company=self.company,
+            name="Other Shop",
+            phone_number="9876543211",
+            username="othershop",
+        )
+        today = date.today()
+        self._create_appointments(self.shop, today, ["completed"])
+        self._create_appointments(other_shop, today, ["completed", "cancelled"])
+
+        kpis = self.kpi_service.get_kpis_for_shops(
+            [self.shop.id, other_shop.id], today, today, ["total_bookings"]
+        )
+
+        self.assertEqual(kpis[str(self.shop.id)][0]["value"]["value"], 1)
+        self.assertEqual(kpis[str(other_shop.id)][0]["value"]["value"], 2)
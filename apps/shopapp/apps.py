@@ -8,4 +8,5 @@ class ShopAppConfig(AppConfig):
     verbose_name = _("Shop Management")
 
     def ready(self):
-        pass
+        # Import signals to register them
+        import apps.shopapp.signals  # noqa
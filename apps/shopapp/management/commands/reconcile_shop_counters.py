@@ -0,0 +1,27 @@
+# apps/shopapp/management/commands/reconcile_shop_counters.py
+from django.core.management.base import BaseCommand
+
+from apps.shopapp.services.counter_service import ShopCounterService
+
+
+class Command(BaseCommand):
+    help = "Repair drift in denormalized shop counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop-ids", type=str, nargs="*", help="Only check these shops")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted shops without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        drifted = ShopCounterService.reconcile(
+            shop_ids=options["shop_ids"], dry_run=options["dry_run"]
+        )
+
+        for shop_id in drifted:
+            self.stdout.write(f"Drifted: {shop_id}")
+
+        verb = "Found" if options["dry_run"] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} shops with drifted counters"))
@@ -1,7 +1,6 @@
 import uuid
 
 from django.db import models
-from django.db.models import Avg
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -70,6 +69,13 @@ class Shop(models.Model):
     )
     languages_supported = models.JSONField(_("Languages Supported"), default=list)
 
+    # Denormalized counters, maintained by ShopCounterService
+    rating_sum = models.PositiveIntegerField(_("Rating Sum"), default=0)
+    rating_count = models.PositiveIntegerField(_("Rating Count"), default=0)
+    service_count = models.PositiveIntegerField(_("Service Count"), default=0)
+    specialist_count = models.PositiveIntegerField(_("Specialist Count"), default=0)
+    follower_count = models.PositiveIntegerField(_("Follower Count"), default=0)
+
     class Meta:
         verbose_name = _("Shop")
         verbose_name_plural = _("Shops")
@@ -87,15 +93,9 @@ class Shop(models.Model):
 
     def get_avg_rating(self):
         """Get average rating for shop"""
-        from apps.reviewapp.models import Review
-
-        avg_rating = (
-            Review.objects.filter(
-                content_type__model="shop", object_id=self.id
-            ).aggregate(Avg("rating"))["rating__avg"]
-            or 0
-        )
-        return round(avg_rating, 1)
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
 
     def get_booking_count(self):
         """Get total booking count"""
@@ -105,19 +105,15 @@ class Shop(models.Model):
 
     def get_specialist_count(self):
         """Get count of specialists in this shop"""
-        from apps.specialistsapp.models import Specialist
-
-        return Specialist.objects.filter(employee__shop=self).count()
+        return self.specialist_count
 
     def get_service_count(self):
         """Get count of services offered by this shop"""
-        from apps.serviceapp.models import Service
-
-        return Service.objects.filter(shop=self).count()
+        return self.service_count
 
     def get_follower_count(self):
         """Get count of customers following this shop"""
-        return self.followers.count()
+        return self.follower_count
 
     def is_open_now(self):
         """Check if shop is currently open"""
@@ -185,6 +185,9 @@ class ShopSerializer(serializers.ModelSerializer):
         return obj.get_follower_count()
 
     def get_is_open_now(self, obj):
+        # Annotated for the whole page by ShopCounterService.annotate_listing
+        if hasattr(obj, "open_now"):
+            return obj.open_now
         return obj.is_open_now()
 
     def get_distance(self, obj):
@@ -239,6 +242,9 @@ class ShopSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return False
 
+        if hasattr(obj, "followed_by_user"):
+            return obj.followed_by_user
+
         return ShopFollower.objects.filter(shop=obj, customer=request.user).exists()
 
 
@@ -268,6 +274,9 @@ class ShopMinimalSerializer(serializers.ModelSerializer):
         return obj.get_avg_rating()
 
     def get_is_open_now(self, obj):
+        # Annotated for the whole page by ShopCounterService.annotate_listing
+        if hasattr(obj, "open_now"):
+            return obj.open_now
         return obj.is_open_now()
 
     def get_distance(self, obj):
@@ -0,0 +1,176 @@
+"""
+Denormalized shop counters.
+
+Shop keeps rating_sum, rating_count, service_count, specialist_count and
+follower_count columns so list endpoints can render them without per-row
+aggregates. Signals recount the affected counter of one shop with a single
+UPDATE whenever a review, service, specialist or follower row changes, and
+the reconciler repairs drift left by bulk operations that bypass signals.
+"""
+
+import logging
+
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.shopapp.models import Shop, ShopFollower, ShopHours
+
+logger = logging.getLogger(__name__)
+
+
+class ShopCounterService:
+    """Maintain and reconcile denormalized shop counters"""
+
+    COUNTER_FIELDS = [
+        "rating_sum",
+        "rating_count",
+        "service_count",
+        "specialist_count",
+        "follower_count",
+    ]
+
+    # Shops reconciled per UPDATE
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def _aggregate(queryset, group_field, aggregate):
+        """Correlated subquery aggregating rows of the outer shop."""
+        return Coalesce(
+            Subquery(
+                queryset.filter(**{group_field: OuterRef("pk")})
+                .order_by()
+                .values(group_field)
+                .annotate(value=aggregate)
+                .values("value"),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    @classmethod
+    def counter_expressions(cls):
+        """
+        Get the expression recomputing each counter from its source rows.
+
+        Returns:
+            Dict mapping counter field to a subquery expression
+        """
+        from apps.reviewapp.models import ShopReview
+        from apps.serviceapp.models import Service
+        from apps.specialistsapp.models import Specialist
+
+        # Only approved reviews are shown, so only they count towards ratings
+        approved_reviews = ShopReview.objects.filter(status="approved")
+
+        return {
+            "rating_sum": cls._aggregate(approved_reviews, "shop", Sum("rating")),
+            "rating_count": cls._aggregate(approved_reviews, "shop", Count("id")),
+            "service_count": cls._aggregate(Service.objects.all(), "shop", Count("id")),
+            "specialist_count": cls._aggregate(
+                Specialist.objects.all(), "employee__shop", Count("id")
+            ),
+            "follower_count": cls._aggregate(ShopFollower.objects.all(), "shop", Count("id")),
+        }
+
+    @classmethod
+    def refresh(cls, shop_id, fields=None):
+        """
+        Recount counters of one shop with a single UPDATE.
+
+        Args:
+            shop_id: ID of the shop
+            fields: Optional counter fields to refresh (defaults to all)
+        """
+        if not shop_id:
+            return
+
+        expressions = cls.counter_expressions()
+        fields = fields or cls.COUNTER_FIELDS
+        Shop.objects.filter(id=shop_id).update(**{field: expressions[field] for field in fields})
+
+    @classmethod
+    def reconcile(cls, shop_ids=None, dry_run=False):
+        """
+        Find shops whose counters drifted from their source rows and fix them.
+
+        Args:
+            shop_ids: Optional shop IDs to check (defaults to every shop)
+            dry_run: Only report drifted shops without updating them
+
+        Returns:
+            List of IDs of drifted shops
+        """
+        expressions = cls.counter_expressions()
+
+        queryset = Shop.objects.all()
+        if shop_ids is not None:
+            queryset = queryset.filter(id__in=shop_ids)
+
+        drift = Q()
+        for field in cls.COUNTER_FIELDS:
+            drift |= ~Q(**{field: F(f"actual_{field}")})
+
+        drifted = list(
+            queryset.annotate(
+                **{f"actual_{field}": expression for field, expression in expressions.items()}
+            )
+            .filter(drift)
+            .values_list("id", flat=True)
+        )
+
+        if drifted and not dry_run:
+            for start in range(0, len(drifted), cls.BATCH_SIZE):
+                Shop.objects.filter(id__in=drifted[start : start + cls.BATCH_SIZE]).update(
+                    **expressions
+                )
+            logger.info(f"Reconciled counters of {len(drifted)} shops")
+
+        return drifted
+
+    @staticmethod
+    def annotate_listing(queryset, user=None):
+        """
+        Annotate open-now and followed state for a page of shops.
+
+        Both are EXISTS subqueries evaluated by the page query itself, so
+        serializers need no query per shop. Adds `open_now` and, for an
+        authenticated user, `followed_by_user`, and loads the location,
+        settings and hours the shop serializers render.
+
+        Args:
+            queryset: Shop queryset
+            user: Optional requesting user
+
+        Returns:
+            Annotated queryset
+        """
+        now = timezone.now()
+        # Convert to our weekday format (0 = Sunday)
+        weekday = (now.weekday() + 1) % 7
+        current_time = now.time()
+
+        queryset = (
+            queryset.select_related("location", "settings")
+            .prefetch_related("hours")
+            .annotate(
+                open_now=Exists(
+                    ShopHours.objects.filter(
+                        shop=OuterRef("pk"),
+                        weekday=weekday,
+                        is_closed=False,
+                        from_hour__lte=current_time,
+                        to_hour__gte=current_time,
+                    )
+                )
+            )
+        )
+
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                followed_by_user=Exists(
+                    ShopFollower.objects.filter(shop=OuterRef("pk"), customer=user)
+                )
+            )
+
+        return queryset
@@ -1,10 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from apps.employeeapp.models import Employee
+from apps.reviewapp.models import ShopReview
+from apps.serviceapp.models import Service
 from apps.specialistsapp.models import Specialist
 
-from .models import Shop, ShopSettings, ShopVerification
+from .models import Shop, ShopFollower, ShopSettings, ShopVerification
+from .services.counter_service import ShopCounterService
 
 
 @receiver(post_save, sender=Shop)
@@ -25,3 +29,77 @@ def handle_verification_approval(sender, instance, **kwargs):
 
         # Also verify all specialists in this shop
         Specialist.objects.filter(employee__shop=shop).update(is_verified=True)
+
+
+@receiver(post_save, sender=ShopReview)
+@receiver(post_delete, sender=ShopReview)
+def update_rating_counters(sender, instance, **kwargs):
+    """Recount rating sum and count of the reviewed shop"""
+    ShopCounterService.refresh(instance.shop_id, ["rating_sum", "rating_count"])
+
+
+def refresh_moved_counter(instance, shop_id, field):
+    """Recount a counter of the current shop and of the shop moved away from"""
+    ShopCounterService.refresh(shop_id, [field])
+
+    previous_shop_id = getattr(instance, "_previous_shop_id", None)
+    if previous_shop_id and previous_shop_id != shop_id:
+        ShopCounterService.refresh(previous_shop_id, [field])
+
+
+@receiver(pre_save, sender=Service)
+def remember_service_shop(sender, instance, **kwargs):
+    """Remember the saved shop of a service, in case it moves"""
+    instance._previous_shop_id = (
+        Service.objects.filter(pk=instance.pk).values_list("shop_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def update_service_counter(sender, instance, **kwargs):
+    """Recount services of the shop"""
+    refresh_moved_counter(instance, instance.shop_id, "service_count")
+
+
+@receiver(pre_save, sender=Specialist)
+def remember_specialist_shop(sender, instance, **kwargs):
+    """Remember the saved shop of a specialist, in case it moves"""
+    instance._previous_shop_id = (
+        Specialist.objects.filter(pk=instance.pk)
+        .values_list("employee__shop_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Specialist)
+@receiver(post_delete, sender=Specialist)
+def update_specialist_counter(sender, instance, **kwargs):
+    """Recount specialists of the specialist's shop"""
+    shop_id = (
+        Employee.objects.filter(id=instance.employee_id).values_list("shop_id", flat=True).first()
+    )
+    refresh_moved_counter(instance, shop_id, "specialist_count")
+
+
+@receiver(pre_save, sender=Employee)
+def remember_employee_shop(sender, instance, **kwargs):
+    """Remember the saved shop of an employee, in case it moves"""
+    instance._previous_shop_id = (
+        Employee.objects.filter(pk=instance.pk).values_list("shop_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Employee)
+def update_moved_specialist_counter(sender, instance, **kwargs):
+    """Recount specialists of both shops when a specialist's employee moves"""
+    previous_shop_id = getattr(instance, "_previous_shop_id", None)
+    if previous_shop_id and previous_shop_id != instance.shop_id:
+        refresh_moved_counter(instance, instance.shop_id, "specialist_count")
+
+
+@receiver(post_save, sender=ShopFollower)
+@receiver(post_delete, sender=ShopFollower)
+def update_follower_counter(sender, instance, **kwargs):
+    """Recount followers of the shop"""
+    ShopCounterService.refresh(instance.shop_id, ["follower_count"])
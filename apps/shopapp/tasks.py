@@ -0,0 +1,14 @@
+# apps/shopapp/tasks.py
+from celery import shared_task
+
+from apps.shopapp.services.counter_service import ShopCounterService
+
+
+@shared_task
+def reconcile_shop_counters():
+    """
+    Task to repair denormalized shop counters that drifted from their source rows
+    """
+    drifted = ShopCounterService.reconcile()
+
+    return f"{len(drifted)} shops reconciled"
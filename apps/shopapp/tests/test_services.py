@@ -0,0 +1,174 @@
+from datetime import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.authapp.models import User
+from apps.categoriesapp.models import Category
+from apps.companiesapp.models import Company
+from apps.employeeapp.models import Employee
+from apps.reviewapp.models import ShopReview
+from apps.serviceapp.models import Service
+from apps.shopapp.models import Shop, ShopFollower, ShopHours
+from apps.shopapp.serializers import ShopSerializer
+from apps.shopapp.services.counter_service import ShopCounterService
+from apps.specialistsapp.models import Specialist
+
+
+class ShopCounterServiceTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(phone_number="1234567890", user_type="employee")
+        self.customer = User.objects.create(phone_number="1234567891", user_type="customer")
+        self.company = Company.objects.create(
+            name="Test Company", owner=self.owner, contact_phone="1234567890"
+        )
+        self.shop = self.create_shop("testshop")
+        self.other_shop = self.create_shop("othershop")
+        self.category = Category.objects.create(name="Hair")
+
+    def create_shop(self, username):
+        return Shop.objects.create(
+            name=username, company=self.company, phone_number="1234567890", username=username
+        )
+
+    def create_service(self, shop):
+        return Service.objects.create(
+            name="Haircut", shop=shop, category=self.category, price=50, duration=30
+        )
+
+    def create_specialist(self, shop, phone_number):
+        user = User.objects.create(phone_number=phone_number, user_type="employee")
+        employee = Employee.objects.create(
+            user=user, shop=shop, first_name="Test", last_name="Specialist", position="specialist"
+        )
+        return Specialist.objects.create(employee=employee)
+
+    def review(self, rating, status="approved", user=None):
+        return ShopReview.objects.create(
+            shop=self.shop,
+            user=user or self.customer,
+            title="Review",
+            content="Review",
+            rating=rating,
+            status=status,
+        )
+
+    def counters(self, shop):
+        shop.refresh_from_db()
+        return {field: getattr(shop, field) for field in ShopCounterService.COUNTER_FIELDS}
+
+    def test_signals_keep_counters_current(self):
+        """Test that row changes recount the affected shop counters"""
+        self.review(5)
+        self.review(3, user=self.owner)
+        self.create_service(self.shop)
+        self.create_specialist(self.shop, "1234567892")
+        ShopFollower.objects.create(shop=self.shop, customer=self.customer)
+
+        self.assertEqual(
+            self.counters(self.shop),
+            {
+                "rating_sum": 8,
+                "rating_count": 2,
+                "service_count": 1,
+                "specialist_count": 1,
+                "follower_count": 1,
+            },
+        )
+        self.assertEqual(self.shop.get_avg_rating(), 4.0)
+
+    def test_only_approved_reviews_are_counted(self):
+        """Test that pending and rejected reviews leave the rating alone"""
+        review = self.review(4)
+        self.review(1, status="pending", user=self.owner)
+        self.assertEqual(self.counters(self.shop)["rating_count"], 1)
+
+        review.status = "rejected"
+        review.save()
+        self.assertEqual(self.counters(self.shop)["rating_sum"], 0)
+        self.assertEqual(self.counters(self.shop)["rating_count"], 0)
+
+    def test_moving_rows_recounts_both_shops(self):
+        """Test that the shop moved away from is recounted too"""
+        service = self.create_service(self.shop)
+        specialist = self.create_specialist(self.shop, "1234567892")
+
+        service.shop = self.other_shop
+        service.save()
+        employee = specialist.employee
+        employee.shop = self.other_shop
+        employee.save()
+
+        for shop, count in ((self.shop, 0), (self.other_shop, 1)):
+            counters = self.counters(shop)
+            self.assertEqual(counters["service_count"], count)
+            self.assertEqual(counters["specialist_count"], count)
+
+    def test_refresh_recounts_selected_fields(self):
+        """Test that refresh only rewrites the requested counters"""
+        self.create_service(self.shop)
+        Shop.objects.filter(id=self.shop.id).update(service_count=7, follower_count=7)
+
+        ShopCounterService.refresh(self.shop.id, ["service_count"])
+
+        counters = self.counters(self.shop)
+        self.assertEqual(counters["service_count"], 1)
+        self.assertEqual(counters["follower_count"], 7)
+
+    def test_reconcile_repairs_drifted_shops(self):
+        """Test that reconcile finds and fixes counters changed behind signals"""
+        self.create_service(self.shop)
+        Shop.objects.filter(id=self.shop.id).update(service_count=5, rating_count=2)
+
+        self.assertEqual(ShopCounterService.reconcile(dry_run=True), [self.shop.id])
+        self.assertEqual(self.counters(self.shop)["service_count"], 5)
+
+        self.assertEqual(ShopCounterService.reconcile(), [self.shop.id])
+        self.assertEqual(self.counters(self.shop)["service_count"], 1)
+        self.assertEqual(self.counters(self.shop)["rating_count"], 0)
+        self.assertEqual(ShopCounterService.reconcile(), [])
+
+    def test_annotate_listing_adds_page_state(self):
+        """Test that open-now and followed state come from the page query"""
+        now = timezone.now()
+        ShopHours.objects.create(
+            shop=self.shop,
+            weekday=(now.weekday() + 1) % 7,
+            from_hour=time(0, 0),
+            to_hour=time(23, 59, 59),
+        )
+        ShopFollower.objects.create(shop=self.shop, customer=self.customer)
+
+        shops = {
+            shop.id: shop
+            for shop in ShopCounterService.annotate_listing(
+                Shop.objects.filter(id__in=[self.shop.id, self.other_shop.id]), self.customer
+            )
+        }
+
+        self.assertTrue(shops[self.shop.id].open_now)
+        self.assertFalse(shops[self.other_shop.id].open_now)
+        self.assertTrue(shops[self.shop.id].followed_by_user)
+        self.assertFalse(shops[self.other_shop.id].followed_by_user)
+
+        anonymous = ShopCounterService.annotate_listing(
+            Shop.objects.all(), SimpleNamespace(is_authenticated=False)
+        ).first()
+        self.assertFalse(hasattr(anonymous, "followed_by_user"))
+
+    def test_serializer_falls_back_without_annotations(self):
+        """Test that the serializer reads annotations and checks per shop otherwise"""
+        request = SimpleNamespace(user=self.customer, query_params={})
+        serializer = ShopSerializer(context={"request": request})
+        ShopFollower.objects.create(shop=self.shop, customer=self.customer)
+
+        annotated = MagicMock(open_now=False, followed_by_user=False)
+        self.assertFalse(serializer.get_is_open_now(annotated))
+        self.assertFalse(serializer.get_is_followed(annotated))
+        annotated.is_open_now.assert_not_called()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.get_is_followed(self.shop))
+        self.assertEqual(serializer.get_is_open_now(self.shop), self.shop.is_open_now())
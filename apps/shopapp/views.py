@@ -41,6 +41,7 @@ from .serializers import (
     ShopSettingsSerializer,
     ShopVerificationSerializer,
 )
+from .services.counter_service import ShopCounterService
 from .services.hours_service import HoursService
 from .services.shop_service import ShopService
 from .services.shop_visibility import ShopVisibilityService
@@ -78,6 +79,9 @@ class ShopViewSet(viewsets.ModelViewSet):
     ordering = ["-is_featured", "name"]
 
     def get_queryset(self):
+        return ShopCounterService.annotate_listing(self._get_visible_shops(), self.request.user)
+
+    def _get_visible_shops(self):
         user = self.request.user
 
         # For customers, only return active and verified shops in their city
@@ -894,7 +898,8 @@ class NearbyShopsView(generics.ListAPIView):
             queryset = queryset.filter(services__category__id=category_id).distinct()
 
         # Use shop visibility service to sort by relevance
-        return ShopVisibilityService.sort_shops_by_relevance(queryset, user)
+        queryset = ShopVisibilityService.sort_shops_by_relevance(queryset, user)
+        return ShopCounterService.annotate_listing(queryset, user)
 
 
 @document_api_endpoint(
@@ -976,6 +981,7 @@ class TopShopsView(generics.ListAPIView):
         )
 
         # Order by weighted score
+        queryset = ShopCounterService.annotate_listing(queryset, self.request.user)
         return queryset.order_by("-weighted_score")
 
 
@@ -1002,6 +1008,7 @@ class FollowedShopsView(generics.ListAPIView):
             return Shop.objects.none()
 
         # Get shops followed by the customer
-        return Shop.objects.filter(
+        queryset = Shop.objects.filter(
             followers__customer=user, is_verified=True, is_active=True
         ).order_by("-followers__created_at")
+        return ShopCounterService.annotate_listing(queryset, user)
@@ -304,52 +304,60 @@ class SpecialistCreateSerializer(serializers.ModelSerializer):
         employee = Employee.objects.get(id=employee_id)
         shop = employee.shop
 
-        # Create specialist
-        specialist = Specialist.objects.create(employee=employee, **validated_data)
+        from apps.subscriptionapp.services.usage_monitor import UsageMonitor
 
-        # Add expertise categories
-        if expertise_ids:
-            categories = Category.objects.filter(id__in=expertise_ids)
-            specialist.expertise.set(categories)
-
-        # Add services
-        services = Service.objects.filter(id__in=service_ids, shop=shop)
-        for service in services:
-            SpecialistService.objects.create(
-                specialist=specialist,
-                service=service,
-                is_primary=service == services.first(),  # First service is primary
-            )
-
-        # Create working hours (default or provided)
-        if working_hours_data:
-            for hours_data in working_hours_data:
-                SpecialistWorkingHours.objects.create(
-                    specialist=specialist, **hours_data
+        with UsageMonitor.reserve_specialist(shop.id) as (reserved, current, limit):
+            if not reserved:
+                raise serializers.ValidationError(
+                    _("Specialist limit reached ({current}/{limit}).").format(
+                        current=current, limit=limit
+                    )
                 )
-        else:
-            # Create default working hours (9AM-5PM, Sun-Thu, Friday off)
-            from apps.specialistsapp.constants import (
-                DEFAULT_END_HOUR,
-                DEFAULT_START_HOUR,
-            )
 
-            for day in range(7):  # 0=Sunday, 6=Saturday
-                SpecialistWorkingHours.objects.create(
+            # Create specialist
+            specialist = Specialist.objects.create(employee=employee, **validated_data)
+
+            # Add expertise categories
+            if expertise_ids:
+                categories = Category.objects.filter(id__in=expertise_ids)
+                specialist.expertise.set(categories)
+
+            # Add services
+            services = Service.objects.filter(id__in=service_ids, shop=shop)
+            for service in services:
+                SpecialistService.objects.create(
                     specialist=specialist,
-                    weekday=day,
-                    from_hour=DEFAULT_START_HOUR,
-                    to_hour=DEFAULT_END_HOUR,
-                    is_off=(day == 5),  # Friday off by default
+                    service=service,
+                    is_primary=service == services.first(),  # First service is primary
                 )
 
-        # If shop is verified, auto-verify specialist
-        if shop.is_verified:
-            specialist.is_verified = True
-            specialist.verified_at = shop.verification_date
-            specialist.save()
+            # Create working hours (default or provided)
+            if working_hours_data:
+                for hours_data in working_hours_data:
+                    SpecialistWorkingHours.objects.create(specialist=specialist, **hours_data)
+            else:
+                # Create default working hours (9AM-5PM, Sun-Thu, Friday off)
+                from apps.specialistsapp.constants import (
+                    DEFAULT_END_HOUR,
+                    DEFAULT_START_HOUR,
+                )
 
-        return specialist
+                for day in range(7):  # 0=Sunday, 6=Saturday
+                    SpecialistWorkingHours.objects.create(
+                        specialist=specialist,
+                        weekday=day,
+                        from_hour=DEFAULT_START_HOUR,
+                        to_hour=DEFAULT_END_HOUR,
+                        is_off=(day == 5),  # Friday off by default
+                    )
+
+            # If shop is verified, auto-verify specialist
+            if shop.is_verified:
+                specialist.is_verified = True
+                specialist.verified_at = shop.verification_date
+                specialist.save()
+
+            return specialist
 
 
 class SpecialistUpdateSerializer(serializers.ModelSerializer):
@@ -34,69 +34,79 @@ class SpecialistService:
         if hasattr(employee, "specialist"):
             raise ValidationError(_("Employee already has a specialist profile."))
 
-        # Create specialist
-        specialist = Specialist.objects.create(
-            employee=employee,
-            bio=data.get("bio", ""),
-            experience_years=data.get("experience_years", 0),
-            experience_level=data.get("experience_level", "intermediate"),
-        )
-
-        # Add expertise categories if provided
-        if "expertise_ids" in data and data["expertise_ids"]:
-            from apps.categoriesapp.models import Category
-
-            categories = Category.objects.filter(id__in=data["expertise_ids"])
-            specialist.expertise.set(categories)
-
-        # Add services if provided
-        if "service_ids" in data and data["service_ids"]:
-            from apps.serviceapp.models import Service
-
-            shop = employee.shop
-            services = Service.objects.filter(id__in=data["service_ids"], shop=shop)
-
-            for i, service in enumerate(services):
-                SpecialistService.objects.create(
-                    specialist=specialist,
-                    service=service,
-                    is_primary=(i == 0),  # First service is primary
+        from apps.subscriptionapp.services.usage_monitor import UsageMonitor
+
+        with UsageMonitor.reserve_specialist(employee.shop_id) as (reserved, current, limit):
+            if not reserved:
+                raise ValidationError(
+                    _("Specialist limit reached ({current}/{limit}).").format(
+                        current=current, limit=limit
+                    )
                 )
 
-        # Create working hours if provided
-        if "working_hours" in data and data["working_hours"]:
-            for hours_data in data["working_hours"]:
-                SpecialistWorkingHours.objects.create(
-                    specialist=specialist,
-                    weekday=hours_data.get("weekday"),
-                    from_hour=hours_data.get("from_hour"),
-                    to_hour=hours_data.get("to_hour"),
-                    is_off=hours_data.get("is_off", False),
-                )
-        else:
-            # Create default working hours (9AM-5PM, Sun-Thu, Friday off)
-            from apps.specialistsapp.constants import (
-                DEFAULT_END_HOUR,
-                DEFAULT_START_HOUR,
+            # Create specialist
+            specialist = Specialist.objects.create(
+                employee=employee,
+                bio=data.get("bio", ""),
+                experience_years=data.get("experience_years", 0),
+                experience_level=data.get("experience_level", "intermediate"),
             )
 
-            for day in range(7):  # 0=Sunday, 6=Saturday
-                SpecialistWorkingHours.objects.create(
-                    specialist=specialist,
-                    weekday=day,
-                    from_hour=DEFAULT_START_HOUR,
-                    to_hour=DEFAULT_END_HOUR,
-                    is_off=(day == 5),  # Friday off by default
+            # Add expertise categories if provided
+            if "expertise_ids" in data and data["expertise_ids"]:
+                from apps.categoriesapp.models import Category
+
+                categories = Category.objects.filter(id__in=data["expertise_ids"])
+                specialist.expertise.set(categories)
+
+            # Add services if provided
+            if "service_ids" in data and data["service_ids"]:
+                from apps.serviceapp.models import Service
+
+                shop = employee.shop
+                services = Service.objects.filter(id__in=data["service_ids"], shop=shop)
+
+                for i, service in enumerate(services):
+                    SpecialistService.objects.create(
+                        specialist=specialist,
+                        service=service,
+                        is_primary=(i == 0),  # First service is primary
+                    )
+
+            # Create working hours if provided
+            if "working_hours" in data and data["working_hours"]:
+                for hours_data in data["working_hours"]:
+                    SpecialistWorkingHours.objects.create(
+                        specialist=specialist,
+                        weekday=hours_data.get("weekday"),
+                        from_hour=hours_data.get("from_hour"),
+                        to_hour=hours_data.get("to_hour"),
+                        is_off=hours_data.get("is_off", False),
+                    )
+            else:
+                # Create default working hours (9AM-5PM, Sun-Thu, Friday off)
+                from apps.specialistsapp.constants import (
+                    DEFAULT_END_HOUR,
+                    DEFAULT_START_HOUR,
                 )
 
-        # If shop is verified, auto-verify specialist
-        shop = employee.shop
-        if shop.is_verified:
-            specialist.is_verified = True
-            specialist.verified_at = timezone.now()
-            specialist.save()
+                for day in range(7):  # 0=Sunday, 6=Saturday
+                    SpecialistWorkingHours.objects.create(
+                        specialist=specialist,
+                        weekday=day,
+                        from_hour=DEFAULT_START_HOUR,
+                        to_hour=DEFAULT_END_HOUR,
+                        is_off=(day == 5),  # Friday off by default
+                    )
 
-        return specialist
+            # If shop is verified, auto-verify specialist
+            shop = employee.shop
+            if shop.is_verified:
+                specialist.is_verified = True
+                specialist.verified_at = timezone.now()
+                specialist.save()
+
+            return specialist
 
     @transaction.atomic
     def update_specialist(self, specialist, data):
@@ -20,6 +20,8 @@ from apps.specialistsapp.services.specialist_ranker import SpecialistRanker
 from apps.specialistsapp.services.specialist_service import (
     SpecialistService as SpecialistManager,
 )
+from apps.subscriptionapp.constants import STATUS_ACTIVE
+from apps.subscriptionapp.models import Subscription
 
 
 class AvailabilityServiceTests(TestCase):
@@ -215,6 +217,10 @@ class SpecialistManagerTests(TestCase):
         self.company = Company.objects.create(
             name="Test Company", owner=self.owner, contact_phone="1234567890"
         )
+
+        # Active subscription for the plan limits
+        Subscription.objects.create(company=self.company, status=STATUS_ACTIVE)
+
         self.shop = Shop.objects.create(
             name="Test Shop",
             company=self.company,
@@ -16,6 +16,8 @@ from apps.specialistsapp.models import (
     SpecialistService,
     SpecialistWorkingHours,
 )
+from apps.subscriptionapp.constants import STATUS_ACTIVE
+from apps.subscriptionapp.models import Subscription
 
 
 class SpecialistViewSetTests(TestCase):
@@ -37,6 +39,10 @@ class SpecialistViewSetTests(TestCase):
         self.company = Company.objects.create(
             name="Test Company", owner=self.owner, contact_phone="1234567890"
         )
+
+        # Active subscription for the plan limits
+        Subscription.objects.create(company=self.company, status=STATUS_ACTIVE)
+
         self.shop = Shop.objects.create(
             name="Test Shop",
             company=self.company,
@@ -8,4 +8,4 @@ class SubscriptionAppConfig(AppConfig):
     verbose_name = _("Subscription Management")
 
     def ready(self):
-        pass
+        import apps.subscriptionapp.entitlement_signals  # noqa
@@ -0,0 +1,122 @@
+# apps/subscriptionapp/entitlement_signals.py
+"""
+Keep entitlement snapshots in step with the objects they count.
+
+Counts are adjusted once the surrounding transaction commits, so rolled back
+creates never reach the snapshot. Objects created under a reservation were
+counted when it was taken and are skipped here.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.employeeapp.models import Employee
+from apps.serviceapp.models import Service
+from apps.shopapp.models import Shop
+from apps.specialistsapp.models import Specialist
+
+from .constants import (
+    FEATURE_CATEGORY_SERVICES,
+    FEATURE_CATEGORY_SHOPS,
+    FEATURE_CATEGORY_SPECIALISTS,
+)
+from .models import Plan, PlanFeature, Subscription
+from .services.entitlement_service import EntitlementService
+
+
+@receiver(post_save, sender=Subscription)
+def rebuild_entitlements_on_subscription_change(sender, instance, **kwargs):
+    """Rebuild the snapshot when a subscription or its plan changes"""
+    transaction.on_commit(partial(EntitlementService.build, instance.company_id))
+
+
+@receiver(post_delete, sender=Subscription)
+def invalidate_entitlements_on_subscription_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(EntitlementService.invalidate, instance.company_id))
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_save, sender=PlanFeature)
+@receiver(post_delete, sender=PlanFeature)
+def invalidate_entitlements_on_plan_change(sender, instance, **kwargs):
+    """Drop the snapshots of companies on a changed plan"""
+    plan_id = instance.id if sender is Plan else instance.plan_id
+    transaction.on_commit(partial(EntitlementService.invalidate_plan, plan_id))
+
+
+@receiver(post_save, sender=Shop)
+def count_created_shop(sender, instance, created, **kwargs):
+    if created and not EntitlementService.take_reservation(
+        FEATURE_CATEGORY_SHOPS, company_id=instance.company_id
+    ):
+        transaction.on_commit(
+            partial(
+                EntitlementService.record_created,
+                instance.company_id,
+                FEATURE_CATEGORY_SHOPS,
+            )
+        )
+
+
+@receiver(post_delete, sender=Shop)
+def invalidate_entitlements_on_shop_delete(sender, instance, **kwargs):
+    """Rebuild without the shop and its per-shop counts"""
+    transaction.on_commit(partial(EntitlementService.invalidate, instance.company_id))
+
+
+def _record_shop_object(category, shop_id, created):
+    company_id = EntitlementService.company_for_shop(shop_id)
+    if not company_id:
+        return
+
+    if created:
+        EntitlementService.record_created(company_id, category, shop_id)
+    else:
+        EntitlementService.record_deleted(company_id, category, shop_id)
+
+
+@receiver(post_save, sender=Service)
+def count_created_service(sender, instance, created, **kwargs):
+    if created and not EntitlementService.take_reservation(
+        FEATURE_CATEGORY_SERVICES, shop_id=instance.shop_id
+    ):
+        transaction.on_commit(
+            partial(_record_shop_object, FEATURE_CATEGORY_SERVICES, instance.shop_id, True)
+        )
+
+
+@receiver(post_delete, sender=Service)
+def count_deleted_service(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(_record_shop_object, FEATURE_CATEGORY_SERVICES, instance.shop_id, False)
+    )
+
+
+@receiver(post_save, sender=Specialist)
+def count_created_specialist(sender, instance, created, **kwargs):
+    if created and not EntitlementService.take_reservation(
+        FEATURE_CATEGORY_SPECIALISTS, shop_id=instance.employee.shop_id
+    ):
+        transaction.on_commit(
+            partial(
+                _record_shop_object,
+                FEATURE_CATEGORY_SPECIALISTS,
+                instance.employee.shop_id,
+                True,
+            )
+        )
+
+
+@receiver(post_delete, sender=Specialist)
+def count_deleted_specialist(sender, instance, **kwargs):
+    # The employee row may be going away in the same delete
+    shop_id = (
+        Employee.objects.filter(id=instance.employee_id).values_list("shop_id", flat=True).first()
+    )
+    if shop_id:
+        transaction.on_commit(
+            partial(_record_shop_object, FEATURE_CATEGORY_SPECIALISTS, shop_id, False)
+        )
@@ -0,0 +1,455 @@
+# apps/subscriptionapp/services/entitlement_service.py
+"""
+Entitlement snapshots for subscription limit checks.
+
+Each company has one compact record of its active subscription: the plan
+limits, the available plan features and the current shop, service and
+specialist counts. Create and delete signals adjust the counts with HINCRBY
+and plan or subscription changes rebuild the record, so a limit check is a
+single hash read instead of subscription, usage and count queries.
+
+Create paths hold a reservation() around the create: it checks the limit and
+counts the new object in one step, so concurrent creates cannot overshoot it.
+The create signal of a reserved object is then not counted again, and the
+slot is handed back when the create fails. A slot taken inside a transaction
+that later rolls back is compensated by a delayed check, which drops the
+record unless the commit confirmed the reservation.
+
+Records live in Redis hashes when the default cache is django-redis, where a
+Lua script applies count changes atomically. Other cache backends store them
+as plain cache entries.
+"""
+
+import logging
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from apps.serviceapp.models import Service
+from apps.shopapp.models import Shop
+from apps.specialistsapp.models import Specialist
+from apps.subscriptionapp.constants import (
+    FEATURE_CATEGORY_SERVICES,
+    FEATURE_CATEGORY_SHOPS,
+    FEATURE_CATEGORY_SPECIALISTS,
+    STATUS_ACTIVE,
+    STATUS_TRIAL,
+)
+from apps.subscriptionapp.models import PlanFeature, Subscription
+from utils.cache_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Count one more object if usage is below the limit.
+# Returns {status, current, limit}: status 1 reserved, 0 refused, -1 no record.
+RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1, 0, 0}
+end
+if redis.call('HGET', KEYS[1], 'active') ~= '1' then
+    return {0, 0, 0}
+end
+local limit = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[2]) or '0')
+if current >= limit then
+    return {0, current, limit}
+end
+redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+return {1, current, limit}
+"""
+
+# Apply a usage delta to an existing record, never going below zero
+RECORD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2]) < 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], 0)
+end
+return 1
+"""
+
+# Reservations held by the running create paths, taken by their create signals
+_reservations = ContextVar("entitlement_reservations", default=())
+
+
+class EntitlementService:
+    """Per-company snapshot of plan limits, features and usage"""
+
+    KEY_PREFIX = "entitlements:"
+    SHOP_KEY_PREFIX = "entitlement_shop:"
+    # Records are rebuilt from the database at least this often
+    TTL = getattr(settings, "ENTITLEMENT_SNAPSHOT_TTL", 60 * 60 * 24)
+
+    # Seconds before an unconfirmed reservation drops its company's record
+    RESERVATION_CONFIRM_DELAY = 300
+
+    ACTIVE_STATUSES = [STATUS_ACTIVE, STATUS_TRIAL]
+
+    # Limit field of the subscription per counted category
+    LIMIT_FIELDS = {
+        FEATURE_CATEGORY_SHOPS: "max_shops",
+        FEATURE_CATEGORY_SERVICES: "max_services_per_shop",
+        FEATURE_CATEGORY_SPECIALISTS: "max_specialists_per_shop",
+    }
+
+    # ------------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def _key(cls, company_id):
+        return f"{cls.KEY_PREFIX}{company_id}"
+
+    @staticmethod
+    def _fields(category, shop_id=None):
+        """Get the (limit, usage) fields of a counted category."""
+        # Services and specialists are limited per shop
+        scope = category if category == FEATURE_CATEGORY_SHOPS else f"{category}:{shop_id}"
+        return f"limit:{category}", f"usage:{scope}"
+
+    @staticmethod
+    def _reservation_key(category, company_id=None, shop_id=None):
+        scope = company_id if category == FEATURE_CATEGORY_SHOPS else shop_id
+        return category, str(scope)
+
+    @classmethod
+    def company_for_shop(cls, shop_id):
+        """
+        Get the company ID of a shop.
+
+        Args:
+            shop_id: ID of the shop
+
+        Returns:
+            Company ID as a string, or None for an unknown shop
+        """
+        key = f"{cls.SHOP_KEY_PREFIX}{shop_id}"
+        company_id = cache.get(key)
+        if company_id is None:
+            company_id = (
+                Shop.objects.filter(id=shop_id).values_list("company_id", flat=True).first()
+            )
+            if company_id is None:
+                return None
+            company_id = str(company_id)
+            cache.set(key, company_id, cls.TTL)
+        return company_id
+
+    # ------------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, company_id):
+        """
+        Rebuild the entitlement record of a company from the database.
+
+        Args:
+            company_id: ID of the company
+
+        Returns:
+            Snapshot dict mapping field name to string value
+        """
+        subscription = Subscription.objects.filter(
+            company_id=company_id, status__in=cls.ACTIVE_STATUSES
+        ).first()
+        shop_ids = list(Shop.objects.filter(company_id=company_id).values_list("id", flat=True))
+        cache.set_many(
+            {f"{cls.SHOP_KEY_PREFIX}{shop_id}": str(company_id) for shop_id in shop_ids},
+            cls.TTL,
+        )
+
+        snapshot = {"active": "0"}
+        if subscription:
+            snapshot.update(
+                {
+                    "active": "1",
+                    "subscription_id": str(subscription.id),
+                    "plan_id": str(subscription.plan_id),
+                    f"usage:{FEATURE_CATEGORY_SHOPS}": str(len(shop_ids)),
+                }
+            )
+            for category, field in cls.LIMIT_FIELDS.items():
+                snapshot[f"limit:{category}"] = str(getattr(subscription, field))
+
+            for row in (
+                Service.objects.filter(shop_id__in=shop_ids)
+                .values("shop_id")
+                .annotate(count=Count("id"))
+            ):
+                _, usage_field = cls._fields(FEATURE_CATEGORY_SERVICES, row["shop_id"])
+                snapshot[usage_field] = str(row["count"])
+
+            for row in (
+                Specialist.objects.filter(employee__shop_id__in=shop_ids)
+                .values("employee__shop_id")
+                .annotate(count=Count("id"))
+            ):
+                _, usage_field = cls._fields(FEATURE_CATEGORY_SPECIALISTS, row["employee__shop_id"])
+                snapshot[usage_field] = str(row["count"])
+
+            # The first available feature of a category in plan order wins
+            for category, value in PlanFeature.objects.filter(
+                plan_id=subscription.plan_id, is_available=True
+            ).values_list("category", "value"):
+                snapshot.setdefault(f"feature:{category}", value)
+
+        client = get_redis_client()
+        if client is None:
+            cache.set(cls._key(company_id), snapshot, cls.TTL)
+        else:
+            key = cls._key(company_id)
+            with client.pipeline() as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=snapshot)
+                pipe.expire(key, cls.TTL)
+                pipe.execute()
+
+        return snapshot
+
+    @staticmethod
+    def _decode(raw):
+        return {
+            (key.decode() if isinstance(key, bytes) else key): (
+                value.decode() if isinstance(value, bytes) else value
+            )
+            for key, value in raw.items()
+        }
+
+    @classmethod
+    def get_snapshot(cls, company_id):
+        """
+        Get the entitlement record of a company, building it when missing.
+
+        Args:
+            company_id: ID of the company
+
+        Returns:
+            Snapshot dict mapping field name to string value
+        """
+        client = get_redis_client()
+        if client is None:
+            snapshot = cache.get(cls._key(company_id))
+        else:
+            snapshot = cls._decode(client.hgetall(cls._key(company_id)))
+
+        return snapshot or cls.build(company_id)
+
+    @classmethod
+    def invalidate(cls, *company_ids):
+        """Drop the entitlement records of companies, rebuilt on next read."""
+        keys = [cls._key(company_id) for company_id in company_ids]
+        if not keys:
+            return
+
+        client = get_redis_client()
+        if client is None:
+            cache.delete_many(keys)
+        else:
+            client.delete(*keys)
+
+    @classmethod
+    def invalidate_plan(cls, plan_id):
+        """Drop the entitlement records of every company subscribed to a plan."""
+        cls.invalidate(
+            *Subscription.objects.filter(plan_id=plan_id)
+            .values_list("company_id", flat=True)
+            .distinct()
+        )
+
+    # ------------------------------------------------------------------------
+    # Checks
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def check_limit(cls, company_id, category, shop_id=None):
+        """
+        Check whether one more object of a category fits the plan limits.
+
+        Args:
+            company_id: ID of the company
+            category: Counted feature category (shops, services or specialists)
+            shop_id: ID of the shop, for per-shop categories
+
+        Returns:
+            Tuple of (allowed, current, limit)
+        """
+        try:
+            snapshot = cls.get_snapshot(company_id)
+            if snapshot.get("active") != "1":
+                return False, 0, 0
+
+            limit_field, usage_field = cls._fields(category, shop_id)
+            limit = int(snapshot.get(limit_field, 0))
+            current = int(snapshot.get(usage_field, 0))
+            return current < limit, current, limit
+
+        except Exception as e:
+            logger.error(f"Error checking {category} limit: {str(e)}")
+            return False, 0, 0
+
+    @classmethod
+    def reserve(cls, company_id, category, shop_id=None):
+        """
+        Atomically check a limit and count one new object.
+
+        Args:
+            company_id: ID of the company
+            category: Counted feature category (shops, services or specialists)
+            shop_id: ID of the shop, for per-shop categories
+
+        Returns:
+            Tuple of (reserved, current, limit)
+        """
+        if not company_id:
+            return False, 0, 0
+
+        try:
+            limit_field, usage_field = cls._fields(category, shop_id)
+
+            client = get_redis_client()
+            if client is None:
+                allowed, current, limit = cls.check_limit(company_id, category, shop_id)
+                if allowed:
+                    cls._apply_locally(company_id, usage_field, 1)
+                return allowed, current, limit
+
+            script = client.register_script(RESERVE_SCRIPT)
+            args = [limit_field, usage_field]
+            status, current, limit = script(keys=[cls._key(company_id)], args=args)
+            if status == -1:
+                cls.build(company_id)
+                status, current, limit = script(keys=[cls._key(company_id)], args=args)
+
+            return status == 1, int(current), int(limit)
+
+        except Exception as e:
+            logger.error(f"Error reserving {category} slot: {str(e)}")
+            return False, 0, 0
+
+    @classmethod
+    def release(cls, company_id, category, shop_id=None):
+        """Stop counting a reserved object that was never created."""
+        cls._record(company_id, category, shop_id, -1)
+
+    @classmethod
+    @contextmanager
+    def reservation(cls, company_id, category, shop_id=None):
+        """
+        Reserve a slot for one new object around its create.
+
+        Yields (reserved, current, limit). While the block runs, the create
+        signal of a matching object takes the reservation instead of counting
+        the object again. The slot is released if the block raises or creates
+        nothing, so enter it inside the create's transaction.
+        """
+        reserved, current, limit = cls.reserve(company_id, category, shop_id)
+        if not reserved:
+            yield reserved, current, limit
+            return
+
+        held = {"key": cls._reservation_key(category, company_id, shop_id), "taken": False}
+        token = _reservations.set(_reservations.get() + (held,))
+        try:
+            yield reserved, current, limit
+        except BaseException:
+            cls.release(company_id, category, shop_id)
+            raise
+        else:
+            if not held["taken"]:
+                cls.release(company_id, category, shop_id)
+            elif transaction.get_connection().in_atomic_block:
+                cls._confirm_on_commit(company_id)
+        finally:
+            _reservations.reset(token)
+
+    @classmethod
+    def _confirm_on_commit(cls, company_id):
+        """
+        Undo a taken reservation if the enclosing transaction rolls back.
+
+        The slot was counted before the object's row commits. A pending token
+        is dropped by the commit; if it is still there when the delayed check
+        runs, the record is invalidated and rebuilt from the committed rows.
+        """
+        from apps.subscriptionapp.tasks import verify_entitlement_reservation
+
+        pending_key = f"{cls.KEY_PREFIX}pending:{uuid.uuid4().hex}"
+        cache.set(pending_key, True, cls.RESERVATION_CONFIRM_DELAY * 2)
+        transaction.on_commit(lambda: cache.delete(pending_key))
+        verify_entitlement_reservation.apply_async(
+            args=[str(company_id), pending_key], countdown=cls.RESERVATION_CONFIRM_DELAY
+        )
+
+    @classmethod
+    def verify_reservation(cls, company_id, pending_key):
+        """
+        Invalidate a company's record if a reservation was never committed.
+
+        Returns:
+            True if the record was invalidated
+        """
+        if not cache.get(pending_key):
+            return False
+
+        cache.delete(pending_key)
+        cls.invalidate(company_id)
+        return True
+
+    @classmethod
+    def take_reservation(cls, category, company_id=None, shop_id=None):
+        """
+        Take a held reservation for a created object.
+
+        Returns:
+            True if the object was already counted by a reservation
+        """
+        key = cls._reservation_key(category, company_id, shop_id)
+        for held in _reservations.get():
+            if held["key"] == key and not held["taken"]:
+                held["taken"] = True
+                return True
+        return False
+
+    @classmethod
+    def record_created(cls, company_id, category, shop_id=None):
+        """Count a created object."""
+        cls._record(company_id, category, shop_id, 1)
+
+    @classmethod
+    def record_deleted(cls, company_id, category, shop_id=None):
+        """Stop counting a deleted object."""
+        cls._record(company_id, category, shop_id, -1)
+
+    @classmethod
+    def _record(cls, company_id, category, shop_id, delta):
+        try:
+            _, usage_field = cls._fields(category, shop_id)
+
+            client = get_redis_client()
+            if client is None:
+                cls._apply_locally(company_id, usage_field, delta)
+                return
+
+            # A missing record is left alone, the next read rebuilds it
+            client.register_script(RECORD_SCRIPT)(
+                keys=[cls._key(company_id)], args=[usage_field, delta]
+            )
+
+        except Exception as e:
+            logger.error(f"Error recording {category} usage: {str(e)}")
+
+    @classmethod
+    def _apply_locally(cls, company_id, field, delta):
+        """Adjust a field of a plain cache record (not atomic)."""
+        snapshot = cache.get(cls._key(company_id))
+        if snapshot is None:
+            return
+        snapshot[field] = str(max(0, int(snapshot.get(field, 0)) + delta))
+        cache.set(cls._key(company_id), snapshot, cls.TTL)
@@ -2,6 +2,7 @@
 
 from apps.subscriptionapp.constants import FEATURE_CATEGORY_CHOICES
 from apps.subscriptionapp.models import Plan, PlanFeature
+from apps.subscriptionapp.services.entitlement_service import EntitlementService
 
 
 class FeatureService:
@@ -69,7 +70,14 @@ class FeatureService:
         if not subscription:
             return False
 
-        # Get the plan for this subscription
+        snapshot = EntitlementService.get_snapshot(subscription.company_id)
+        if snapshot.get("subscription_id") == str(subscription.id):
+            key = f"feature:{feature_category}"
+            if snapshot.get("active") != "1" or key not in snapshot:
+                return False
+            return FeatureService._value_allows(snapshot[key], value)
+
+        # Not the company's active subscription, read its plan directly
         plan = subscription.plan
         if not plan:
             return False
@@ -82,16 +90,19 @@ class FeatureService:
         if not feature:
             return False
 
+        return FeatureService._value_allows(feature.value, value)
+
+    @staticmethod
+    def _value_allows(feature_value, value):
+        """Check a requested value against the value of a feature"""
         # If value is provided, check if the feature supports this value
-        if value and feature.value:
+        if value and feature_value:
             # Handle numeric comparisons
             try:
-                feature_value = int(feature.value)
-                check_value = int(value)
-                return check_value <= feature_value
+                return int(value) <= int(feature_value)
             except (ValueError, TypeError):
                 # Handle string values (e.g., "basic", "premium")
-                return feature.value == value or feature.value == "unlimited"
+                return feature_value == value or feature_value == "unlimited"
 
         return True
 
@@ -13,6 +13,7 @@ from apps.subscriptionapp.constants import (
     FEATURE_CATEGORY_SPECIALISTS,
 )
 from apps.subscriptionapp.models import FeatureUsage, Subscription
+from apps.subscriptionapp.services.entitlement_service import EntitlementService
 
 logger = logging.getLogger(__name__)
 
@@ -193,109 +194,44 @@ class UsageMonitor:
     @staticmethod
     def check_shop_limit(company_id):
         """Check if company has reached shop limit"""
-        # Get active subscription
-        subscription = Subscription.objects.filter(
-            company_id=company_id, status__in=["active", "trial"]
-        ).first()
-
-        if not subscription:
-            logger.warning(f"No active subscription found for company {company_id}")
-            return False, 0, 0
-
-        # Get shop usage
-        shop_usage = FeatureUsage.objects.filter(
-            subscription=subscription, feature_category=FEATURE_CATEGORY_SHOPS
-        ).first()
-
-        if not shop_usage:
-            # Create usage record if it doesn't exist
-            shop_count = Shop.objects.filter(company_id=company_id).count()
-
-            shop_usage = FeatureUsage.objects.create(
-                subscription=subscription,
-                feature_category=FEATURE_CATEGORY_SHOPS,
-                limit=subscription.max_shops,
-                current_usage=shop_count,
-            )
-
-        # Check if limit is reached
-        limit_reached = shop_usage.current_usage >= shop_usage.limit
-
-        return not limit_reached, shop_usage.current_usage, shop_usage.limit
+        return EntitlementService.check_limit(company_id, FEATURE_CATEGORY_SHOPS)
 
     @staticmethod
     def check_service_limit(shop_id):
         """Check if shop has reached service limit"""
-        shop = Shop.objects.get(id=shop_id)
-        company_id = shop.company_id
-
-        # Get active subscription
-        subscription = Subscription.objects.filter(
-            company_id=company_id, status__in=["active", "trial"]
-        ).first()
-
-        if not subscription:
-            logger.warning(f"No active subscription found for company {company_id}")
+        company_id = EntitlementService.company_for_shop(shop_id)
+        if not company_id:
+            logger.warning(f"Shop {shop_id} not found")
             return False, 0, 0
 
-        # Count services for this shop
-        service_count = Service.objects.filter(shop_id=shop_id).count()
-
-        # Get service usage
-        service_usage = FeatureUsage.objects.filter(
-            subscription=subscription, feature_category=FEATURE_CATEGORY_SERVICES
-        ).first()
-
-        if not service_usage:
-            # Create usage record if it doesn't exist
-            service_usage = FeatureUsage.objects.create(
-                subscription=subscription,
-                feature_category=FEATURE_CATEGORY_SERVICES,
-                limit=subscription.max_services_per_shop,
-                current_usage=service_count,
-            )
-
-        # Check if limit is reached
-        limit_reached = service_count >= service_usage.limit
-
-        return not limit_reached, service_count, service_usage.limit
+        return EntitlementService.check_limit(company_id, FEATURE_CATEGORY_SERVICES, shop_id)
 
     @staticmethod
     def check_specialist_limit(shop_id):
         """Check if shop has reached specialist limit"""
-        shop = Shop.objects.get(id=shop_id)
-        company_id = shop.company_id
-
-        # Get active subscription
-        subscription = Subscription.objects.filter(
-            company_id=company_id, status__in=["active", "trial"]
-        ).first()
-
-        if not subscription:
-            logger.warning(f"No active subscription found for company {company_id}")
+        company_id = EntitlementService.company_for_shop(shop_id)
+        if not company_id:
+            logger.warning(f"Shop {shop_id} not found")
             return False, 0, 0
 
-        # Count specialists for this shop
-        specialist_count = Specialist.objects.filter(employee__shop_id=shop_id).count()
-
-        # Get specialist usage
-        specialist_usage = FeatureUsage.objects.filter(
-            subscription=subscription, feature_category=FEATURE_CATEGORY_SPECIALISTS
-        ).first()
+        return EntitlementService.check_limit(company_id, FEATURE_CATEGORY_SPECIALISTS, shop_id)
 
-        if not specialist_usage:
-            # Create usage record if it doesn't exist
-            specialist_usage = FeatureUsage.objects.create(
-                subscription=subscription,
-                feature_category=FEATURE_CATEGORY_SPECIALISTS,
-                limit=subscription.max_specialists_per_shop,
-                current_usage=specialist_count,
-            )
+    @staticmethod
+    def reserve_shop(company_id):
+        """Reserve a shop slot of a company around creating the shop"""
+        return EntitlementService.reservation(company_id, FEATURE_CATEGORY_SHOPS)
 
-        # Check if limit is reached
-        limit_reached = specialist_count >= specialist_usage.limit
+    @staticmethod
+    def reserve_service(shop_id):
+        """Reserve a service slot of a shop around creating the service"""
+        company_id = EntitlementService.company_for_shop(shop_id)
+        return EntitlementService.reservation(company_id, FEATURE_CATEGORY_SERVICES, shop_id)
 
-        return not limit_reached, specialist_count, specialist_usage.limit
+    @staticmethod
+    def reserve_specialist(shop_id):
+        """Reserve a specialist slot of a shop around creating the specialist"""
+        company_id = EntitlementService.company_for_shop(shop_id)
+        return EntitlementService.reservation(company_id, FEATURE_CATEGORY_SPECIALISTS, shop_id)
 
     @staticmethod
     def get_usage_summary(company_id):
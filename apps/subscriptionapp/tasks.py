@@ -147,3 +147,13 @@ def retry_failed_payments():
                 )
 
     return f"Retried {retry_count} failed payments"
+
+
+@shared_task
+def verify_entitlement_reservation(company_id, pending_key):
+    """Drop the entitlement record of a company if a reservation rolled back"""
+    from apps.subscriptionapp.services.entitlement_service import EntitlementService
+
+    if EntitlementService.verify_reservation(company_id, pending_key):
+        return f"Invalidated entitlements of company {company_id}"
+    return "Reservation confirmed"
@@ -1,13 +1,17 @@
 # apps/subscriptionapp/tests/test_services.py
 from datetime import timedelta
 from decimal import Decimal
+from unittest import skipUnless
 from unittest.mock import MagicMock, patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from apps.authapp.models import User
 from apps.companiesapp.models import Company
+from apps.shopapp.models import Shop
 from apps.subscriptionapp.constants import (
     FEATURE_CATEGORY_SHOPS,
     PERIOD_MONTHLY,
@@ -23,11 +27,21 @@ from apps.subscriptionapp.models import (
     SubscriptionInvoice,
     SubscriptionLog,
 )
+from apps.subscriptionapp.services.entitlement_service import EntitlementService
 from apps.subscriptionapp.services.invoice_service import InvoiceService
 from apps.subscriptionapp.services.plan_service import PlanService
 from apps.subscriptionapp.services.subscription_service import SubscriptionService
 from apps.subscriptionapp.services.usage_monitor import UsageMonitor
 
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis needs it to run the entitlement scripts
+except ImportError:
+    fakeredis = None
+
+# Entitlement records fall back to the default cache without Redis
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 class SubscriptionServiceTest(TestCase):
     """Test cases for the SubscriptionService"""
@@ -599,41 +613,154 @@ class UsageMonitorTest(TestCase):
         # Current usage should remain unchanged
         self.assertEqual(shop_usage.current_usage, 1)
 
-    @patch("apps.subscriptionapp.services.usage_monitor.Shop.objects.filter")
-    def test_check_shop_limit(self, mock_filter):
-        """Test checking shop limit"""
-        # Mock shop count
-        mock_count = MagicMock()
-        mock_count.count.return_value = 2
-        mock_filter.return_value = mock_count
-
-        # Create shop usage record
-        FeatureUsage.objects.create(
-            subscription=self.subscription,
-            feature_category=FEATURE_CATEGORY_SHOPS,
-            limit=3,
-            current_usage=2,
-        )
+    @override_settings(CACHES=LOCMEM_CACHES)
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_check_shop_limit(self, mock_client):
+        """Test checking shop limit against the entitlement snapshot"""
+        mock_client.return_value = None
+        cache.clear()
 
-        # Check if can add more shops
+        # Should be allowed (0 < 3)
         can_add, current, limit = UsageMonitor.check_shop_limit(self.company.id)
-
-        # Should be allowed (2 < 3)
         self.assertTrue(can_add)
-        self.assertEqual(current, 2)
+        self.assertEqual(current, 0)
         self.assertEqual(limit, 3)
 
-        # Update usage to match limit
-        shop_usage = FeatureUsage.objects.get(
-            subscription=self.subscription, feature_category=FEATURE_CATEGORY_SHOPS
-        )
-        shop_usage.current_usage = 3
-        shop_usage.save()
+        # Without an active subscription nothing can be added
+        self.subscription.status = STATUS_CANCELED
+        self.subscription.save()
+        EntitlementService.build(self.company.id)
 
-        # Check again
         can_add, current, limit = UsageMonitor.check_shop_limit(self.company.id)
+        self.assertFalse(can_add)
+        self.assertEqual(limit, 0)
 
-        # Should not be allowed (3 >= 3)
+    @override_settings(CACHES=LOCMEM_CACHES)
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_recorded_shops_count_towards_limit(self, mock_client):
+        """Test that recorded creates and deletes adjust the shop count"""
+        mock_client.return_value = None
+        cache.clear()
+        EntitlementService.build(self.company.id)
+
+        for _ in range(3):
+            EntitlementService.record_created(self.company.id, FEATURE_CATEGORY_SHOPS)
+
+        can_add, current, limit = UsageMonitor.check_shop_limit(self.company.id)
         self.assertFalse(can_add)
-        self.assertEqual(current, 3)
-        self.assertEqual(limit, 3)
+        self.assertEqual((current, limit), (3, 3))
+
+        # Counts never go below zero
+        for _ in range(5):
+            EntitlementService.record_deleted(self.company.id, FEATURE_CATEGORY_SHOPS)
+
+        can_add, current, _ = UsageMonitor.check_shop_limit(self.company.id)
+        self.assertTrue(can_add)
+        self.assertEqual(current, 0)
+
+    @skipUnless(fakeredis, "fakeredis with Lua support is not installed")
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_record_script_clamps_usage_at_zero(self, mock_client):
+        """Test that the Redis record script keeps usage counts non-negative"""
+        client = fakeredis.FakeRedis()
+        mock_client.return_value = client
+        EntitlementService.build(self.company.id)
+        key = EntitlementService._key(self.company.id)
+
+        EntitlementService.record_created(self.company.id, FEATURE_CATEGORY_SHOPS)
+        EntitlementService.record_deleted(self.company.id, FEATURE_CATEGORY_SHOPS)
+        EntitlementService.record_deleted(self.company.id, FEATURE_CATEGORY_SHOPS)
+        self.assertEqual(client.hget(key, f"usage:{FEATURE_CATEGORY_SHOPS}"), b"0")
+
+        # Records that do not exist are left for the next read to rebuild
+        client.delete(key)
+        EntitlementService.record_created(self.company.id, FEATURE_CATEGORY_SHOPS)
+        self.assertFalse(client.exists(key))
+
+    @skipUnless(fakeredis, "fakeredis with Lua support is not installed")
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_reserve_is_atomic(self, mock_client):
+        """Test that two reserves against a limit of 1 give one slot"""
+        mock_client.return_value = fakeredis.FakeRedis()
+        self.subscription.max_shops = 1
+        self.subscription.save()
+        EntitlementService.build(self.company.id)
+
+        first = EntitlementService.reserve(self.company.id, FEATURE_CATEGORY_SHOPS)
+        second = EntitlementService.reserve(self.company.id, FEATURE_CATEGORY_SHOPS)
+        self.assertEqual(first, (True, 0, 1))
+        self.assertEqual(second, (False, 1, 1))
+
+        # A released slot can be reserved again
+        EntitlementService.release(self.company.id, FEATURE_CATEGORY_SHOPS)
+        reserved, _, _ = EntitlementService.reserve(self.company.id, FEATURE_CATEGORY_SHOPS)
+        self.assertTrue(reserved)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_reserved_create_counted_once(self, mock_client):
+        """Test that a shop created under a reservation is counted once"""
+        mock_client.return_value = None
+        cache.clear()
+        EntitlementService.build(self.company.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with UsageMonitor.reserve_shop(self.company.id) as (reserved, _, _):
+                self.assertTrue(reserved)
+                Shop.objects.create(
+                    name="Test Shop",
+                    company=self.company,
+                    phone_number="1234567890",
+                    username="testshop",
+                )
+
+        _, current, _ = UsageMonitor.check_shop_limit(self.company.id)
+        self.assertEqual(current, 1)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_reservation_released_on_failure(self, mock_client):
+        """Test that a failed or skipped create hands its slot back"""
+        mock_client.return_value = None
+        cache.clear()
+        EntitlementService.build(self.company.id)
+
+        with self.assertRaises(ValueError):
+            with UsageMonitor.reserve_shop(self.company.id):
+                raise ValueError("create failed")
+
+        with UsageMonitor.reserve_shop(self.company.id):
+            pass
+
+        _, current, _ = UsageMonitor.check_shop_limit(self.company.id)
+        self.assertEqual(current, 0)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    @patch("apps.subscriptionapp.tasks.verify_entitlement_reservation.apply_async")
+    @patch("apps.subscriptionapp.services.entitlement_service.get_redis_client")
+    def test_rolled_back_reservation_invalidated(self, mock_client, mock_verify):
+        """Test that a reservation taken in a rolled back transaction is undone"""
+        mock_client.return_value = None
+        cache.clear()
+        EntitlementService.build(self.company.id)
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                with UsageMonitor.reserve_shop(self.company.id):
+                    Shop.objects.create(
+                        name="Test Shop",
+                        company=self.company,
+                        phone_number="1234567890",
+                        username="testshop",
+                    )
+                raise RuntimeError("request failed")
+
+        # Counted until the delayed check runs
+        _, current, _ = UsageMonitor.check_shop_limit(self.company.id)
+        self.assertEqual(current, 1)
+
+        company_id, pending_key = mock_verify.call_args.kwargs["args"]
+        self.assertTrue(EntitlementService.verify_reservation(company_id, pending_key))
+
+        _, current, _ = UsageMonitor.check_shop_limit(self.company.id)
+        self.assertEqual(current, 0)
@@ -76,9 +76,8 @@ try:
             "schedule": 900.0,  # Every 15 minutes
         },
         "generate-daily-shop-analytics": {
-            "task": "apps.reportanalyticsapp.tasks.generate_daily_shop_reports",
+            "task": "apps.reportanalyticsapp.tasks.rollup_daily_analytics",
             "schedule": 3600.0 * 24,  # Daily
-            "kwargs": {"send_email": True},
         },
         "process-subscription-renewals": {
             "task": "apps.subscriptionapp.tasks.process_renewals",
@@ -88,6 +87,30 @@ try:
             "task": "apps.queueapp.tasks.check_stalled_queues",
             "schedule": 1800.0,  # Every 30 minutes
         },
+        "check-live-queue-consistency": {
+            "task": "apps.queueapp.tasks.check_live_queue_consistency",
+            "schedule": 600.0,  # Every 10 minutes
+        },
+        "reconcile-shop-counters": {
+            "task": "apps.shopapp.tasks.reconcile_shop_counters",
+            "schedule": 3600.0 * 24,  # Daily
+        },
+        "rebuild-reel-similarity-index": {
+            "task": "apps.reelsapp.tasks.rebuild_user_similarity_index",
+            "schedule": 3600.0 * 6,  # Every 6 hours
+        },
+        "rebuild-reel-feed-candidates": {
+            "task": "apps.reelsapp.tasks.rebuild_feed_candidates",
+            "schedule": 900.0,  # Every 15 minutes
+        },
+        "resume-campaigns": {
+            "task": "apps.notificationsapp.tasks.resume_campaigns",
+            "schedule": 600.0,  # Every 10 minutes
+        },
+        "build-cohort-benchmarks": {
+            "task": "apps.reportanalyticsapp.tasks.build_cohort_benchmarks",
+            "schedule": 3600.0 * 24,  # Daily
+        },
         # Cache management tasks
         "clear-stale-caches": {
             "task": "core.tasks.cache_management.clear_stale_caches",
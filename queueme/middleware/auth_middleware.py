@@ -8,15 +8,13 @@ role-based access control, and security features like rate limiting.
 import logging
 import re
 import time
-from collections import defaultdict
-from datetime import datetime, timedelta
 
 from django.conf import settings
-from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
 from apps.authapp.services.token_service import TokenService
+from utils.rate_limits import GCRALimiter
 
 logger = logging.getLogger(__name__)
 
@@ -34,9 +32,33 @@ class JWTAuthMiddleware(MiddlewareMixin):
     MAX_REQUESTS_PER_WINDOW = 100
     RATE_LIMIT_CACHE_PREFIX = "rate_limit:"
 
+    # Paths that do not require authentication, matched with a single regex
+    EXEMPT_PATHS = re.compile(
+        "|".join(
+            f"(?:{pattern})"
+            for pattern in [
+                r"^/api/auth/request_otp/?$",
+                r"^/api/auth/verify_otp/?$",
+                r"^/api/auth/verify_token/?$",
+                r"^/api/docs/?",
+                r"^/api/schema/?",
+                r"^/api/guide/?",
+                r"^/api/developers/?",
+                r"^/api/support/?",
+                r"^/api/health/?$",
+                r"^/api/payment/webhook/?$",  # For Moyasar webhook
+                r"^/api/v1/openapi.json/?$",
+            ]
+        )
+    )
+
     def __init__(self, get_response=None):
         super().__init__(get_response)
-        self.rate_limit_cache = defaultdict(list)
+        self.rate_limiter = GCRALimiter(
+            self.MAX_REQUESTS_PER_WINDOW,
+            self.RATE_LIMIT_WINDOW,
+            self.RATE_LIMIT_CACHE_PREFIX,
+        )
 
     def process_request(self, request):
         # Performance tracking
@@ -47,23 +69,8 @@ class JWTAuthMiddleware(MiddlewareMixin):
             return None
 
         # Skip authentication for explicitly exempted paths
-        exempt_paths = [
-            r"^/api/auth/request_otp/?$",
-            r"^/api/auth/verify_otp/?$",
-            r"^/api/auth/verify_token/?$",
-            r"^/api/docs/?",
-            r"^/api/schema/?",
-            r"^/api/guide/?",
-            r"^/api/developers/?",
-            r"^/api/support/?",
-            r"^/api/health/?$",
-            r"^/api/payment/webhook/?$",  # For Moyasar webhook
-            r"^/api/v1/openapi.json/?$",
-        ]
-
-        for pattern in exempt_paths:
-            if re.match(pattern, request.path):
-                return None
+        if self.EXEMPT_PATHS.match(request.path):
+            return None
 
         # Check rate limiting
         if not self._check_rate_limit(request):
@@ -141,26 +148,4 @@ class JWTAuthMiddleware(MiddlewareMixin):
         if hasattr(request, "user") and request.user.is_authenticated:
             client_id = f"user_{request.user.id}"
 
-        # Get current timestamp
-        now = datetime.now()
-
-        # Get existing requests for this client
-        cache_key = f"{self.RATE_LIMIT_CACHE_PREFIX}{client_id}"
-        requests = cache.get(cache_key, [])
-
-        # Remove old requests outside the window
-        requests = [
-            ts
-            for ts in requests
-            if now - ts < timedelta(seconds=self.RATE_LIMIT_WINDOW)
-        ]
-
-        # Check if we're over the limit
-        if len(requests) >= self.MAX_REQUESTS_PER_WINDOW:
-            return False
-
-        # Add current request
-        requests.append(now)
-        cache.set(cache_key, requests, self.RATE_LIMIT_WINDOW)
-
-        return True
+        return self.rate_limiter.hit(client_id).allowed
@@ -3,14 +3,14 @@ Rate limiting middleware to protect against abuse.
 Implements different rate limits for different types of requests.
 """
 
-import time
 from abc import ABC, abstractmethod
 
 from django.conf import settings
-from django.core.cache import cache
 from django.http import HttpRequest, JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
+from utils.rate_limits import GCRALimiter
+
 
 class RateLimiter(ABC):
     """Base rate limiter interface."""
@@ -43,6 +43,7 @@ class IPRateLimiter(RateLimiter):
         self.rate = rate
         self.period = period
         self.prefix = prefix
+        self.limiter = GCRALimiter(rate, period, prefix)
 
     def is_rate_limited(self, request: HttpRequest) -> bool:
         """
@@ -63,21 +64,7 @@ class IPRateLimiter(RateLimiter):
             # If no IP can be determined, don't rate limit
             return False
 
-        # Create a cache key for this IP
-        cache_key = f"{self.prefix}{client_ip}"
-        cache_value = cache.get(cache_key, {"count": 0, "timestamp": time.time()})
-
-        # Check if period has elapsed, reset if needed
-        current_time = time.time()
-        if current_time - cache_value["timestamp"] > self.period:
-            cache_value = {"count": 0, "timestamp": current_time}
-
-        # Increment counter
-        cache_value["count"] += 1
-        cache.set(cache_key, cache_value, self.period)
-
-        # Return True if rate limit exceeded
-        return cache_value["count"] > self.rate
+        return not self.limiter.hit(client_ip).allowed
 
 
 class SensitiveEndpointLimiter(RateLimiter):
@@ -99,6 +86,7 @@ class SensitiveEndpointLimiter(RateLimiter):
         self.period = period
         self.lockout_time = lockout_time
         self.prefix = "rl:sensitive:"
+        self.limiter = GCRALimiter(rate, period, self.prefix, lockout=lockout_time)
 
     def is_rate_limited(self, request: HttpRequest) -> bool:
         """
@@ -130,25 +118,8 @@ class SensitiveEndpointLimiter(RateLimiter):
         if not identifier:
             return False
 
-        # Create cache keys
-        attempts_key = f"{self.prefix}attempts:{identifier}"
-        lockout_key = f"{self.prefix}lockout:{identifier}"
-
-        # Check if user is locked out
-        if cache.get(lockout_key):
-            return True
-
-        # Get and update attempt count
-        attempts = cache.get(attempts_key, 0)
-        attempts += 1
-        cache.set(attempts_key, attempts, self.period)
-
-        # Lockout if too many attempts
-        if attempts > self.rate:
-            cache.set(lockout_key, True, self.lockout_time)
-            return True
-
-        return False
+        # Once over the limit, the identifier stays locked out for lockout_time
+        return not self.limiter.hit(identifier).allowed
 
 
 class RateLimitingMiddleware(MiddlewareMixin):
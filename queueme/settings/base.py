@@ -277,11 +277,16 @@ JWT_COOKIE_SAMESITE = "Lax"
 # ---------------------------------------------------------------------------
 # Channels – Redis
 # ---------------------------------------------------------------------------
+# CHANNEL_REDIS_HOSTS: comma-separated Redis URLs to shard groups across.
+# Every process must list the same hosts in the same order.
+CHANNEL_REDIS_HOSTS = [h.strip() for h in env("CHANNEL_REDIS_HOSTS", "").split(",") if h.strip()]
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "websockets.channel_layers.ShardedRedisChannelLayer",
         "CONFIG": {
-            "hosts": [(env("REDIS_HOST", "redis"), int(env("REDIS_PORT", "6379")))],
+            "hosts": CHANNEL_REDIS_HOSTS
+            or [(env("REDIS_HOST", "redis"), int(env("REDIS_PORT", "6379")))],
         },
     },
 }
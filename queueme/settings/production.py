@@ -343,11 +343,18 @@ CSP_FRAME_ANCESTORS = ("'none'",)
 CSP_FORM_ACTION = ("'self'",)
 CSP_INCLUDE_NONCE_IN = ("script-src",)
 
+# Groups are sharded across CHANNEL_REDIS_HOSTS (comma-separated Redis URLs);
+# every process must list the same hosts in the same order
+CHANNEL_REDIS_HOSTS = [
+    host.strip() for host in os.environ.get("CHANNEL_REDIS_HOSTS", "").split(",") if host.strip()
+]
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "websockets.channel_layers.ShardedRedisChannelLayer",
         "CONFIG": {
-            "hosts": [os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0")],
+            "hosts": CHANNEL_REDIS_HOSTS
+            or [os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0")],
             "capacity": 1500,
             "expiry": 60,
             "group_expiry": 86400,
@@ -5,6 +5,14 @@ SQLite to PostgreSQL Migration Script
 This script handles the migration of the Queue Me database from SQLite to PostgreSQL
 with minimal downtime and maximum data integrity protection.
 
+Tables are loaded in foreign key dependency order, independent tables in
+parallel worker processes, each streaming rowid ranges from SQLite into
+PostgreSQL with COPY FROM STDIN. Secondary indexes are dropped during the load
+and rebuilt afterwards, as are foreign keys that cannot be satisfied chunk by
+chunk (self references and cycles). Progress is checkpointed per table so an interrupted
+run resumes on the next invocation, and the result is verified with chunked
+checksums of both databases.
+
 Usage:
     python sqlite_to_postgresql.py [--dry-run] [--config CONFIG_FILE]
 
@@ -14,13 +22,21 @@ Arguments:
 """
 
 import argparse
+import hashlib
+import io
 import json
 import logging
+import multiprocessing
 import os
+import shutil
 import sqlite3
+import struct
 import sys
 import time
 from datetime import datetime
+from datetime import time as time_type
+from datetime import timezone
+from decimal import Decimal
 
 import django
 import psycopg2
@@ -28,15 +44,350 @@ from django.apps import apps
 from django.conf import settings
 from django.core.management import call_command
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("migration.log"), logging.StreamHandler(sys.stdout)],
-)
 logger = logging.getLogger(__name__)
 
 
+# ---------------------------------------------------------------------------
+# COPY transfer engine
+# ---------------------------------------------------------------------------
+
+
+def quote_ident(name):
+    """Quote a table or column name for SQLite and PostgreSQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def encode_copy_value(value):
+    """
+    Encode one SQLite value for PostgreSQL COPY text format
+
+    Args:
+        value: Value read from SQLite
+
+    Returns:
+        Escaped field text
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bytes):
+        # bytea hex input, with the backslash escaped for COPY
+        return "\\\\x" + value.hex()
+    if isinstance(value, float):
+        return repr(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def dependency_levels(tables, foreign_keys):
+    """
+    Group tables into levels so that every table comes after its FK targets
+
+    Tables of the same level do not reference each other and can be
+    transferred in parallel.
+
+    Args:
+        tables: Table names to order
+        foreign_keys: Iterable of (referencing table, referenced table)
+
+    Returns:
+        List of lists of table names
+    """
+    remaining = set(tables)
+    parents = {table: set() for table in tables}
+    for child, parent in foreign_keys:
+        if child in parents and parent in parents and child != parent:
+            parents[child].add(parent)
+
+    levels = []
+    while remaining:
+        level = sorted(table for table in remaining if not parents[table] & remaining)
+        if not level:
+            # Foreign key cycle: transfer the rest together; the foreign keys
+            # between them are dropped for the load (see deferred_foreign_keys)
+            level = sorted(remaining)
+            logger.warning(f"Foreign key cycle between tables: {', '.join(level)}")
+        levels.append(level)
+        remaining.difference_update(level)
+
+    return levels
+
+
+def deferred_foreign_keys(levels, foreign_keys):
+    """
+    Pick the foreign keys that must be dropped while the tables are loaded
+
+    Every chunk is committed on its own, and the tables of a level load in
+    parallel, so a foreign key between tables of the same level (including a
+    table referencing itself) can point at a row that is not loaded yet.
+
+    Args:
+        levels: Table levels from dependency_levels
+        foreign_keys: Iterable of (referencing table, referenced table,
+            constraint name, constraint definition)
+
+    Returns:
+        Dictionary mapping constraint name to (table, definition)
+    """
+    level_of = {table: number for number, level in enumerate(levels) for table in level}
+    return {
+        name: (child, definition)
+        for child, parent, name, definition in foreign_keys
+        if child in level_of and level_of[child] == level_of.get(parent)
+    }
+
+
+class TransferCheckpoint:
+    """
+    Resumable transfer progress
+
+    One JSON file per table in a checkpoint directory, written atomically so
+    worker processes never share a file.
+    """
+
+    RUN_FILE = "_run"
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    @property
+    def started(self):
+        return os.path.exists(self._path(self.RUN_FILE))
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.save(self.RUN_FILE, {"started_at": datetime.now().isoformat()})
+
+    def load(self, name):
+        try:
+            with open(self._path(name), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, name, state):
+        path = self._path(name)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def finish(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _connect_postgres(config):
+    return psycopg2.connect(
+        host=config["pg_host"],
+        port=config["pg_port"],
+        user=config["pg_user"],
+        password=config["pg_password"],
+        database=config["pg_dbname"],
+    )
+
+
+def transfer_table(task):
+    """
+    Stream one table from SQLite into PostgreSQL (worker process entry point)
+
+    Rows are read in rowid order, one chunk at a time, and each chunk is
+    loaded with a single COPY FROM STDIN and committed. Before the commit the
+    chunk is recorded as pending with its last primary key, so a resumed run
+    can tell whether the chunk made it in.
+
+    Args:
+        task: Tuple of (config, table spec)
+
+    Returns:
+        Tuple of (table name, rows transferred in total)
+    """
+    config, spec = task
+    table = spec["table"]
+    columns = spec["columns"]
+    pk_index = columns.index(spec["pk_field"])
+    checkpoint = TransferCheckpoint(config["checkpoint_dir"])
+
+    state = checkpoint.load(table)
+    if state.get("done"):
+        return table, state["rows"]
+
+    sqlite_conn = sqlite3.connect(config["sqlite_db"])
+    pg_conn = _connect_postgres(config)
+
+    try:
+        last_rowid = state.get("last_rowid", 0)
+        rows = state.get("rows", 0)
+
+        pending = state.get("pending")
+        if pending:
+            with pg_conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT 1 FROM {quote_ident(table)} "
+                    f"WHERE {quote_ident(spec['pk_field'])} = %s",
+                    [pending["last_pk"]],
+                )
+                if cursor.fetchone():
+                    last_rowid = pending["end_rowid"]
+                    rows += pending["rows"]
+
+        column_list = ", ".join(quote_ident(column) for column in columns)
+        select_sql = (
+            f"SELECT rowid, {column_list} FROM {quote_ident(table)} "
+            f"WHERE rowid > ? ORDER BY rowid LIMIT ?"
+        )
+        copy_sql = f"COPY {quote_ident(table)} ({column_list}) FROM STDIN"
+
+        while True:
+            chunk = sqlite_conn.execute(
+                select_sql, (last_rowid, config["copy_chunk_rows"])
+            ).fetchall()
+            if not chunk:
+                break
+
+            buffer = io.StringIO()
+            for row in chunk:
+                buffer.write("\t".join(encode_copy_value(value) for value in row[1:]))
+                buffer.write("\n")
+            buffer.seek(0)
+
+            end_rowid = chunk[-1][0]
+            checkpoint.save(
+                table,
+                {
+                    "last_rowid": last_rowid,
+                    "rows": rows,
+                    "pending": {
+                        "end_rowid": end_rowid,
+                        "last_pk": chunk[-1][pk_index + 1],
+                        "rows": len(chunk),
+                    },
+                },
+            )
+
+            with pg_conn.cursor() as cursor:
+                cursor.copy_expert(copy_sql, buffer)
+            pg_conn.commit()
+
+            last_rowid = end_rowid
+            rows += len(chunk)
+            checkpoint.save(table, {"last_rowid": last_rowid, "rows": rows})
+
+        checkpoint.save(table, {"last_rowid": last_rowid, "rows": rows, "done": True})
+        return table, rows
+
+    finally:
+        sqlite_conn.close()
+        pg_conn.close()
+
+
+def rebuild_index(task):
+    """
+    Recreate one deferred index (worker process entry point)
+
+    Args:
+        task: Tuple of (config, index name, index definition)
+
+    Returns:
+        Index name
+    """
+    config, name, definition = task
+    pg_conn = _connect_postgres(config)
+    pg_conn.autocommit = True
+    try:
+        with pg_conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [quote_ident(name)])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(definition)
+        return name
+    finally:
+        pg_conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Chunked checksums
+# ---------------------------------------------------------------------------
+
+
+def _normalize_bool(value):
+    return "1" if value in (True, 1, "1", "t", "true") else "0"
+
+
+def _normalize_datetime(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(" ")
+
+
+def _normalize_json(value):
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+# PostgreSQL data type -> normalizer applied to values from both databases
+VALUE_NORMALIZERS = {
+    "boolean": _normalize_bool,
+    "uuid": lambda value: str(value).replace("-", "").lower(),
+    "timestamp with time zone": _normalize_datetime,
+    "timestamp without time zone": _normalize_datetime,
+    "date": lambda value: str(value)[:10],
+    "time without time zone": lambda value: (
+        time_type.fromisoformat(value) if isinstance(value, str) else value
+    ).isoformat(),
+    "numeric": lambda value: format(Decimal(str(value)).normalize(), "f"),
+    "double precision": lambda value: repr(float(value)),
+    # Round SQLite doubles to single precision like the real column did
+    "real": lambda value: repr(struct.unpack("f", struct.pack("f", value))[0]),
+    "smallint": lambda value: str(int(value)),
+    "integer": lambda value: str(int(value)),
+    "bigint": lambda value: str(int(value)),
+    "json": _normalize_json,
+    "jsonb": _normalize_json,
+    "bytea": lambda value: bytes(value).hex(),
+}
+
+
+def chunk_checksums(rows, normalizers, chunk_rows):
+    """
+    Hash a stream of rows in fixed-size chunks
+
+    Args:
+        rows: Iterable of row tuples, in primary key order
+        normalizers: One normalizer per column
+        chunk_rows: Rows per chunk
+
+    Returns:
+        List of (row count, hex digest) per chunk
+    """
+    checksums = []
+    digest, count = hashlib.blake2b(digest_size=16), 0
+
+    for row in rows:
+        digest.update(
+            "\x1f".join(
+                "\\N" if value is None else normalize(value)
+                for normalize, value in zip(normalizers, row)
+            ).encode()
+        )
+        digest.update(b"\x1e")
+        count += 1
+        if count == chunk_rows:
+            checksums.append((count, digest.hexdigest()))
+            digest, count = hashlib.blake2b(digest_size=16), 0
+
+    if count:
+        checksums.append((count, digest.hexdigest()))
+    return checksums
+
+
 class DatabaseMigration:
     """
     Handles migration from SQLite to PostgreSQL
@@ -79,7 +430,12 @@ class DatabaseMigration:
             "pg_password": "",
             "pg_host": "localhost",
             "pg_port": 5432,
-            "batch_size": 5000,
+            # Rows per COPY chunk and per verification checksum
+            "copy_chunk_rows": 50000,
+            "verify_chunk_rows": 10000,
+            "workers": min(8, os.cpu_count() or 1),
+            "defer_indexes": True,
+            "checkpoint_dir": "migration_checkpoint",
             "timeout": 1800,  # 30 minutes
             "backup_dir": "backups",
             "exclude_tables": ["django_migrations"],
@@ -272,8 +628,6 @@ class DatabaseMigration:
                     f"SQLite database file not found: {sqlite_path}"
                 )
 
-            import shutil
-
             shutil.copy2(sqlite_path, backup_file)
 
             logger.info(f"SQLite database backed up to {backup_file}")
@@ -494,10 +848,178 @@ class DatabaseMigration:
             logger.error(f"Failed to connect to PostgreSQL database: {e}")
             raise
 
+    def _get_postgres_columns(self, pg_cursor, table):
+        """
+        Get column names and data types of a PostgreSQL table
+
+        Returns:
+            Dictionary mapping column name to data type, in column order
+        """
+        pg_cursor.execute(
+            """
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+            ORDER BY ordinal_position
+            """,
+            [table],
+        )
+        return dict(pg_cursor.fetchall())
+
+    def _get_table_spec(self, sqlite_cursor, pg_cursor, table, table_info):
+        """
+        Describe the columns a table is transferred with
+
+        Returns:
+            Dictionary with table, columns (common to both databases, in
+            SQLite order), column types and pk_field
+        """
+        sqlite_cursor.execute(f"PRAGMA table_info({quote_ident(table)})")
+        sqlite_columns = [row[1] for row in sqlite_cursor.fetchall()]
+        pg_columns = self._get_postgres_columns(pg_cursor, table)
+
+        columns = [column for column in sqlite_columns if column in pg_columns]
+        skipped = [column for column in sqlite_columns if column not in pg_columns]
+        if skipped:
+            logger.warning(f"Columns missing in PostgreSQL for {table}: {', '.join(skipped)}")
+
+        return {
+            "table": table,
+            "columns": columns,
+            "types": [pg_columns[column] for column in columns],
+            "pk_field": table_info["pk_field"],
+        }
+
+    def _get_foreign_keys(self, pg_cursor):
+        """
+        Get foreign key references between tables of the PostgreSQL schema
+
+        Returns:
+            List of (referencing table, referenced table, constraint name,
+            constraint definition) tuples
+        """
+        pg_cursor.execute(
+            """
+            SELECT child.relname, parent.relname, c.conname, pg_get_constraintdef(c.oid)
+            FROM pg_constraint c
+            JOIN pg_class child ON child.oid = c.conrelid
+            JOIN pg_class parent ON parent.oid = c.confrelid
+            JOIN pg_namespace n ON n.oid = child.relnamespace
+            WHERE c.contype = 'f' AND n.nspname = current_schema()
+            """
+        )
+        return pg_cursor.fetchall()
+
+    def _drop_indexes(self, pg_conn, tables, checkpoint):
+        """
+        Drop secondary indexes of the target tables, remembering their definitions
+
+        Indexes backing primary key and unique constraints are kept. On a
+        resumed run the definitions saved by the interrupted run are reused.
+
+        Returns:
+            Dictionary mapping index name to definition
+        """
+        indexes = checkpoint.load("_indexes")
+        if indexes:
+            return indexes
+
+        with pg_conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT i.relname, pg_get_indexdef(x.indexrelid)
+                FROM pg_index x
+                JOIN pg_class i ON i.oid = x.indexrelid
+                JOIN pg_class t ON t.oid = x.indrelid
+                JOIN pg_namespace n ON n.oid = t.relnamespace
+                WHERE n.nspname = current_schema()
+                AND t.relname = ANY(%s)
+                AND NOT x.indisprimary
+                AND NOT EXISTS (
+                    SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid
+                )
+                """,
+                [list(tables)],
+            )
+            indexes = dict(cursor.fetchall())
+
+            # Saved before dropping so an interrupted run can rebuild them
+            checkpoint.save("_indexes", indexes)
+            for name in indexes:
+                cursor.execute(f"DROP INDEX IF EXISTS {quote_ident(name)}")
+        pg_conn.commit()
+
+        logger.info(f"Deferred {len(indexes)} indexes until the transfer completes")
+        return indexes
+
+    def _drop_foreign_keys(self, pg_conn, foreign_keys, checkpoint):
+        """
+        Drop foreign keys that cannot be checked during the load
+
+        On a resumed run the constraints saved by the interrupted run are
+        reused.
+
+        Args:
+            pg_conn: PostgreSQL database connection
+            foreign_keys: Dictionary from deferred_foreign_keys
+            checkpoint: Transfer checkpoint
+
+        Returns:
+            Dictionary mapping constraint name to (table, definition)
+        """
+        saved = checkpoint.load("_foreign_keys")
+        if saved:
+            return {name: tuple(value) for name, value in saved.items()}
+
+        # Saved before dropping so an interrupted run can restore them
+        checkpoint.save("_foreign_keys", foreign_keys)
+        with pg_conn.cursor() as cursor:
+            for name, (table, _) in foreign_keys.items():
+                cursor.execute(
+                    f"ALTER TABLE {quote_ident(table)} "
+                    f"DROP CONSTRAINT IF EXISTS {quote_ident(name)}"
+                )
+        pg_conn.commit()
+
+        logger.info(f"Deferred {len(foreign_keys)} foreign keys until the transfer completes")
+        return foreign_keys
+
+    def _restore_foreign_keys(self, pg_conn, foreign_keys):
+        """
+        Re-add the foreign keys dropped for the load
+
+        Adding a constraint validates every loaded row against it, so a
+        dangling reference fails the migration here.
+
+        Args:
+            pg_conn: PostgreSQL database connection
+            foreign_keys: Dictionary mapping constraint name to (table, definition)
+        """
+        with pg_conn.cursor() as cursor:
+            for name, (table, definition) in foreign_keys.items():
+                cursor.execute(
+                    "SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = %s::regclass",
+                    [name, quote_ident(table)],
+                )
+                if cursor.fetchone() is None:
+                    cursor.execute(
+                        f"ALTER TABLE {quote_ident(table)} "
+                        f"ADD CONSTRAINT {quote_ident(name)} {definition}"
+                    )
+        pg_conn.commit()
+
     def _transfer_data(self, sqlite_conn, pg_conn, django_tables):
         """
         Transfer data from SQLite to PostgreSQL
 
+        Tables are grouped into levels by foreign key dependency. The tables of
+        a level are independent and are streamed in parallel worker processes,
+        each reading rowid ranges from SQLite and loading them with COPY FROM
+        STDIN. Secondary indexes are dropped first and rebuilt at the end, and
+        foreign keys within a level (self references and cycles) are dropped
+        and re-added once every table is loaded. Progress is checkpointed per
+        table, so rerunning after an interruption resumes where the previous
+        run stopped.
+
         Args:
             sqlite_conn: SQLite database connection
             pg_conn: PostgreSQL database connection
@@ -507,96 +1029,80 @@ class DatabaseMigration:
             # Get list of tables from SQLite
             sqlite_cursor = sqlite_conn.cursor()
             sqlite_cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in sqlite_cursor.fetchall()]
+            tables = []
+            for (table,) in sqlite_cursor.fetchall():
+                if table in self.config["exclude_tables"] or table.startswith("sqlite_"):
+                    continue
+                if table not in django_tables:
+                    logger.warning(f"Table {table} not found in Django models, skipping")
+                    continue
+                tables.append(table)
 
-            # Filter out tables to exclude
-            tables = [
-                table
+            pg_cursor = pg_conn.cursor()
+            specs = {
+                table: self._get_table_spec(sqlite_cursor, pg_cursor, table, django_tables[table])
                 for table in tables
-                if table not in self.config["exclude_tables"]
-                and not table.startswith("sqlite_")
-            ]
-
-            logger.info(f"Preparing to transfer {len(tables)} tables")
-
-            # Process each table
-            for table in tables:
-                if table in django_tables:
-                    logger.info(f"Transferring table: {table}")
-
-                    if self.dry_run:
-                        logger.info(f"[DRY RUN] Would transfer data for table {table}")
-                        continue
-
-                    # Count rows
-                    sqlite_cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    row_count = sqlite_cursor.fetchone()[0]
-
-                    if row_count == 0:
-                        logger.info(f"Table {table} is empty, skipping")
-                        continue
-
-                    logger.info(f"Table {table} has {row_count} rows")
+            }
+            foreign_keys = self._get_foreign_keys(pg_cursor)
+            levels = dependency_levels(
+                tables, [(child, parent) for child, parent, _, _ in foreign_keys]
+            )
+            deferred = deferred_foreign_keys(levels, foreign_keys)
 
-                    # Get table structure
-                    sqlite_cursor.execute(f"PRAGMA table_info({table})")
-                    columns = [row[1] for row in sqlite_cursor.fetchall()]
+            logger.info(
+                f"Preparing to transfer {len(tables)} tables in {len(levels)} "
+                f"dependency levels with {self.config['workers']} workers"
+            )
 
-                    # Clear existing data in PostgreSQL (if any)
-                    pg_cursor = pg_conn.cursor()
-                    pg_cursor.execute(f"TRUNCATE TABLE {table} CASCADE")
+            if self.dry_run:
+                for number, level in enumerate(levels, start=1):
+                    logger.info(f"[DRY RUN] Level {number} would transfer: {', '.join(level)}")
+                if deferred:
+                    logger.info(
+                        f"[DRY RUN] Would defer foreign keys: {', '.join(sorted(deferred))}"
+                    )
+                return
 
-                    # Transfer in batches
-                    batch_size = self.config["batch_size"]
-                    offset = 0
+            checkpoint = TransferCheckpoint(self.config["checkpoint_dir"])
+            if checkpoint.started:
+                logger.info(f"Resuming transfer from checkpoint {self.config['checkpoint_dir']}")
+            else:
+                # Clear existing data in PostgreSQL (if any)
+                pg_cursor.execute(
+                    f"TRUNCATE TABLE {', '.join(quote_ident(t) for t in tables)} CASCADE"
+                )
+                pg_conn.commit()
+                checkpoint.start()
+            pg_cursor.close()
 
-                    while offset < row_count:
-                        # Get batch of data from SQLite
-                        sqlite_cursor.execute(
-                            f"SELECT * FROM {table} LIMIT {batch_size} OFFSET {offset}"
-                        )
-                        rows = sqlite_cursor.fetchall()
-
-                        if not rows:
-                            break
-
-                        # Prepare insert SQL
-                        column_names = ", ".join(columns)
-                        placeholders = ", ".join(["%s"] * len(columns))
-                        insert_sql = f"INSERT INTO {table} ({column_names}) VALUES ({placeholders})"
-
-                        # Convert rows to list of tuples for psycopg2
-                        rows_data = []
-                        for row in rows:
-                            row_values = []
-                            for col in columns:
-                                value = row[col]
-                                # Handle SQLite NULL values
-                                if value is None:
-                                    row_values.append(None)
-                                else:
-                                    row_values.append(value)
-                            rows_data.append(tuple(row_values))
-
-                        # Execute batch insert
-                        pg_cursor.executemany(insert_sql, rows_data)
-                        pg_conn.commit()
-
-                        # Update progress
-                        offset += len(rows)
-                        logger.info(
-                            f"Transferred {offset}/{row_count} rows for table {table}"
-                        )
+            deferred = self._drop_foreign_keys(pg_conn, deferred, checkpoint)
+
+            indexes = {}
+            if self.config["defer_indexes"]:
+                indexes = self._drop_indexes(pg_conn, tables, checkpoint)
+
+            with multiprocessing.Pool(self.config["workers"]) as pool:
+                for number, level in enumerate(levels, start=1):
+                    logger.info(f"Transferring level {number}/{len(levels)}")
+                    tasks = [(self.config, specs[table]) for table in level]
+                    for table, rows in pool.imap_unordered(transfer_table, tasks):
+                        logger.info(f"Transferred {rows} rows for table {table}")
+                        self.tables_migrated += 1
+                        self.rows_migrated += rows
+
+                if indexes:
+                    logger.info(f"Rebuilding {len(indexes)} indexes")
+                    tasks = [
+                        (self.config, name, definition) for name, definition in indexes.items()
+                    ]
+                    for _ in pool.imap_unordered(rebuild_index, tasks):
+                        pass
 
-                        # Track total rows migrated
-                        self.rows_migrated += len(rows)
+            if deferred:
+                logger.info(f"Restoring {len(deferred)} foreign keys")
+                self._restore_foreign_keys(pg_conn, deferred)
 
-                    pg_cursor.close()
-                    self.tables_migrated += 1
-                else:
-                    logger.warning(
-                        f"Table {table} not found in Django models, skipping"
-                    )
+            checkpoint.finish()
 
             logger.info(
                 f"Data transfer completed: {self.tables_migrated} tables, {self.rows_migrated} rows"
@@ -653,7 +1159,11 @@ class DatabaseMigration:
 
     def _verify_migration(self, sqlite_conn, pg_conn, django_tables):
         """
-        Verify the migration by comparing row counts and sample data
+        Verify the migration by comparing row counts and chunked checksums
+
+        Both databases are streamed in primary key order and hashed in chunks
+        of verify_chunk_rows rows, with values normalized by their PostgreSQL
+        type. Mismatching chunks pinpoint where the data differs.
 
         Args:
             sqlite_conn: SQLite database connection
@@ -673,91 +1183,58 @@ class DatabaseMigration:
                 "details": {},
             }
 
+            chunk_rows = self.config["verify_chunk_rows"]
             sqlite_cursor = sqlite_conn.cursor()
             pg_cursor = pg_conn.cursor()
+            pg_cursor.execute("SET TIME ZONE 'UTC'")
 
-            for table in django_tables:
-                logger.info(f"Verifying table: {table}")
-
-                # Compare row counts
-                sqlite_cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                sqlite_count = sqlite_cursor.fetchone()[0]
+            sqlite_cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            sqlite_tables = {row[0] for row in sqlite_cursor.fetchall()}
 
-                pg_cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                pg_count = pg_cursor.fetchone()[0]
+            for table, table_info in django_tables.items():
+                if table not in sqlite_tables or table in self.config["exclude_tables"]:
+                    continue
 
-                count_match = sqlite_count == pg_count
-
-                # Get column names
-                sqlite_cursor.execute(f"PRAGMA table_info({table})")
-                sqlite_columns = [row[1] for row in sqlite_cursor.fetchall()]
+                logger.info(f"Verifying table: {table}")
 
-                pg_cursor.execute(
-                    f"""
-                    SELECT column_name FROM information_schema.columns
-                    WHERE table_name = '{table}' ORDER BY ordinal_position
-                """
+                spec = self._get_table_spec(sqlite_cursor, pg_cursor, table, table_info)
+                column_list = ", ".join(quote_ident(c) for c in spec["columns"])
+                normalizers = [VALUE_NORMALIZERS.get(data_type, str) for data_type in spec["types"]]
+                pk = quote_ident(spec["pk_field"])
+                # Match SQLite's binary ordering of text keys
+                pk_type = spec["types"][spec["columns"].index(spec["pk_field"])]
+                pg_order = (
+                    f'{pk} COLLATE "C"'
+                    if pk_type in ("character varying", "text", "character")
+                    else pk
                 )
-                pg_columns = [row[0] for row in pg_cursor.fetchall()]
 
-                # Check if table has rows for detailed verification
-                has_rows = sqlite_count > 0
-
-                # For tables with rows, check a sample
-                sample_matches = None
-                if has_rows:
-                    # Get common columns
-                    common_columns = [
-                        col
-                        for col in sqlite_columns
-                        if col.lower() in [c.lower() for c in pg_columns]
-                    ]
-                    column_list = ", ".join(common_columns)
+                sqlite_stream = sqlite_conn.execute(
+                    f"SELECT {column_list} FROM {quote_ident(table)} ORDER BY {pk}"
+                )
+                sqlite_checksums = chunk_checksums(sqlite_stream, normalizers, chunk_rows)
 
-                    # Get primary key
-                    pk_field = django_tables[table]["pk_field"]
+                # Server-side cursor so large tables are streamed
+                with pg_conn.cursor(name=f"verify_{table}") as pg_stream:
+                    pg_stream.itersize = chunk_rows
+                    pg_stream.execute(
+                        f"SELECT {column_list} FROM {quote_ident(table)} ORDER BY {pg_order}"
+                    )
+                    pg_checksums = chunk_checksums(pg_stream, normalizers, chunk_rows)
 
-                    # Check a sample of records
-                    sample_size = min(10, sqlite_count)
+                sqlite_count = sum(count for count, _ in sqlite_checksums)
+                pg_count = sum(count for count, _ in pg_checksums)
+                count_match = sqlite_count == pg_count
+                has_rows = sqlite_count > 0
 
-                    # Get random sample from SQLite
-                    sqlite_cursor.execute(
-                        f"SELECT {column_list} FROM {table} ORDER BY {pk_field} LIMIT {sample_size}"
+                mismatched_chunks = [
+                    number
+                    for number, (sqlite_chunk, pg_chunk) in enumerate(
+                        zip(sqlite_checksums, pg_checksums)
                     )
-                    sqlite_sample = sqlite_cursor.fetchall()
-
-                    # Convert to a set of tuples for comparison
-                    sqlite_sample_set = set()
-                    for row in sqlite_sample:
-                        row_values = tuple(row[col] for col in common_columns)
-                        sqlite_sample_set.add(row_values)
-
-                    # Check if records exist in PostgreSQL
-                    pg_matches = 0
-                    for row in sqlite_sample:
-                        # Build WHERE clause for this record
-                        conditions = []
-                        params = []
-
-                        for col in common_columns:
-                            if row[col] is None:
-                                conditions.append(f"{col} IS NULL")
-                            else:
-                                conditions.append(f"{col} = %s")
-                                params.append(row[col])
-
-                        where_clause = " AND ".join(conditions)
-
-                        # Check if record exists
-                        pg_cursor.execute(
-                            f"SELECT 1 FROM {table} WHERE {where_clause} LIMIT 1",
-                            params,
-                        )
-                        if pg_cursor.fetchone():
-                            pg_matches += 1
-
-                    # Check if all samples were found
-                    sample_matches = pg_matches == sample_size
+                    if sqlite_chunk != pg_chunk
+                ]
+                checksum_matches = count_match and not mismatched_chunks
 
                 # Record results
                 verification_results["tables_checked"] += 1
@@ -767,23 +1244,25 @@ class DatabaseMigration:
                     "sqlite_count": sqlite_count,
                     "pg_count": pg_count,
                     "has_rows": has_rows,
-                    "sample_matches": sample_matches,
+                    "checksum_matches": checksum_matches,
+                    "mismatched_chunks": mismatched_chunks,
                 }
 
                 verification_results["details"][table] = table_result
 
-                if count_match and (not has_rows or sample_matches):
+                if checksum_matches:
                     verification_results["tables_matched"] += 1
-                    logger.info(f"Table {table} verified: counts match ({pg_count})")
+                    logger.info(f"Table {table} verified: checksums match ({pg_count})")
                 else:
                     verification_results["tables_mismatched"] += 1
                     if not count_match:
                         logger.warning(
                             f"Table {table} verification failed: count mismatch (SQLite: {sqlite_count}, PostgreSQL: {pg_count})"
                         )
-                    elif not sample_matches:
+                    else:
                         logger.warning(
-                            f"Table {table} verification failed: sample data mismatch"
+                            f"Table {table} verification failed: checksum mismatch in "
+                            f"chunks {mismatched_chunks} of {chunk_rows} rows"
                         )
 
             pg_cursor.close()
@@ -828,9 +1307,7 @@ class DatabaseMigration:
             if verification_results["tables_mismatched"] > 0:
                 logger.warning("Mismatched Tables:")
                 for table, result in verification_results["details"].items():
-                    if not result["row_count_match"] or (
-                        result["has_rows"] and not result["sample_matches"]
-                    ):
+                    if not result["checksum_matches"]:
                         logger.warning(
                             f"  - {table} (SQLite: {result['sqlite_count']}, PostgreSQL: {result['pg_count']})"
                         )
@@ -844,6 +1321,13 @@ def main():
     parser.add_argument("--config", help="Path to configuration file")
     args = parser.parse_args()
 
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler("migration.log"), logging.StreamHandler(sys.stdout)],
+    )
+
     migration = DatabaseMigration(config_file=args.config, dry_run=args.dry_run)
     success = migration.run_migration()
 
@@ -0,0 +1,274 @@
+# tests/performance/test_channel_layer_benchmark.py
+"""
+Fan-out benchmark for the channel layer.
+
+For each consumer class in websockets/consumers, N instances join one group
+and every group_send goes through the channel layer into the broadcast handler
+of each instance, which writes to a stub client. Reports the messages per
+second delivered to clients and the p99 latency from group_send to the client
+write, on the in-memory layer and, when fakeredis with Lua support is
+installed, on ShardedRedisChannelLayer over in-process fake Redis shards.
+"""
+
+import asyncio
+import binascii
+import statistics
+import time
+import zlib
+from importlib import import_module
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+from channels.consumer import get_handler_name
+from channels.layers import InMemoryChannelLayer
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase
+
+from websockets.channel_layers import ShardedRedisChannelLayer, jump_hash
+
+try:
+    import fakeredis
+    import fakeredis.aioredis
+    import lupa  # noqa: F401 - fakeredis needs it to run the layer's scripts
+except ImportError:
+    fakeredis = None
+
+SHARDS = 4
+CONSUMER_COUNTS = (1, 10, 100)
+MESSAGES = 50
+
+_DELTA = (
+    '{"type": "queue_delta", "queue_id": "q1", "version": 1, '
+    '"changes": [{"id": "t1", "position": 2, "estimated_wait_time": 12}], '
+    '"removed": []}'
+)
+
+# Consumer class, group name, broadcast event and the instance attributes its
+# handler needs. QueueStatusConsumer is left out: its queue_update handler
+# reads the queue from the database for every message.
+CONSUMERS = [
+    (
+        "websockets.consumers.queue_consumer.QueueConsumer",
+        "queue_q1",
+        {
+            "type": "queue_broadcast",
+            "version": 1,
+            "text": _DELTA,
+            "compressed": zlib.compress(_DELTA.encode("utf-8")),
+        },
+        {"use_compression": False},
+    ),
+    (
+        "websockets.consumers.chat.ChatConsumer",
+        "chat_c1",
+        {"type": "chat_message", "message": {"id": "m1", "content": "Hello"}},
+        {},
+    ),
+    (
+        "websockets.consumers.notifications.NotificationConsumer",
+        "notifications_u1",
+        {"type": "notification_message", "data": {"id": "n1", "title": "Hi"}},
+        {},
+    ),
+    (
+        "websockets.consumers.notification_consumer.NotificationConsumer",
+        "notifications_u1",
+        {"type": "status_update", "data": {"entity_type": "booking"}},
+        {"user_id": "u1"},
+    ),
+    (
+        "websockets.consumers.admin_dashboard.BookingStatsConsumer",
+        "admin_booking_stats",
+        {"type": "new_booking", "booking": {"id": "b1"}, "stats": {"today": 1}},
+        {},
+    ),
+    (
+        "websockets.consumers.analytics_consumer.AnalyticsConsumer",
+        "analytics_s1",
+        {"type": "analytics_update", "data": {"bookings": 1}, "timestamp": "t"},
+        {},
+    ),
+    (
+        "websockets.consumers.analytics_consumer.AdminDashboardConsumer",
+        "analytics_admin",
+        {"type": "analytics_update", "data": {"bookings": 1}, "timestamp": "t"},
+        {},
+    ),
+    (
+        "websockets.consumers.enhanced_consumer.QueueConsumer",
+        "queue_q1",
+        {
+            "type": "queue_broadcast",
+            "version": 1,
+            "text": _DELTA,
+            "compressed": zlib.compress(_DELTA.encode("utf-8")),
+        },
+        {"connected": True},
+    ),
+    (
+        "websockets.consumers.enhanced_consumer.NotificationConsumer",
+        "notifications_u1",
+        {"type": "new_notification", "notification": {"id": "n1"}},
+        {"connected": True},
+    ),
+]
+
+
+def _import(path):
+    module_name, class_name = path.rsplit(".", 1)
+    return getattr(import_module(module_name), class_name)
+
+
+if fakeredis is not None:
+
+    class FakeShardedRedisChannelLayer(ShardedRedisChannelLayer):
+        """ShardedRedisChannelLayer over in-process fake Redis servers"""
+
+        def __init__(self, shards, **kwargs):
+            super().__init__(
+                hosts=[f"redis://shard-{index}:6379" for index in range(shards)],
+                **kwargs,
+            )
+            self.servers = [fakeredis.FakeServer() for _ in range(shards)]
+
+        def connection(self, index):
+            return fakeredis.aioredis.FakeRedis(server=self.servers[index])
+
+
+async def _fan_out(layer, consumer_path, group, event, attributes, count):
+    """
+    Send MESSAGES group messages to `count` consumers of a class.
+
+    Returns:
+        Tuple of (deliveries, seconds elapsed, latencies in seconds)
+    """
+    consumer_class = _import(consumer_path)
+    deliveries = []
+    latencies = []
+
+    async def client_write(message):
+        deliveries.append(message)
+
+    consumers = []
+    for _ in range(count):
+        consumer = consumer_class()
+        consumer.scope = {
+            "type": "websocket",
+            "user": AnonymousUser(),
+            "url_route": {"kwargs": {}},
+        }
+        consumer.channel_layer = layer
+        consumer.channel_name = await layer.new_channel()
+        consumer.base_send = client_write
+        for name, value in attributes.items():
+            setattr(consumer, name, value)
+        await layer.group_add(group, consumer.channel_name)
+        consumers.append(consumer)
+
+    async def pump(consumer):
+        for _ in range(MESSAGES):
+            message = await layer.receive(consumer.channel_name)
+            await getattr(consumer, get_handler_name(message))(message)
+            latencies.append(time.perf_counter() - message["sent_at"])
+
+    start_time = time.perf_counter()
+    pumps = [asyncio.ensure_future(pump(consumer)) for consumer in consumers]
+    for _ in range(MESSAGES):
+        await layer.group_send(group, {**event, "sent_at": time.perf_counter()})
+        # Let the consumers drain between messages, as with live traffic
+        await asyncio.sleep(0)
+    await asyncio.gather(*pumps)
+    elapsed = time.perf_counter() - start_time
+
+    for consumer in consumers:
+        await layer.group_discard(group, consumer.channel_name)
+
+    return deliveries, elapsed, latencies
+
+
+class ShardedChannelLayerTest(SimpleTestCase):
+    """Check the placement of groups across channel layer shards."""
+
+    def _layer(self, shards):
+        return ShardedRedisChannelLayer(
+            hosts=[f"redis://shard-{index}:6379" for index in range(shards)]
+        )
+
+    def test_groups_spread_across_shards(self):
+        """Queue, notification and chat groups are balanced over every shard"""
+        layer = self._layer(SHARDS)
+        groups = [
+            f"{prefix}_{index}"
+            for prefix in ("queue", "notifications", "chat")
+            for index in range(3000)
+        ]
+        counts = [0] * SHARDS
+        for group in groups:
+            counts[layer.consistent_hash(group)] += 1
+
+        expected = len(groups) / SHARDS
+        for count in counts:
+            self.assertLess(abs(count - expected), expected * 0.1)
+
+    def test_adding_a_shard_moves_few_groups(self):
+        """Only about 1 / (N + 1) of the groups move to a new shard"""
+        before, after = self._layer(SHARDS), self._layer(SHARDS + 1)
+        groups = [f"queue_{index}" for index in range(10000)]
+
+        moved = [
+            group
+            for group in groups
+            if before.consistent_hash(group) != after.consistent_hash(group)
+        ]
+
+        self.assertLess(len(moved) / len(groups), 1.5 / (SHARDS + 1))
+        for group in moved:
+            self.assertEqual(after.consistent_hash(group), SHARDS)
+
+    def test_jump_hash_accepts_bytes_names(self):
+        """Channel names hash the same as str or bytes"""
+        layer = self._layer(SHARDS)
+        self.assertEqual(
+            layer.consistent_hash("specific.abc!def"),
+            layer.consistent_hash(b"specific.abc!def"),
+        )
+        self.assertEqual(
+            layer.consistent_hash("queue_1"),
+            jump_hash(binascii.crc32(b"queue_1"), SHARDS),
+        )
+
+
+class ChannelLayerFanOutBenchmarkTest(SimpleTestCase):
+    """Benchmark group_send fan-out for every consumer class."""
+
+    def _benchmark(self, name, make_layer):
+        for consumer_path, group, event, attributes in CONSUMERS:
+            for count in CONSUMER_COUNTS:
+                deliveries, elapsed, latencies = async_to_sync(_fan_out)(
+                    make_layer(), consumer_path, group, event, attributes, count
+                )
+
+                self.assertEqual(
+                    len(deliveries),
+                    count * MESSAGES,
+                    f"{consumer_path} dropped messages",
+                )
+                p99 = statistics.quantiles(latencies, n=100)[98]
+                print(
+                    f"{name} {consumer_path.rsplit('.', 2)[1]}."
+                    f"{consumer_path.rsplit('.', 1)[1]} x{count}: "
+                    f"{len(deliveries) / elapsed:.0f} msg/s, "
+                    f"p99 {p99 * 1000:.3f}ms"
+                )
+
+    def test_in_memory_fan_out(self):
+        """group_send fan-out on the in-memory layer"""
+        self._benchmark("in-memory", lambda: InMemoryChannelLayer(capacity=MESSAGES * 2))
+
+    @skipUnless(fakeredis, "fakeredis[lua] is not installed")
+    def test_sharded_redis_fan_out(self):
+        """group_send fan-out on the sharded Redis layer"""
+        self._benchmark(
+            f"redis x{SHARDS}",
+            lambda: FakeShardedRedisChannelLayer(SHARDS, capacity=MESSAGES * 2),
+        )
@@ -0,0 +1,209 @@
+# tests/performance/test_slot_generator_benchmark.py
+"""
+Microbenchmark for the SlotGenerator availability engine.
+
+Compares the minute-resolution engine backends against the legacy TimeSlot
+pipeline, both for byte-identical output and for raw generation speed on a
+busy shop day. Wall-clock timings depend on the machine, so the speed
+benchmark only runs when RUN_BENCHMARKS is set.
+"""
+
+import json
+import os
+import random
+import time
+from datetime import date, datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+
+from algorithms.availability.slot_generator import SlotGenerator
+
+BACKENDS = ("interval", "bitmap")
+
+
+def _minute_time(minute, second=0):
+    return dt_time(minute // 60, minute % 60, second)
+
+
+def _random_case(rng, day):
+    """Build a random set of generate_slots arguments for one day."""
+    weekday = (day.weekday() + 1) % 7
+    open_minute, close_minute = sorted(rng.randint(0, 1439) for _ in range(2))
+    shop_hours = [
+        {
+            "weekday": weekday,
+            "from_hour": _minute_time(open_minute),
+            "to_hour": _minute_time(close_minute),
+            "is_closed": rng.random() < 0.05,
+        }
+    ]
+
+    service_availability = None
+    if rng.random() < 0.5:
+        service_availability = [
+            {
+                "from_hour": _minute_time(rng.randint(0, 1439)),
+                "to_hour": _minute_time(rng.randint(0, 1439)),
+                "is_closed": rng.random() < 0.1,
+            }
+            for _ in range(rng.randint(0, 3))
+        ]
+
+    specialist_ids = [f"s{i}" for i in range(rng.randint(0, 5))]
+    specialist_hours = []
+    for _ in range(rng.randint(0, 8)):
+        start, end = sorted(rng.randint(0, 1439) for _ in range(2))
+        specialist_hours.append(
+            {
+                "specialist_id": f"s{rng.randint(0, 6)}",
+                "from_hour": _minute_time(start),
+                "to_hour": _minute_time(end),
+                "is_off": rng.random() < 0.1,
+            }
+        )
+
+    existing_bookings = []
+    for index in range(rng.randint(0, 15)):
+        # A few bookings carry seconds to exercise the legacy fallback
+        second = 30 if rng.random() < 0.02 else 0
+        start_time = datetime.combine(day, _minute_time(rng.randint(0, 1439), second))
+        existing_bookings.append(
+            {
+                "id": index,
+                "start_time": start_time,
+                "end_time": start_time + timedelta(minutes=rng.choice([15, 30, 60, 90])),
+                "specialist_id": f"s{rng.randint(0, 6)}",
+            }
+        )
+
+    return (
+        day,
+        shop_hours,
+        service_availability,
+        specialist_hours,
+        existing_bookings,
+    ), {
+        "service_duration": rng.choice([5, 15, 30, 45, 60]),
+        "buffer_before": rng.choice([0, 5, 10]),
+        "buffer_after": rng.choice([0, 5, 15]),
+        "slot_granularity": rng.choice([5, 15, 30]),
+        "specialist_ids": specialist_ids or None,
+        "use_cache": False,
+    }
+
+
+def _busy_day_case(day, specialist_count=25, bookings_per_specialist=6):
+    """Build a busy shop day with many specialists and bookings."""
+    weekday = (day.weekday() + 1) % 7
+    specialist_ids = [f"specialist-{i}" for i in range(specialist_count)]
+    shop_hours = [
+        {
+            "weekday": weekday,
+            "from_hour": dt_time(8),
+            "to_hour": dt_time(23),
+            "is_closed": False,
+        }
+    ]
+    specialist_hours = [
+        {
+            "specialist_id": specialist_id,
+            "from_hour": dt_time(8 + index % 3),
+            "to_hour": dt_time(20 + index % 3),
+            "is_off": False,
+        }
+        for index, specialist_id in enumerate(specialist_ids)
+    ]
+    existing_bookings = []
+    for index, specialist_id in enumerate(specialist_ids):
+        for slot in range(bookings_per_specialist):
+            start_time = datetime.combine(day, dt_time(9 + slot * 2, (index * 7) % 60))
+            existing_bookings.append(
+                {
+                    "id": len(existing_bookings),
+                    "start_time": start_time,
+                    "end_time": start_time + timedelta(minutes=45),
+                    "specialist_id": specialist_id,
+                }
+            )
+    return (day, shop_hours, None, specialist_hours, existing_bookings), {
+        "service_duration": 30,
+        "buffer_before": 5,
+        "buffer_after": 5,
+        "slot_granularity": 5,
+        "specialist_ids": specialist_ids,
+        "use_cache": False,
+    }
+
+
+class SlotGeneratorEngineTest(SimpleTestCase):
+    """Check that every engine backend matches the legacy pipeline."""
+
+    def setUp(self):
+        self.day = date(2026, 10, 14)
+        self.legacy = SlotGenerator(backend="legacy")
+
+    def test_backends_match_legacy_output(self):
+        """Engine output is byte-identical to the legacy TimeSlot pipeline"""
+        rng = random.Random(42)
+        generators = {name: SlotGenerator(backend=name) for name in BACKENDS}
+
+        for _ in range(2000):
+            args, kwargs = _random_case(rng, self.day)
+            expected = json.dumps(self.legacy.generate_slots(*args, **kwargs))
+            for name, generator in generators.items():
+                actual = json.dumps(generator.generate_slots(*args, **kwargs))
+                self.assertEqual(actual, expected, f"{name} backend diverged")
+
+    def test_unrepresentable_inputs_fall_back(self):
+        """Times with seconds are handled by the legacy pipeline"""
+        args, kwargs = _busy_day_case(self.day, specialist_count=2)
+        args[4][0]["start_time"] = args[4][0]["start_time"].replace(second=30)
+        generator = SlotGenerator(backend="interval")
+
+        self.assertIsNone(
+            generator.engine.discrete_slots(
+                generator._get_shop_base_slots(self.day, args[1]),
+                args[2],
+                args[3],
+                args[4],
+                kwargs["service_duration"],
+                kwargs["buffer_before"],
+                kwargs["buffer_after"],
+                kwargs["slot_granularity"],
+                kwargs["specialist_ids"],
+            )
+        )
+        self.assertEqual(
+            generator.generate_slots(*args, **kwargs),
+            self.legacy.generate_slots(*args, **kwargs),
+        )
+
+
+@skipUnless(os.environ.get("RUN_BENCHMARKS"), "RUN_BENCHMARKS is not set")
+class SlotGeneratorBenchmarkTest(SimpleTestCase):
+    """Microbenchmark of engine backends against the legacy pipeline."""
+
+    iterations = 50
+
+    def _time(self, generator, args, kwargs):
+        start_time = time.perf_counter()
+        for _ in range(self.iterations):
+            generator.generate_slots(*args, **kwargs)
+        return (time.perf_counter() - start_time) / self.iterations
+
+    def test_busy_day_benchmark(self):
+        """Engine backends are faster than the legacy pipeline on a busy day"""
+        args, kwargs = _busy_day_case(date(2026, 10, 14))
+        legacy_time = self._time(SlotGenerator(backend="legacy"), args, kwargs)
+        print(f"Slot generation (legacy): {legacy_time * 1000:.3f}ms")
+
+        for name in BACKENDS:
+            backend_time = self._time(SlotGenerator(backend=name), args, kwargs)
+            print(
+                f"Slot generation ({name}): {backend_time * 1000:.3f}ms "
+                f"({legacy_time / backend_time:.1f}x)"
+            )
+            self.assertLess(backend_time, legacy_time)
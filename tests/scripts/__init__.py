@@ -0,0 +1,3 @@
+"""
+Tests for the maintenance scripts of Queue Me platform.
+"""
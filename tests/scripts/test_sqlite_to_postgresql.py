@@ -0,0 +1,132 @@
+# tests/scripts/test_sqlite_to_postgresql.py
+"""
+Tests for the building blocks of the SQLite to PostgreSQL transfer engine.
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from scripts.db_migration.sqlite_to_postgresql import (
+    VALUE_NORMALIZERS,
+    TransferCheckpoint,
+    chunk_checksums,
+    deferred_foreign_keys,
+    dependency_levels,
+    encode_copy_value,
+)
+
+
+class EncodeCopyValueTest(SimpleTestCase):
+    def test_special_values(self):
+        """Test that NULL, bytes and floats use COPY text syntax"""
+        self.assertEqual(encode_copy_value(None), "\\N")
+        self.assertEqual(encode_copy_value(b"\x00\xff"), "\\\\x00ff")
+        self.assertEqual(encode_copy_value(0.1), "0.1")
+        self.assertEqual(encode_copy_value(42), "42")
+
+    def test_control_characters_are_escaped(self):
+        """Test that separators and backslashes cannot break a row"""
+        self.assertEqual(encode_copy_value("a\tb\nc\rd\\e"), "a\\tb\\nc\\rd\\\\e")
+
+
+class DependencyLevelsTest(SimpleTestCase):
+    def test_tables_follow_their_references(self):
+        """Test that every table comes after the tables it references"""
+        levels = dependency_levels(
+            ["booking", "shop", "user", "service"],
+            [("booking", "service"), ("booking", "user"), ("service", "shop")],
+        )
+        self.assertEqual(levels, [["shop", "user"], ["service"], ["booking"]])
+
+    def test_self_references_and_cycles(self):
+        """Test that self references are ignored and cycles share a level"""
+        levels = dependency_levels(
+            ["category", "a", "b", "c"],
+            [("category", "category"), ("a", "b"), ("b", "a"), ("c", "a")],
+        )
+        self.assertEqual(levels, [["category"], ["a", "b", "c"]])
+
+    def test_foreign_keys_within_a_level_are_deferred(self):
+        """Test that only foreign keys within a level are dropped for the load"""
+        foreign_keys = [
+            ("category", "category", "category_parent_fk", "FOREIGN KEY (parent_id)"),
+            ("a", "b", "a_b_fk", "FOREIGN KEY (b_id)"),
+            ("b", "a", "b_a_fk", "FOREIGN KEY (a_id)"),
+            ("service", "category", "service_category_fk", "FOREIGN KEY (category_id)"),
+            ("external", "category", "external_fk", "FOREIGN KEY (category_id)"),
+        ]
+        levels = dependency_levels(
+            ["category", "a", "b", "service"],
+            [(child, parent) for child, parent, _, _ in foreign_keys],
+        )
+
+        self.assertEqual(
+            deferred_foreign_keys(levels, foreign_keys),
+            {
+                "category_parent_fk": ("category", "FOREIGN KEY (parent_id)"),
+                "a_b_fk": ("a", "FOREIGN KEY (b_id)"),
+                "b_a_fk": ("b", "FOREIGN KEY (a_id)"),
+            },
+        )
+
+
+class ChunkChecksumsTest(SimpleTestCase):
+    def test_rows_are_hashed_in_chunks(self):
+        """Test that chunks hold chunk_rows rows and the rest goes last"""
+        rows = [(i, f"row {i}") for i in range(5)]
+        normalizers = [str, str]
+
+        checksums = chunk_checksums(rows, normalizers, 2)
+
+        self.assertEqual([count for count, _ in checksums], [2, 2, 1])
+        self.assertEqual(checksums, chunk_checksums(iter(rows), normalizers, 2))
+        self.assertEqual(chunk_checksums([], normalizers, 2), [])
+
+    def test_normalized_values_compare_equal(self):
+        """Test that both databases' representations of a row hash the same"""
+        normalizers = [VALUE_NORMALIZERS["boolean"], VALUE_NORMALIZERS["numeric"], str]
+        sqlite_rows = [(1, "10.50", None)]
+        postgres_rows = [(True, "10.5", None)]
+
+        self.assertEqual(
+            chunk_checksums(sqlite_rows, normalizers, 10),
+            chunk_checksums(postgres_rows, normalizers, 10),
+        )
+        self.assertNotEqual(
+            chunk_checksums(sqlite_rows, normalizers, 10),
+            chunk_checksums([(True, "10.5", "")], normalizers, 10),
+        )
+
+
+class TransferCheckpointTest(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.directory = os.path.join(root, "checkpoint")
+        self.checkpoint = TransferCheckpoint(self.directory)
+
+    def test_progress_survives_a_new_instance(self):
+        """Test that saved table progress is read back by a resumed run"""
+        self.assertFalse(self.checkpoint.started)
+        self.assertEqual(self.checkpoint.load("shop"), {})
+
+        self.checkpoint.start()
+        self.checkpoint.save("shop", {"last_rowid": 10, "rows": 10})
+
+        resumed = TransferCheckpoint(self.directory)
+        self.assertTrue(resumed.started)
+        self.assertEqual(resumed.load("shop"), {"last_rowid": 10, "rows": 10})
+        self.assertEqual(os.listdir(self.directory).count("shop.json.tmp"), 0)
+
+    def test_finish_removes_the_checkpoint(self):
+        """Test that a finished transfer starts over next time"""
+        self.checkpoint.start()
+        self.checkpoint.save("shop", {"done": True})
+
+        self.checkpoint.finish()
+
+        self.assertFalse(os.path.exists(self.directory))
+        self.assertFalse(TransferCheckpoint(self.directory).started)
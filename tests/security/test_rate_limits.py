@@ -0,0 +1,187 @@
+# tests/security/test_rate_limits.py
+"""
+Tests for the GCRA rate limiter and the tiered API rate limiter built on it.
+
+Limiters are checked against the in-process fallback and, when fakeredis
+with Lua support is installed, against the Redis script.
+"""
+
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from algorithms.security.rate_limiter import RateLimiter
+from utils.rate_limits import GCRALimiter
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis needs it to run the GCRA script
+except ImportError:
+    fakeredis = None
+
+NOW = 1_700_000_000.0
+
+
+class GCRALimiterTest(SimpleTestCase):
+    """Test GCRA limits with the in-process fallback."""
+
+    def setUp(self):
+        self.now = NOW
+        GCRALimiter._local.clear()
+
+        patcher = patch("utils.rate_limits.get_redis_client", return_value=self.redis_client())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch("utils.rate_limits.time.time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def redis_client(self):
+        return None
+
+    def test_burst(self):
+        """Test that a full burst is allowed at once, and no more."""
+        limiter = GCRALimiter(5, 60, "test:")
+
+        results = [limiter.hit("client") for _ in range(5)]
+        self.assertTrue(all(result.allowed for result in results))
+        self.assertEqual([result.remaining for result in results], [4, 3, 2, 1, 0])
+
+        result = limiter.hit("client")
+        self.assertFalse(result.allowed)
+        # One request is freed every 60 / 5 seconds
+        self.assertAlmostEqual(result.retry_after, 12)
+
+        # Keys are limited separately
+        self.assertTrue(limiter.hit("other").allowed)
+
+    def test_sustained_rate(self):
+        """Test that requests at the limit's rate are all allowed."""
+        limiter = GCRALimiter(5, 60, "test:")
+        for _ in range(5):
+            limiter.hit("client")
+
+        for _ in range(10):
+            self.now += 12
+            self.assertTrue(limiter.hit("client").allowed)
+            self.assertFalse(limiter.hit("client").allowed)
+
+    def test_retry_after(self):
+        """Test that retry_after is when the next request is allowed."""
+        limiter = GCRALimiter(2, 60, "test:")
+        limiter.hit("client")
+        limiter.hit("client")
+
+        self.now += 10
+        result = limiter.hit("client")
+        self.assertFalse(result.allowed)
+        self.assertAlmostEqual(result.retry_after, 20)
+
+        # Refused requests are not counted
+        self.now += result.retry_after
+        self.assertTrue(limiter.hit("client").allowed)
+
+    def test_lockout(self):
+        """Test that exceeding a lockout limiter blocks the key."""
+        limiter = GCRALimiter(2, 60, "test:", lockout=120)
+        limiter.hit("client")
+        limiter.hit("client")
+
+        result = limiter.hit("client")
+        self.assertFalse(result.allowed)
+        self.assertAlmostEqual(result.retry_after, 120)
+
+        self.now += 60
+        result = limiter.hit("client")
+        self.assertFalse(result.allowed)
+        self.assertAlmostEqual(result.retry_after, 60)
+
+        self.now += 60
+        self.assertTrue(limiter.hit("client").allowed)
+
+    def test_block_and_reset(self):
+        """Test blocking a key and resetting it."""
+        limiter = GCRALimiter(5, 60, "test:")
+
+        limiter.block("client", 300)
+        result = limiter.hit("client")
+        self.assertFalse(result.allowed)
+        self.assertAlmostEqual(result.retry_after, 300)
+
+        limiter.reset("client")
+        self.assertEqual(limiter.hit("client").remaining, 4)
+
+    def test_hit_many(self):
+        """Test checking several keys at once."""
+        limiter = GCRALimiter(1, 60, "test:")
+        limiter.hit("first")
+
+        results = limiter.hit_many(["first", "second"])
+        self.assertEqual([result.allowed for result in results], [False, True])
+
+
+@skipUnless(fakeredis, "fakeredis with Lua support is not installed")
+class GCRALimiterRedisTest(GCRALimiterTest):
+    """Test GCRA limits with the Redis script."""
+
+    def redis_client(self):
+        return fakeredis.FakeRedis()
+
+
+class RateLimiterTest(SimpleTestCase):
+    """Test violations and backoff of the tiered rate limiter."""
+
+    def setUp(self):
+        self.now = NOW
+        GCRALimiter._local.clear()
+        self.limiter = RateLimiter()
+
+        for target, kwargs in [
+            ("utils.rate_limits.get_redis_client", {"return_value": None}),
+            ("utils.rate_limits.time.time", {"side_effect": lambda: self.now}),
+        ]:
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = patch.object(RateLimiter, "_record_violation", return_value=600)
+        self.record_violation = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_overage_is_a_violation(self):
+        """Test that a second window of refused requests backs off."""
+        for _ in range(3):
+            self.assertEqual(self.limiter.check_identifier("client", "otp", 3), (True, None))
+
+        # One more window of refused requests is tolerated
+        for _ in range(3):
+            self.assertEqual(self.limiter.check_identifier("client", "otp", 3), (False, 20))
+        self.record_violation.assert_not_called()
+
+        self.assertEqual(self.limiter.check_identifier("client", "otp", 3), (False, 600))
+        self.record_violation.assert_called_once_with("client")
+
+    def test_backoff_refusals_are_not_violations(self):
+        """Test that requests refused during a backoff are not counted."""
+        for _ in range(7):
+            self.limiter.check_identifier("client", "otp", 3)
+        self.assertEqual(self.record_violation.call_count, 1)
+
+        for _ in range(20):
+            self.now += 10
+            allowed, retry_after = self.limiter.check_identifier("client", "otp", 3)
+            self.assertFalse(allowed)
+        self.assertEqual(retry_after, 400)
+        self.assertEqual(self.record_violation.call_count, 1)
+
+    def test_reset_counts(self):
+        """Test that resetting counts keeps no limiters of its own."""
+        for _ in range(4):
+            self.limiter.check_identifier("client", "otp", 3)
+
+        self.limiter.reset_counts("client")
+
+        self.assertEqual(list(self.limiter._limiters), [("otp", 3)])
+        self.assertEqual(self.limiter.check_identifier("client", "otp", 3), (True, None))
@@ -9,7 +9,7 @@ input validation, and protection against common vulnerabilities.
 
 from datetime import datetime, time, timedelta
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient
@@ -23,6 +23,7 @@ from apps.geoapp.models import Location
 from apps.rolesapp.models import Permission, Role, UserRole
 from apps.serviceapp.models import Service
 from apps.shopapp.models import Shop
+from queueme.middleware.auth_middleware import JWTAuthMiddleware
 
 
 class AuthenticationSecurityTest(TestCase):
@@ -140,6 +141,36 @@ class AuthenticationSecurityTest(TestCase):
         self.assertEqual(response2.status_code, 400)
 
 
+class AuthExemptPathsTest(SimpleTestCase):
+    """Test the paths the JWT middleware lets through unauthenticated."""
+
+    def test_exempt_paths(self):
+        """Test that only the listed endpoints are exempt."""
+        exempt = [
+            "/api/auth/request_otp",
+            "/api/auth/verify_otp/",
+            "/api/docs/",
+            "/api/docs/swagger/",
+            "/api/schema",
+            "/api/health/",
+            "/api/payment/webhook/",
+            "/api/v1/openapi.json",
+        ]
+        protected = [
+            "/api/auth/request_otp/extra/",
+            "/api/auth/logout/",
+            "/api/health/details/",
+            "/api/payment/webhook/replay/",
+            "/api/shops/",
+            "/v2/api/docs/",
+        ]
+
+        for path in exempt:
+            self.assertTrue(JWTAuthMiddleware.EXEMPT_PATHS.match(path), path)
+        for path in protected:
+            self.assertFalse(JWTAuthMiddleware.EXEMPT_PATHS.match(path), path)
+
+
 class AuthorizationSecurityTest(TestCase):
     """Test authorization security measures."""
 
@@ -2,16 +2,28 @@
 Cache utility functions to extend Django's cache capabilities.
 """
 
+import hashlib
 import logging
 import re
-from typing import Optional, Union
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List, Optional, Union
 
+from django.conf import settings
 from django.core.cache import cache
 from redis import Redis
 from redis.exceptions import RedisError
 
 logger = logging.getLogger(__name__)
 
+# Prefix for generation counters used by tag-based invalidation
+GENERATION_KEY_PREFIX = "gen:"
+# Seconds a generation counter is kept, longer than entries registered under a
+# tag live. An expired counter is re-seeded from the clock, which at worst makes
+# the entries built under it miss early
+GENERATION_TTL = getattr(settings, "CACHE_GENERATION_TTL", 60 * 60 * 24)
+
 
 def delete_pattern(pattern: str) -> int:
     """
@@ -124,3 +136,128 @@ def clear_cache_for_model(
     """
     pattern = f"{model_name}:*" if object_id is None else f"{model_name}:{object_id}:*"
     return delete_pattern(pattern)
+
+
+def get_redis_client() -> Optional[Redis]:
+    """
+    Get the raw Redis client behind the default cache.
+
+    Returns:
+        Redis client, or None when the default cache is not django-redis
+    """
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except (ImportError, NotImplementedError):
+        return None
+    except RedisError as e:
+        logger.error(f"Error connecting to Redis: {str(e)}")
+        return None
+
+
+def _generation_seed() -> int:
+    """
+    Initial value for a generation counter.
+
+    Counters are seeded from the clock so that a counter evicted from the cache
+    never restarts at a value that older cache entries were built with.
+    """
+    return int(time.time() * 1000)
+
+
+def get_generations(tags: Iterable[str]) -> List[int]:
+    """
+    Get the current generation counter of each tag in one cache round trip.
+
+    Args:
+        tags: Tag names (e.g., "slots:shop:<id>:2024-01-01")
+
+    Returns:
+        List of generation numbers, in the same order as tags
+    """
+    keys = [f"{GENERATION_KEY_PREFIX}{tag}" for tag in tags]
+    values = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in values]
+    if missing:
+        seed = _generation_seed()
+        for key in missing:
+            cache.add(key, seed, GENERATION_TTL)
+        values.update(cache.get_many(missing))
+
+    return [values.get(key, 0) for key in keys]
+
+
+def bump_generations(*tags: str) -> None:
+    """
+    Invalidate every cache entry registered under the given tags.
+
+    Each tag's generation counter is incremented in O(1); entries whose keys
+    embed the old generation simply stop being read and expire by TTL.
+
+    Args:
+        *tags: Tag names to invalidate
+    """
+    for tag in tags:
+        key = f"{GENERATION_KEY_PREFIX}{tag}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter not initialised yet (or evicted)
+            cache.set(key, _generation_seed(), GENERATION_TTL)
+
+
+def generation_token(tags: Iterable[str]) -> str:
+    """
+    Build a short token identifying the current generations of a tag set.
+
+    Embedding the token in a cache key registers the entry under all tags.
+
+    Args:
+        tags: Tag names the cache entry depends on
+
+    Returns:
+        Hex digest of the tag generations
+    """
+    tags = list(tags)
+    generations = get_generations(tags)
+    token_str = "|".join(f"{tag}={gen}" for tag, gen in zip(tags, generations))
+    return hashlib.sha256(token_str.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+class LocalLRU:
+    """
+    Small thread-safe in-process LRU.
+
+    Used in front of the shared cache for entries read on every request, where
+    even a cache round trip is too slow. Callers store their own timestamps
+    with the values to bound how long an entry is trusted.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: Any) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
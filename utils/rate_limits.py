@@ -0,0 +1,215 @@
+"""
+Atomic rate limiting shared by the HTTP and WebSocket layers.
+
+Limits use the generic cell rate algorithm (GCRA): each key stores a single
+"theoretical arrival time" (TAT) that advances by rate/period per allowed
+request. A request is allowed while the TAT stays within one period of now,
+which behaves like a sliding window of `rate` requests per `period` without
+keeping per-request history.
+
+With django-redis, each check is one Lua script call, so concurrent requests
+never lose counts, and checks of several keys can be pipelined into a single
+round trip. Other cache backends, and Redis errors, fall back to a bounded
+in-process LRU that limits per process only.
+"""
+
+import logging
+import threading
+import time
+from typing import Iterable, List, NamedTuple
+
+from redis.exceptions import RedisError
+
+from utils.cache_utils import LocalLRU, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Apply one GCRA check. Times are in milliseconds.
+# ARGV: now, emission interval, period, cost, lockout.
+# Returns {allowed, remaining, retry_after}.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local lockout = tonumber(ARGV[5])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - period
+if allow_at > now then
+    if lockout > 0 and tat - now <= period then
+        tat = now + lockout + period - interval
+        redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil(tat - now))
+        return {0, 0, math.ceil(lockout)}
+    end
+    return {0, 0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), 0}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    # Seconds until the next request would be allowed, 0 when allowed
+    retry_after: float
+
+
+class GCRALimiter:
+    """Allow `rate` requests per `period` seconds per key"""
+
+    KEY_PREFIX = "gcra:"
+    LOCAL_SIZE = 10000
+
+    # Fallback state shared by every limiter of the process
+    _local = LocalLRU(LOCAL_SIZE)
+    _local_lock = threading.Lock()
+
+    def __init__(self, rate: int, period: float, prefix: str = "rl:", lockout: float = 0):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Maximum number of requests per period
+            period: Time period in seconds
+            prefix: Key prefix separating limiters
+            lockout: Seconds to block a key once it exceeds the limit
+                (0 only delays until the next request fits)
+        """
+        self.rate = max(1, int(rate))
+        self.period = period
+        self.prefix = prefix
+        self.lockout = lockout
+
+        self._period_ms = period * 1000
+        self._interval_ms = self._period_ms / self.rate
+        self._lockout_ms = lockout * 1000
+
+    def _key(self, identifier: str) -> str:
+        return f"{self.KEY_PREFIX}{self.prefix}{identifier}"
+
+    def _args(self, cost: int) -> list:
+        return [
+            time.time() * 1000,
+            self._interval_ms,
+            self._period_ms,
+            cost,
+            self._lockout_ms,
+        ]
+
+    @staticmethod
+    def _result(raw) -> RateLimitResult:
+        allowed, remaining, retry_after_ms = raw
+        return RateLimitResult(bool(allowed), int(remaining), retry_after_ms / 1000)
+
+    def hit(self, identifier: str, cost: int = 1) -> RateLimitResult:
+        """
+        Count a request against the limit of a key.
+
+        Args:
+            identifier: Client identifier (IP address, user ID, ...)
+            cost: Number of requests to count
+
+        Returns:
+            RateLimitResult
+        """
+        client = get_redis_client()
+        if client is not None:
+            try:
+                script = client.register_script(GCRA_SCRIPT)
+                return self._result(script(keys=[self._key(identifier)], args=self._args(cost)))
+            except RedisError as e:
+                logger.error(f"Rate limit check failed, limiting locally: {str(e)}")
+
+        return self._hit_locally(identifier, cost)
+
+    def hit_many(self, identifiers: Iterable[str], cost: int = 1) -> List:
+        """
+        Count one request against each of several keys in one round trip.
+
+        Args:
+            identifiers: Client identifiers
+            cost: Number of requests to count per key
+
+        Returns:
+            List of RateLimitResult in identifier order
+        """
+        identifiers = list(identifiers)
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                script = client.register_script(GCRA_SCRIPT)
+                with client.pipeline(transaction=False) as pipe:
+                    for identifier in identifiers:
+                        script(
+                            keys=[self._key(identifier)],
+                            args=self._args(cost),
+                            client=pipe,
+                        )
+                    return [self._result(raw) for raw in pipe.execute()]
+            except RedisError as e:
+                logger.error(f"Rate limit check failed, limiting locally: {str(e)}")
+
+        return [self._hit_locally(identifier, cost) for identifier in identifiers]
+
+    def _hit_locally(self, identifier: str, cost: int) -> RateLimitResult:
+        """Apply GCRA_SCRIPT to the in-process state of a key."""
+        key = self._key(identifier)
+        now = time.time() * 1000
+
+        with self._local_lock:
+            tat = max(self._local.get(key) or 0, now)
+            new_tat = tat + self._interval_ms * cost
+            allow_at = new_tat - self._period_ms
+
+            if allow_at > now:
+                if self._lockout_ms and tat - now <= self._period_ms:
+                    self._local.set(
+                        key,
+                        now + self._lockout_ms + self._period_ms - self._interval_ms,
+                    )
+                    return RateLimitResult(False, 0, self.lockout)
+                return RateLimitResult(False, 0, (allow_at - now) / 1000)
+
+            self._local.set(key, new_tat)
+            return RateLimitResult(True, int((now - allow_at) // self._interval_ms), 0)
+
+    def block(self, identifier: str, seconds: float) -> None:
+        """
+        Refuse every request of a key for a number of seconds.
+
+        Args:
+            identifier: Client identifier
+            seconds: Seconds to block the key for
+        """
+        key = self._key(identifier)
+        now = time.time() * 1000
+        # The first request allowed afterwards is the one at now + seconds
+        tat = now + seconds * 1000 + self._period_ms - self._interval_ms
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.set(key, tat, px=max(1, int(tat - now)))
+                return
+            except RedisError as e:
+                logger.error(f"Rate limit block failed, blocking locally: {str(e)}")
+
+        self._local.set(key, tat)
+
+    def reset(self, identifier: str) -> None:
+        """Forget the requests counted for a key."""
+        key = self._key(identifier)
+        self._local.discard(key)
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.delete(key)
+            except RedisError as e:
+                logger.error(f"Error resetting rate limit: {str(e)}")
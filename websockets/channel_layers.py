@@ -0,0 +1,59 @@
+"""
+Sharded channel layer for Queue Me.
+
+channels_redis already spreads channels and groups over every host of its
+"hosts" list: each group (queue_<id>, notifications_<user>, chat_<id>, ...)
+lives on the one host its name hashes to, and group_send batches the member
+channels per host. Its hash is CRC32 modulo the number of hosts, so adding a
+host moves almost every group to another one.
+
+ShardedRedisChannelLayer keeps the CRC32 key but maps it with jump consistent
+hashing instead. Growing from N to N + 1 hosts only moves about 1 / (N + 1) of
+the groups and channels; the rest keep their members while processes are
+restarted onto the new host list.
+
+Every process must use the same hosts, in the same order.
+"""
+
+import binascii
+
+from channels_redis.core import RedisChannelLayer
+
+
+def jump_hash(key, buckets):
+    """
+    Map an integer key to one of a number of buckets.
+
+    Implements the jump consistent hash of Lamping and Veach.
+
+    Args:
+        key: Non-negative integer key
+        buckets: Number of buckets
+
+    Returns:
+        Bucket index in range(buckets)
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """RedisChannelLayer placing channels and groups by jump consistent hash"""
+
+    def consistent_hash(self, value):
+        """
+        Get the index of the host serving a channel or group name.
+
+        Args:
+            value: Channel or group name (str or bytes)
+
+        Returns:
+            Host index
+        """
+        if isinstance(value, str):
+            value = value.encode("utf8")
+        return jump_hash(binascii.crc32(value), self.ring_size)
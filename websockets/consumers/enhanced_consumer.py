@@ -391,6 +391,39 @@ class EnhancedConsumer(AsyncWebsocketConsumer):
             logger.exception(f"Error sending WebSocket message: {e}")
             websocket_stats.errors += 1
 
+    async def send_encoded(self, text_data, compressed=None):
+        """
+        Send a message encoded once for a whole group
+
+        Broadcasts carry their JSON text and zlib-compressed bytes, so each
+        consumer forwards them without serializing or compressing again.
+
+        Args:
+            text_data: JSON text of the message
+            compressed: Optional zlib-compressed bytes of text_data
+        """
+        if not self.connected:
+            logger.warning("Attempted to send message on closed connection")
+            return
+
+        try:
+            websocket_stats.messages_sent += 1
+            websocket_stats.bytes_sent += len(text_data)
+
+            if (
+                compressed is not None
+                and self.compression_enabled
+                and len(text_data) >= self.compression_threshold
+            ):
+                websocket_stats.compressed_messages += 1
+                await self.send(bytes_data=compressed)
+            else:
+                await self.send(text_data=text_data)
+
+        except Exception as e:
+            logger.exception(f"Error sending WebSocket message: {e}")
+            websocket_stats.errors += 1
+
     async def send_error(self, error_code, data=None):
         """
         Send an error message to the client
@@ -655,6 +688,9 @@ class ShopConsumer(AuthenticatedConsumer):
 class QueueConsumer(ShopConsumer):
     """
     WebSocket consumer for real-time queue updates
+
+    Connections routed with a queue_id also receive the versioned deltas of
+    that queue, and may send "resync" after missing a version.
     """
 
     async def on_connect(self):
@@ -663,6 +699,11 @@ class QueueConsumer(ShopConsumer):
         """
         await super().on_connect()
 
+        # Join the queue group for versioned queue deltas
+        self.queue_id = self.scope["url_route"]["kwargs"].get("queue_id")
+        if self.queue_id:
+            await self.join_group(f"queue_{self.queue_id}")
+
         # Get initial queue data
         queue_data = await self.get_queue_data()
 
@@ -725,6 +766,42 @@ class QueueConsumer(ShopConsumer):
         # Send to client
         await self.send_json({"type": "queue_update", "data": queue_data})
 
+    async def queue_broadcast(self, event):
+        """
+        Forward a coalesced queue delta encoded once for the group
+
+        Args:
+            event: Event data from channel layer
+        """
+        await self.send_encoded(event["text"], event.get("compressed"))
+
+    @catch_errors
+    async def handle_resync(self, data):
+        """
+        Resend the full queue state to a client that missed a delta version
+
+        Args:
+            data: Client message data
+        """
+        if not getattr(self, "queue_id", None):
+            await self.send_error("invalid_request", {"message": "No queue to resync"})
+            return
+
+        text, compressed = await self.get_queue_snapshot()
+        await self.send_encoded(text, compressed)
+
+    @database_sync_to_async
+    def get_queue_snapshot(self):
+        """
+        Get the encoded broadcast state of the queue
+
+        Returns:
+            Tuple of (JSON text, zlib-compressed bytes)
+        """
+        from apps.queueapp.services.broadcast_service import QueueBroadcastService
+
+        return QueueBroadcastService.encode(QueueBroadcastService.snapshot(self.queue_id))
+
     @catch_errors
     async def handle_leave_queue(self, data):
         """
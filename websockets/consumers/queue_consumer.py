@@ -81,9 +81,10 @@ class QueueConsumer(AsyncJsonWebsocketConsumer):
         # Accept the connection
         await self.accept()
 
-        # Send initial state
+        # Send initial state, and the snapshot queue deltas apply to
         if self.queue_id:
             await self._send_queue_status()
+            await self._send_snapshot()
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
@@ -121,6 +122,9 @@ class QueueConsumer(AsyncJsonWebsocketConsumer):
 
         if message_type == "request_status":
             await self._send_queue_status()
+        elif message_type == "resync":
+            # Client missed a delta version
+            await self._send_snapshot()
         elif message_type == "ping":
             await self.send_json(
                 {"type": "pong", "timestamp": timezone.now().isoformat()}
@@ -141,6 +145,13 @@ class QueueConsumer(AsyncJsonWebsocketConsumer):
             # Send as regular JSON
             await self.send_json(message)
 
+    async def queue_broadcast(self, event):
+        """Forward a coalesced queue delta encoded once for the whole group."""
+        if self.use_compression:
+            await self.send(bytes_data=event["compressed"])
+        else:
+            await self.send(text_data=event["text"])
+
     async def specialist_update(self, event):
         """Handle specialist status updates."""
         # Only send if this is for the same shop
@@ -190,6 +201,22 @@ class QueueConsumer(AsyncJsonWebsocketConsumer):
         status = QueueManager.get_queue_status(self.queue_id)
         return status
 
+    @database_sync_to_async
+    def _get_snapshot(self):
+        """Get the encoded broadcast state of the queue."""
+        from apps.queueapp.services.broadcast_service import QueueBroadcastService
+
+        return QueueBroadcastService.encode(QueueBroadcastService.snapshot(self.queue_id))
+
+    async def _send_snapshot(self):
+        """Send the full broadcast state of the queue to the client."""
+        text, compressed = await self._get_snapshot()
+
+        if self.use_compression:
+            await self.send(bytes_data=compressed)
+        else:
+            await self.send(text_data=text)
+
     async def _send_queue_status(self):
         """Send current queue status to the client."""
         # Get current status
@@ -5,11 +5,11 @@ This middleware limits the rate of WebSocket connections and messages
 to prevent abuse and ensure fair resource allocation.
 """
 
-import time
-from collections import defaultdict, deque
-
+from asgiref.sync import sync_to_async
 from channels.middleware import BaseMiddleware
 
+from utils.rate_limits import GCRALimiter
+
 # Module-level constants for rate limits
 MAX_CONNECTIONS_PER_MINUTE = 10  # Max connections per minute per client
 MAX_MESSAGES_PER_MINUTE = 60  # Max messages per minute per client
@@ -24,10 +24,9 @@ class WebsocketRateLimiter(BaseMiddleware):
     2. Message rate limiting: Limits how many messages a client can send in a time period
     """
 
-    # Storage for rate tracking
-    # Use the module-level constants for maxlen
-    connection_history = defaultdict(lambda: deque(maxlen=MAX_CONNECTIONS_PER_MINUTE))
-    message_history = defaultdict(lambda: deque(maxlen=MAX_MESSAGES_PER_MINUTE))
+    # Limits shared by every process through the default cache
+    connection_limiter = GCRALimiter(MAX_CONNECTIONS_PER_MINUTE, 60, "ws:connect:")
+    message_limiter = GCRALimiter(MAX_MESSAGES_PER_MINUTE, 60, "ws:message:")
 
     async def __call__(self, scope, receive, send):
         """Process the WebSocket connection."""
@@ -37,7 +36,7 @@ class WebsocketRateLimiter(BaseMiddleware):
         # Apply connection rate limiting (only for connect event)
         if scope["type"] == "websocket" and scope.get("path", "").startswith("/ws/"):
             # Check connection rate
-            if not self.check_connection_rate(client_id):
+            if not await sync_to_async(self.check_connection_rate)(client_id):
                 # Too many connection attempts, close with rate limit error
                 await send(
                     {
@@ -55,7 +54,7 @@ class WebsocketRateLimiter(BaseMiddleware):
 
             # Apply message rate limiting (only for websocket.receive)
             if message["type"] == "websocket.receive":
-                if not self.check_message_rate(client_id):
+                if not await sync_to_async(self.check_message_rate)(client_id):
                     # Too many messages, close with rate limit error
                     await send(
                         {
@@ -82,33 +81,11 @@ class WebsocketRateLimiter(BaseMiddleware):
 
     def check_connection_rate(self, client_id):
         """Check if client is within connection rate limits."""
-        now = time.time()
-        history = self.connection_history[client_id]
-
-        # If queue is full, check the oldest timestamp
-        if len(history) == self.MAX_CONNECTIONS_PER_MINUTE:
-            # If oldest timestamp is less than 60 seconds ago, rate limit exceeded
-            if now - history[0] < 60:
-                return False
-
-        # Add current timestamp to history
-        history.append(now)
-        return True
+        return self.connection_limiter.hit(client_id).allowed
 
     def check_message_rate(self, client_id):
         """Check if client is within message rate limits."""
-        now = time.time()
-        history = self.message_history[client_id]
-
-        # If queue is full, check the oldest timestamp
-        if len(history) == self.MAX_MESSAGES_PER_MINUTE:
-            # If oldest timestamp is less than 60 seconds ago, rate limit exceeded
-            if now - history[0] < 60:
-                return False
-
-        # Add current timestamp to history
-        history.append(now)
-        return True
+        return self.message_limiter.hit(client_id).allowed
 
 
 def WebsocketRateLimiterStack(inner):